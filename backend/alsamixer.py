@@ -0,0 +1,540 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+import subprocess
+import threading
+import ctypes
+import ctypes.util
+from .amixersession import AmixerSession
+
+__all__ = ['AlsaMixer']
+
+
+class LibasoundMixer():
+    """
+    Direct access to ALSA simple mixer controls through libasound (no amixer process spawned)
+
+    Mixer handle is opened once and kept open, values changed by other processes are
+    synchronized before each read.
+    """
+
+    CHANNEL_FRONT_LEFT = 0
+
+    def __init__(self, device='default'):
+        """
+        Constructor
+
+        Args:
+            device (string): alsa ctl device name (default, hw:0...)
+
+        Raises:
+            OSError: if libasound is not available or mixer can't be opened
+        """
+        self.device = device
+        self.__lock = threading.Lock()
+        self.__elements = {}
+        self.__libasound = self.__load_library()
+        self.__handle = ctypes.c_void_p()
+        self.__open()
+
+    def __del__(self):
+        """
+        Destructor
+        """
+        self.close()
+
+    @staticmethod
+    def __load_library():
+        """
+        Load libasound and declare used functions prototypes
+
+        Returns:
+            CDLL: libasound library
+
+        Raises:
+            OSError: if library is not found
+        """
+        lib_path = ctypes.util.find_library('asound')
+        if not lib_path:
+            raise OSError('libasound not found')
+        lib = ctypes.CDLL(lib_path)
+
+        void_p = ctypes.c_void_p
+        long_p = ctypes.POINTER(ctypes.c_long)
+        prototypes = {
+            'snd_mixer_open': (ctypes.c_int, [ctypes.POINTER(void_p), ctypes.c_int]),
+            'snd_mixer_attach': (ctypes.c_int, [void_p, ctypes.c_char_p]),
+            'snd_mixer_selem_register': (ctypes.c_int, [void_p, void_p, void_p]),
+            'snd_mixer_load': (ctypes.c_int, [void_p]),
+            'snd_mixer_close': (ctypes.c_int, [void_p]),
+            'snd_mixer_handle_events': (ctypes.c_int, [void_p]),
+            'snd_mixer_find_selem': (void_p, [void_p, void_p]),
+            'snd_mixer_first_elem': (void_p, [void_p]),
+            'snd_mixer_elem_next': (void_p, [void_p]),
+            'snd_mixer_selem_get_name': (ctypes.c_char_p, [void_p]),
+            'snd_mixer_selem_id_malloc': (ctypes.c_int, [ctypes.POINTER(void_p)]),
+            'snd_mixer_selem_id_free': (None, [void_p]),
+            'snd_mixer_selem_id_set_index': (None, [void_p, ctypes.c_uint]),
+            'snd_mixer_selem_id_set_name': (None, [void_p, ctypes.c_char_p]),
+            'snd_mixer_selem_get_playback_volume_range': (ctypes.c_int, [void_p, long_p, long_p]),
+            'snd_mixer_selem_get_playback_volume': (ctypes.c_int, [void_p, ctypes.c_int, long_p]),
+            'snd_mixer_selem_set_playback_volume_all': (ctypes.c_int, [void_p, ctypes.c_long]),
+            'snd_mixer_selem_get_capture_volume_range': (ctypes.c_int, [void_p, long_p, long_p]),
+            'snd_mixer_selem_get_capture_volume': (ctypes.c_int, [void_p, ctypes.c_int, long_p]),
+            'snd_mixer_selem_set_capture_volume_all': (ctypes.c_int, [void_p, ctypes.c_long]),
+        }
+        for name, (restype, argtypes) in prototypes.items():
+            func = getattr(lib, name)
+            func.restype = restype
+            func.argtypes = argtypes
+
+        return lib
+
+    def __open(self):
+        """
+        Open and load mixer
+
+        Raises:
+            OSError: if mixer can't be opened
+        """
+        lib = self.__libasound
+        if lib.snd_mixer_open(ctypes.byref(self.__handle), 0) < 0:
+            raise OSError('Unable to open alsa mixer')
+        if lib.snd_mixer_attach(self.__handle, self.device.encode('utf-8')) < 0 \
+                or lib.snd_mixer_selem_register(self.__handle, None, None) < 0 \
+                or lib.snd_mixer_load(self.__handle) < 0:
+            self.close()
+            raise OSError('Unable to load alsa mixer for device "%s"' % self.device)
+
+    def close(self):
+        """
+        Close mixer handle
+        """
+        if getattr(self, '_LibasoundMixer__handle', None) and self.__handle.value:
+            self.__libasound.snd_mixer_close(self.__handle)
+            self.__handle = ctypes.c_void_p()
+            self.__elements.clear()
+
+    def __get_element(self, control):
+        """
+        Return mixer element for specified simple control name
+
+        Args:
+            control (string): simple control name
+
+        Returns:
+            int: element pointer or None if control not found
+        """
+        if control in self.__elements:
+            return self.__elements[control]
+
+        lib = self.__libasound
+        selem_id = ctypes.c_void_p()
+        if lib.snd_mixer_selem_id_malloc(ctypes.byref(selem_id)) < 0:
+            return None
+        try:
+            lib.snd_mixer_selem_id_set_index(selem_id, 0)
+            lib.snd_mixer_selem_id_set_name(selem_id, control.encode('utf-8'))
+            element = lib.snd_mixer_find_selem(self.__handle, selem_id)
+        finally:
+            lib.snd_mixer_selem_id_free(selem_id)
+
+        if element:
+            self.__elements[control] = element
+        return element
+
+    def get_controls(self):
+        """
+        Return simple controls names
+
+        Returns:
+            list: list of simple control names (same order than amixer scontrols)
+        """
+        lib = self.__libasound
+        controls = []
+        with self.__lock:
+            lib.snd_mixer_handle_events(self.__handle)
+            element = lib.snd_mixer_first_elem(self.__handle)
+            while element:
+                name = lib.snd_mixer_selem_get_name(element)
+                if name:
+                    controls.append(name.decode('utf-8', 'ignore'))
+                element = lib.snd_mixer_elem_next(element)
+
+        return controls
+
+    def __get_functions(self, capture):
+        """
+        Return libasound functions according to volume direction
+
+        Args:
+            capture (bool): True for capture functions, False for playback ones
+
+        Returns:
+            tuple: (range function, get function, set function)
+        """
+        lib = self.__libasound
+        if capture:
+            return (
+                lib.snd_mixer_selem_get_capture_volume_range,
+                lib.snd_mixer_selem_get_capture_volume,
+                lib.snd_mixer_selem_set_capture_volume_all,
+            )
+        return (
+            lib.snd_mixer_selem_get_playback_volume_range,
+            lib.snd_mixer_selem_get_playback_volume,
+            lib.snd_mixer_selem_set_playback_volume_all,
+        )
+
+    def get_volume(self, control, capture=False):
+        """
+        Get control volume
+
+        Args:
+            control (string): simple control name
+            capture (bool): True to get capture volume instead of playback one
+
+        Returns:
+            int: volume percentage (same rounding than amixer)
+
+        Raises:
+            OSError: if volume can't be read
+        """
+        with self.__lock:
+            self.__libasound.snd_mixer_handle_events(self.__handle)
+            element = self.__get_element(control)
+            if not element:
+                raise OSError('Mixer control "%s" not found' % control)
+
+            range_func, get_func, _ = self.__get_functions(capture)
+            min_value, max_value, value = ctypes.c_long(), ctypes.c_long(), ctypes.c_long()
+            if range_func(element, ctypes.byref(min_value), ctypes.byref(max_value)) < 0 \
+                    or get_func(element, self.CHANNEL_FRONT_LEFT, ctypes.byref(value)) < 0:
+                raise OSError('Unable to read volume of mixer control "%s"' % control)
+
+        return self.raw_to_percent(value.value, min_value.value, max_value.value)
+
+    def set_volume(self, control, volume, capture=False):
+        """
+        Set control volume
+
+        Args:
+            control (string): simple control name
+            volume (int): volume percentage
+            capture (bool): True to set capture volume instead of playback one
+
+        Returns:
+            int: applied volume percentage
+
+        Raises:
+            OSError: if volume can't be written
+        """
+        with self.__lock:
+            element = self.__get_element(control)
+            if not element:
+                raise OSError('Mixer control "%s" not found' % control)
+
+            range_func, _, set_func = self.__get_functions(capture)
+            min_value, max_value = ctypes.c_long(), ctypes.c_long()
+            if range_func(element, ctypes.byref(min_value), ctypes.byref(max_value)) < 0:
+                raise OSError('Unable to read volume range of mixer control "%s"' % control)
+            raw = self.percent_to_raw(volume, min_value.value, max_value.value)
+            if set_func(element, raw) < 0:
+                raise OSError('Unable to set volume of mixer control "%s"' % control)
+
+        return self.raw_to_percent(raw, min_value.value, max_value.value)
+
+    @staticmethod
+    def raw_to_percent(value, min_value, max_value):
+        """
+        Convert raw mixer value to percentage (amixer convert_prange)
+
+        Args:
+            value (int): raw value
+            min_value (int): raw min value
+            max_value (int): raw max value
+
+        Returns:
+            int: percentage
+        """
+        value_range = max_value - min_value
+        if value_range == 0:
+            return 0
+        return int(round((value - min_value) * 100.0 / value_range))
+
+    @staticmethod
+    def percent_to_raw(percent, min_value, max_value):
+        """
+        Convert percentage to raw mixer value (amixer convert_prange1)
+
+        Args:
+            percent (int): percentage
+            min_value (int): raw min value
+            max_value (int): raw max value
+
+        Returns:
+            int: raw value
+        """
+        percent = max(0, min(100, percent))
+        return int(round((max_value - min_value) * percent * 0.01)) + min_value
+
+
+class AlsaMixer():
+    """
+    Volume access for audio drivers with selectable backend:
+
+        - libasound: direct access to ALSA control interface (fast, no process spawned)
+        - amixer: amixer command execution and output parsing (historical way). Volume updates are
+          executed through an amixer session that returns new state without extra process
+
+    Auto backend uses libasound when available and falls back to amixer if it fails. Forced libasound
+    backend never uses amixer, its errors are raised.
+    """
+
+    BACKEND_AUTO = 'auto'
+    BACKEND_LIBASOUND = 'libasound'
+    BACKEND_AMIXER = 'amixer'
+
+    AMIXER = 'amixer'
+    AMIXER_TIMEOUT = 5.0
+    SCONTROL_PATTERN = re.compile(r"^Simple mixer control '(.*)',\d+$")
+
+    def __init__(self, alsa, volume_pattern, backend=BACKEND_AUTO, device='default'):
+        """
+        Constructor
+
+        Args:
+            alsa (Alsa): Alsa command instance used by amixer backend on default device
+            volume_pattern (tuple): amixer output volume pattern (see Alsa.get_volume). Channel can be
+                                    None to use first channel of control
+            backend (string): backend to use (BACKEND_XXX)
+            device (string): alsa ctl device (default, hw:1...)
+        """
+        if backend not in (self.BACKEND_AUTO, self.BACKEND_LIBASOUND, self.BACKEND_AMIXER):
+            raise ValueError('Invalid mixer backend "%s"' % backend)
+
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.alsa = alsa
+        self.volume_pattern = volume_pattern
+        self.backend = backend
+        self.device = device
+        self.__native = None
+        if backend != self.BACKEND_AMIXER:
+            self.__native = self.__open_native()
+            if self.__native is None and backend == self.BACKEND_LIBASOUND:
+                raise OSError('Libasound mixer backend is not available')
+
+    def __open_native(self):
+        """
+        Open libasound mixer
+
+        Returns:
+            LibasoundMixer: native mixer instance or None if not available
+        """
+        try:
+            return LibasoundMixer(self.device)
+        except Exception as error:
+            self.logger.debug('Libasound mixer unavailable, amixer will be used: %s' % str(error))
+            return None
+
+    def get_backend(self):
+        """
+        Return backend currently in use
+
+        Returns:
+            string: BACKEND_LIBASOUND or BACKEND_AMIXER
+        """
+        return self.BACKEND_LIBASOUND if self.__native else self.BACKEND_AMIXER
+
+    def close(self):
+        """
+        Release mixer resources
+        """
+        if self.__native:
+            self.__native.close()
+            self.__native = None
+
+    def get_controls(self):
+        """
+        Return simple controls names
+
+        Returns:
+            list: list of simple control names
+
+        Raises:
+            Exception: if libasound backend is forced and fails
+        """
+        if self.__native:
+            try:
+                return self.__native.get_controls()
+            except Exception as error:
+                self.__on_native_error(error)
+
+        if self.device != 'default':
+            output = self.__run_amixer(['scontrols'])
+            matches = [self.SCONTROL_PATTERN.match(line) for line in (output or '').splitlines()]
+            return [match.group(1) for match in matches if match]
+        return self.alsa.get_simple_controls()
+
+    def get_volume(self, control, capture=False):
+        """
+        Get volume of specified control
+
+        Args:
+            control (string): simple control name
+            capture (bool): True to get capture volume
+
+        Returns:
+            int: volume percentage or None if error occured
+
+        Raises:
+            Exception: if libasound backend is forced and fails
+        """
+        if self.__native:
+            try:
+                return self.__native.get_volume(control, capture)
+            except Exception as error:
+                self.__on_native_error(error)
+
+        if self.device != 'default':
+            return self.parse_volume(self.__run_amixer(['sget', control]))
+        return self.alsa.get_volume(control, self.volume_pattern)
+
+    def __run_amixer(self, arguments):
+        """
+        Run amixer command on configured device
+
+        Args:
+            arguments (list): amixer command arguments
+
+        Returns:
+            string: command output or None if command failed
+        """
+        try:
+            return subprocess.check_output(
+                [self.AMIXER, '-D', self.device] + arguments,
+                stderr=subprocess.DEVNULL,
+                timeout=self.AMIXER_TIMEOUT,
+            ).decode('utf-8', 'replace')
+        except Exception as error:
+            self.logger.error('Amixer command failed on device "%s": %s' % (self.device, str(error)))
+            return None
+
+    def set_volume(self, control, volume, capture=False):
+        """
+        Set volume of specified control
+
+        Args:
+            control (string): simple control name
+            volume (int): volume percentage (None to keep current volume)
+            capture (bool): True to set capture volume
+
+        Returns:
+            int: applied volume percentage or None if error occured
+
+        Raises:
+            Exception: if libasound backend is forced and fails
+        """
+        if volume is None:
+            return self.get_volume(control, capture)
+
+        if self.__native:
+            try:
+                return self.__native.set_volume(control, volume, capture)
+            except Exception as error:
+                self.__on_native_error(error)
+
+        return self.__set_amixer_volumes([(control, volume, capture)])[0]
+
+    def set_volumes(self, volumes):
+        """
+        Set volumes of several controls. With amixer backend all volumes are set by a single amixer
+        process
+
+        Args:
+            volumes (list): list of (control name (string), volume percentage (int, None to keep
+                            current volume), capture (bool)) tuples
+
+        Returns:
+            list: applied volume percentages (None if error occured), in volumes order
+
+        Raises:
+            Exception: if libasound backend is forced and fails
+        """
+        if self.__native:
+            return [self.set_volume(control, volume, capture) for control, volume, capture in volumes]
+
+        results = [None] * len(volumes)
+        updates = []
+        for index, (control, volume, capture) in enumerate(volumes):
+            if volume is None:
+                results[index] = self.get_volume(control, capture)
+            else:
+                updates.append((index, (control, volume, capture)))
+        if updates:
+            applied = self.__set_amixer_volumes([update for _, update in updates])
+            for (index, _), volume in zip(updates, applied):
+                results[index] = volume
+
+        return results
+
+    def __set_amixer_volumes(self, volumes):
+        """
+        Set volumes using a single amixer session. New volumes are read from amixer output
+
+        Args:
+            volumes (list): list of (control name, volume percentage, capture) tuples
+
+        Returns:
+            list: applied volume percentages (None if error occured), in volumes order
+        """
+        session = AmixerSession(device=self.device if self.device != 'default' else None)
+        for control, volume, capture in volumes:
+            session.sset(control, '%d%%%s' % (volume, ' capture' if capture else ''))
+        try:
+            outputs = session.execute()
+        except Exception as error:
+            self.logger.error('Unable to set volume of mixer controls %s: %s' % (
+                [control for control, _, _ in volumes], str(error),
+            ))
+            return [None] * len(volumes)
+
+        return [self.parse_volume(output) for output in outputs]
+
+    def parse_volume(self, output):
+        """
+        Parse volume from amixer control output using volume pattern
+
+        Args:
+            output (string): amixer control output
+
+        Returns:
+            int: volume percentage or None if not found
+        """
+        channel, pattern = self.volume_pattern
+        for line in (output or '').splitlines():
+            if channel is not None and not line.strip().startswith('%s:' % channel):
+                continue
+            matches = re.search(pattern, line)
+            if matches and matches.group(1):
+                return int(matches.group(1))
+
+        return None
+
+    def __on_native_error(self, error):
+        """
+        Handle native backend error: forced libasound backend raises it, auto backend switches to amixer
+
+        Args:
+            error (Exception): native error
+
+        Raises:
+            Exception: native error if libasound backend is forced
+        """
+        self.logger.warning('Libasound mixer failed: %s' % str(error))
+        if self.backend == self.BACKEND_LIBASOUND:
+            raise error
+        self.logger.info('Switch mixer backend to amixer')
+        self.close()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+import subprocess
+
+__all__ = ['AmixerSession']
+
+
+class AmixerSession():
+    """
+    Batched amixer commands: queued commands are piped to a single "amixer --stdin" process,
+    so multi-control operations cost one process instead of one per control.
+
+    Note:
+        amixer stdin mode only accepts sset and cset commands and has no reply delimiter, so a
+        batch is terminated by closing amixer stdin. Each command prints resulting control state,
+        outputs are mapped back to commands using control identifier in output header.
+    """
+
+    AMIXER = 'amixer'
+    SSET = 'sset'
+    CSET = 'cset'
+    TIMEOUT = 5.0
+
+    SIMPLE_HEADER_PATTERN = re.compile(r"^Simple mixer control '(.*)',(\d+)$")
+    CONTROL_HEADER_PATTERN = re.compile(r'^numid=(\d+),')
+
+    def __init__(self, device=None, timeout=TIMEOUT):
+        """
+        Constructor
+
+        Args:
+            device (string): alsa ctl device (None for default one)
+            timeout (float): batch execution timeout in seconds
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.device = device
+        self.timeout = timeout
+        self.__commands = []
+
+    def __len__(self):
+        """
+        Return number of queued commands
+
+        Returns:
+            int: number of queued commands
+        """
+        return len(self.__commands)
+
+    def sset(self, control, value):
+        """
+        Queue simple control update
+
+        Args:
+            control (string): simple control name
+            value (string): control value (50%, on, 2dB+...)
+
+        Returns:
+            int: command index in batch
+
+        Raises:
+            ValueError: if value is None
+        """
+        if value is None:
+            raise ValueError('No value specified for control "%s"' % control)
+        return self.__add(self.SSET, ('name', control), "'%s' %s" % (control, value))
+
+    def cset(self, numid, value):
+        """
+        Queue control update
+
+        Args:
+            numid (int): control numid
+            value (any): control value
+
+        Returns:
+            int: command index in batch
+
+        Raises:
+            ValueError: if value is None
+        """
+        if value is None:
+            raise ValueError('No value specified for control numid=%s' % numid)
+        return self.__add(self.CSET, ('numid', str(numid)), 'numid=%s %s' % (numid, value))
+
+    def __add(self, command, key, arguments):
+        """
+        Queue command
+
+        Args:
+            command (string): amixer command (SSET or CSET)
+            key (tuple): control identifier used to find command output
+            arguments (string): command arguments
+
+        Returns:
+            int: command index in batch
+        """
+        self.__commands.append((key, '%s %s' % (command, arguments)))
+        return len(self.__commands) - 1
+
+    def get_command(self):
+        """
+        Return amixer command line
+
+        Returns:
+            list: command line arguments
+        """
+        command = [self.AMIXER]
+        if self.device:
+            command += ['-D', self.device]
+        return command + ['--stdin']
+
+    def execute(self):
+        """
+        Execute queued commands in a single amixer process. Queue is emptied
+
+        Returns:
+            list: commands outputs in queue order (None if command did not output anything, for
+                  example when control does not exist)
+
+        Raises:
+            Exception: if amixer failed
+        """
+        commands, self.__commands = self.__commands, []
+        if not commands:
+            return []
+
+        process = subprocess.Popen(
+            self.get_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        stdin = ''.join(['%s\n' % line for _, line in commands]).encode('utf-8')
+        try:
+            stdout, stderr = process.communicate(stdin, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise Exception('Amixer batch timed out')
+        if process.returncode != 0:
+            raise Exception('Amixer batch failed: %s' % stderr.decode('utf-8', 'ignore').strip())
+
+        blocks = self.parse_output(stdout.decode('utf-8', 'ignore'))
+        self.logger.debug('Amixer batch of %d commands executed' % len(commands))
+
+        return ['\n'.join(blocks[key]) if key in blocks else None for key, _ in commands]
+
+    def parse_output(self, output):
+        """
+        Split amixer output into blocks, one per control
+
+        Args:
+            output (string): amixer output
+
+        Returns:
+            dict: output lines indexed by control identifier (('name', name) or ('numid', numid))
+        """
+        blocks = {}
+        lines = None
+        for line in output.splitlines():
+            simple_header = self.SIMPLE_HEADER_PATTERN.match(line)
+            control_header = self.CONTROL_HEADER_PATTERN.match(line)
+            if simple_header or control_header:
+                key = ('name', simple_header.group(1)) if simple_header else ('numid', control_header.group(1))
+                lines = blocks[key] = []
+            if lines is not None:
+                lines.append(line)
+
+        return blocks
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import re
+import threading
+import time
+
+__all__ = ['AsoundCards']
+
+
+class AsoundCards():
+    """
+    Sound cards and PCM devices enumerator based on /proc/asound content
+
+    It is a lightweight replacement of aplay/arecord output parsing: enumeration only reads
+    /proc/asound/cards and lists /proc/asound/cardX directories. Result is indexed by card
+    number, card id, card name and capability, and kept until it is invalidated or expired.
+    """
+
+    PROC_ASOUND = '/proc/asound'
+    CARD_PATTERN = re.compile(r'^\s*(\d+)\s+\[(.+?)\s*\]:\s+(\S+)\s+-\s+(.*?)\s*$')
+    PCM_PATTERN = re.compile(r'^pcm(\d+)([pc])$')
+    HW_PARAMS_PATTERN = re.compile(r'^(\w+):\s+(\S+)')
+    CACHE_TTL = 5.0
+
+    CAPABILITY_PLAYBACK = 'playback'
+    CAPABILITY_CAPTURE = 'capture'
+
+    def __init__(self, proc_path=PROC_ASOUND):
+        """
+        Constructor
+
+        Args:
+            proc_path (string): asound proc directory path
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.proc_path = proc_path
+        self.__lock = threading.Lock()
+        self.__timestamp = 0.0
+        self.__cards = None
+        self.__by_id = {}
+        self.__by_name = {}
+        self.__by_capability = {}
+
+    def invalidate(self):
+        """
+        Invalidate enumeration. Next access will read /proc/asound again
+        """
+        with self.__lock:
+            self.__cards = None
+
+    def __refresh(self):
+        """
+        Enumerate cards if needed. Must be called with lock acquired
+        """
+        now = time.monotonic()
+        if self.__cards is not None and now - self.__timestamp < self.CACHE_TTL:
+            return
+
+        cards = {}
+        for card in self.__read_cards():
+            card.update(self.__read_pcms(card['cardid']))
+            cards[card['cardid']] = card
+
+        self.__cards = cards
+        self.__by_id = {card['id']: card for card in cards.values()}
+        self.__by_name = {card['name']: card for card in cards.values()}
+        self.__by_capability = {
+            self.CAPABILITY_PLAYBACK: [card for card in cards.values() if card['playback']],
+            self.CAPABILITY_CAPTURE: [card for card in cards.values() if card['capture']],
+        }
+        self.__timestamp = now
+        self.logger.debug('Found sound cards: %s' % cards)
+
+    def __read_cards(self):
+        """
+        Parse /proc/asound/cards content
+
+        Returns:
+            list: list of cards (without pcm infos)
+        """
+        try:
+            with open(os.path.join(self.proc_path, 'cards'), 'r') as proc_file:
+                lines = proc_file.read().splitlines()
+        except Exception as error:
+            self.logger.debug('Unable to read sound cards: %s' % str(error))
+            return []
+
+        cards = []
+        for line in lines:
+            matches = self.CARD_PATTERN.match(line)
+            if matches:
+                cards.append({
+                    'cardid': int(matches.group(1)),
+                    'id': matches.group(2),
+                    'driver': matches.group(3),
+                    'name': matches.group(4),
+                    'longname': None,
+                })
+            elif cards and cards[-1]['longname'] is None and line.strip():
+                cards[-1]['longname'] = line.strip()
+
+        return cards
+
+    def __read_pcms(self, cardid):
+        """
+        List PCM devices of specified card
+
+        Args:
+            cardid (int): card number
+
+        Returns:
+            dict: pcm devices::
+
+                {
+                    playback (list): list of playback device numbers
+                    capture (list): list of capture device numbers
+                }
+
+        """
+        pcms = {
+            self.CAPABILITY_PLAYBACK: [],
+            self.CAPABILITY_CAPTURE: [],
+        }
+        try:
+            entries = os.listdir(os.path.join(self.proc_path, 'card%d' % cardid))
+        except Exception:
+            return pcms
+
+        for entry in entries:
+            matches = self.PCM_PATTERN.match(entry)
+            if matches:
+                key = self.CAPABILITY_PLAYBACK if matches.group(2) == 'p' else self.CAPABILITY_CAPTURE
+                pcms[key].append(int(matches.group(1)))
+        for devices in pcms.values():
+            devices.sort()
+
+        return pcms
+
+    def get_cards(self):
+        """
+        Return all sound cards
+
+        Returns:
+            list: list of cards sorted by card number::
+
+                [
+                    {
+                        cardid (int): card number
+                        id (string): card identifier
+                        driver (string): card driver
+                        name (string): card name
+                        longname (string): card long name
+                        playback (list): playback device numbers
+                        capture (list): capture device numbers
+                    },
+                    ...
+                ]
+
+        """
+        with self.__lock:
+            self.__refresh()
+            return [self.__cards[cardid] for cardid in sorted(self.__cards.keys())]
+
+    def get_card(self, cardid):
+        """
+        Return card by card number
+
+        Args:
+            cardid (int): card number
+
+        Returns:
+            dict: card (see get_cards) or None if not found
+        """
+        with self.__lock:
+            self.__refresh()
+            return self.__cards.get(cardid)
+
+    def get_card_by_id(self, card_id):
+        """
+        Return card by card identifier
+
+        Args:
+            card_id (string): card identifier (Headphones, vc4hdmi...)
+
+        Returns:
+            dict: card (see get_cards) or None if not found
+        """
+        with self.__lock:
+            self.__refresh()
+            return self.__by_id.get(card_id)
+
+    def get_card_by_name(self, name):
+        """
+        Return card by card name
+
+        Args:
+            name (string): card name (bcm2835 Headphones...)
+
+        Returns:
+            dict: card (see get_cards) or None if not found
+        """
+        with self.__lock:
+            self.__refresh()
+            return self.__by_name.get(name)
+
+    def get_cards_by_capability(self, capability):
+        """
+        Return cards having specified capability
+
+        Args:
+            capability (string): CAPABILITY_PLAYBACK or CAPABILITY_CAPTURE
+
+        Returns:
+            list: list of cards (see get_cards)
+        """
+        with self.__lock:
+            self.__refresh()
+            return list(self.__by_capability.get(capability, []))
+
+    def find(self, pattern, capability=None):
+        """
+        Return first card (lowest card number) which id, name or driver contains specified pattern
+
+        Args:
+            pattern (string): case insensitive pattern
+            capability (string): restrict search to cards with this capability (CAPABILITY_XXX)
+
+        Returns:
+            dict: card (see get_cards) or None if not found
+        """
+        pattern = pattern.lower()
+        cards = self.get_cards_by_capability(capability) if capability else self.get_cards()
+        for card in sorted(cards, key=lambda card: card['cardid']):
+            if pattern in card['id'].lower() or pattern in card['name'].lower() or pattern in card['driver'].lower():
+                return card
+
+        return None
+
+    def get_hw_params(self, cardid, device=0, capability=CAPABILITY_PLAYBACK):
+        """
+        Return hardware parameters of an opened PCM device (first substream), read from
+        /proc/asound/cardX/pcmYp/sub0/hw_params. Parameters are only available while
+        device is opened.
+
+        Args:
+            cardid (int): card number
+            device (int): device number
+            capability (string): CAPABILITY_PLAYBACK or CAPABILITY_CAPTURE
+
+        Returns:
+            dict: hardware parameters or None if device is closed or unknown::
+
+                {
+                    rate (int): sample rate
+                    channels (int): channels count
+                    sample_format (string): sample format
+                }
+
+        """
+        path = os.path.join(
+            self.proc_path,
+            'card%d' % cardid,
+            'pcm%d%s' % (device, 'p' if capability == self.CAPABILITY_PLAYBACK else 'c'),
+            'sub0',
+            'hw_params',
+        )
+        try:
+            with open(path, 'r') as proc_file:
+                lines = proc_file.read().splitlines()
+        except Exception as error:
+            self.logger.debug('Unable to read hw params: %s' % str(error))
+            return None
+
+        params = {}
+        for line in lines:
+            matches = self.HW_PARAMS_PATTERN.match(line)
+            if matches:
+                params[matches.group(1)] = matches.group(2)
+        try:
+            return {
+                'rate': int(params['rate']),
+                'channels': int(params['channels']),
+                'sample_format': params['format'],
+            }
+        except (KeyError, ValueError):
+            return None
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__all__ = ['AsoundProfile']
+
+
+class AsoundProfile():
+    """
+    Latency profiles for /etc/asound.conf. A profile sets period and buffer sizes of a
+    plug -> dmix (playback) and plug -> dsnoop (capture) chain on top of card hardware device,
+    so several processes can use card at the same time with a known latency.
+    """
+
+    LOW_LATENCY = 'low-latency'
+    BALANCED = 'balanced'
+    POWER_SAVE = 'power-save'
+    PROFILES = {
+        LOW_LATENCY: {
+            'period_size': 256,
+            'periods': 4,
+        },
+        BALANCED: {
+            'period_size': 1024,
+            'periods': 4,
+        },
+        POWER_SAVE: {
+            'period_size': 4096,
+            'periods': 4,
+        },
+    }
+
+    HEADER_PREFIX = '# generated by cleep audio module'
+    HEADER = HEADER_PREFIX + ', profile "%s" (do not edit)'
+    PLAYBACK_IPC_KEY = 2048
+    CAPTURE_IPC_KEY = 2049
+
+    def __init__(self, profile, rate=44100):
+        """
+        Constructor
+
+        Args:
+            profile (string): profile name (LOW_LATENCY, BALANCED or POWER_SAVE)
+            rate (int): hardware sample rate
+
+        Raises:
+            ValueError: if profile is unknown
+        """
+        if profile not in self.PROFILES:
+            raise ValueError('Unknown latency profile "%s"' % profile)
+
+        self.profile = profile
+        self.rate = rate
+        self.period_size = self.PROFILES[profile]['period_size']
+        self.buffer_size = self.period_size * self.PROFILES[profile]['periods']
+
+    @classmethod
+    def get_profiles(cls, rate=44100):
+        """
+        Return available profiles
+
+        Args:
+            rate (int): hardware sample rate
+
+        Returns:
+            list: profiles (see get_infos), lowest latency first
+        """
+        return sorted(
+            [cls(profile, rate).get_infos() for profile in cls.PROFILES],
+            key=lambda infos: infos['latency'],
+        )
+
+    @classmethod
+    def is_generated(cls, content):
+        """
+        Return True if asound.conf content was generated from a profile
+
+        Args:
+            content (string): asound.conf content
+
+        Returns:
+            bool: True if content was generated from a profile
+        """
+        return bool(content) and content.startswith(cls.HEADER_PREFIX)
+
+    @classmethod
+    def is_capture_shared(cls, content):
+        """
+        Return True if asound.conf content was generated from a profile with capture chain (dsnoop)
+
+        Args:
+            content (string): asound.conf content
+
+        Returns:
+            bool: True if default capture device is shared
+        """
+        return cls.is_generated(content) and 'type dsnoop' in content
+
+    def get_infos(self):
+        """
+        Return profile infos
+
+        Returns:
+            dict: profile infos::
+
+                {
+                    name (string): profile name
+                    period_size (int): period size in frames
+                    buffer_size (int): buffer size in frames
+                    latency (float): buffer latency in milliseconds
+                }
+
+        """
+        return {
+            'name': self.profile,
+            'period_size': self.period_size,
+            'buffer_size': self.buffer_size,
+            'latency': round(self.buffer_size * 1000.0 / self.rate, 1),
+        }
+
+    def generate(self, card_id, device_id, capture=False):
+        """
+        Generate asound.conf content
+
+        Args:
+            card_id (int): card number
+            device_id (int): device number
+            capture (bool): True to add capture chain (card has capture capability)
+
+        Returns:
+            string: asound.conf content
+        """
+        lines = [
+            self.HEADER % self.profile,
+            'pcm.!default {',
+            '    type asym',
+            '    playback.pcm "cleep_playback"',
+        ]
+        if capture:
+            lines.append('    capture.pcm "cleep_capture"')
+        lines += [
+            '}',
+            '',
+            'ctl.!default {',
+            '    type hw',
+            '    card %d' % card_id,
+            '}',
+            '',
+        ]
+        lines += self.__get_chain('playback', 'dmix', self.PLAYBACK_IPC_KEY, card_id, device_id)
+        if capture:
+            lines += self.__get_chain('capture', 'dsnoop', self.CAPTURE_IPC_KEY, card_id, device_id)
+
+        return '\n'.join(lines)
+
+    def __get_chain(self, name, plugin, ipc_key, card_id, device_id):
+        """
+        Return plug -> dmix/dsnoop -> hw chain definition
+
+        Args:
+            name (string): chain name (playback or capture)
+            plugin (string): sharing plugin (dmix or dsnoop)
+            ipc_key (int): plugin ipc key
+            card_id (int): card number
+            device_id (int): device number
+
+        Returns:
+            list: configuration lines
+        """
+        return [
+            'pcm.cleep_%s {' % name,
+            '    type plug',
+            '    slave.pcm "cleep_%s"' % plugin,
+            '}',
+            '',
+            'pcm.cleep_%s {' % plugin,
+            '    type %s' % plugin,
+            '    ipc_key %d' % ipc_key,
+            '    ipc_perm 0666',
+            '    slave {',
+            '        pcm "hw:%d,%d"' % (card_id, device_id),
+            '        rate %d' % self.rate,
+            '        period_size %d' % self.period_size,
+            '        buffer_size %d' % self.buffer_size,
+            '    }',
+            '}',
+            '',
+        ]
@@ -3,13 +3,33 @@
 
 import time
 import os
+import copy
+import threading
+from collections import OrderedDict
 from cleep.core import CleepResources
 from cleep.exception import CommandError, InvalidParameter, MissingParameter
 from cleep.libs.commands.alsa import Alsa
-from cleep.libs.configs.etcasoundconf import EtcAsoundConf
 from cleep.libs.drivers.driver import Driver
 import cleep.libs.internals.tools as Tools
 from .bcm2835audiodriver import Bcm2835AudioDriver
+from .asoundcards import AsoundCards
+from .cardregistry import CardRegistry
+from .concurrentrunner import ConcurrentRunner
+from .rawpcm import RawPcm
+from .soundcache import SoundCache
+from .soundassets import SoundAssets
+from .coalescer import Coalescer
+from .volumeramp import VolumeRamp
+from .hotplugwatcher import HotplugWatcher
+from .deviceswitch import DeviceSwitch
+from .playbackservice import PlaybackService
+from .asoundprofile import AsoundProfile
+from .levelmeter import LevelMeter
+from .sharedstreams import SharedStreams
+from .testjobs import TestJobs
+from .latencybench import LatencyBench
+from .commandstats import CommandStats, instrumented
+from .instrumentedproxy import InstrumentedProxy
 
 __all__ = ['Audio']
 
@@ -32,10 +52,50 @@ class Audio(CleepResources):
 
     MODULE_CONFIG_FILE = 'audio.conf'
     DEFAULT_CONFIG = {
-        'driver': None
+        'driver': None,
+        'latency_profile': None,
+        'active_cards': [],
     }
 
+    ASOUND_CONF = '/etc/asound.conf'
     TEST_SOUND = '/opt/cleep/sounds/connected.wav'
+    MODULE_SOUNDS = [TEST_SOUND]
+    SOUND_ASSETS_PATH = '/var/cache/cleep/audio'
+    VOLUMES_COALESCE_WINDOW = 0.15
+    SOUND_CACHE_SIZE = 2097152
+    DEFAULT_PLAYBACK_FORMAT = {
+        'rate': 44100,
+        'channels': 2,
+        'sample_format': RawPcm.FORMAT_S16LE,
+    }
+    TEST_RECORDING_DURATION = 5.0
+    TEST_RECORDING_FORMAT = {
+        'rate': 22050,
+        'channels': 1,
+        'sample_format': RawPcm.FORMAT_S16LE,
+    }
+    TEST_PLAYING = 'playing'
+    TEST_RECORDING = 'recording'
+    TEST_LATENCY = 'latency'
+    TEST_RESOURCES = {
+        TEST_PLAYING: ('audio.playback',),
+        TEST_RECORDING: ('audio.capture',),
+        TEST_LATENCY: ('audio.playback', 'audio.capture'),
+    }
+
+    CAPTURE_STREAM_FORMAT = {
+        'rate': 16000,
+        'channels': 1,
+        'sample_format': RawPcm.FORMAT_S16LE,
+    }
+    LEVEL_METER_RATE = 10.0
+    LATENCY_BENCH_MAX_RUNS = 20
+    LATENCY_BENCH_REFERENCE_CARD = 'Loopback'
+
+    DEVICES_CACHE_TTL = 60.0
+    CONFIG_PUBLISH_DELAY = 0.5
+    PROBE_WORKERS = 4
+    PROBE_TIMEOUT = 5.0
 
     DEFAULT_DEVICE = {
         'card': 0,
@@ -60,29 +120,298 @@ class Audio(CleepResources):
             debug_enabled (bool): flag to set debug level to logger
         """
         # init
+        start = time.monotonic()
         CleepResources.__init__(self, bootstrap, debug_enabled)
+        self.__startup_timings = OrderedDict()
+        self.__startup_timings['core'] = time.monotonic() - start
+
+        # members (helpers are created on first use)
+        start = time.monotonic()
+        self.stats = CommandStats()
+        self.__alsa = None
+        self.__board_infos = None
+        self.asound_cards = AsoundCards()
+        # drivers and cards calls share same workers
+        self.runner = ConcurrentRunner(workers=self.PROBE_WORKERS, timeout=self.PROBE_TIMEOUT)
+        self.__helpers_lock = threading.RLock()
+        self.__card_registry = None
+        self.bcm2835_driver = Bcm2835AudioDriver(
+            asound_cards=self.asound_cards,
+            board_infos=self._get_board_infos,
+            stats=self.stats,
+        )
+        self.__devices_cache = None
+        self.__devices_cache_timestamp = 0.0
+        self.__devices_cache_lock = threading.Lock()
+        # version starts from current time so it keeps increasing across module restarts
+        self.__config_version = int(time.time())
+        self.__config = None
+        self.__config_inventory = None
+        self.__config_lock = threading.Lock()
+        self.__config_publish_timer = None
+        self.sound_cache = SoundCache(self.SOUND_CACHE_SIZE)
+        self.__sound_assets = None
+        self.__volume_ramp = None
+        self.__volumes_coalescer = Coalescer(self._apply_volumes, self.VOLUMES_COALESCE_WINDOW, self._merge_volumes)
+        self.__test_jobs = None
+        self.__hotplug_watcher = None
+        self.__known_cards = {}
+        self.__shared_streams = None
+        self.__level_meter = None
+
+        # events
+        self.test_progress_event = self._get_event('audio.test.progress')
+        self.test_done_event = self._get_event('audio.test.done')
+        self.device_added_event = self._get_event('audio.device.added')
+        self.device_removed_event = self._get_event('audio.device.removed')
+        self.level_update_event = self._get_event('audio.level.update')
+        self.config_changed_event = self._get_event('audio.config.changed')
 
-        # members
-        self.alsa = Alsa(self.cleep_filesystem)
-        self.asoundconf = EtcAsoundConf(self.cleep_filesystem)
-        self.bcm2835_driver = Bcm2835AudioDriver()
-        self.__cached_playback_devices = None
-        self.__cached_capture_devices = None
+        self.__startup_timings['members'] = time.monotonic() - start
 
         # register default audio drivers
+        start = time.monotonic()
         self._register_driver(self.bcm2835_driver)
+        self.__startup_timings['drivers'] = time.monotonic() - start
+
+    def _get_alsa(self):
+        """
+        Return Alsa command instance, created on first use
+
+        Returns:
+            InstrumentedProxy: Alsa instance (calls are measured)
+        """
+        if self.__alsa is None:
+            self.__alsa = InstrumentedProxy(Alsa(self.cleep_filesystem), self.stats, 'alsa')
+        return self.__alsa
+
+    def _get_card_registry(self):
+        """
+        Return sound cards registry, created on first use with active cards from config
+
+        Returns:
+            CardRegistry: cards registry
+        """
+        with self.__helpers_lock:
+            if self.__card_registry is None:
+                self.__card_registry = CardRegistry(
+                    self.asound_cards,
+                    lambda: self.drivers.get_drivers(Driver.DRIVER_AUDIO),
+                    timeout=self.PROBE_TIMEOUT,
+                    runner=self.runner,
+                )
+                self.__card_registry.set_active_cards(self._get_config_field('active_cards') or [])
+            return self.__card_registry
+
+    def _invalidate_card_registry(self):
+        """
+        Invalidate sound cards registry, only if it was already created
+        """
+        with self.__helpers_lock:
+            if self.__card_registry is not None:
+                self.__card_registry.invalidate()
+
+    def _get_sound_assets(self):
+        """
+        Return converted sounds cache, created on first use
+
+        Returns:
+            SoundAssets: sound assets
+        """
+        with self.__helpers_lock:
+            if self.__sound_assets is None:
+                self.__sound_assets = SoundAssets(self.SOUND_ASSETS_PATH, self.cleep_filesystem, self.sound_cache)
+            return self.__sound_assets
+
+    def _get_volume_ramp(self):
+        """
+        Return volume ramp, created on first use
+
+        Returns:
+            VolumeRamp: volume ramp
+        """
+        with self.__helpers_lock:
+            if self.__volume_ramp is None:
+                self.__volume_ramp = VolumeRamp(self._on_volume_ramp_end)
+            return self.__volume_ramp
+
+    def _get_hotplug_watcher(self):
+        """
+        Return sound cards hotplug watcher, created on first use
+
+        Returns:
+            HotplugWatcher: hotplug watcher
+        """
+        with self.__helpers_lock:
+            if self.__hotplug_watcher is None:
+                self.__hotplug_watcher = HotplugWatcher(self._on_card_hotplug)
+            return self.__hotplug_watcher
+
+    def _get_shared_streams(self):
+        """
+        Return shared playback and capture streams, created on first use
+
+        Returns:
+            SharedStreams: shared streams
+        """
+        with self.__helpers_lock:
+            if self.__shared_streams is None:
+                self.__shared_streams = SharedStreams(
+                    self.cleep_filesystem,
+                    self.ASOUND_CONF,
+                    self._get_playback_format,
+                    self.CAPTURE_STREAM_FORMAT,
+                    self._need_resource,
+                    self._release_resource,
+                    self._get_test_jobs().is_pending,
+                    self.stats,
+                )
+            return self.__shared_streams
+
+    def _get_test_jobs(self):
+        """
+        Return background test jobs, created on first use
+
+        Returns:
+            TestJobs: test jobs
+        """
+        with self.__helpers_lock:
+            if self.__test_jobs is None:
+                self.__test_jobs = TestJobs(
+                    self.TEST_RESOURCES,
+                    self._run_test,
+                    self._on_test_job_update,
+                    self._need_resource,
+                    self._release_test_resource,
+                    self.stats,
+                )
+            return self.__test_jobs
+
+    def _get_capture_stream(self):
+        """
+        Return shared capture stream, created on first use
+
+        Returns:
+            CaptureStream: capture stream
+        """
+        return self._get_shared_streams().get_capture_stream()
+
+    def _get_level_meter(self):
+        """
+        Return capture level meter reading shared capture stream, created on first use
+
+        Returns:
+            LevelMeter: level meter
+        """
+        with self.__helpers_lock:
+            if self.__level_meter is None:
+                self.__level_meter = LevelMeter(
+                    self._on_level_update,
+                    publish_rate=self.LEVEL_METER_RATE,
+                    stream=self._get_capture_stream(),
+                )
+            return self.__level_meter
+
+    def _get_board_infos(self):
+        """
+        Return board infos. Infos are computed once and shared with module drivers
+
+        Returns:
+            dict: board infos (see Tools.raspberry_pi_infos)
+        """
+        if self.__board_infos is None:
+            self.__board_infos = Tools.raspberry_pi_infos()
+        return self.__board_infos
 
     def _configure(self):
         """
         Module configuration
         """
+        start = time.monotonic()
+        try:
+            self._configure_driver()
+
+            # watch sound cards changes
+            self.__known_cards = {card['cardid']: card for card in self.asound_cards.get_cards()}
+            self._get_hotplug_watcher().start()
+        finally:
+            self.__startup_timings['configure'] = time.monotonic() - start
+            self.logger.debug('Startup timings: %s' % ', '.join([
+                '%s=%.1fms' % (step, duration * 1000.0) for step, duration in self.__startup_timings.items()
+            ]))
+
+    def _on_stop(self):
+        """
+        Module stopped
+        """
+        # only stop helpers that were used
+        if self.__hotplug_watcher:
+            self.__hotplug_watcher.stop()
+        if self.__volume_ramp:
+            self.__volume_ramp.cancel()
+        if self.__level_meter:
+            self.__level_meter.stop()
+        if self.__shared_streams:
+            self.__shared_streams.stop()
+        self.runner.shutdown()
+        with self.__config_lock:
+            if self.__config_publish_timer:
+                self.__config_publish_timer.cancel()
+                self.__config_publish_timer = None
+
+    def _on_card_hotplug(self, action, cardid):
+        """
+        Sound card added or removed: refresh devices inventory and notify it
+
+        Args:
+            action (string): HotplugWatcher.ACTION_ADDED or HotplugWatcher.ACTION_REMOVED
+            cardid (int): card number
+        """
+        self.asound_cards.invalidate()
+        self._invalidate_card_registry()
+        self._invalidate_devices_inventory()
+        for driver in self.drivers.get_drivers(Driver.DRIVER_AUDIO).values():
+            self._invalidate_driver_controls(driver)
+
+        if action == HotplugWatcher.ACTION_ADDED:
+            card = self.asound_cards.get_card(cardid) or {'cardid': cardid, 'id': None, 'name': None}
+            self.__known_cards[cardid] = card
+            event = self.device_added_event
+        else:
+            card = self.__known_cards.pop(cardid, None) or {'cardid': cardid, 'id': None, 'name': None}
+            event = self.device_removed_event
+
+        self.logger.info('Sound card %s "%s" %s' % (cardid, card['name'], action))
+        event.send(params={
+            'cardid': cardid,
+            'id': card['id'],
+            'name': card['name'],
+        })
+
+    def _invalidate_driver_controls(self, driver):
+        """
+        Invalidate controls index of specified driver if it has one
+
+        Args:
+            driver (AudioDriver): audio driver
+        """
+        invalidate_controls = getattr(driver, 'invalidate_controls', None)
+        if callable(invalidate_controls):
+            invalidate_controls()
+
+    def _configure_driver(self):
+        """
+        Restore selected audio driver and enable it if necessary
+        """
+        audio_supported = self._get_board_infos()['audio']
+
         # restore selected soundcard
         selected_driver_name = self._get_config_field('driver')
         self.logger.trace('selected_driver_name=%s audio supported=%s' % (
             selected_driver_name,
-            Tools.raspberry_pi_infos()['audio']
+            audio_supported
         ))
-        if not selected_driver_name and Tools.raspberry_pi_infos()['audio']:
+        if not selected_driver_name and audio_supported:
             # set default sound driver to raspberry pi embedded one
             self.logger.trace('Set default sound driver')
             selected_driver_name = self.bcm2835_driver.name
@@ -98,7 +427,7 @@ class Audio(CleepResources):
         driver = self.drivers.get_driver(Driver.DRIVER_AUDIO, selected_driver_name)
 
         # fallback to default driver if necessary (and possible)
-        if not driver and Tools.raspberry_pi_infos()['audio']:
+        if not driver and audio_supported:
             self.logger.warning('Configured audio driver is not loaded, fallback to default one.')
             self._set_config_field('driver', self.bcm2835_driver.name)
             driver = self.drivers.get_driver(Driver.DRIVER_AUDIO, self.bcm2835_driver.name)
@@ -107,6 +436,7 @@ class Audio(CleepResources):
         if not driver:
             self.logger.info('No driver found while it should')
             return
+        self._apply_latency_profile(driver)
         if not driver.is_installed():
             self.logger.error('Unable to enable soundcard because it is not properly installed. Please install it manually.')
         elif not driver.is_enabled():
@@ -114,18 +444,203 @@ class Audio(CleepResources):
             if not driver.enable():
                 self.logger.error('Unable to enable soundcard. Internal driver error.')
 
-    def get_module_config(self):
+    @instrumented
+    def get_module_config(self, version=None):
         """
         Return module configuration
 
+        Args:
+            version (int): config version already known by caller. Config is not returned if it
+                           has not changed since this version
+
         Returns:
             dict: audio config::
 
                 {
+                    version (int): config version
                     volumes (dict): volumes values (playback and capture)
-                    devices (dict): audio devices installed on device (playback and capture)
+                    devices (dict): audio devices installed on device (playback and capture). Device
+                                    that can't be probed in time is flagged as unavailable
+                    latencyprofile (string): selected latency profile
+                    latencyprofiles (list): available latency profiles
+                }
+
+            or if config is not modified::
+
+                {
+                    version (int): config version
+                    modified (bool): False
+                }
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        self._check_parameters([
+            {'name': 'version', 'type': int, 'value': version, 'none': True},
+        ])
+
+        # cheap check: changes are pushed as soon as they are known, so a caller up to date does
+        # not need to touch devices inventory while it is valid. Expired inventory is probed again
+        # to catch changes made outside module (volumes changed by another process...)
+        inventory = self._get_cached_devices_inventory()
+        with self.__config_lock:
+            if version is not None and version == self.__config_version \
+                    and inventory is not None and inventory is self.__config_inventory:
+                return {
+                    'version': version,
+                    'modified': False,
                 }
 
+        config, current_version = self._get_versioned_config()
+        if version == current_version:
+            return {
+                'version': current_version,
+                'modified': False,
+            }
+
+        config = copy.deepcopy(config)
+        config['version'] = current_version
+        return config
+
+    def _get_versioned_config(self):
+        """
+        Return module config and its version. Config is only built again when devices inventory
+        is probed again. Config version is increased and changed fields are pushed through
+        audio.config.changed event each time config differs from previous one
+
+        Returns:
+            tuple: (config (dict), version (int))
+        """
+        inventory = self._get_devices_inventory()
+        with self.__config_lock:
+            if inventory is self.__config_inventory:
+                return self.__config, self.__config_version
+
+        config = dict(inventory)
+        config['latencyprofile'] = self._get_config_field('latency_profile')
+        config['latencyprofiles'] = AsoundProfile.get_profiles(self._get_playback_format()['rate'])
+
+        with self.__config_lock:
+            previous_config = self.__config
+            changes = {
+                key: value for key, value in config.items()
+                if previous_config is not None and previous_config.get(key) != value
+            }
+            if changes:
+                self.__config_version += 1
+            self.__config = config
+            self.__config_inventory = inventory
+            version = self.__config_version
+
+        if changes:
+            self.logger.debug('Config changed (version %d): %s' % (version, list(changes.keys())))
+            self.config_changed_event.send(params={
+                'version': version,
+                'changes': copy.deepcopy(changes),
+            })
+
+        return config, version
+
+    def _schedule_config_publish(self):
+        """
+        Publish config changes after CONFIG_PUBLISH_DELAY seconds. Delay is restarted by each call
+        so a burst of changes probes devices only once
+        """
+        with self.__config_lock:
+            if self.__config_publish_timer:
+                self.__config_publish_timer.cancel()
+            self.__config_publish_timer = threading.Timer(self.CONFIG_PUBLISH_DELAY, self._publish_config)
+            self.__config_publish_timer.daemon = True
+            self.__config_publish_timer.start()
+
+    def _publish_config(self):
+        """
+        Probe devices and push config changes
+        """
+        with self.__config_lock:
+            self.__config_publish_timer = None
+        try:
+            self._get_versioned_config()
+        except Exception:
+            self.logger.exception('Unable to publish config changes')
+
+    def _publish_volumes(self, volumes):
+        """
+        Update volumes of cached inventory and config with values read after a volume change, and
+        push them through audio.config.changed event. Devices are not probed again
+
+        Args:
+            volumes (dict): selected device volumes ({playback, capture})
+        """
+        volumes = dict(volumes)
+        with self.__devices_cache_lock:
+            previous_inventory = self.__devices_cache
+            if previous_inventory is not None:
+                self.__devices_cache = dict(previous_inventory)
+                self.__devices_cache['volumes'] = volumes
+
+        with self.__config_lock:
+            if self.__config_inventory is previous_inventory and previous_inventory is not None:
+                self.__config_inventory = self.__devices_cache
+            if self.__config is None or self.__config.get('volumes') == volumes:
+                return
+            self.__config = dict(self.__config)
+            self.__config['volumes'] = volumes
+            self.__config_version += 1
+            version = self.__config_version
+
+        self.logger.debug('Volumes changed (version %d): %s' % (version, volumes))
+        self.config_changed_event.send(params={
+            'version': version,
+            'changes': {'volumes': dict(volumes)},
+        })
+
+    def _get_devices_inventory(self):
+        """
+        Return audio devices inventory. Inventory is cached during DEVICES_CACHE_TTL seconds
+        or until it is invalidated by a device change
+
+        Returns:
+            dict: devices inventory (same format as get_module_config output)
+        """
+        with self.__devices_cache_lock:
+            now = time.monotonic()
+            if self.__devices_cache is not None and now - self.__devices_cache_timestamp < self.DEVICES_CACHE_TTL:
+                return self.__devices_cache
+
+            self.logger.trace('Devices inventory cache expired, probe audio drivers')
+            self.__devices_cache = self._probe_devices()
+            self.__devices_cache_timestamp = now
+            return self.__devices_cache
+
+    def _get_cached_devices_inventory(self):
+        """
+        Return cached devices inventory without probing audio drivers
+
+        Returns:
+            dict: devices inventory or None if inventory is expired or invalidated
+        """
+        with self.__devices_cache_lock:
+            if self.__devices_cache is None or time.monotonic() - self.__devices_cache_timestamp >= self.DEVICES_CACHE_TTL:
+                return None
+            return self.__devices_cache
+
+    def _invalidate_devices_inventory(self):
+        """
+        Invalidate devices inventory cache. Next inventory request will probe audio drivers again
+        """
+        self.logger.trace('Invalidate devices inventory cache')
+        with self.__devices_cache_lock:
+            self.__devices_cache = None
+        self._schedule_config_publish()
+
+    def _probe_devices(self):
+        """
+        Probe all audio drivers concurrently to build devices inventory. A driver that does not answer
+        within PROBE_TIMEOUT seconds, or whose previous probing is still running, is reported as unavailable
+
+        Returns:
+            dict: devices inventory (same format as get_module_config output)
         """
         playbacks = []
         captures = []
@@ -135,21 +650,29 @@ class Audio(CleepResources):
         }
 
         audio_drivers = self.drivers.get_drivers(Driver.DRIVER_AUDIO)
-        for driver_name, driver in audio_drivers.items():
-            device_infos = driver.get_device_infos()
-            device = {
-                'name': driver.card_name,
-                'label': driver_name,
-                'device': device_infos,
-                'enabled': driver.is_enabled(),
-                'installed': driver.is_installed(),
+        if not audio_drivers:
+            return {
+                'devices': {'playback': [], 'capture': []},
+                'volumes': volumes,
             }
-            if device_infos['playback']:
+
+        calls = OrderedDict(
+            (('driver', driver_name), (self._probe_driver, (driver_name, driver)))
+            for driver_name, driver in audio_drivers.items()
+        )
+        for (_, driver_name), (result, error) in self.runner.run(calls, self.PROBE_TIMEOUT).items():
+            if error is not None:
+                self.logger.warning('Audio driver "%s" probing failed: %s' % (driver_name, str(error)))
+                device, driver_volumes = self._get_unavailable_device(driver_name, audio_drivers[driver_name]), None
+            else:
+                device, driver_volumes = result
+
+            if device['unavailable'] or device['device']['playback']:
                 playbacks.append(device)
-            if device_infos['capture']:
+            if not device['unavailable'] and device['device']['capture']:
                 captures.append(device)
-            if device['enabled'] and device['installed']:
-                volumes = driver.get_volumes()
+            if driver_volumes:
+                volumes = driver_volumes
 
         return {
             'devices': {
@@ -159,18 +682,77 @@ class Audio(CleepResources):
             'volumes': volumes
         }
 
+    def _probe_driver(self, driver_name, driver):
+        """
+        Probe specified audio driver
+
+        Args:
+            driver_name (string): driver name
+            driver (AudioDriver): driver instance
+
+        Returns:
+            tuple: probing result::
+
+                (
+                    dict: device infos,
+                    dict: driver volumes if driver is in use, None otherwise
+                )
+
+        """
+        device_infos = driver.get_device_infos()
+        device = {
+            'name': driver.card_name,
+            'label': driver_name,
+            'device': device_infos,
+            'enabled': driver.is_enabled(),
+            'installed': driver.is_installed(),
+            'unavailable': False,
+        }
+        volumes = driver.get_volumes() if device['enabled'] and device['installed'] else None
+
+        return device, volumes
+
+    def _get_unavailable_device(self, driver_name, driver):
+        """
+        Return device infos of a driver that could not be probed
+
+        Args:
+            driver_name (string): driver name
+            driver (AudioDriver): driver instance
+
+        Returns:
+            dict: device infos
+        """
+        return {
+            'name': driver.card_name,
+            'label': driver_name,
+            'device': None,
+            'enabled': False,
+            'installed': False,
+            'unavailable': True,
+        }
+
+    @instrumented
     def select_device(self, driver_name):
         """
         Select audio device
 
+        Device switch is transactional: devices state is captured once and restored if switch fails
+
         Args:
             driver_name (string): driver name
 
         Returns:
-            bool: True if device saved successfully
+            dict: switch result::
+
+                {
+                    driver (string): selected driver name
+                    duration (float): switch duration in milliseconds
+                }
 
         Raises:
             InvalidParameter: if parameter is invalid
+            CommandError: if switch failed (previous device is restored)
         """
         # check params
         self._check_parameters([
@@ -186,7 +768,9 @@ class Audio(CleepResources):
 
         # get drivers
         selected_driver_name = self._get_config_field('driver')
-        old_driver = self.drivers.get_driver(Driver.DRIVER_AUDIO, selected_driver_name) if selected_driver_name is not None else None
+        old_driver = None
+        if selected_driver_name is not None:
+            old_driver = self.drivers.get_driver(Driver.DRIVER_AUDIO, selected_driver_name)
         new_driver = self.drivers.get_driver(Driver.DRIVER_AUDIO, driver_name)
 
         if not new_driver:
@@ -194,26 +778,133 @@ class Audio(CleepResources):
         if not new_driver.is_installed():
             raise InvalidParameter('Can\'t selected device because its driver seems not to be installed')
 
-        # disable old driver
+        # capture known volumes before devices state changes, then drop cached inventory and controls
+        # whatever the result
+        switch = DeviceSwitch(old_driver, new_driver, self.cleep_filesystem, volumes=self._get_cached_volumes())
+        self._apply_latency_profile(new_driver)
+        self._invalidate_devices_inventory()
+        self._invalidate_driver_controls(new_driver)
+
         self.logger.info('Using audio driver "%s"' % new_driver.name)
-        if old_driver and old_driver.is_installed():
-            disabled = old_driver.disable()
-            self.logger.debug('Disable previous driver "%s": %s' % (old_driver.name, disabled))
-            if not disabled:
-                raise CommandError('Unable to disable current device')
-
-        # enable new driver
-        self.logger.debug('Enable new driver "%s"' % new_driver.name)
-        driver_enabled = new_driver.enable()
-        if not driver_enabled or not new_driver.is_card_enabled():
-            self.logger.debug('Unable to enable new driver. Revert re-enabling old driver')
-            if old_driver:
-                old_driver.enable()
-            raise CommandError('Unable to enable selected device')
-
-        # everything is fine, save new driver
-        self._set_config_field('driver', new_driver.name)
+        # opened streams must be reopened on new device
+        self._close_playback_service()
+        capture_stream = self._get_capture_stream()
+        capture_stream.suspend()
+        try:
+            switch.execute(commit=lambda: self._set_config_field('driver', new_driver.name))
+        except Exception as error:
+            raise CommandError(str(error))
+        finally:
+            self.stats.record('select_device.switch', switch.duration / 1000.0)
+            # drop inventory probed while devices were switching
+            self._invalidate_devices_inventory()
+            self._resume_capture_stream(capture_stream)
+        self._prepare_sound_assets()
+
+        return {
+            'driver': new_driver.name,
+            'duration': switch.duration,
+        }
+
+    def _get_cached_volumes(self):
+        """
+        Return volumes from devices inventory cache without probing drivers
+
+        Returns:
+            dict: volumes ({playback, capture}) or None if inventory is not cached
+        """
+        with self.__devices_cache_lock:
+            if self.__devices_cache is None:
+                return None
+            return dict(self.__devices_cache['volumes'])
+
+    @instrumented
+    def set_latency_profile(self, profile):
+        """
+        Set latency profile of selected device. Alsa configuration is generated with profile
+        period and buffer sizes (see AsoundProfile). Playback stream is closed and capture stream
+        suspended while driver is enabled again, capture consumers (level meter...) are kept
+
+        Args:
+            profile (string): profile name (low-latency, balanced, power-save) or None to
+                              restore default alsa configuration
+
+        Returns:
+            dict: applied profile infos (name, period_size, buffer_size, latency) or None if
+                  default alsa configuration is used
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+            CommandError: if profile can't be applied (previous profile is restored)
+        """
+        self._check_parameters([
+            {
+                'name': 'profile',
+                'type': str,
+                'value': profile,
+                'none': True,
+                'validator': lambda val: val is None or val in AsoundProfile.PROFILES,
+                'message': 'Parameter "profile" must be one of %s' % sorted(AsoundProfile.PROFILES.keys()),
+            },
+        ])
+
+        selected_driver_name = self._get_config_field('driver')
+        driver = self.drivers.get_driver(Driver.DRIVER_AUDIO, selected_driver_name) if selected_driver_name else None
+        if not driver or not callable(getattr(driver, 'set_latency_profile', None)):
+            raise CommandError('Selected device does not support latency profiles')
+
+        # opened streams must be reopened with new alsa configuration
+        self._close_playback_service()
+        capture_stream = self._get_capture_stream()
+        capture_stream.suspend()
+        try:
+            old_profile = self._get_config_field('latency_profile')
+            driver.set_latency_profile(profile)
+            if not driver.enable():
+                self.logger.error('Unable to apply latency profile "%s", restore "%s"' % (profile, old_profile))
+                driver.set_latency_profile(old_profile)
+                if not driver.enable():
+                    self.logger.error('Unable to restore latency profile "%s"' % old_profile)
+                    self._invalidate_devices_inventory()
+                raise CommandError('Unable to apply latency profile')
+
+            self._set_config_field('latency_profile', profile)
+            self._invalidate_devices_inventory()
+        finally:
+            self._resume_capture_stream(capture_stream)
+
+        return AsoundProfile(profile, self._get_playback_format()['rate']).get_infos() if profile else None
+
+    def _resume_capture_stream(self, capture_stream):
+        """
+        Resume capture stream suspended while alsa configuration changed. Consumers are closed if
+        capture can't be launched again
+
+        Args:
+            capture_stream (CaptureStream): suspended capture stream
+        """
+        try:
+            capture_stream.resume()
+        except Exception:
+            self.logger.exception('Unable to resume capture stream')
+
+    def _apply_latency_profile(self, driver):
+        """
+        Set configured latency profile to driver if it supports latency profiles
+
+        Args:
+            driver (AudioDriver): audio driver
+        """
+        set_latency_profile = getattr(driver, 'set_latency_profile', None)
+        if not callable(set_latency_profile):
+            return
 
+        try:
+            set_latency_profile(self._get_config_field('latency_profile'))
+        except ValueError as error:
+            self.logger.warning('Invalid latency profile configured: %s' % str(error))
+
+    @instrumented
     def set_volumes(self, playback, capture):
         """
         Update volume
@@ -230,6 +921,10 @@ class Audio(CleepResources):
                     capture (int)
                 }
 
+        Note:
+            Calls received within VOLUMES_COALESCE_WINDOW seconds are coalesced in a single hardware write
+            with latest values. All callers receive the finally applied volumes.
+
         Raises:
             InvalidParameters if parameter is invalid
         """
@@ -252,6 +947,19 @@ class Audio(CleepResources):
             },
         ])
 
+        return self.__volumes_coalescer.submit(playback, capture)
+
+    def _apply_volumes(self, playback, capture):
+        """
+        Apply volumes on selected driver. Called once per burst of set_volumes calls
+
+        Args:
+            playback (int): playback volume percentage (None to keep current value)
+            capture (int): capture volume percentage (None to keep current value)
+
+        Returns:
+            dict: current volumes (see set_volumes)
+        """
         self.logger.info('Set volumes to: playback[%s%%] capture[%s%%]' % (playback, capture))
 
         selected_driver_name = self._get_config_field('driver')
@@ -271,66 +979,810 @@ class Audio(CleepResources):
             self.logger.warning('Driver "%s" not found' % selected_driver_name)
             return volumes
 
-        # set volumes
+        # set volumes (explicit volumes override ramp in progress)
+        self._get_volume_ramp().cancel()
         driver.set_volumes(playback, capture)
+        volumes = driver.get_volumes()
+        self._publish_volumes(volumes)
 
-        return driver.get_volumes()
+        return volumes
 
-    def test_playing(self):
+    def _on_volume_ramp_end(self):
         """
-        Play test sound to make sure audio card is correctly configured
+        Volume ramp ended: publish volumes reached by selected driver
         """
-        # request playback resource
-        self._need_resource('audio.playback')
+        selected_driver_name = self._get_config_field('driver')
+        driver = self.drivers.get_driver(Driver.DRIVER_AUDIO, selected_driver_name) if selected_driver_name else None
+        if not driver:
+            return
 
-    def test_recording(self):
+        try:
+            self._publish_volumes(driver.get_volumes())
+        except Exception:
+            self.logger.exception('Unable to publish volumes after volume ramp')
+
+    @instrumented
+    def fade_volumes(self, playback=None, capture=None, duration=1000, playback_from=None, capture_from=None):
         """
-        Record sound during few seconds and play it
+        Fade volumes to specified values. Fade runs in background and cancels fade in progress
+
+        Args:
+            playback (int): playback volume percentage to reach (None to keep playback volume unchanged)
+            capture (int): capture volume percentage to reach (None to keep capture volume unchanged)
+            duration (int): fade duration in milliseconds
+            playback_from (int): playback volume percentage to start from (None to start from current volume)
+            capture_from (int): capture volume percentage to start from (None to start from current volume)
+
+        Returns:
+            int: number of volume updates scheduled
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+            CommandError: if no audio driver is selected
         """
-        # request capture resource (non blocking)
-        self._need_resource('audio.capture')
+        parameters = [
+            {'name': 'duration', 'type': int, 'value': duration, 'validator': lambda val: 0 <= val <= 60000,
+             'message': 'Parameter "duration" must be 0<=duration<=60000'},
+        ]
+        volume_parameters = (
+            ('playback', playback), ('capture', capture), ('playback_from', playback_from), ('capture_from', capture_from),
+        )
+        for name, value in volume_parameters:
+            parameters.append({
+                'name': name,
+                'type': int,
+                'value': value,
+                'none': True,
+                'validator': lambda val: 0 <= val <= 100,
+                'message': 'Parameter "%s" must be 0<=%s<=100' % (name, name),
+            })
+        self._check_parameters(parameters)
 
-        # pause to simulate 5 seconds recording
-        time.sleep(5.0)
+        selected_driver_name = self._get_config_field('driver')
+        driver = self.drivers.get_driver(Driver.DRIVER_AUDIO, selected_driver_name) if selected_driver_name else None
+        if not driver:
+            raise CommandError('No audio device selected')
 
-    def _resource_acquired(self, resource_name):
+        current = driver.get_volumes() if playback_from is None or capture_from is None else {}
+        playback_from = playback_from if playback_from is not None else current.get('playback')
+        capture_from = capture_from if capture_from is not None else current.get('capture')
+
+        return self._get_volume_ramp().start(
+            driver,
+            playback=(playback_from, playback) if playback is not None and playback_from is not None else None,
+            capture=(capture_from, capture) if capture is not None and capture_from is not None else None,
+            duration=duration,
+        )
+
+    @staticmethod
+    def _merge_volumes(pending, new):
         """
-        Function called when resource is acquired
+        Merge pending volumes with new ones. Latest specified value wins
 
         Args:
-            resource_name (string): acquired resource name
+            pending (tuple): pending (playback, capture) volumes
+            new (tuple): new (playback, capture) volumes
 
-        Raises:
-            CommandError: if command failed
+        Returns:
+            tuple: merged (playback, capture) volumes
         """
-        self.logger.debug('Resource "%s" acquired' % resource_name)
-        if resource_name == 'audio.playback':
-            # play test sample
-            if not self.alsa.play_sound(self.TEST_SOUND):
-                raise CommandError('Unable to play test sound: internal error')
-
-            # release resource
-            self._release_resource('audio.playback')
-
-        elif resource_name == 'audio.capture':
-            # record sound
-            sound = self.alsa.record_sound(timeout=5.0)
-            self.logger.debug('Recorded sound: %s' % sound)
-            if not self.alsa.play_sound(sound, timeout=6.0):
-                raise CommandError('Unable to play recorded sound: internal error')
+        return tuple(new_value if new_value is not None else pending_value for pending_value, new_value in zip(pending, new))
 
-            # release resource
-            self._release_resource('audio.capture')
+    @instrumented
+    def get_cards(self):
+        """
+        Return sound cards plugged on device
 
-            # purge file
-            time.sleep(0.5)
-            try:
-                os.remove(sound)
-            except Exception:
-                self.logger.warning('Unable to delete recorded test sound "%s"' % sound)
+        Returns:
+            list: list of cards sorted by card number::
 
-        else:
-            self.logger.error('Unsupported resource "%s" acquired' % resource_name)
+                [
+                    {
+                        cardid (int): card number
+                        id (string): card identifier
+                        name (string): card name
+                        driver (string): name of driver handling card (None if no driver)
+                        playback (bool): playback capability
+                        capture (bool): capture capability
+                        active (bool): True if card is managed by module
+                    },
+                    ...
+                ]
+
+        """
+        return self._get_card_registry().get_cards()
+
+    @instrumented
+    def set_card_active(self, card, active):
+        """
+        Activate or deactivate card. Active cards are managed together (see get_cards_volumes and
+        set_cards_volumes), independently of selected audio device
+
+        Args:
+            card (string): card id, card name or driver name
+            active (bool): True to activate card
+
+        Returns:
+            list: active card ids
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        self._check_parameters([
+            {'name': 'card', 'type': str, 'value': card,
+             'validator': lambda val: self._get_card_registry().get_card(val) is not None,
+             'message': 'Card "%s" does not exist' % card},
+            {'name': 'active', 'type': bool, 'value': active},
+        ])
+
+        active_cards = set(self._get_config_field('active_cards') or [])
+        card_id = self._get_card_registry().get_card(card)['id']
+        if active:
+            active_cards.add(card_id)
+        else:
+            active_cards.discard(card_id)
+        active_cards = sorted(active_cards)
+        self._set_config_field('active_cards', active_cards)
+        self._get_card_registry().set_active_cards(active_cards)
+
+        return active_cards
+
+    @instrumented
+    def get_cards_volumes(self, cards=None):
+        """
+        Return volumes of several cards. Cards are queried concurrently
+
+        Args:
+            cards (list): card ids, card names or driver names (active cards if not specified)
+
+        Returns:
+            dict: volumes ({playback, capture}) indexed by card id. Volumes are None if card failed to answer
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        self._check_parameters([
+            {'name': 'cards', 'type': list, 'value': cards, 'none': True},
+        ])
+
+        try:
+            return self._get_card_registry().get_volumes(cards)
+        except ValueError as error:
+            raise InvalidParameter(str(error))
+
+    @instrumented
+    def set_cards_volumes(self, volumes):
+        """
+        Set volumes of several cards. Cards are updated concurrently
+
+        Args:
+            volumes (dict): volumes indexed by card id, card name or driver name::
+
+                {
+                    card (dict): {
+                        playback (int): playback volume percentage (None to keep it unchanged)
+                        capture (int): capture volume percentage (None to keep it unchanged)
+                    },
+                    ...
+                }
+
+        Returns:
+            dict: new volumes ({playback, capture}) indexed by card id. Volumes are None if card failed
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        self._check_parameters([
+            {'name': 'volumes', 'type': dict, 'value': volumes, 'validator': lambda val: len(val) > 0,
+             'message': 'Parameter "volumes" must not be empty'},
+        ])
+        for card, card_volumes in volumes.items():
+            for name in ('playback', 'capture'):
+                value = card_volumes.get(name) if isinstance(card_volumes, dict) else None
+                if not isinstance(card_volumes, dict) or not (value is None or (isinstance(value, int) and 0 <= value <= 100)):
+                    raise InvalidParameter('Parameter "%s" of card "%s" must be 0<=%s<=100' % (name, card, name))
+
+        try:
+            result = self._get_card_registry().set_volumes(volumes)
+        except ValueError as error:
+            raise InvalidParameter(str(error))
+
+        # selected device may be one of updated cards
+        selected_driver_name = self._get_config_field('driver')
+        selected_card = self._get_card_registry().get_card(selected_driver_name) if selected_driver_name else None
+        if selected_card and result.get(selected_card['id']):
+            self._publish_volumes(result[selected_card['id']])
+
+        return result
+
+    def on_event(self, event):
+        """
+        Event received
+
+        Args:
+            event (MessageRequest): event data
+        """
+        if event['event'] in ('system.driver.install', 'system.driver.uninstall'):
+            params = event.get('params') or {}
+            if params.get('drivertype') == Driver.DRIVER_AUDIO and not params.get('installing', False):
+                self.logger.debug('Audio driver "%s" (un)installed, invalidate devices inventory' % params.get('drivername'))
+                self._invalidate_card_registry()
+                self._invalidate_devices_inventory()
+
+    @instrumented
+    def test_playing(self):
+        """
+        Play test sound to make sure audio card is correctly configured.
+        Test runs in background, progress is notified through audio.test.progress and audio.test.done events
+
+        Returns:
+            string: test job id
+
+        Raises:
+            CommandError: if a playing test is already running
+        """
+        return self._start_test_job(self.TEST_PLAYING)
+
+    @instrumented
+    def test_recording(self):
+        """
+        Record sound during few seconds and play it.
+        Test runs in background, progress is notified through audio.test.progress and audio.test.done events
+
+        Returns:
+            string: test job id
+
+        Raises:
+            CommandError: if a recording test is already running
+        """
+        return self._start_test_job(self.TEST_RECORDING)
+
+    @instrumented
+    def benchmark_latency(self, runs=5):
+        """
+        Measure audio round-trip latency (playback to capture) of selected device.
+        A loopback (cable or speaker close to microphone) is needed. Measures are calibrated on
+        snd-aloop loopback card if it is loaded (see LatencyBench).
+        Benchmark runs in background once playback and capture resources are acquired, stats are
+        available in job result sent with audio.test.done event
+
+        Args:
+            runs (int): number of measures
+
+        Returns:
+            string: test job id
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+            CommandError: if a benchmark is already running
+        """
+        self._check_parameters([
+            {'name': 'runs', 'type': int, 'value': runs, 'validator': lambda val: 1 <= val <= self.LATENCY_BENCH_MAX_RUNS,
+             'message': 'Parameter "runs" must be 1<=runs<=%d' % self.LATENCY_BENCH_MAX_RUNS},
+        ])
+
+        return self._start_test_job(self.TEST_LATENCY, {'runs': runs})
+
+    @instrumented
+    def get_test_job(self, job_id):
+        """
+        Return test job status
+
+        Args:
+            job_id (string): test job id
+
+        Returns:
+            dict: test job::
+
+                {
+                    jobid (string): job id
+                    type (string): test type (playing|recording|latency)
+                    status (string): job status (waiting|running|done|failed)
+                    progress (int): job progress percentage
+                    error (string): error message if job failed
+                    result (dict): job result (latency benchmark stats, see LatencyBench.run)
+                }
+
+        Raises:
+            InvalidParameter: if job does not exist
+        """
+        self._check_parameters([
+            {'name': 'job_id', 'type': str, 'value': job_id},
+        ])
+
+        job = self._get_test_jobs().get(job_id)
+        if job is None:
+            raise InvalidParameter('Test job "%s" does not exist' % job_id)
+
+        return job
+
+    def get_stats(self):
+        """
+        Return module operations stats (commands, alsa calls, subprocesses...)
+
+        Returns:
+            dict: stats by operation name (see CommandStats.get_stats)
+        """
+        return self.stats.get_stats()
+
+    def reset_stats(self):
+        """
+        Reset module operations stats
+        """
+        self.stats.reset()
+
+    @instrumented
+    def start_level_meter(self):
+        """
+        Start capture level meter. Levels are published through audio.level.update events
+
+        Returns:
+            bool: True if level meter is running
+
+        Raises:
+            CommandError: if level meter can't be started
+        """
+        level_meter = self._get_level_meter()
+        if level_meter.is_running():
+            return True
+
+        try:
+            level_meter.start()
+        except ImportError:
+            raise CommandError('Level meter requires numpy library')
+        except Exception as error:
+            self.logger.exception('Unable to start level meter')
+            raise CommandError('Unable to start level meter: %s' % str(error))
+
+        return True
+
+    @instrumented
+    def stop_level_meter(self):
+        """
+        Stop capture level meter
+        """
+        self._get_level_meter().stop()
+
+    def open_capture_consumer(self):
+        """
+        Open a consumer on shared capture stream. Capture is started with first consumer and
+        stopped when last consumer is closed, so several modules can listen to microphone at
+        the same time. Consumer must be closed after use.
+
+        Note:
+            Consumer object can only be used by modules running in same process.
+
+        Returns:
+            CaptureConsumer: capture consumer (see CaptureConsumer.read and CaptureConsumer.chunks)
+
+        Raises:
+            CommandError: if capture can't be started
+        """
+        try:
+            return self._get_capture_stream().open_consumer()
+        except Exception as error:
+            self.logger.exception('Unable to open capture stream')
+            raise CommandError('Unable to open capture stream: %s' % str(error))
+
+    def get_capture_status(self):
+        """
+        Return shared capture stream status
+
+        Returns:
+            dict: capture stream status and format::
+
+                {
+                    running (bool): True if capture is running
+                    consumers (int): number of opened consumers
+                    captured (int): number of captured bytes
+                    buffer_size (int): ring buffer size in bytes
+                    format (dict): capture format (rate, channels, sample_format)
+                }
+
+        """
+        capture_stream = self._get_capture_stream()
+        status = capture_stream.get_status()
+        status['format'] = capture_stream.get_format()
+        return status
+
+    def _on_level_update(self, levels):
+        """
+        Level meter callback: send levels event
+
+        Args:
+            levels (dict): levels (rms and peak in dBFS)
+        """
+        self.level_update_event.send(params=levels)
+
+    @instrumented
+    def play_sound(self, filepath, priority=PlaybackService.PRIORITY_NORMAL):
+        """
+        Play sound immediately through shared playback stream. Sound is mixed with sounds
+        being played. Playback resource is held while stream is opened, unless device is shared
+        through dmix (latency profile)
+
+        Args:
+            filepath (string): sound file path (wav)
+            priority (int): sound priority (highest priority sounds are kept if too many sounds are played)
+
+        Returns:
+            int: sound id
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+            CommandError: if sound can't be played
+        """
+        return self._play_shared_sound(filepath, priority, False)
+
+    @instrumented
+    def queue_sound(self, filepath, priority=PlaybackService.PRIORITY_NORMAL):
+        """
+        Queue sound on shared playback stream. Queued sounds are played one after another
+        (highest priority first) and are mixed with sounds played with play_sound
+
+        Args:
+            filepath (string): sound file path (wav)
+            priority (int): sound priority
+
+        Returns:
+            int: sound id
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+            CommandError: if sound can't be played
+        """
+        return self._play_shared_sound(filepath, priority, True)
+
+    def _play_shared_sound(self, filepath, priority, queued):
+        """
+        Decode sound (using sounds cache) and send it to shared playback stream
+
+        Args:
+            filepath (string): sound file path
+            priority (int): sound priority
+            queued (bool): True to queue sound, False to play it immediately
+
+        Returns:
+            int: sound id
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+            CommandError: if sound can't be played
+        """
+        self._check_parameters([
+            {'name': 'filepath', 'type': str, 'value': filepath, 'validator': lambda val: os.path.exists(val),
+             'message': 'Sound file "%s" does not exist' % filepath},
+            {'name': 'priority', 'type': int, 'value': priority,
+             'validator': lambda val: PlaybackService.PRIORITY_LOW <= val <= PlaybackService.PRIORITY_HIGH,
+             'message': 'Parameter "priority" must be %d<=priority<=%d' % (
+                 PlaybackService.PRIORITY_LOW, PlaybackService.PRIORITY_HIGH,
+             )},
+        ])
+
+        service = self._get_playback_service()
+        playback_format = service.get_format()
+        try:
+            data = self.sound_cache.get(self._get_sound_variant(filepath, playback_format), **playback_format)
+        except Exception as error:
+            raise CommandError('Unable to decode sound: %s' % str(error))
+
+        try:
+            return service.queue(data, priority) if queued else service.play(data, priority)
+        except Exception as error:
+            self.logger.exception('Unable to play sound "%s"' % filepath)
+            raise CommandError('Unable to play sound: %s' % str(error))
+
+    def _get_playback_service(self):
+        """
+        Return shared playback service, created on first use with selected device format
+
+        Returns:
+            PlaybackService: playback service
+        """
+        return self._get_shared_streams().get_playback_service()
+
+    def _close_playback_service(self):
+        """
+        Close shared playback service (device changed, module stopped). It is created again on next sound
+        """
+        if self.__shared_streams:
+            self.__shared_streams.close_playback_service()
+
+    def _start_test_job(self, test_type, options=None):
+        """
+        Create test job and request associated resources (non blocking). Job is run as soon as all
+        resources are acquired
+
+        Args:
+            test_type (string): test type (TEST_XXX)
+            options (dict): test options
+
+        Returns:
+            string: job id
+
+        Raises:
+            CommandError: if a test using same resources is already running
+        """
+        try:
+            return self._get_test_jobs().start(test_type, options)
+        except ValueError as error:
+            raise CommandError(str(error))
+
+    def _run_test(self, job, options):
+        """
+        Run test job (called by test jobs in job thread)
+
+        Args:
+            job (dict): test job
+            options (dict): test options
+
+        Returns:
+            dict: test result (latency benchmark stats) or None
+        """
+        if job['type'] == self.TEST_PLAYING:
+            self._test_playback()
+            return None
+        if job['type'] == self.TEST_RECORDING:
+            self._test_capture(job)
+            return None
+
+        return self._test_latency(options['runs'])
+
+    def _on_test_job_update(self, job):
+        """
+        Test job updated: send event about it
+
+        Args:
+            job (dict): test job
+        """
+        if job['status'] in (TestJobs.STATUS_DONE, TestJobs.STATUS_FAILED):
+            self.test_done_event.send(params=job)
+        else:
+            self.test_progress_event.send(params=job)
+
+    def _release_test_resource(self, resource_name):
+        """
+        Release resource at end of test job. Resource still used by a shared stream is released
+        when stream is closed
+
+        Args:
+            resource_name (string): resource name
+        """
+        if self.__shared_streams and self.__shared_streams.is_resource_held(resource_name):
+            return
+        self._release_resource(resource_name)
+
+    def _test_latency(self, runs):
+        """
+        Run latency benchmark
+
+        Args:
+            runs (int): number of measures
+
+        Returns:
+            dict: benchmark stats (see LatencyBench.run)
+
+        Raises:
+            CommandError: if numpy is not installed
+        """
+        reference_card = self.asound_cards.get_card_by_id(self.LATENCY_BENCH_REFERENCE_CARD)
+        reference_devices = None
+        if reference_card:
+            # snd-aloop: sound played on device 0 is captured on device 1
+            reference_devices = ('hw:%d,0' % reference_card['cardid'], 'hw:%d,1' % reference_card['cardid'])
+
+        try:
+            stats = LatencyBench(reference_devices=reference_devices).run(runs)
+        except ImportError:
+            raise CommandError('Latency benchmark requires numpy library')
+        self.logger.info('Latency benchmark: %s' % stats)
+
+        return stats
+
+    def _test_playback(self):
+        """
+        Play test sound
+
+        Raises:
+            CommandError: if command failed
+        """
+        if not self._play_sound(self.TEST_SOUND):
+            raise CommandError('Unable to play test sound: internal error')
+
+    def _get_playback_format(self):
+        """
+        Return PCM format to use with selected audio driver
+
+        Returns:
+            dict: playback format::
+
+                {
+                    rate (int): sample rate
+                    channels (int): channels count
+                    sample_format (string): sample format
+                }
+
+        """
+        selected_driver_name = self._get_config_field('driver')
+        driver = self.drivers.get_driver(Driver.DRIVER_AUDIO, selected_driver_name) if selected_driver_name else None
+        get_playback_format = getattr(driver, 'get_playback_format', None)
+        playback_format = get_playback_format() if callable(get_playback_format) else None
+        if not isinstance(playback_format, dict):
+            playback_format = self._get_hw_playback_format(driver)
+
+        return playback_format if isinstance(playback_format, dict) else self.DEFAULT_PLAYBACK_FORMAT
+
+    def _get_hw_playback_format(self, driver):
+        """
+        Return format driver card is currently opened with (/proc/asound hw_params)
+
+        Args:
+            driver (AudioDriver): audio driver
+
+        Returns:
+            dict: playback format (see _get_playback_format) or None if unknown
+        """
+        get_cardid_deviceid = getattr(driver, 'get_cardid_deviceid', None)
+        card_infos = get_cardid_deviceid() if callable(get_cardid_deviceid) else None
+        if not isinstance(card_infos, tuple) or not all(isinstance(value, int) for value in card_infos):
+            return None
+
+        return self.asound_cards.get_hw_params(card_infos[0], card_infos[1])
+
+    def _get_sound_variant(self, path, playback_format):
+        """
+        Return sound variant converted to playback format, so alsa plays it without resampling.
+        Only module sounds are converted on filesystem (cache directory is not bounded), other
+        sounds are converted in memory by sounds cache. Source path is returned if sound is not
+        a module sound or can't be converted
+
+        Args:
+            path (string): sound file path
+            playback_format (dict): playback format (see _get_playback_format)
+
+        Returns:
+            string: sound file path to play
+        """
+        if path not in self.MODULE_SOUNDS:
+            return path
+
+        try:
+            return self._get_sound_assets().get(path, **playback_format)
+        except Exception as error:
+            self.logger.debug('No converted variant for sound "%s": %s' % (path, str(error)))
+            return path
+
+    def _prepare_sound_assets(self):
+        """
+        Convert module sounds to selected device playback format in background
+        """
+        thread = threading.Thread(
+            target=self._get_sound_assets().prepare,
+            args=(self.MODULE_SOUNDS,),
+            kwargs=self._get_playback_format(),
+            daemon=True,
+        )
+        thread.start()
+
+    def _play_sound(self, path):
+        """
+        Play sound using decoded sounds cache. Aplay is used directly if sound can't be decoded
+
+        Args:
+            path (string): sound file path
+
+        Returns:
+            bool: True if sound played successfully
+        """
+        playback_format = self._get_playback_format()
+        path = self._get_sound_variant(path, playback_format)
+        try:
+            data = self.sound_cache.get(path, **playback_format)
+        except Exception as error:
+            self.logger.debug('Unable to play "%s" from cache, use aplay: %s' % (path, str(error)))
+            return self._get_alsa().play_sound(path)
+
+        return InstrumentedProxy(RawPcm(**playback_format), self.stats, 'rawpcm').play(data)
+
+    def _test_capture(self, job):
+        """
+        Record sound and play it. Sound is kept in memory, file recording is only used as fallback
+
+        Args:
+            job (dict): test job
+
+        Raises:
+            CommandError: if command failed
+        """
+        self._get_test_jobs().update(job, TestJobs.STATUS_RUNNING, 20)
+        try:
+            capture_stream = self._get_capture_stream()
+            if capture_stream.is_running():
+                # capture device is already opened by shared capture stream, record from it
+                pcm = InstrumentedProxy(RawPcm(**capture_stream.get_format()), self.stats, 'rawpcm')
+                data = self._record_from_capture_stream(self.TEST_RECORDING_DURATION)
+            else:
+                pcm = InstrumentedProxy(RawPcm(**self.TEST_RECORDING_FORMAT), self.stats, 'rawpcm')
+                data = pcm.record(self.TEST_RECORDING_DURATION)
+        except Exception as error:
+            self.logger.warning('In-memory recording failed, fallback to file recording: %s' % str(error))
+            data = None
+
+        if data:
+            self._get_test_jobs().update(job, TestJobs.STATUS_RUNNING, 60)
+            if not pcm.play(data):
+                raise CommandError('Unable to play recorded sound: internal error')
+            return
+
+        self._test_capture_with_file(job)
+
+    def _record_from_capture_stream(self, duration):
+        """
+        Record sound from shared capture stream
+
+        Args:
+            duration (float): recording duration in seconds
+
+        Returns:
+            memoryview: recorded PCM data with capture stream format
+        """
+        capture_stream = self._get_capture_stream()
+        capture_format = capture_stream.get_format()
+        buffer = bytearray(int(capture_format['rate'] * duration) * capture_stream.frame_size)
+        received = 0
+        end = time.monotonic() + duration + 2.0
+        with capture_stream.open_consumer() as consumer:
+            while received < len(buffer):
+                chunk = consumer.read(len(buffer) - received, timeout=max(0.0, end - time.monotonic()))
+                if not chunk:
+                    break
+                buffer[received:received + len(chunk)] = chunk
+                received += len(chunk)
+
+        return memoryview(buffer)[:received]
+
+    def _test_capture_with_file(self, job):
+        """
+        Record sound to file and play it
+
+        Args:
+            job (dict): test job
+
+        Raises:
+            CommandError: if command failed
+        """
+        sound = self._get_alsa().record_sound(timeout=self.TEST_RECORDING_DURATION)
+        self.logger.debug('Recorded sound: %s' % sound)
+
+        try:
+            self._get_test_jobs().update(job, TestJobs.STATUS_RUNNING, 60)
+            if not self._get_alsa().play_sound(sound, timeout=self.TEST_RECORDING_DURATION + 1.0):
+                raise CommandError('Unable to play recorded sound: internal error')
+        finally:
+            try:
+                os.remove(sound)
+            except Exception:
+                self.logger.warning('Unable to delete recorded test sound "%s"' % sound)
+
+    def _resource_acquired(self, resource_name):
+        """
+        Function called when resource is acquired. It launches associated test job in background
+        when all resources it needs are acquired
+
+        Args:
+            resource_name (string): acquired resource name
+        """
+        self.logger.debug('Resource "%s" acquired' % resource_name)
+        if resource_name not in self.MODULE_RESOURCES:
+            self.logger.error('Unsupported resource "%s" acquired' % resource_name)
+            return
+
+        if self._get_shared_streams().resource_acquired(resource_name):
+            self.logger.debug('Resource "%s" acquired for shared stream' % resource_name)
+            return
+        if not self._get_test_jobs().resource_acquired(resource_name):
+            self.logger.warning('No test job waiting for resource "%s"' % resource_name)
+            self._release_resource(resource_name)
 
     def _resource_needs_to_be_released(self, resource_name): # pragma: no cover
         """
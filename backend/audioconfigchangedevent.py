@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from cleep.libs.internals.event import Event
+
+class AudioConfigChangedEvent(Event):
+    """
+    Audio.config.changed event
+    """
+
+    EVENT_NAME = 'audio.config.changed'
+    EVENT_PROPAGATE = False
+    EVENT_PARAMS = ['version', 'changes']
+
+    def __init__(self, params):
+        """
+        Constructor
+
+        Args:
+            params (dict): event parameters
+        """
+        Event.__init__(self, params)
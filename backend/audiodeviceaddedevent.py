@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from cleep.libs.internals.event import Event
+
+class AudioDeviceAddedEvent(Event):
+    """
+    Audio.device.added event
+    """
+
+    EVENT_NAME = 'audio.device.added'
+    EVENT_PROPAGATE = False
+    EVENT_PARAMS = ['cardid', 'id', 'name']
+
+    def __init__(self, params):
+        """
+        Constructor
+
+        Args:
+            params (dict): event parameters
+        """
+        Event.__init__(self, params)
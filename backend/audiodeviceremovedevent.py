@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from cleep.libs.internals.event import Event
+
+class AudioDeviceRemovedEvent(Event):
+    """
+    Audio.device.removed event
+    """
+
+    EVENT_NAME = 'audio.device.removed'
+    EVENT_PROPAGATE = False
+    EVENT_PARAMS = ['cardid', 'id', 'name']
+
+    def __init__(self, params):
+        """
+        Constructor
+
+        Args:
+            params (dict): event parameters
+        """
+        Event.__init__(self, params)
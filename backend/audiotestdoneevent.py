@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from cleep.libs.internals.event import Event
+
+class AudioTestDoneEvent(Event):
+    """
+    Audio.test.done event
+    """
+
+    EVENT_NAME = 'audio.test.done'
+    EVENT_PROPAGATE = False
+    EVENT_PARAMS = ['jobid', 'type', 'status', 'progress', 'error']
+
+    def __init__(self, params):
+        """
+        Constructor
+
+        Args:
+            params (dict): event parameters
+        """
+        Event.__init__(self, params)
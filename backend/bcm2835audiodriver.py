@@ -2,12 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import logging
-from cleep.libs.commands.alsa import Alsa
+import os
+import re
 from cleep.libs.configs.etcasoundconf import EtcAsoundConf
 from cleep.libs.drivers.audiodriver import AudioDriver
-from cleep.libs.internals.console import Console
 from cleep.libs.configs.configtxt import ConfigTxt
 import cleep.libs.internals.tools as Tools
+from .alsamixer import AlsaMixer
+from .amixersession import AmixerSession
+from .controlindex import ControlIndex
+from .fileutils import read_file
+from .asoundcards import AsoundCards
+from .asoundprofile import AsoundProfile
+from .instrumentedproxy import InstrumentedProxy
 
 class Bcm2835AudioDriver(AudioDriver):
     """
@@ -19,30 +26,106 @@ class Bcm2835AudioDriver(AudioDriver):
 
     MODULE_NAME = 'snd_bcm2835'
     CARD_NAME = 'BCM2835'
+    CARD_PATTERN = 'bcm2835'
+    ASOUND_CONF = '/etc/asound.conf'
+    ASOUND_STATE = '/var/lib/alsa/asound.state'
 
     VOLUME_PATTERN = ('Mono', r'\[(\d*)%\]')
+    PLAYBACK_FORMAT = {
+        'rate': 44100,
+        'channels': 2,
+        'sample_format': 'S16_LE',
+    }
 
     AMIXER_AUTO = 0
     AMIXER_JACK = 1
     AMIXER_HDMI = 2
 
-    def __init__(self):
+    def __init__(self, mixer_backend=AlsaMixer.BACKEND_AUTO, asound_cards=None, board_infos=None, stats=None):
         """
         Constructor
+
+        Args:
+            mixer_backend (string): mixer backend used to get/set volumes (see AlsaMixer.BACKEND_XXX)
+            asound_cards (AsoundCards): shared sound cards enumerator (created if not specified)
+            board_infos (callable): function returning shared board infos (Tools.raspberry_pi_infos if not specified)
+            stats (CommandStats): stats collector used to measure alsa and config files calls (disabled if not specified)
         """
         # init
         AudioDriver.__init__(self, 'Raspberry pi soundcard', self.CARD_NAME)
 
+        # members
+        self.mixer_backend = mixer_backend
+        self.mixer = None
+        self.asound_cards = asound_cards or AsoundCards()
+        self.board_infos = board_infos
+        self.stats = stats
+        self.control_index = None
+        self.latency_profile = None
+        self.__board_infos = None
+        self.__asoundconf = None
+        self.__configtxt = None
+
     def _on_audio_registered(self):
         """
         Audio driver registered
         """
-        # members
-        self.asoundconf = EtcAsoundConf(self.cleep_filesystem)
-        self.configtxt = ConfigTxt(self.cleep_filesystem)
-        self.console = Console()
+        # members (config helpers are created on first use)
         self.card_name = ''
         self.volume_control = ''
+        self.alsa = self._instrument(getattr(self, 'alsa', None), 'alsa')
+
+    @property
+    def asoundconf(self):
+        """
+        Return /etc/asound.conf helper
+
+        Returns:
+            EtcAsoundConf: instance
+        """
+        if self.__asoundconf is None:
+            self.__asoundconf = self._instrument(EtcAsoundConf(self.cleep_filesystem), 'asoundconf')
+        return self.__asoundconf
+
+    @property
+    def configtxt(self):
+        """
+        Return /boot/config.txt helper
+
+        Returns:
+            ConfigTxt: instance
+        """
+        if self.__configtxt is None:
+            self.__configtxt = self._instrument(ConfigTxt(self.cleep_filesystem), 'configtxt')
+        return self.__configtxt
+
+    def _instrument(self, helper, prefix):
+        """
+        Wrap helper to measure its calls if stats are enabled
+
+        Args:
+            helper (any): helper instance
+            prefix (string): operations name prefix
+
+        Returns:
+            any: helper instance or its instrumented proxy
+        """
+        if not self.stats or helper is None or isinstance(helper, InstrumentedProxy):
+            return helper
+        return InstrumentedProxy(helper, self.stats, prefix)
+
+    def _get_board_infos(self):
+        """
+        Return board infos, computed once
+
+        Returns:
+            dict: board infos (see Tools.raspberry_pi_infos)
+        """
+        if self.board_infos:
+            return self.board_infos()
+        if self.__board_infos is None:
+            self.__board_infos = Tools.raspberry_pi_infos()
+        return self.__board_infos
 
     def get_card_name(self):
         """
@@ -67,6 +150,22 @@ class Bcm2835AudioDriver(AudioDriver):
         """
         return (True, False)
 
+    def get_playback_format(self):
+        """
+        Return PCM format natively supported by card
+
+        Returns:
+            dict: playback format::
+
+                {
+                    rate (int): sample rate
+                    channels (int): channels count
+                    sample_format (string): sample format
+                }
+
+        """
+        return dict(self.PLAYBACK_FORMAT)
+
     def _install(self, params=None):
         """
         Install driver
@@ -74,7 +173,7 @@ class Bcm2835AudioDriver(AudioDriver):
         Args:
             params (dict): additional parameters
         """
-        if not Tools.raspberry_pi_infos()['audio']:
+        if not self._get_board_infos()['audio']:
             raise Exception('Raspberry pi has no onboard audio device')
 
         # as the default driver and just in case, delete existing config
@@ -93,7 +192,7 @@ class Bcm2835AudioDriver(AudioDriver):
         Args:
             params (dict): additional parameters
         """
-        if not Tools.raspberry_pi_infos()['audio']:
+        if not self._get_board_infos()['audio']:
             raise Exception('Raspberry pi has no onboard audio device')
 
         # uninstalling native audio device consists of disabling dtparam audio in /boot/config.txt
@@ -113,49 +212,286 @@ class Bcm2835AudioDriver(AudioDriver):
 
     def enable(self, params=None):
         """
-        Enable driver
+        Enable driver. Only settings that differ from current configuration are applied
+
+        Args:
+            params (dict): additional parameters
         """
         # search appropriate card name
-        devices = self.alsa.get_playback_devices()
-        for card_id, card in devices.items():
-            if card['name'].find('bcm2835') >= 0:
-                self.card_name = card['name']
-                break
+        card = self.asound_cards.find(self.CARD_PATTERN, AsoundCards.CAPABILITY_PLAYBACK)
+        if card:
+            self.card_name = card['name']
 
-        # as the default driver and just in case, delete existing config
-        self.asoundconf.delete()
-
-        # create default /etc/asound.conf
         card_infos = self.get_cardid_deviceid()
         self.logger.trace('card_infos=%s' % str(card_infos))
         if card_infos[0] is None:
+            # existing config can't target this card, delete it just in case
+            self.asoundconf.delete()
+            self.control_index = None
             self.logger.error('Unable to get alsa infos for card "%s"' % self.card_name)
             return False
-        self.logger.debug('Write to /etc/asound.conf values "%s:%s"' % (card_infos[0], card_infos[1]))
-        if not self.asoundconf.save_default_file(card_infos[0], card_infos[1]):
-            self.logger.error('Unable to create /etc/asound.conf for soundcard "%s"' % self.card_name)
-            return False
+        self._get_control_index(card_infos[0])
+
+        # create /etc/asound.conf (default one or latency profile one) if necessary
+        changed = False
+        profile_content = self._get_profile_content(card_infos[0], card_infos[1])
+        if self._is_asound_conf_configured(card_infos[0], card_infos[1], profile_content):
+            self.logger.debug('/etc/asound.conf already configured for "%s:%s"' % (card_infos[0], card_infos[1]))
+        else:
+            self.asoundconf.delete()
+            self.logger.debug('Write to /etc/asound.conf values "%s:%s" (profile %s)' % (
+                card_infos[0], card_infos[1], self.latency_profile,
+            ))
+            if profile_content:
+                saved = self._write_file(self.ASOUND_CONF, profile_content)
+            else:
+                saved = self.asoundconf.save_default_file(card_infos[0], card_infos[1])
+            if not saved:
+                self.logger.error('Unable to create /etc/asound.conf for soundcard "%s"' % self.card_name)
+                return False
+            changed = True
 
         # configure default output to "auto" in alsa (0=auto, 1=headphone jack, 2=HDMI) if necessary
+        controls = {}
         route_control_numid = self.get_control_numid('Route')
         self.logger.trace('route_control_numid=%s' % route_control_numid)
-        if route_control_numid is not None:
-            if not self.alsa.amixer_control(Alsa.CSET, route_control_numid, self.AMIXER_JACK):
-                self.logger.error('Error executing amixer command')
+        if route_control_numid is not None and self._get_saved_control_value('Route') != self.AMIXER_JACK:
+            controls[route_control_numid] = self.AMIXER_JACK
+        if controls:
+            if not self._set_controls(controls):
                 return False
+            changed = True
 
         # force saving alsa conf (this will create asound.state if needed)
-        self.alsa.save()
+        if changed or not os.path.exists(self.ASOUND_STATE):
+            self.alsa.save()
+
+        if not changed and self.volume_control:
+            self.logger.debug('Driver already enabled, nothing changed')
+            return True
+
+        # default card may have changed, mixer will be reopened on next volume access
+        self._close_mixer()
 
         # search for appropriate volume control
-        controls = self.alsa.get_simple_controls()
-        self.volume_control = controls[0] if len(controls) > 0 else ''
+        simple_controls = self._get_mixer().get_controls()
+        self.volume_control = simple_controls[0] if simple_controls else ''
 
         # get volume control numid
         self.volume_control_numid = self.get_control_numid('Volume')
 
         return True
 
+    def _get_control_index(self, card_id=None):
+        """
+        Return controls index of embedded soundcard. Index is created for specified card or for
+        card currently found if not specified. Default card is never used instead of embedded one
+
+        Args:
+            card_id (int): card number
+
+        Returns:
+            ControlIndex: controls index or None if embedded card is not found
+        """
+        if card_id is None:
+            if self.control_index is not None:
+                return self.control_index
+            card_id = self.get_cardid_deviceid()[0]
+            if card_id is None:
+                self.logger.debug('Embedded card not found, no controls index')
+                return None
+        if self.control_index is None or self.control_index.card != card_id:
+            self.control_index = self._instrument(ControlIndex(card_id), 'controls')
+        return self.control_index
+
+    def invalidate_controls(self):
+        """
+        Invalidate controls index and mixer (card changed, card hotplugged...)
+        """
+        if self.control_index is not None:
+            self.control_index.invalidate()
+        self._close_mixer()
+
+    def get_control_numid(self, control_name):
+        """
+        Return control numid using controls index (built once per card)
+
+        Args:
+            control_name (string): control name pattern (Route, Volume...)
+
+        Returns:
+            int: control numid or None if control not found
+        """
+        control_index = self._get_control_index()
+        return control_index.get_numid(control_name) if control_index else None
+
+    def _set_controls(self, values):
+        """
+        Set controls values using a single amixer batch
+
+        Args:
+            values (dict): controls values indexed by control numid
+
+        Returns:
+            bool: True if all controls were updated
+        """
+        session = self._instrument(AmixerSession(), 'amixer')
+        try:
+            for numid, value in values.items():
+                session.cset(numid, value)
+            outputs = session.execute()
+        except Exception as error:
+            self.logger.error('Error executing amixer command: %s' % str(error))
+            return False
+        if None in outputs:
+            self.logger.error('Error executing amixer command: some controls were not updated %s' % values)
+            return False
+
+        return True
+
+    def _read_file(self, path):
+        """
+        Read file content
+
+        Args:
+            path (string): file path
+
+        Returns:
+            string: file content or None if file does not exist or can't be read
+        """
+        return read_file(self.cleep_filesystem, path, self.logger)
+
+    def set_latency_profile(self, profile):
+        """
+        Set latency profile used to generate /etc/asound.conf. It is applied on next enable
+
+        Args:
+            profile (string): profile name (see AsoundProfile) or None for default alsa configuration
+
+        Raises:
+            ValueError: if profile is unknown
+        """
+        if profile is not None and profile not in AsoundProfile.PROFILES:
+            raise ValueError('Unknown latency profile "%s"' % profile)
+        self.latency_profile = profile
+
+    def _get_profile_content(self, card_id, device_id):
+        """
+        Return /etc/asound.conf content generated for current latency profile
+
+        Args:
+            card_id (int): card number
+            device_id (int): device number
+
+        Returns:
+            string: asound.conf content or None if no latency profile is set
+        """
+        if not self.latency_profile:
+            return None
+        profile = AsoundProfile(self.latency_profile, self.PLAYBACK_FORMAT['rate'])
+        return profile.generate(card_id, device_id, capture=self.get_card_capabilities()[1])
+
+    def _write_file(self, path, content):
+        """
+        Write file content
+
+        Args:
+            path (string): file path
+            content (string): file content
+
+        Returns:
+            bool: True if file written successfully
+        """
+        try:
+            fd = self.cleep_filesystem.open(path, 'w')
+            fd.write(content)
+            self.cleep_filesystem.close(fd)
+        except Exception:
+            self.logger.exception('Unable to write file "%s"' % path)
+            return False
+
+        return True
+
+    def _is_asound_conf_configured(self, card_id, device_id, profile_content=None):
+        """
+        Check if /etc/asound.conf already targets specified card and device
+
+        Args:
+            card_id (int): card number
+            device_id (int): device number
+            profile_content (string): expected content if a latency profile is set
+
+        Returns:
+            bool: True if asound.conf is already configured
+        """
+        content = self._read_file(self.ASOUND_CONF)
+        if not content:
+            return False
+        if profile_content is not None:
+            return content == profile_content
+        if AsoundProfile.is_generated(content):
+            # generated by a latency profile that is not used anymore
+            return False
+
+        cards = set(re.findall(r'^\s*card\s+(\d+)\s*$', content, re.MULTILINE))
+        devices = set(re.findall(r'^\s*device\s+(\d+)\s*$', content, re.MULTILINE))
+        return cards == {str(card_id)} and devices == {str(device_id)}
+
+    def _get_saved_control_value(self, control_name):
+        """
+        Return control value of embedded card stored in alsa state file
+
+        Args:
+            control_name (string): control name pattern (Route, Volume...)
+
+        Returns:
+            int: control value or None if control not found
+        """
+        content = self._read_file(self.ASOUND_STATE)
+        if not content:
+            return None
+
+        card_id = self.get_cardid_deviceid()[0]
+        card = self.asound_cards.get_card(card_id) if card_id is not None else None
+        state = self._get_card_state(content, card['id']) if card else None
+        if not state:
+            self.logger.debug('No saved state for card %s' % card_id)
+            return None
+
+        for block in re.split(r'control\.\d+\s*\{', state)[1:]:
+            name = re.search(r'^\s*name\s+\'(.*?)\'', block, re.MULTILINE)
+            value = re.search(r'^\s*value\s+(-?\d+)\s*$', block, re.MULTILINE)
+            if name and value and name.group(1).find(control_name) >= 0:
+                return int(value.group(1))
+
+        return None
+
+    def _get_card_state(self, content, card_id):
+        """
+        Return state block of specified card in alsa state file content
+
+        Args:
+            content (string): alsa state file content
+            card_id (string): card identifier (Headphones...)
+
+        Returns:
+            string: card state block content or None if card has no state
+        """
+        start = re.search(r'^state\.%s\s*\{' % re.escape(card_id), content, re.MULTILINE)
+        if not start:
+            return None
+
+        depth = 1
+        for index in range(start.end(), len(content)):
+            if content[index] == '{':
+                depth += 1
+            elif content[index] == '}':
+                depth -= 1
+                if depth == 0:
+                    return content[start.end():index]
+
+        return None
+
     def disable(self, params=None):
         """
         Disable driver
@@ -165,8 +501,10 @@ class Bcm2835AudioDriver(AudioDriver):
         """
         # configure alsa to "auto"
         self.logger.debug('Configure alsa')
-        if not self.alsa.amixer_control(Alsa.CSET, 3, self.AMIXER_AUTO):
-            self.logger.error('Error executing amixer command')
+        route_control_numid = self.get_control_numid('Route')
+        if route_control_numid is None:
+            self.logger.warning('No route control found, output is not reset')
+        elif not self._set_controls({route_control_numid: self.AMIXER_AUTO}):
             return False
 
         self.logger.debug('Delete /etc/asound.conf and /var/lib/alsa/asound.state')
@@ -174,9 +512,43 @@ class Bcm2835AudioDriver(AudioDriver):
             self.logger.error('Unable to delete asound.conf file')
             return False
 
+        self.invalidate_controls()
+
         self.logger.debug('Driver disabled')
         return True
 
+    def get_cardid_deviceid(self):
+        """
+        Return card number and playback device number of embedded soundcard
+
+        Returns:
+            tuple: card infos::
+
+                (
+                    int: card number or None if card not found,
+                    int: device number or None if card not found
+                )
+
+        """
+        card = self.asound_cards.find(self.CARD_PATTERN, AsoundCards.CAPABILITY_PLAYBACK)
+        if not card:
+            return (None, None)
+        return (card['cardid'], card['playback'][0])
+
+    def is_card_enabled(self, card_name=None):
+        """
+        Is card enabled (loaded by kernel) ?
+
+        Args:
+            card_name (string): card name. If not specified embedded soundcard is searched
+
+        Returns:
+            bool: True if card is enabled
+        """
+        if card_name:
+            return self.asound_cards.get_card_by_name(card_name) is not None
+        return self.asound_cards.find(self.CARD_PATTERN) is not None
+
     def is_enabled(self):
         """
         Is driver enabled ?
@@ -189,6 +561,29 @@ class Bcm2835AudioDriver(AudioDriver):
 
         return card and asound
 
+    def _get_mixer(self):
+        """
+        Return mixer instance, creating it on first use with configured backend. Mixer is opened on
+        embedded card control device, default one is used only if card is not found
+
+        Returns:
+            AlsaMixer: mixer instance
+        """
+        if not self.mixer:
+            card_id = self.get_cardid_deviceid()[0]
+            device = 'hw:%d' % card_id if card_id is not None else 'default'
+            self.mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=self.mixer_backend, device=device)
+            self.logger.debug('Mixer backend in use: %s' % self.mixer.get_backend())
+        return self.mixer
+
+    def _close_mixer(self):
+        """
+        Close current mixer instance if any
+        """
+        if self.mixer:
+            self.mixer.close()
+            self.mixer = None
+
     def get_volumes(self):
         """
         Get volumes
@@ -203,7 +598,7 @@ class Bcm2835AudioDriver(AudioDriver):
 
         """
         return {
-            'playback': self.alsa.get_volume(self.volume_control, self.VOLUME_PATTERN),
+            'playback': self._get_mixer().get_volume(self.volume_control),
             'capture': None
         }
 
@@ -225,7 +620,7 @@ class Bcm2835AudioDriver(AudioDriver):
 
         """
         return {
-            'playback': self.alsa.set_volume(self.volume_control, self.VOLUME_PATTERN, playback),
+            'playback': self._get_mixer().set_volume(self.volume_control, playback),
             'capture': None
         }
 
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+
+__all__ = ['CaptureConsumer']
+
+
+class CaptureConsumer():
+    """
+    Capture stream consumer. It reads shared capture ring buffer with its own cursor
+
+    Usage::
+
+        with capture_stream.open_consumer() as consumer:
+            for chunk in consumer.chunks(3200):
+                process(chunk)
+
+    """
+
+    def __init__(self, stream, position):
+        """
+        Constructor
+
+        Args:
+            stream (CaptureStream): capture stream
+            position (int): initial read position in captured stream (bytes)
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.stream = stream
+        self.position = position
+        self.lost = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self, max_size=None, timeout=None):
+        """
+        Read next captured data
+
+        Args:
+            max_size (int): max number of bytes to read (None for all available data)
+            timeout (float): max time to wait for data in seconds (None to wait until data is available)
+
+        Returns:
+            memoryview: captured data slice (copied only if about to be overwritten), empty if no
+                        data before timeout or if stream or consumer is closed. Slice content must
+                        be used before it is overwritten by capture (see CaptureStream)
+        """
+        data, self.position, lost = self.stream.read(self, max_size, timeout)
+        if lost:
+            self.lost += lost
+            self.logger.debug('Capture consumer too late, %d bytes lost' % lost)
+
+        return data
+
+    def chunks(self, max_size=None):
+        """
+        Iterate over captured data until consumer or stream is closed
+
+        Args:
+            max_size (int): max chunk size in bytes
+
+        Returns:
+            generator: memoryview chunks (see read)
+        """
+        while not self.closed:
+            data = self.read(max_size)
+            if not data:
+                break
+            yield data
+
+    def close(self):
+        """
+        Close consumer
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.stream.close_consumer(self)
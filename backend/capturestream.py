@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import subprocess
+import threading
+import time
+from .rawpcm import RawPcm
+from .captureconsumer import CaptureConsumer
+
+__all__ = ['CaptureStream']
+
+
+class CaptureStream():
+    """
+    Shared capture stream. A single arecord process writes captured PCM data into a fixed-size
+    ring buffer, each consumer reads it with its own cursor. Consumers receive memoryview slices
+    of ring buffer, so adding consumers costs neither another capture process nor data copies.
+
+    Stream is opened with first consumer and closed when last consumer is closed. It can be suspended
+while alsa configuration changes and resumed on new configuration, consumers are kept meanwhile.
+
+    Note:
+        A slice is only valid until capture wraps around ring buffer (BUFFER_DURATION seconds).
+        A consumer lagging more than that loses oldest data (counted in its lost bytes). Data about
+        to be overwritten by next capture read is copied instead of sliced.
+    """
+
+    BUFFER_DURATION = 5.0
+    READ_DURATION = 0.01
+
+    def __init__(self, rate=16000, channels=1, sample_format=RawPcm.FORMAT_S16LE, device=None,
+                 buffer_duration=BUFFER_DURATION, read_duration=READ_DURATION, open_callback=None, close_callback=None):
+        """
+        Constructor
+
+        Args:
+            rate (int): capture sample rate
+            channels (int): capture channels count
+            sample_format (string): capture sample format
+            device (string): alsa capture device (None for default one)
+            buffer_duration (float): ring buffer duration in seconds
+            read_duration (float): duration of data read from capture process at once in seconds
+            open_callback (callable): function called (without parameter) before opening stream. It
+                                      returns False if device can't be used (capture resource not acquired...)
+            close_callback (callable): function called (without parameter) once stream is closed
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.pcm = RawPcm(rate=rate, channels=channels, sample_format=sample_format, device=device)
+        self.frame_size = self.pcm.frame_size
+        self.read_size = max(1, int(rate * read_duration)) * self.frame_size
+        self.size = max(1, int(rate * buffer_duration / (self.read_size / self.frame_size))) * self.read_size
+        self.__buffer = bytearray(self.size)
+        self.__view = memoryview(self.__buffer)
+        self.__written = 0
+        self.open_callback = open_callback
+        self.close_callback = close_callback
+        # serializes stream opening and closing, open callback may block
+        self.__lock = threading.Lock()
+        self.__condition = threading.Condition()
+        self.__consumers = set()
+        self.__suspended = False
+        self.__process = None
+        self.__thread = None
+
+    def get_format(self):
+        """
+        Return capture PCM format
+
+        Returns:
+            dict: capture format::
+
+                {
+                    rate (int): sample rate
+                    channels (int): channels count
+                    sample_format (string): sample format
+                }
+
+        """
+        return {
+            'rate': self.pcm.rate,
+            'channels': self.pcm.channels,
+            'sample_format': self.pcm.sample_format,
+        }
+
+    def is_running(self):
+        """
+        Return True if capture is running
+
+        Returns:
+            bool: True if capture is running
+        """
+        return self.__process is not None
+
+    def get_status(self):
+        """
+        Return stream status
+
+        Returns:
+            dict: status::
+
+                {
+                    running (bool): True if capture is running
+                    consumers (int): number of opened consumers
+                    captured (int): number of bytes captured since stream creation
+                    buffer_size (int): ring buffer size in bytes
+                }
+
+        """
+        with self.__condition:
+            return {
+                'running': self.__process is not None,
+                'consumers': len(self.__consumers),
+                'captured': self.__written,
+                'buffer_size': self.size,
+            }
+
+    def open_consumer(self):
+        """
+        Open consumer. It reads data captured from now on. Capture is started if necessary
+
+        Returns:
+            CaptureConsumer: consumer instance
+
+        Raises:
+            OSError: if capture process can't be launched or device can't be used
+        """
+        with self.__lock:
+            # suspended stream is launched again on resume
+            if self.__process is None and not self.__suspended:
+                self.__start()
+            with self.__condition:
+                consumer = CaptureConsumer(self, self.__written - self.__written % self.frame_size)
+                self.__consumers.add(consumer)
+
+        self.logger.debug('Capture consumer opened (%d consumers)' % len(self.__consumers))
+        return consumer
+
+    def close_consumer(self, consumer):
+        """
+        Close consumer. Capture is stopped when last consumer is closed
+
+        Args:
+            consumer (CaptureConsumer): consumer to close
+        """
+        with self.__condition:
+            self.__consumers.discard(consumer)
+            last = not self.__consumers
+            self.__condition.notify_all()
+
+        self.logger.debug('Capture consumer closed (%d consumers)' % len(self.__consumers))
+        if last:
+            self.stop()
+
+    def stop(self):
+        """
+        Stop capture. Opened consumers stop receiving data
+        """
+        with self.__lock:
+            with self.__condition:
+                self.__suspended = False
+            self.__terminate()
+
+    def suspend(self):
+        """
+        Suspend capture: capture process is stopped but opened consumers are kept and wait for data
+        until stream is resumed
+        """
+        with self.__lock:
+            with self.__condition:
+                if self.__process is None:
+                    return
+                self.__suspended = True
+            self.__terminate()
+        self.logger.debug('Capture stream suspended')
+
+    def resume(self):
+        """
+        Resume suspended capture: capture process is launched again if consumers are opened. If it
+        can't be launched, consumers stop receiving data
+
+        Raises:
+            OSError: if capture process can't be launched or device can't be used
+        """
+        with self.__lock:
+            try:
+                if self.__suspended and self.__consumers:
+                    self.__start()
+            finally:
+                with self.__condition:
+                    self.__suspended = False
+                    self.__condition.notify_all()
+
+    def __terminate(self):
+        """
+        Terminate capture process and wait for writer thread. Must be called with stream lock acquired
+        """
+        with self.__condition:
+            process, self.__process = self.__process, None
+            thread, self.__thread = self.__thread, None
+            self.__condition.notify_all()
+        if process and process.poll() is None:
+            process.terminate()
+        # close callback is run by writer thread before a new stream can be opened
+        if thread and thread is not threading.current_thread():
+            thread.join()
+
+    def read(self, consumer, max_size=None, timeout=None):
+        """
+        Return consumer next available data. Used by CaptureConsumer
+
+        Args:
+            consumer (CaptureConsumer): consumer
+            max_size (int): max number of bytes to return (None for all available data until ring end)
+            timeout (float): max time to wait for data in seconds (None to wait until data is available)
+
+        Returns:
+            tuple: read result::
+
+                (
+                    memoryview: frame-aligned data slice (empty if no data before timeout or stream stopped),
+                    int: new consumer position,
+                    int: number of lost bytes (consumer was too late),
+                )
+
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        with self.__condition:
+            position = consumer.position
+            while self.__written - position < self.frame_size:
+                remaining = None if end is None else end - time.monotonic()
+                stopped = self.__process is None and not self.__suspended
+                if consumer.closed or stopped or (remaining is not None and remaining <= 0.0):
+                    return self.__view[0:0], position, 0
+                self.__condition.wait(remaining)
+
+            # writer window being filled by running capture is already overwritten
+            window = self.read_size if self.__process is not None else 0
+            lost = max(0, self.__written + window - self.size - position)
+            lost += (-lost) % self.frame_size
+            position += lost
+
+            offset = position % self.size
+            count = min(self.__written - position, self.size - offset)
+            if max_size is not None:
+                count = min(count, max(self.frame_size, max_size))
+            count -= count % self.frame_size
+
+            data = self.__view[offset:offset + count]
+            if position < self.__written + 2 * window - self.size:
+                # slice is overwritten by next capture read, hand back a copy
+                data = memoryview(bytes(data))
+
+            return data, position + count, lost
+
+    def __start(self):
+        """
+        Launch capture process and writer thread. Must be called with stream lock acquired (not
+        condition, open callback may block)
+
+        Raises:
+            OSError: if capture process can't be launched or device can't be used
+        """
+        if self.open_callback and not self.open_callback():
+            raise OSError('Capture device is busy')
+
+        try:
+            process = subprocess.Popen(
+                self.pcm.get_command(RawPcm.ARECORD),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except Exception:
+            if self.close_callback:
+                self.close_callback()
+            raise
+        with self.__condition:
+            self.__process = process
+            self.__thread = threading.Thread(target=self._run, args=(process,), daemon=True)
+            self.__thread.start()
+        self.logger.debug('Capture stream opened')
+
+    def _run(self, process):
+        """
+        Writer thread: read capture process output into ring buffer
+
+        Args:
+            process (Popen): capture process
+        """
+        try:
+            while True:
+                offset = self.__written % self.size
+                count = process.stdout.readinto(self.__view[offset:offset + self.read_size])
+                if not count:
+                    break
+                with self.__condition:
+                    self.__written += count
+                    self.__condition.notify_all()
+        except Exception:
+            self.logger.exception('Capture stream error')
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.terminate()
+            process.wait()
+            # release device before stream can be opened again
+            if self.close_callback:
+                try:
+                    self.close_callback()
+                except Exception:
+                    self.logger.exception('Error in capture stream close callback')
+            with self.__condition:
+                if self.__process is process:
+                    self.__process = None
+                    self.__thread = None
+                self.__condition.notify_all()
+            self.logger.debug('Capture stream closed')
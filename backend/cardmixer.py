@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+from .alsamixer import AlsaMixer
+
+__all__ = ['CardMixer']
+
+
+class CardMixer():
+    """
+    Volumes of a sound card that is not handled by an audio driver (usb microphone, i2s dac...).
+    Mixer is opened on card hardware control device and volume controls are found by name.
+    """
+
+    PLAYBACK_CONTROLS = ['Master', 'PCM', 'Speaker', 'Headphone', 'Digital', 'DAC']
+    CAPTURE_CONTROLS = ['Capture', 'Mic', 'Mic Capture', 'ADC']
+    VOLUME_PATTERN = (None, r'\[(\d*)%\]')
+
+    def __init__(self, cardid, backend=AlsaMixer.BACKEND_AUTO):
+        """
+        Constructor
+
+        Args:
+            cardid (int): card number
+            backend (string): mixer backend (see AlsaMixer.BACKEND_XXX)
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.cardid = cardid
+        self.mixer = AlsaMixer(None, self.VOLUME_PATTERN, backend=backend, device='hw:%d' % cardid)
+        self.__controls = None
+
+    def close(self):
+        """
+        Release mixer resources
+        """
+        self.mixer.close()
+
+    def get_controls(self):
+        """
+        Return volume controls of card, found once
+
+        Returns:
+            dict: volume controls::
+
+                {
+                    playback (string): playback volume control name (None if card has no playback volume)
+                    capture (string): capture volume control name (None if card has no capture volume)
+                }
+
+        """
+        if self.__controls is None:
+            controls = self.mixer.get_controls() or []
+            self.__controls = {
+                'playback': next((name for name in self.PLAYBACK_CONTROLS if name in controls), None),
+                'capture': next((name for name in self.CAPTURE_CONTROLS if name in controls), None),
+            }
+            self.logger.debug('Volume controls of card %d: %s' % (self.cardid, self.__controls))
+        return self.__controls
+
+    def get_volumes(self):
+        """
+        Get volumes
+
+        Returns:
+            dict: volumes level::
+
+                {
+                    playback (int): playback volume (None if card has no playback volume)
+                    capture (int): capture volume (None if card has no capture volume)
+                }
+
+        """
+        controls = self.get_controls()
+        return {
+            'playback': self.mixer.get_volume(controls['playback']) if controls['playback'] else None,
+            'capture': self.mixer.get_volume(controls['capture'], capture=True) if controls['capture'] else None,
+        }
+
+    def set_volumes(self, playback=None, capture=None):
+        """
+        Set volumes
+
+        Args:
+            playback (int): playback volume (None to keep it unchanged)
+            capture (int): capture volume (None to keep it unchanged)
+
+        Returns:
+            dict: volumes level (see get_volumes)
+        """
+        controls = self.get_controls()
+        values = {'playback': playback, 'capture': capture}
+        # both volumes are set by a single amixer process with amixer backend
+        keys = [key for key in ('playback', 'capture') if controls[key]]
+        applied = self.mixer.set_volumes([(controls[key], values[key], key == 'capture') for key in keys])
+
+        volumes = {'playback': None, 'capture': None}
+        volumes.update(zip(keys, applied))
+        return volumes
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+from collections import OrderedDict
+from .cardmixer import CardMixer
+from .concurrentrunner import ConcurrentRunner
+
+__all__ = ['CardRegistry']
+
+
+class CardRegistry():
+    """
+    Registry of sound cards managed at the same time (onboard card, usb microphone, i2s dac...)
+
+    Cards are enumerated from /proc/asound (see AsoundCards) and associated to the audio driver
+    handling them. Registry is indexed by card number, card id, card name and driver name, and is
+    built again when it is invalidated. Card operations (volumes...) are executed concurrently so
+    managing several cards takes about the same time as managing one.
+
+    Cards that are not handled by an audio driver are managed through a CardMixer opened on card
+    control device.
+    """
+
+    def __init__(self, asound_cards, get_drivers, workers=4, timeout=5.0, runner=None):
+        """
+        Constructor
+
+        Args:
+            asound_cards (AsoundCards): sound cards enumerator
+            get_drivers (callable): function returning audio drivers ({driver name: driver})
+            workers (int): max number of cards handled concurrently (if runner is not specified)
+            timeout (float): max time to wait for a card operation in seconds
+            runner (ConcurrentRunner): runner shared with other components (a new one is used if not specified)
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.asound_cards = asound_cards
+        self.get_drivers = get_drivers
+        self.timeout = timeout
+        self.runner = runner or ConcurrentRunner(workers, timeout)
+        self.__lock = threading.Lock()
+        self.__cards = None
+        self.__by_cardid = {}
+        self.__by_key = {}
+        self.__drivers = {}
+        self.__mixers = {}
+        self.__active = set()
+
+    def invalidate(self):
+        """
+        Invalidate registry. Cards and drivers are enumerated again on next access
+        """
+        with self.__lock:
+            self.__cards = None
+            # card numbers may have changed, mixers are released when no longer used
+            self.__mixers = {}
+
+    def __refresh(self):
+        """
+        Build registry if needed. Must be called with lock acquired
+        """
+        if self.__cards is not None:
+            return
+
+        cards_drivers = {}
+        for driver_name, driver in (self.get_drivers() or {}).items():
+            cardid = self.__get_driver_cardid(driver)
+            if cardid is not None:
+                cards_drivers.setdefault(cardid, (driver_name, driver))
+
+        cards = []
+        by_key = {}
+        drivers = {}
+        for card in self.asound_cards.get_cards():
+            driver_name, driver = cards_drivers.get(card['cardid'], (None, None))
+            entry = {
+                'cardid': card['cardid'],
+                'id': card['id'],
+                'name': card['name'],
+                'driver': driver_name,
+                'playback': len(card['playback']) > 0,
+                'capture': len(card['capture']) > 0,
+            }
+            cards.append(entry)
+            drivers[card['id']] = driver
+            # first indexed key wins: card id, then card name, then driver name
+            for key in (card['id'], card['name'], driver_name):
+                if key is not None:
+                    by_key.setdefault(key, entry)
+
+        self.__cards = cards
+        self.__by_cardid = {card['cardid']: card for card in cards}
+        self.__by_key = by_key
+        self.__drivers = drivers
+        self.logger.debug('Cards registry: %s' % cards)
+
+    def __get_driver_cardid(self, driver):
+        """
+        Return number of card handled by driver
+
+        Args:
+            driver (AudioDriver): audio driver
+
+        Returns:
+            int: card number or None if card is not found
+        """
+        try:
+            get_cardid_deviceid = getattr(driver, 'get_cardid_deviceid', None)
+            card_infos = get_cardid_deviceid() if callable(get_cardid_deviceid) else None
+            if isinstance(card_infos, tuple) and isinstance(card_infos[0], int):
+                return card_infos[0]
+
+            card = self.asound_cards.get_card_by_name(driver.get_card_name())
+            return card['cardid'] if card else None
+        except Exception as error:
+            self.logger.debug('Unable to get card of driver: %s' % str(error))
+            return None
+
+    def __get_entry(self, key):
+        """
+        Return card entry. Must be called with lock acquired
+
+        Args:
+            key (int|string): card number, card id, card name or driver name
+
+        Returns:
+            dict: card entry or None if not found
+        """
+        self.__refresh()
+        if isinstance(key, int):
+            return self.__by_cardid.get(key)
+        return self.__by_key.get(key)
+
+    def __to_card(self, entry):
+        """
+        Return public card infos from entry. Must be called with lock acquired
+
+        Args:
+            entry (dict): card entry
+
+        Returns:
+            dict: card infos (see get_cards)
+        """
+        card = dict(entry)
+        card['active'] = entry['id'] in self.__active
+        return card
+
+    def get_cards(self):
+        """
+        Return all sound cards
+
+        Returns:
+            list: list of cards sorted by card number::
+
+                [
+                    {
+                        cardid (int): card number
+                        id (string): card identifier
+                        name (string): card name
+                        driver (string): name of driver handling card (None if no driver)
+                        playback (bool): playback capability
+                        capture (bool): capture capability
+                        active (bool): True if card is managed
+                    },
+                    ...
+                ]
+
+        """
+        with self.__lock:
+            self.__refresh()
+            return [self.__to_card(entry) for entry in self.__cards]
+
+    def get_card(self, key):
+        """
+        Return card
+
+        Args:
+            key (int|string): card number, card id, card name or driver name
+
+        Returns:
+            dict: card (see get_cards) or None if not found
+        """
+        with self.__lock:
+            entry = self.__get_entry(key)
+            return self.__to_card(entry) if entry else None
+
+    def get_active_cards(self):
+        """
+        Return active cards that are currently plugged
+
+        Returns:
+            list: list of cards (see get_cards)
+        """
+        return [card for card in self.get_cards() if card['active']]
+
+    def get_capabilities(self, key):
+        """
+        Return card capabilities
+
+        Args:
+            key (int|string): card number, card id, card name or driver name
+
+        Returns:
+            dict: card capabilities::
+
+                {
+                    playback (bool): playback capability
+                    capture (bool): capture capability
+                }
+
+        Raises:
+            ValueError: if card does not exist
+        """
+        card = self.get_card(key)
+        if not card:
+            raise ValueError('Card "%s" does not exist' % key)
+
+        return {
+            'playback': card['playback'],
+            'capture': card['capture'],
+        }
+
+    def set_active_cards(self, card_ids):
+        """
+        Set active cards. Cards that are not plugged are kept and become active when plugged
+
+        Args:
+            card_ids (list): card identifiers
+        """
+        with self.__lock:
+            self.__active = set(card_ids)
+
+    def set_active(self, key, active):
+        """
+        Activate or deactivate card
+
+        Args:
+            key (int|string): card number, card id, card name or driver name
+            active (bool): True to activate card
+
+        Returns:
+            list: active card identifiers (sorted)
+
+        Raises:
+            ValueError: if card does not exist
+        """
+        with self.__lock:
+            entry = self.__get_entry(key)
+            if not entry:
+                raise ValueError('Card "%s" does not exist' % key)
+            if active:
+                self.__active.add(entry['id'])
+            else:
+                self.__active.discard(entry['id'])
+            return sorted(self.__active)
+
+    def get_volumes(self, keys=None):
+        """
+        Return cards volumes. Cards are queried concurrently
+
+        Args:
+            keys (list): cards to query (card number, id, name or driver name). Active cards if not specified
+
+        Returns:
+            dict: volumes ({playback, capture}) indexed by card id. Volumes are None if card failed
+
+        Raises:
+            ValueError: if a card does not exist
+        """
+        return self.run(lambda driver: driver.get_volumes(), keys)
+
+    def set_volumes(self, volumes):
+        """
+        Set cards volumes. Cards are updated concurrently
+
+        Args:
+            volumes (dict): volumes ({playback, capture}) indexed by card (card number, id, name or driver name)
+
+        Returns:
+            dict: new volumes ({playback, capture}) indexed by card id. Volumes are None if card failed
+
+        Raises:
+            ValueError: if a card does not exist
+        """
+        card_volumes = {}
+        for key, values in volumes.items():
+            card = self.get_card(key)
+            if card:
+                card_volumes[card['id']] = values
+
+        return self.run(
+            lambda driver, card_id: driver.set_volumes(
+                card_volumes[card_id].get('playback'), card_volumes[card_id].get('capture'),
+            ),
+            list(volumes.keys()),
+            with_card_id=True,
+        )
+
+    def __get_mixer(self, entry):
+        """
+        Return mixer of card not handled by an audio driver, created on first use. Must be called
+        with lock acquired
+
+        Args:
+            entry (dict): card entry
+
+        Returns:
+            CardMixer: card mixer
+        """
+        mixer = self.__mixers.get(entry['id'])
+        if mixer is None:
+            mixer = CardMixer(entry['cardid'])
+            self.__mixers[entry['id']] = mixer
+        return mixer
+
+    def run(self, func, keys=None, with_card_id=False):
+        """
+        Execute function on drivers of specified cards concurrently. Cards without audio driver are
+        handled by a CardMixer which has the same volumes api. A card that does not answer within
+        timeout, or whose previous operation is still running, is reported as failed
+
+        Args:
+            func (callable): function receiving card driver or mixer (and card id if with_card_id is True)
+            keys (list): cards (card number, id, name or driver name). Active cards if not specified
+            with_card_id (bool): True to give card id to function
+
+        Returns:
+            dict: function result indexed by card id. Result is None if function failed
+
+        Raises:
+            ValueError: if a card does not exist
+        """
+        with self.__lock:
+            self.__refresh()
+            if keys is None:
+                entries = [entry for entry in self.__cards if entry['id'] in self.__active]
+            else:
+                entries = []
+                for key in keys:
+                    entry = self.__get_entry(key)
+                    if not entry:
+                        raise ValueError('Card "%s" does not exist' % key)
+                    entries.append(entry)
+            drivers = OrderedDict()
+            for entry in entries:
+                driver = self.__drivers.get(entry['id'])
+                drivers[entry['id']] = driver if driver is not None else self.__get_mixer(entry)
+
+        results = OrderedDict()
+        if not drivers:
+            return results
+
+        calls = OrderedDict(
+            (('card', card_id), (func, (driver, card_id) if with_card_id else (driver,)))
+            for card_id, driver in drivers.items()
+        )
+        for (_, card_id), (result, error) in self.runner.run(calls, self.timeout).items():
+            if error is not None:
+                self.logger.warning('Operation on card "%s" failed: %s' % (card_id, str(error)))
+            results[card_id] = result
+
+        return results
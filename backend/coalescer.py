@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+__all__ = ['Coalescer']
+
+
+class Coalescer():
+    """
+    Coalesce bursts of calls to the same function.
+
+    First call of a burst waits during window time, meanwhile other calls only update the
+    arguments of the pending call. Function is then executed once with latest arguments and
+    all callers of the burst receive the same result (or exception).
+    """
+
+    def __init__(self, func, window=0.15, merge=None):
+        """
+        Constructor
+
+        Args:
+            func (callable): function to execute
+            window (float): coalescing window in seconds
+            merge (callable): function that merges pending arguments with new ones: merge(pending_args, new_args).
+                              By default new arguments replace pending ones.
+        """
+        self.func = func
+        self.window = window
+        self.merge = merge
+        self.__lock = threading.Lock()
+        self.__execution_lock = threading.Lock()
+        self.__batch = None
+
+    def submit(self, *args):
+        """
+        Submit call
+
+        Args:
+            args: function arguments
+
+        Returns:
+            any: function result of the burst the call belongs to
+
+        Raises:
+            Exception: exception raised by function
+        """
+        with self.__lock:
+            batch = self.__batch
+            leader = batch is None
+            if leader:
+                batch = {
+                    'args': args,
+                    'done': threading.Event(),
+                    'result': None,
+                    'error': None,
+                }
+                self.__batch = batch
+            else:
+                batch['args'] = self.merge(batch['args'], args) if self.merge else args
+
+        if leader:
+            self.__run(batch)
+        else:
+            batch['done'].wait()
+
+        if batch['error']:
+            raise batch['error']
+        return batch['result']
+
+    def __run(self, batch):
+        """
+        Wait for window end and execute function with latest arguments
+
+        Args:
+            batch (dict): batch to execute
+        """
+        time.sleep(self.window)
+        with self.__execution_lock:
+            with self.__lock:
+                # close batch: next calls will start a new one
+                self.__batch = None
+                args = batch['args']
+            try:
+                batch['result'] = self.func(*args)
+            except Exception as error:
+                batch['error'] = error
+            finally:
+                batch['done'].set()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+__all__ = ['CommandStats', 'instrumented']
+
+
+def instrumented(func):
+    """
+    Decorator that measures method calls using instance "stats" member (CommandStats instance).
+    Method signature is kept so command parameters introspection still works
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.stats.measure(func.__name__):
+            return func(self, *args, **kwargs)
+    wrapper.__signature__ = inspect.signature(func)
+
+    return wrapper
+
+
+class CommandStats():
+    """
+    Operations timings collector. Durations are stored in fixed-size histograms (one per operation)
+    so memory usage does not depend on number of calls. Percentiles are approximated by histogram
+    bucket upper bounds.
+    """
+
+    # buckets upper bounds in milliseconds (last bucket holds longer durations)
+    BUCKETS = (0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0, 1000.0, 2000.0, 5000.0, 10000.0)
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.__lock = threading.Lock()
+        self.__operations = {}
+
+    def record(self, name, duration, failed=False):
+        """
+        Record operation duration
+
+        Args:
+            name (string): operation name
+            duration (float): operation duration in seconds
+            failed (bool): True if operation failed
+        """
+        duration = duration * 1000.0
+        with self.__lock:
+            operation = self.__operations.get(name)
+            if operation is None:
+                operation = {
+                    'count': 0,
+                    'failures': 0,
+                    'total': 0.0,
+                    'max': 0.0,
+                    'buckets': [0] * (len(self.BUCKETS) + 1),
+                }
+                self.__operations[name] = operation
+            operation['count'] += 1
+            operation['failures'] += 1 if failed else 0
+            operation['total'] += duration
+            operation['max'] = max(operation['max'], duration)
+            operation['buckets'][bisect.bisect_left(self.BUCKETS, duration)] += 1
+
+    @contextmanager
+    def measure(self, name):
+        """
+        Context manager that records duration of enclosed code. Operation is flagged as failed
+        if an exception is raised
+
+        Args:
+            name (string): operation name
+        """
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.record(name, time.perf_counter() - start, failed)
+
+    def wrap(self, func, name):
+        """
+        Return function wrapper that records function calls
+
+        Args:
+            func (callable): function to measure
+            name (string): operation name
+
+        Returns:
+            callable: wrapped function
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.measure(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def __get_percentile(self, operation, percentile):
+        """
+        Return approximated percentile of operation durations
+
+        Args:
+            operation (dict): operation stats
+            percentile (int): percentile to compute
+
+        Returns:
+            float: percentile value in milliseconds
+        """
+        threshold = operation['count'] * percentile / 100.0
+        cumulated = 0
+        for index, count in enumerate(operation['buckets']):
+            cumulated += count
+            if cumulated >= threshold:
+                bound = self.BUCKETS[index] if index < len(self.BUCKETS) else operation['max']
+                return min(bound, operation['max'])
+
+        return operation['max']
+
+    def get_stats(self):
+        """
+        Return operations stats
+
+        Returns:
+            dict: stats by operation name::
+
+                {
+                    operation (dict): {
+                        count (int): number of calls
+                        failures (int): number of failed calls
+                        total (float): total duration in milliseconds
+                        max (float): max duration in milliseconds
+                        p50 (float): 50th percentile in milliseconds
+                        p95 (float): 95th percentile in milliseconds
+                        p99 (float): 99th percentile in milliseconds
+                    },
+                    ...
+                }
+
+        """
+        stats = {}
+        with self.__lock:
+            for name, operation in self.__operations.items():
+                stats[name] = {
+                    'count': operation['count'],
+                    'failures': operation['failures'],
+                    'total': round(operation['total'], 3),
+                    'max': round(operation['max'], 3),
+                }
+                for percentile in self.PERCENTILES:
+                    stats[name]['p%d' % percentile] = round(self.__get_percentile(operation, percentile), 3)
+
+        return stats
+
+    def reset(self):
+        """
+        Reset all stats
+        """
+        with self.__lock:
+            self.__operations.clear()
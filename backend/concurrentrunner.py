@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+__all__ = ['ConcurrentRunner']
+
+
+class ConcurrentRunner():
+    """
+    Run calls concurrently on a thread pool shared by all runs, with a global timeout.
+
+    A call that does not answer in time keeps its worker until it returns. A call whose previous
+    call with same key is still running is not submitted again (it is reported as failed), so a
+    hung driver holds at most one worker and can't exhaust the pool.
+
+    Note:
+        Thread pool is created on first run, it is not needed during module startup.
+    """
+
+    def __init__(self, workers=4, timeout=5.0):
+        """
+        Constructor
+
+        Args:
+            workers (int): max number of calls running concurrently
+            timeout (float): default max time to wait for a run in seconds
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.workers = workers
+        self.timeout = timeout
+        self.__lock = threading.Lock()
+        self.__executor = None
+        self.__futures = {}
+
+    def __get_executor(self):
+        """
+        Return thread pool, created on first use. Must be called with lock acquired
+
+        Returns:
+            ThreadPoolExecutor: thread pool
+        """
+        if self.__executor is None:
+            # deferred import: not needed during module startup
+            from concurrent.futures import ThreadPoolExecutor
+            self.__executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self.__executor
+
+    def run(self, calls, timeout=None):
+        """
+        Run calls concurrently and wait for their results
+
+        Args:
+            calls (OrderedDict): calls indexed by key::
+
+                {
+                    key (hashable): (function (callable), arguments (tuple)),
+                    ...
+                }
+
+            timeout (float): max time to wait for all calls in seconds (default runner timeout)
+
+        Returns:
+            OrderedDict: call results indexed by key (same order as calls)::
+
+                {
+                    key (hashable): (result, error (Exception or None if call succeed)),
+                    ...
+                }
+
+        """
+        futures = OrderedDict()
+        results = OrderedDict()
+        with self.__lock:
+            for key, (func, args) in calls.items():
+                previous = self.__futures.get(key)
+                if previous is not None and not previous.done():
+                    futures[key] = None
+                    continue
+                futures[key] = self.__get_executor().submit(func, *args)
+                self.__futures[key] = futures[key]
+
+        # deferred import: not needed during module startup
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        for key, future in futures.items():
+            if future is None:
+                results[key] = (None, Exception('previous call still running'))
+                continue
+            try:
+                results[key] = (future.result(timeout=max(0.0, deadline - time.monotonic())), None)
+            except FutureTimeoutError:
+                results[key] = (None, Exception('timeout'))
+            except Exception as error:
+                results[key] = (None, error)
+
+        return results
+
+    def shutdown(self):
+        """
+        Stop thread pool without waiting for running calls. It is created again on next run
+        """
+        with self.__lock:
+            executor = self.__executor
+            self.__executor = None
+            self.__futures = {}
+        if executor:
+            executor.shutdown(wait=False)
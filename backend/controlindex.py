@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+import subprocess
+import threading
+from collections import OrderedDict
+
+__all__ = ['ControlIndex']
+
+
+class ControlIndex():
+    """
+    Index of sound card controls (numid, type, range and dB infos) indexed by control name
+
+    Index is built with a single "amixer contents" call on first lookup and kept until it is
+    invalidated (card enabled/disabled, card hotplug...). Lookups by name pattern are memoized.
+    """
+
+    AMIXER = 'amixer'
+    TIMEOUT = 5.0
+
+    HEADER_PATTERN = re.compile(r"^numid=(\d+),iface=(\w+),name='(.*)'")
+    INFOS_PATTERN = re.compile(r'^\s*;\s*(.*)$')
+    VALUES_PATTERN = re.compile(r'^\s*:\s*values=(.*)$')
+    DB_PATTERN = re.compile(r'^\s*\|\s*dBscale-min=(-?[\d.]+)dB,step=(-?[\d.]+)dB')
+    DB_MINMAX_PATTERN = re.compile(r'^\s*\|\s*dBminmax-min=(-?[\d.]+)dB,max=(-?[\d.]+)dB')
+
+    def __init__(self, card=None, timeout=TIMEOUT):
+        """
+        Constructor
+
+        Args:
+            card (int): card number (None for default card)
+            timeout (float): amixer timeout in seconds
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.card = card
+        self.timeout = timeout
+        self.__lock = threading.Lock()
+        self.__controls = None
+        self.__found = {}
+
+    def invalidate(self):
+        """
+        Invalidate index, it will be rebuilt on next lookup
+        """
+        with self.__lock:
+            self.__controls = None
+            self.__found = {}
+
+    def is_built(self):
+        """
+        Return True if index is built
+
+        Returns:
+            bool: True if index is built
+        """
+        return self.__controls is not None
+
+    def get_command(self):
+        """
+        Return amixer command line
+
+        Returns:
+            list: command line arguments
+        """
+        command = [self.AMIXER]
+        if self.card is not None:
+            command += ['-c', str(self.card)]
+        return command + ['contents']
+
+    def __build(self):
+        """
+        Build index if necessary. Must be called with lock acquired
+        """
+        if self.__controls is not None:
+            return
+
+        try:
+            output = subprocess.run(
+                self.get_command(),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=self.timeout,
+                check=True,
+            ).stdout.decode('utf-8', 'ignore')
+        except Exception as error:
+            self.logger.error('Unable to list controls of card "%s": %s' % (self.card, str(error)))
+            return
+
+        self.__controls = self.parse_contents(output)
+        self.__found = {}
+        self.logger.debug('Controls of card "%s": %s' % (self.card, list(self.__controls.keys())))
+
+    def parse_contents(self, output):
+        """
+        Parse "amixer contents" output
+
+        Args:
+            output (string): amixer output
+
+        Returns:
+            OrderedDict: controls indexed by name::
+
+                {
+                    name (string): {
+                        numid (int): control numid
+                        iface (string): control interface
+                        name (string): control name
+                        type (string): control type (INTEGER, BOOLEAN, ENUMERATED...)
+                        min (int): min value (None if not relevant)
+                        max (int): max value (None if not relevant)
+                        step (int): value step (None if not relevant)
+                        values (list): current values
+                        db_min (float): value in dB at min value (None if control has no dB infos)
+                        db_max (float): value in dB at max value (None if control has no dB infos)
+                    },
+                    ...
+                }
+
+        """
+        controls = OrderedDict()
+        control = None
+        for line in output.splitlines():
+            header = self.HEADER_PATTERN.match(line)
+            if header:
+                control = {
+                    'numid': int(header.group(1)),
+                    'iface': header.group(2),
+                    'name': header.group(3),
+                    'type': None,
+                    'min': None,
+                    'max': None,
+                    'step': None,
+                    'values': [],
+                    'db_min': None,
+                    'db_max': None,
+                }
+                controls[control['name']] = control
+                continue
+            if control is None:
+                continue
+
+            infos = self.INFOS_PATTERN.match(line)
+            values = self.VALUES_PATTERN.match(line)
+            db_scale = self.DB_PATTERN.match(line)
+            db_minmax = self.DB_MINMAX_PATTERN.match(line)
+            if infos:
+                fields = dict(field.split('=', 1) for field in infos.group(1).split(',') if '=' in field)
+                control['type'] = fields.get('type')
+                for key in ('min', 'max', 'step'):
+                    control[key] = int(fields[key]) if key in fields else None
+            elif values:
+                control['values'] = [self.__convert_value(value) for value in values.group(1).split(',')]
+            elif db_scale and control['min'] is not None and control['max'] is not None:
+                db_min, db_step = float(db_scale.group(1)), float(db_scale.group(2))
+                control['db_min'] = db_min
+                control['db_max'] = round(db_min + db_step * (control['max'] - control['min']), 2)
+            elif db_minmax:
+                control['db_min'] = float(db_minmax.group(1))
+                control['db_max'] = float(db_minmax.group(2))
+
+        return controls
+
+    @staticmethod
+    def __convert_value(value):
+        """
+        Convert control value to int if possible
+
+        Args:
+            value (string): value
+
+        Returns:
+            any: converted value
+        """
+        try:
+            return int(value)
+        except ValueError:
+            return value
+
+    def get_controls(self):
+        """
+        Return all controls
+
+        Returns:
+            list: list of controls (see parse_contents)
+        """
+        with self.__lock:
+            self.__build()
+            return list(self.__controls.values()) if self.__controls else []
+
+    def get(self, name):
+        """
+        Return control by exact name
+
+        Args:
+            name (string): control name
+
+        Returns:
+            dict: control (see parse_contents) or None if not found
+        """
+        with self.__lock:
+            self.__build()
+            return self.__controls.get(name) if self.__controls else None
+
+    def find(self, pattern):
+        """
+        Return first control which name contains specified pattern
+
+        Args:
+            pattern (string): control name pattern (Route, Volume...)
+
+        Returns:
+            dict: control (see parse_contents) or None if not found
+        """
+        with self.__lock:
+            if pattern in self.__found:
+                return self.__found[pattern]
+
+            self.__build()
+            if self.__controls is None:
+                return None
+            control = self.__controls.get(pattern)
+            if control is None:
+                control = next((control for name, control in self.__controls.items() if pattern in name), None)
+            self.__found[pattern] = control
+
+            return control
+
+    def get_numid(self, pattern):
+        """
+        Return numid of first control which name contains specified pattern
+
+        Args:
+            pattern (string): control name pattern
+
+        Returns:
+            int: control numid or None if not found
+        """
+        control = self.find(pattern)
+        return control['numid'] if control else None
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from .fileutils import read_file
+
+__all__ = ['DeviceSwitch']
+
+
+class DeviceSwitch():
+    """
+    Audio device switch transaction
+
+    Devices state (old driver installation, asound.conf content and mixer volumes) is captured
+    once before switching. Each applied step registers its undo operation, so a failure only
+    reverts what was actually changed. asound.conf and volumes are then restored from snapshot
+    instead of probing devices again.
+    """
+
+    ASOUND_CONF = '/etc/asound.conf'
+
+    def __init__(self, old_driver, new_driver, cleep_filesystem, volumes=None, asound_conf=ASOUND_CONF):
+        """
+        Constructor
+
+        Args:
+            old_driver (AudioDriver): currently selected driver (None if no driver selected)
+            new_driver (AudioDriver): driver to select
+            cleep_filesystem (CleepFilesystem): filesystem instance
+            volumes (dict): current volumes ({playback, capture}) if known, None otherwise
+            asound_conf (string): alsa configuration file path
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.old_driver = old_driver
+        self.new_driver = new_driver
+        self.cleep_filesystem = cleep_filesystem
+        self.volumes = volumes
+        self.asound_conf = asound_conf
+        self.duration = None
+        self.rolled_back = False
+        self.__snapshot = None
+
+    def snapshot(self):
+        """
+        Capture devices state. Called by execute if not done before
+
+        Returns:
+            dict: captured state::
+
+                {
+                    old_installed (bool): True if old driver is installed
+                    asound_conf (string): asound.conf content (None if file does not exist)
+                    volumes (dict): volumes (None if unknown)
+                }
+
+        """
+        self.__snapshot = {
+            'old_installed': bool(self.old_driver and self.old_driver.is_installed()),
+            'asound_conf': read_file(self.cleep_filesystem, self.asound_conf, self.logger),
+            'volumes': dict(self.volumes) if self.volumes else None,
+        }
+        self.logger.debug('Device switch snapshot: %s' % self.__snapshot)
+
+        return self.__snapshot
+
+    def execute(self, commit=None):
+        """
+        Switch devices: disable old driver, enable new one and commit. Applied steps are rolled back
+        if a step fails
+
+        Args:
+            commit (function): function called once new driver is enabled (to save config). Returning
+                               False or raising an exception rolls back switch
+
+        Returns:
+            float: switch duration in milliseconds
+
+        Raises:
+            Exception: if switch failed (changes are rolled back)
+        """
+        start = time.monotonic()
+        if self.__snapshot is None:
+            self.snapshot()
+
+        undos = []
+        try:
+            if self.__snapshot['old_installed']:
+                disabled = self.old_driver.disable()
+                self.logger.debug('Disable previous driver "%s": %s' % (self.old_driver.name, disabled))
+                if not disabled:
+                    raise Exception('Unable to disable current device')
+                undos.append(self.old_driver.enable)
+
+            self.logger.debug('Enable new driver "%s"' % self.new_driver.name)
+            if not self.new_driver.enable():
+                raise Exception('Unable to enable selected device')
+            undos.append(self.new_driver.disable)
+            if not self.new_driver.is_card_enabled():
+                raise Exception('Unable to enable selected device')
+
+            if commit and commit() is False:
+                raise Exception('Unable to save selected device')
+        except Exception:
+            self.rollback(undos)
+            raise
+        finally:
+            self.duration = round((time.monotonic() - start) * 1000.0, 1)
+            self.logger.debug('Device switch took %sms (rolled back: %s)' % (self.duration, self.rolled_back))
+
+        return self.duration
+
+    def rollback(self, undos):
+        """
+        Revert applied steps and restore captured state
+
+        Args:
+            undos (list): undo functions of applied steps (in applied order)
+        """
+        self.logger.info('Device switch failed, restore previous device')
+        self.rolled_back = True
+        for undo in reversed(undos):
+            try:
+                undo()
+            except Exception:
+                self.logger.exception('Error during device switch rollback')
+
+        self._restore_asound_conf()
+        self._restore_volumes()
+
+    def _restore_asound_conf(self):
+        """
+        Restore asound.conf content from snapshot. File is written only if it changed
+        """
+        content = self.__snapshot['asound_conf']
+        if read_file(self.cleep_filesystem, self.asound_conf, self.logger) == content:
+            return
+
+        self.logger.debug('Restore "%s" content' % self.asound_conf)
+        try:
+            if content is None:
+                self.cleep_filesystem.rm(self.asound_conf)
+            else:
+                fd = self.cleep_filesystem.open(self.asound_conf, 'w')
+                fd.write(content)
+                self.cleep_filesystem.close(fd)
+        except Exception:
+            self.logger.exception('Unable to restore "%s"' % self.asound_conf)
+
+    def _restore_volumes(self):
+        """
+        Restore old driver volumes from snapshot (if known)
+        """
+        volumes = self.__snapshot['volumes']
+        if not self.old_driver or not volumes or all(value is None for value in volumes.values()):
+            return
+
+        try:
+            self.old_driver.set_volumes(playback=volumes.get('playback'), capture=volumes.get('capture'))
+        except Exception:
+            self.logger.exception('Unable to restore volumes')
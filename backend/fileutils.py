@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+__all__ = ['read_file']
+
+
+def read_file(cleep_filesystem, path, logger):
+    """
+    Read text file content
+
+    Args:
+        cleep_filesystem (CleepFilesystem): filesystem instance
+        path (string): file path
+        logger (Logger): logger used to report read errors
+
+    Returns:
+        string: file content or None if file does not exist or can't be read
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        fd = cleep_filesystem.open(path, 'r')
+        content = fd.read()
+        cleep_filesystem.close(fd)
+    except Exception:
+        logger.exception('Unable to read file "%s"' % path)
+        return None
+
+    return content if isinstance(content, str) else None
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import re
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+__all__ = ['HotplugWatcher']
+
+
+class HotplugWatcher():
+    """
+    Sound card hotplug watcher. It watches /dev/snd with inotify (no polling) and reports
+    added and removed cards through a callback.
+
+    Note:
+        /proc/asound is a procfs directory that does not emit inotify events, card control device
+        nodes /dev/snd/controlCX are watched instead (one per card).
+    """
+
+    DEV_SND = '/dev/snd'
+    CONTROL_PATTERN = re.compile(r'^controlC(\d+)$')
+
+    ACTION_ADDED = 'added'
+    ACTION_REMOVED = 'removed'
+
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0x00000800
+    IN_CLOEXEC = 0x00080000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, callback, path=DEV_SND):
+        """
+        Constructor
+
+        Args:
+            callback (callable): function called on card change: callback(action, cardid)
+                                 with action ACTION_ADDED or ACTION_REMOVED and cardid the card number
+            path (string): watched directory
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.callback = callback
+        self.path = path
+        self.__thread = None
+        self.__inotify_fd = None
+        self.__stop_pipe = None
+
+    def is_running(self):
+        """
+        Return True if watcher is running
+
+        Returns:
+            bool: True if running
+        """
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        """
+        Start watching
+
+        Returns:
+            bool: True if watcher started, False if inotify is not available
+        """
+        if self.is_running():
+            return True
+
+        try:
+            self.__inotify_fd = self.__init_inotify()
+        except Exception as error:
+            self.logger.warning('Sound card hotplug detection is disabled: %s' % str(error))
+            return False
+
+        self.__stop_pipe = os.pipe()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+        return True
+
+    def stop(self):
+        """
+        Stop watching
+        """
+        if not self.is_running():
+            return
+
+        os.write(self.__stop_pipe[1], b'x')
+        self.__thread.join()
+        self.__thread = None
+
+    def __init_inotify(self):
+        """
+        Create inotify instance watching card control nodes
+
+        Returns:
+            int: inotify file descriptor
+
+        Raises:
+            OSError: if inotify is not available
+        """
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        inotify_fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if inotify_fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(inotify_fd, self.path.encode('utf-8'), self.IN_CREATE | self.IN_DELETE) < 0:
+            error = ctypes.get_errno()
+            os.close(inotify_fd)
+            raise OSError(error, 'Unable to watch "%s"' % self.path)
+
+        return inotify_fd
+
+    def parse_events(self, data):
+        """
+        Parse inotify events buffer
+
+        Args:
+            data (bytes): inotify read buffer
+
+        Returns:
+            list: list of (action, cardid) tuples
+        """
+        changes = []
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'ignore')
+            offset += length
+
+            matches = self.CONTROL_PATTERN.match(name)
+            if not matches:
+                continue
+            action = self.ACTION_ADDED if mask & self.IN_CREATE else self.ACTION_REMOVED
+            changes.append((action, int(matches.group(1))))
+
+        return changes
+
+    def __run(self):
+        """
+        Watcher thread
+        """
+        self.logger.debug('Sound card hotplug watcher started on "%s"' % self.path)
+        try:
+            while True:
+                readables, _, _ = select.select([self.__inotify_fd, self.__stop_pipe[0]], [], [])
+                if self.__stop_pipe[0] in readables:
+                    break
+
+                try:
+                    data = os.read(self.__inotify_fd, 4096)
+                except BlockingIOError:
+                    continue
+
+                for action, cardid in self.parse_events(data):
+                    self.logger.debug('Sound card %s %s' % (cardid, action))
+                    try:
+                        self.callback(action, cardid)
+                    except Exception:
+                        self.logger.exception('Error in hotplug callback')
+        finally:
+            os.close(self.__inotify_fd)
+            os.close(self.__stop_pipe[0])
+            os.close(self.__stop_pipe[1])
+            self.logger.debug('Sound card hotplug watcher stopped')
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__all__ = ['InstrumentedProxy']
+
+
+class InstrumentedProxy():
+    """
+    Proxy that records calls of wrapped object public methods into CommandStats.
+    Operations are named "<prefix>.<method name>", non callable attributes are returned as is.
+    """
+
+    def __init__(self, target, stats, prefix):
+        """
+        Constructor
+
+        Args:
+            target (any): proxied object
+            stats (CommandStats): stats collector
+            prefix (string): operations name prefix
+        """
+        self._target = target
+        self._stats = stats
+        self._prefix = prefix
+        self._wrappers = {}
+
+    def __getattr__(self, name):
+        """
+        Return target attribute, public methods are wrapped to be measured
+
+        Args:
+            name (string): attribute name
+
+        Returns:
+            any: attribute value
+        """
+        value = getattr(self._target, name)
+        if name.startswith('_') or not callable(value):
+            return value
+
+        wrapper = self._wrappers.get(name)
+        if wrapper is None:
+            wrapper = self._stats.wrap(value, '%s.%s' % (self._prefix, name))
+            self._wrappers[name] = wrapper
+        return wrapper
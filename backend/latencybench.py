@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+import statistics
+import threading
+import time
+import wave
+from .rawpcm import RawPcm
+
+__all__ = ['LatencyBench']
+
+
+class LatencyBench():
+    """
+    Audio round-trip latency benchmark. A linear chirp is played while capture device is recording,
+    chirp position in captured signal is found with FFT cross-correlation.
+
+    Playback and capture run in separate aplay/arecord processes, so chirp position in captured signal
+    also contains the time between both processes opening their device, which is not known from
+    python side (measured process launch times are only an approximation). This bias is calibrated
+    by running same measure on a reference loopback (snd-aloop) that returns signal immediately:
+    reference median latency is subtracted from card measures. Remaining bias is the loopback
+    period (a few milliseconds) and the difference of device opening times between card and
+    loopback. Without reference, stats are flagged as not calibrated and include the bias.
+
+    Measured latency includes ALSA buffering and card latency, so it is relevant to compare cards
+    and asound.conf settings.
+
+    Note:
+        NumPy is imported on first use, it is not needed by the rest of the module.
+    """
+
+    RATE = 44100
+    CHIRP_DURATION = 0.1
+    CHIRP_FREQUENCIES = (200.0, 8000.0)
+    CHIRP_AMPLITUDE = 0.5
+    PREROLL = 0.2
+    MAX_LATENCY = 0.5
+    MIN_CONFIDENCE = 0.2
+
+    CALIBRATION_RUNS = 3
+
+    def __init__(self, rate=RATE, playback_device=None, capture_device=None, reference_devices=None):
+        """
+        Constructor
+
+        Args:
+            rate (int): sample rate used for playback and capture
+            playback_device (string): alsa playback device (None for default one)
+            capture_device (string): alsa capture device (None for default one)
+            reference_devices (tuple): alsa (playback, capture) devices of reference loopback used
+                                       to calibrate measures (None to disable calibration)
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.rate = rate
+        self.playback_pcm = RawPcm(rate=rate, channels=1, sample_format=RawPcm.FORMAT_S16LE, device=playback_device)
+        self.capture_pcm = RawPcm(rate=rate, channels=1, sample_format=RawPcm.FORMAT_S16LE, device=capture_device)
+        self.reference_pcms = None
+        if reference_devices:
+            self.reference_pcms = tuple(
+                RawPcm(rate=rate, channels=1, sample_format=RawPcm.FORMAT_S16LE, device=device) for device in reference_devices
+            )
+        self.__numpy = None
+
+    def __get_numpy(self):
+        """
+        Return numpy module, imported on first use
+
+        Returns:
+            module: numpy module
+
+        Raises:
+            ImportError: if numpy is not installed
+        """
+        if self.__numpy is None:
+            import numpy
+            self.__numpy = numpy
+        return self.__numpy
+
+    def generate_chirp(self):
+        """
+        Generate linear chirp reference signal. Signal edges are faded to avoid clicks
+
+        Returns:
+            numpy.ndarray: int16 samples
+        """
+        numpy = self.__get_numpy()
+        count = int(self.rate * self.CHIRP_DURATION)
+        times = numpy.arange(count) / float(self.rate)
+        start, end = self.CHIRP_FREQUENCIES
+        phase = 2.0 * math.pi * (start * times + (end - start) / (2.0 * self.CHIRP_DURATION) * times * times)
+        signal = numpy.sin(phase) * numpy.hanning(count) * self.CHIRP_AMPLITUDE
+
+        return (signal * 32767.0).astype('<i2')
+
+    def estimate_delay(self, reference, captured):
+        """
+        Find reference signal position in captured signal using FFT cross-correlation
+
+        Args:
+            reference (numpy.ndarray): reference samples
+            captured (numpy.ndarray): captured samples
+
+        Returns:
+            tuple: delay infos::
+
+                (
+                    int: delay in samples,
+                    float: confidence (normalized correlation, 0..1)
+                )
+
+        """
+        numpy = self.__get_numpy()
+        reference = numpy.asarray(reference, dtype=numpy.float64)
+        captured = numpy.asarray(captured, dtype=numpy.float64)
+        if len(captured) < len(reference) or not reference.any():
+            return 0, 0.0
+
+        size = 1 << int(math.ceil(math.log2(len(captured) + len(reference))))
+        spectrum = numpy.fft.rfft(captured, size) * numpy.conj(numpy.fft.rfft(reference, size))
+        correlation = numpy.fft.irfft(spectrum, size)[:len(captured) - len(reference) + 1]
+        delay = int(numpy.argmax(numpy.abs(correlation)))
+
+        window = captured[delay:delay + len(reference)]
+        norm = numpy.linalg.norm(reference) * numpy.linalg.norm(window)
+        confidence = float(abs(correlation[delay]) / norm) if norm else 0.0
+
+        return delay, confidence
+
+    def load_wav(self, path):
+        """
+        Load 16 bits wav file samples (first channel only)
+
+        Args:
+            path (string): wav file path
+
+        Returns:
+            tuple: wav infos::
+
+                (
+                    numpy.ndarray: int16 samples,
+                    int: sample rate
+                )
+
+        Raises:
+            ValueError: if wav file is not 16 bits
+        """
+        numpy = self.__get_numpy()
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError('Only 16 bits wav files are supported')
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+
+        return numpy.frombuffer(frames, dtype='<i2')[::channels], rate
+
+    def measure(self, playback_pcm=None, capture_pcm=None):
+        """
+        Perform single latency measure. Measure is not calibrated
+
+        Args:
+            playback_pcm (RawPcm): playback pcm (default to benchmarked playback device)
+            capture_pcm (RawPcm): capture pcm (default to benchmarked capture device)
+
+        Returns:
+            tuple: measure infos::
+
+                (
+                    float: latency in seconds (None if chirp was not detected),
+                    float: detection confidence
+                )
+
+        Raises:
+            Exception: if playback or capture failed
+        """
+        numpy = self.__get_numpy()
+        playback_pcm = playback_pcm or self.playback_pcm
+        capture_pcm = capture_pcm or self.capture_pcm
+        chirp = self.generate_chirp()
+        capture = {'data': None, 'error': None}
+
+        def record():
+            try:
+                capture['data'] = capture_pcm.record(self.PREROLL + self.CHIRP_DURATION + self.MAX_LATENCY)
+            except Exception as error:
+                capture['error'] = error
+
+        capture_start = time.monotonic()
+        thread = threading.Thread(target=record, daemon=True)
+        thread.start()
+        time.sleep(self.PREROLL)
+        playback_start = time.monotonic()
+        played = playback_pcm.play(chirp.tobytes())
+        thread.join()
+
+        if capture['error']:
+            raise capture['error']
+        if not played:
+            raise Exception('Unable to play reference signal')
+
+        captured = numpy.frombuffer(capture['data'], dtype='<i2')
+        delay, confidence = self.estimate_delay(chirp, captured)
+        if confidence < self.MIN_CONFIDENCE:
+            return None, confidence
+
+        return delay / float(self.rate) - (playback_start - capture_start), confidence
+
+    def calibrate(self, runs=CALIBRATION_RUNS):
+        """
+        Measure bias on reference loopback
+
+        Args:
+            runs (int): number of reference measures
+
+        Returns:
+            float: bias in seconds (median of reference measures) or None if no reference measure succeeded
+        """
+        latencies = []
+        for run in range(runs):
+            try:
+                latency, confidence = self.measure(*self.reference_pcms)
+            except Exception as error:
+                self.logger.warning('Reference measure #%d failed: %s' % (run, str(error)))
+                continue
+            self.logger.debug('Reference measure #%d: latency=%s confidence=%.2f' % (run, latency, confidence))
+            if latency is not None:
+                latencies.append(latency)
+
+        return statistics.median(latencies) if latencies else None
+
+    def run(self, runs=5):
+        """
+        Run benchmark. Measures are calibrated first if reference loopback is configured
+
+        Args:
+            runs (int): number of measures
+
+        Returns:
+            dict: benchmark stats (see compute_stats) with calibration infos::
+
+                {
+                    ...
+                    calibrated (bool): True if bias was measured on reference loopback and removed
+                    bias (float): removed bias in milliseconds (None if not calibrated)
+                }
+
+        Raises:
+            ImportError: if numpy is not installed
+        """
+        self.__get_numpy()
+        bias = self.calibrate() if self.reference_pcms else None
+        if self.reference_pcms and bias is None:
+            self.logger.warning('Latency calibration failed, measures include processes start bias')
+
+        latencies = []
+        confidences = []
+        for run in range(runs):
+            try:
+                latency, confidence = self.measure()
+            except Exception as error:
+                self.logger.warning('Latency measure #%d failed: %s' % (run, str(error)))
+                continue
+            self.logger.debug('Latency measure #%d: latency=%s confidence=%.2f' % (run, latency, confidence))
+            if latency is not None:
+                latencies.append(latency - bias if bias is not None else latency)
+                confidences.append(confidence)
+
+        stats = self.compute_stats(latencies, confidences, runs)
+        stats['calibrated'] = bias is not None
+        stats['bias'] = round(bias * 1000.0, 2) if bias is not None else None
+
+        return stats
+
+    @staticmethod
+    def compute_stats(latencies, confidences, runs):
+        """
+        Compute benchmark stats
+
+        Args:
+            latencies (list): measured latencies in seconds
+            confidences (list): measures detection confidences
+            runs (int): number of measures performed
+
+        Returns:
+            dict: benchmark stats::
+
+                {
+                    runs (int): number of measures performed
+                    failed (int): number of failed measures
+                    latencies (list): measured latencies in milliseconds
+                    min (float): min latency in milliseconds (None if no measure)
+                    max (float): max latency in milliseconds (None if no measure)
+                    mean (float): mean latency in milliseconds (None if no measure)
+                    median (float): median latency in milliseconds (None if no measure)
+                    jitter (float): latency standard deviation in milliseconds (None if no measure)
+                    confidence (float): mean detection confidence (None if no measure)
+                }
+
+        """
+        values = [round(latency * 1000.0, 2) for latency in latencies]
+        return {
+            'runs': runs,
+            'failed': runs - len(values),
+            'latencies': values,
+            'min': min(values) if values else None,
+            'max': max(values) if values else None,
+            'mean': round(statistics.mean(values), 2) if values else None,
+            'median': round(statistics.median(values), 2) if values else None,
+            'jitter': round(statistics.pstdev(values), 2) if values else None,
+            'confidence': round(statistics.mean(confidences), 2) if confidences else None,
+        }
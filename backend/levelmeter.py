@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+import subprocess
+import threading
+import time
+from .rawpcm import RawPcm
+
+__all__ = ['LevelMeter']
+
+
+class LevelMeter():
+    """
+    Capture level meter. It opens capture device once (or reads shared capture stream) and computes
+    RMS and peak levels (dBFS) of each captured block with vectorized NumPy operations. Levels are
+    aggregated and published at a limited rate through a callback.
+
+    Note:
+        NumPy is imported when meter is started, it is not needed by the rest of the module.
+    """
+
+    MIN_LEVEL = -120.0
+
+    def __init__(self, callback, rate=16000, channels=1, block_duration=0.025, publish_rate=10.0, device=None, stream=None):
+        """
+        Constructor
+
+        Args:
+            callback (callable): function called with levels: callback({'rms': float, 'peak': float})
+            rate (int): capture sample rate
+            channels (int): capture channels count
+            block_duration (float): duration of a processed block in seconds
+            publish_rate (float): max number of levels published per second
+            device (string): alsa capture device (None for default one)
+            stream (CaptureStream): shared capture stream to read (S16_LE format). If specified, capture
+                                    format is stream one and no capture process is launched by meter
+        """
+        if stream:
+            rate = stream.pcm.rate
+            channels = stream.pcm.channels
+            device = stream.pcm.device
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.callback = callback
+        self.pcm = RawPcm(rate=rate, channels=channels, sample_format=RawPcm.FORMAT_S16LE, device=device)
+        self.block_size = int(rate * block_duration) * self.pcm.frame_size
+        self.publish_interval = 1.0 / publish_rate
+        self.stream = stream
+        self.__process = None
+        self.__consumer = None
+        self.__thread = None
+        self.__numpy = None
+
+    def is_running(self):
+        """
+        Return True if meter is running
+
+        Returns:
+            bool: True if running
+        """
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        """
+        Start meter
+
+        Raises:
+            ImportError: if numpy is not installed
+            OSError: if capture process can't be launched
+        """
+        if self.is_running():
+            return
+
+        self.__get_numpy()
+        if self.stream:
+            self.__consumer = self.stream.open_consumer()
+            blocks = self.__consumer.chunks(self.block_size)
+        else:
+            self.__process = subprocess.Popen(
+                self.pcm.get_command(RawPcm.ARECORD),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            blocks = self.__read_process(self.__process)
+        self.__thread = threading.Thread(target=self.__run, args=(blocks,), daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stop meter
+        """
+        if self.__process:
+            self.__process.terminate()
+            self.__process = None
+        if self.__consumer:
+            self.__consumer.close()
+            self.__consumer = None
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+
+    def __get_numpy(self):
+        """
+        Return numpy module, imported on first use
+
+        Returns:
+            module: numpy module
+
+        Raises:
+            ImportError: if numpy is not installed
+        """
+        if self.__numpy is None:
+            import numpy
+            self.__numpy = numpy
+        return self.__numpy
+
+    def compute_levels(self, data):
+        """
+        Compute block levels
+
+        Args:
+            data (bytes-like): S16_LE PCM block
+
+        Returns:
+            tuple: (mean power, peak) normalized values (0..1)
+        """
+        numpy = self.__get_numpy()
+        samples = numpy.frombuffer(data, dtype='<i2').astype(numpy.float32)
+        if not samples.size:
+            return 0.0, 0.0
+        samples *= 1.0 / 32768.0
+        return float(numpy.dot(samples, samples) / samples.size), float(numpy.max(numpy.abs(samples)))
+
+    def to_dbfs(self, value):
+        """
+        Convert normalized amplitude to dBFS
+
+        Args:
+            value (float): normalized amplitude (0..1)
+
+        Returns:
+            float: dBFS value (MIN_LEVEL for silence)
+        """
+        if value <= 0.0:
+            return self.MIN_LEVEL
+        return max(self.MIN_LEVEL, round(20.0 * math.log10(value), 1))
+
+    def __read_process(self, process):
+        """
+        Read capture process output
+
+        Args:
+            process (Popen): capture process
+
+        Returns:
+            generator: captured blocks (memoryview of a reused buffer)
+        """
+        buffer = bytearray(self.block_size)
+        view = memoryview(buffer)
+        try:
+            while True:
+                count = process.stdout.readinto(view)
+                if not count:
+                    break
+                yield view[:count - count % 2]
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.terminate()
+            process.wait()
+
+    def __run(self, blocks):
+        """
+        Meter thread: read capture blocks, aggregate levels and publish them
+
+        Args:
+            blocks (iterable): captured blocks
+        """
+        power_sum = 0.0
+        count = 0
+        peak = 0.0
+        last_publish = time.monotonic()
+        try:
+            for block in blocks:
+                block_power, block_peak = self.compute_levels(block)
+                power_sum += block_power
+                count += 1
+                peak = max(peak, block_peak)
+
+                now = time.monotonic()
+                if now - last_publish >= self.publish_interval:
+                    self.__publish(power_sum / count, peak)
+                    power_sum, count, peak = 0.0, 0, 0.0
+                    last_publish = now
+        except Exception:
+            self.logger.exception('Level meter error')
+        finally:
+            blocks.close()
+            self.logger.debug('Level meter stopped')
+
+    def __publish(self, power, peak):
+        """
+        Publish levels
+
+        Args:
+            power (float): mean power
+            peak (float): peak amplitude
+        """
+        try:
+            self.callback({
+                'rms': self.to_dbfs(math.sqrt(power)),
+                'peak': self.to_dbfs(peak),
+            })
+        except Exception:
+            self.logger.exception('Error in level meter callback')
@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import array
+import heapq
+import itertools
+import logging
+import operator
+import subprocess
+import sys
+import threading
+import time
+from .rawpcm import RawPcm
+
+__all__ = ['PlaybackService']
+
+
+class PlaybackService():
+    """
+    Shared playback stream. A single aplay process is fed with PCM periods mixed in software, so
+    sounds played while stream is opened start within few milliseconds and overlapping sounds are
+    played together instead of waiting for each other.
+
+    Played sounds are mixed immediately with other sounds. Queued sounds are played one after
+    another (highest priority first) and mixed with played sounds. Once there is nothing left to
+    play, silence is written during IDLE_TIMEOUT seconds so a burst of sounds reuses the stream,
+    then stream is closed and reopened on next sound, so device is not held while idle.
+
+    Note:
+        Writer keeps at most LEAD seconds of audio ahead of real time, so a new sound is heard
+        after LEAD + BUFFER_TIME seconds at worst (pipe and aplay buffers are kept almost empty).
+        Mixing is vectorized with numpy when installed (it is usually already imported by sound
+        assets conversion), standard library array is used otherwise.
+    """
+
+    PERIOD = 0.01
+    LEAD = 0.02
+    BUFFER_TIME = 0.02
+    IDLE_TIMEOUT = 1.0
+    MAX_VOICES = 4
+    PRIORITY_LOW = -10
+    PRIORITY_NORMAL = 0
+    PRIORITY_HIGH = 10
+    SAMPLE_TYPECODES = {
+        2: 'h',
+        4: 'i',
+    }
+    SAMPLE_DTYPES = {
+        2: '<i2',
+        4: '<i4',
+    }
+    _numpy = None
+
+    def __init__(self, rate=44100, channels=2, sample_format=RawPcm.FORMAT_S16LE, device=None,
+                 period=PERIOD, lead=LEAD, max_voices=MAX_VOICES, idle_timeout=IDLE_TIMEOUT, open_callback=None,
+                 close_callback=None):
+        """
+        Constructor
+
+        Args:
+            rate (int): stream sample rate
+            channels (int): stream channels count
+            sample_format (string): stream sample format (S16_LE or S32_LE, U8 is mixed as S16_LE)
+            device (string): alsa pcm device (None for default one, dmix on most setups)
+            period (float): mixed period duration in seconds
+            lead (float): max audio duration written ahead of real time in seconds
+            max_voices (int): max number of sounds played simultaneously
+            idle_timeout (float): duration stream is kept opened once there is nothing left to play in seconds
+            open_callback (callable): function called (without parameter) before opening stream, without
+                                      service lock held. It returns False if device can't be used (playback
+                                      resource not acquired...)
+            close_callback (callable): function called (without parameter) once stream is closed
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if sample_format == RawPcm.FORMAT_U8:
+            sample_format = RawPcm.FORMAT_S16LE
+        self.pcm = RawPcm(rate=rate, channels=channels, sample_format=sample_format, device=device)
+        self.width = RawPcm.SAMPLE_WIDTHS[sample_format]
+        self.period_size = max(1, int(rate * period)) * self.pcm.frame_size
+        self.lead = lead
+        self.max_voices = max_voices
+        self.idle_timeout = idle_timeout
+        self.open_callback = open_callback
+        self.close_callback = close_callback
+        self.__silence = bytes(self.period_size)
+        self.__lock = threading.Lock()
+        # serializes stream opening, open callback may block
+        self.__open_lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__ids = itertools.count(1)
+        self.__voices = []
+        self.__queue = []
+        self.__queued_voice = None
+        self.__idle_since = None
+        self.__process = None
+        self.__thread = None
+        self.__writer = None
+
+    def get_format(self):
+        """
+        Return stream PCM format
+
+        Returns:
+            dict: stream format::
+
+                {
+                    rate (int): sample rate
+                    channels (int): channels count
+                    sample_format (string): sample format
+                }
+
+        """
+        return {
+            'rate': self.pcm.rate,
+            'channels': self.pcm.channels,
+            'sample_format': self.pcm.sample_format,
+        }
+
+    def is_running(self):
+        """
+        Return True if stream is opened
+
+        Returns:
+            bool: True if stream is opened
+        """
+        return self.__thread is not None
+
+    def get_status(self):
+        """
+        Return service status
+
+        Returns:
+            dict: status::
+
+                {
+                    running (bool): True if stream is opened
+                    playing (int): number of sounds being played
+                    queued (int): number of queued sounds waiting to be played
+                }
+
+        """
+        with self.__lock:
+            return {
+                'running': self.__thread is not None,
+                'playing': len(self.__voices),
+                'queued': len(self.__queue),
+            }
+
+    def play(self, data, priority=PRIORITY_NORMAL):
+        """
+        Play PCM data immediately, mixed with sounds being played. If too many sounds are
+        played, oldest sound with lowest priority is dropped
+
+        Args:
+            data (bytes-like): PCM data with stream format
+            priority (int): sound priority
+
+        Returns:
+            int: sound id
+
+        Raises:
+            OSError: if stream can't be opened
+        """
+        with self.__lock:
+            voice = self.__create_voice(data, priority)
+            self.__voices.append(voice)
+            self.__drop_voices()
+            opened = self.__thread is not None
+        if not opened:
+            self.__start()
+
+        return voice['id']
+
+    def queue(self, data, priority=PRIORITY_NORMAL):
+        """
+        Queue PCM data. Queued sounds are played one after another, highest priority first
+
+        Args:
+            data (bytes-like): PCM data with stream format
+            priority (int): sound priority
+
+        Returns:
+            int: sound id
+
+        Raises:
+            OSError: if stream can't be opened
+        """
+        with self.__lock:
+            voice = self.__create_voice(data, priority)
+            heapq.heappush(self.__queue, (-priority, voice['id'], voice))
+            opened = self.__thread is not None
+        if not opened:
+            self.__start()
+
+        return voice['id']
+
+    def stop(self):
+        """
+        Stop playing and close stream. Playing and queued sounds are dropped
+        """
+        with self.__lock:
+            writer = self.__writer
+            self.__stop_event.set()
+        if writer and writer is not threading.current_thread():
+            writer.join()
+
+        with self.__lock:
+            self.__voices = []
+            self.__queue = []
+            self.__queued_voice = None
+
+    def __create_voice(self, data, priority):
+        """
+        Create voice. Must be called with lock acquired
+
+        Args:
+            data (bytes-like): PCM data
+            priority (int): sound priority
+
+        Returns:
+            dict: voice
+        """
+        return {
+            'id': next(self.__ids),
+            'data': memoryview(data).cast('B'),
+            'offset': 0,
+            'priority': priority,
+        }
+
+    def __drop_voices(self):
+        """
+        Drop voices exceeding max voices count. Must be called with lock acquired
+        """
+        while len(self.__voices) > self.max_voices:
+            voice = min(self.__voices, key=lambda voice: voice['priority'])
+            self.__voices.remove(voice)
+            self.logger.debug('Too many sounds played, sound %s dropped' % voice['id'])
+
+    def __start(self):
+        """
+        Open stream if necessary. Must be called without lock acquired: open callback may block while
+        status is requested or other sounds are added
+
+        Raises:
+            OSError: if aplay can't be launched or device can't be used
+        """
+        with self.__open_lock:
+            with self.__lock:
+                if self.__thread is not None:
+                    return
+                writer = self.__writer
+
+            # previous stream may still be draining, never open device twice
+            if writer is not None and writer is not threading.current_thread():
+                writer.join()
+
+            if self.open_callback and not self.open_callback():
+                with self.__lock:
+                    self.__voices = []
+                    self.__queue = []
+                raise OSError('Playback device is busy')
+
+            # import mixing library now rather than in writer while sounds are played
+            self.get_numpy()
+            buffer_time = int(max(self.BUFFER_TIME, self.lead) * 1000000)
+            try:
+                process = subprocess.Popen(
+                    self.pcm.get_command(RawPcm.APLAY, ['--buffer-time=%d' % buffer_time]),
+                    stdin=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+            except Exception:
+                with self.__lock:
+                    self.__voices = []
+                    self.__queue = []
+                if self.close_callback:
+                    self.close_callback()
+                raise
+            with self.__lock:
+                self.__stop_event.clear()
+                self.__idle_since = None
+                self.__process = process
+                self.__thread = threading.Thread(target=self._run, args=(process,), daemon=True)
+                self.__writer = self.__thread
+                self.__thread.start()
+        self.logger.debug('Playback stream opened')
+
+    def _run(self, process):
+        """
+        Writer thread: mix periods and write them to aplay at real time pace
+
+        Args:
+            process (Popen): aplay process
+        """
+        start = time.monotonic()
+        written = 0.0
+        period_duration = self.period_size / float(self.pcm.rate * self.pcm.frame_size)
+        detached = False
+        try:
+            while not self.__stop_event.is_set():
+                chunk = self._next_chunk()
+                if chunk is None:
+                    self.logger.debug('Nothing left to play')
+                    detached = True
+                    break
+
+                process.stdin.write(chunk)
+                process.stdin.flush()
+                written += period_duration
+
+                ahead = written - (time.monotonic() - start)
+                if ahead > self.lead:
+                    self.__stop_event.wait(ahead - self.lead)
+        except (BrokenPipeError, ValueError, OSError) as error:
+            self.logger.error('Playback stream closed unexpectedly: %s' % str(error))
+        finally:
+            # detached stream is already released, lock may be held by a new stream waiting for this one
+            if not detached:
+                with self.__lock:
+                    if self.__process is process:
+                        self.__process = None
+                        self.__thread = None
+            try:
+                process.stdin.close()
+            except Exception:
+                pass
+            # detached aplay exits once buffered periods are played
+            if not detached and process.poll() is None:
+                process.terminate()
+            process.wait()
+            self.logger.debug('Playback stream closed')
+            if self.close_callback:
+                try:
+                    self.close_callback()
+                except Exception:
+                    self.logger.exception('Error in playback stream close callback')
+
+    def _next_chunk(self):
+        """
+        Return next mixed period
+
+        Returns:
+            bytes: mixed period or None if there is nothing left to play
+        """
+        with self.__lock:
+            if self.__queued_voice is None and self.__queue:
+                self.__queued_voice = heapq.heappop(self.__queue)[2]
+
+            voices = sorted(self.__voices, key=lambda voice: -voice['priority'])
+            if self.__queued_voice:
+                voices.append(self.__queued_voice)
+            if not voices:
+                now = time.monotonic()
+                if self.__idle_since is None:
+                    self.__idle_since = now
+                if now - self.__idle_since < self.idle_timeout:
+                    return self.__silence
+                # detach stream now so a sound played meanwhile opens a new one
+                self.__process = None
+                self.__thread = None
+                return None
+            self.__idle_since = None
+
+            chunks = []
+            for voice in voices:
+                chunk = voice['data'][voice['offset']:voice['offset'] + self.period_size]
+                voice['offset'] += len(chunk)
+                if len(chunk) < self.period_size:
+                    chunk = bytes(chunk) + bytes(self.period_size - len(chunk))
+                chunks.append(chunk)
+
+            self.__voices = [voice for voice in self.__voices if voice['offset'] < len(voice['data'])]
+            if self.__queued_voice and self.__queued_voice['offset'] >= len(self.__queued_voice['data']):
+                self.__queued_voice = None
+
+        return self.mix(chunks, self.width)
+
+    @classmethod
+    def get_numpy(cls):
+        """
+        Return numpy module, imported on first use
+
+        Returns:
+            module: numpy module or None if numpy is not installed
+        """
+        if cls._numpy is None:
+            try:
+                # deferred import: not needed during module startup
+                import numpy
+                cls._numpy = numpy
+            except ImportError:
+                cls._numpy = False
+        return cls._numpy or None
+
+    @classmethod
+    def mix(cls, chunks, width):
+        """
+        Mix PCM chunks of same size. Samples are added then saturated
+
+        Args:
+            chunks (list): little endian PCM chunks
+            width (int): sample width in bytes (2 or 4)
+
+        Returns:
+            bytes: mixed chunk
+        """
+        if len(chunks) == 1:
+            return bytes(chunks[0])
+
+        high = (1 << (8 * width - 1)) - 1
+        low = -high - 1
+        numpy = cls.get_numpy()
+        if numpy is not None:
+            dtype = cls.SAMPLE_DTYPES[width]
+            mixed = numpy.frombuffer(chunks[0], dtype=dtype).astype(numpy.int64)
+            for chunk in chunks[1:]:
+                mixed += numpy.frombuffer(chunk, dtype=dtype)
+            return numpy.clip(mixed, low, high).astype(dtype).tobytes()
+
+        typecode = cls.SAMPLE_TYPECODES[width]
+        voices = []
+        for chunk in chunks:
+            samples = array.array(typecode, bytes(chunk))
+            if sys.byteorder == 'big': # pragma: no cover
+                samples.byteswap()
+            voices.append(samples)
+
+        # voices are summed pairwise without python loop, saturation is only applied when needed
+        sums = voices[0]
+        for samples in voices[1:]:
+            sums = list(map(operator.add, sums, samples))
+        if max(sums) > high or min(sums) < low:
+            count = len(sums)
+            sums = list(map(min, itertools.repeat(high, count), map(max, itertools.repeat(low, count), sums)))
+        mixed = array.array(typecode, sums)
+        if sys.byteorder == 'big': # pragma: no cover
+            mixed.byteswap()
+
+        return mixed.tobytes()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import subprocess
+import threading
+
+__all__ = ['RawPcm']
+
+
+class RawPcm():
+    """
+    Raw PCM capture and playback through arecord/aplay pipes. Audio data stays in memory,
+    nothing is written on filesystem.
+    """
+
+    FORMAT_S16LE = 'S16_LE'
+    FORMAT_S32LE = 'S32_LE'
+    FORMAT_U8 = 'U8'
+    SAMPLE_WIDTHS = {
+        FORMAT_U8: 1,
+        FORMAT_S16LE: 2,
+        FORMAT_S32LE: 4,
+    }
+
+    ARECORD = 'arecord'
+    APLAY = 'aplay'
+
+    def __init__(self, rate=22050, channels=1, sample_format=FORMAT_S16LE, device=None):
+        """
+        Constructor
+
+        Args:
+            rate (int): sample rate
+            channels (int): number of channels
+            sample_format (string): sample format (FORMAT_XXX)
+            device (string): alsa pcm device (None for default one)
+        """
+        if sample_format not in self.SAMPLE_WIDTHS:
+            raise ValueError('Unsupported sample format "%s"' % sample_format)
+
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.rate = rate
+        self.channels = channels
+        self.sample_format = sample_format
+        self.device = device
+
+    @property
+    def frame_size(self):
+        """
+        Return size of a frame in bytes
+
+        Returns:
+            int: frame size
+        """
+        return self.SAMPLE_WIDTHS[self.sample_format] * self.channels
+
+    def get_command(self, binary, extra_args=None):
+        """
+        Return aplay/arecord command line for raw stream with configured format
+
+        Args:
+            binary (string): ARECORD or APLAY
+            extra_args (list): additional command arguments
+
+        Returns:
+            list: command arguments
+        """
+        command = [
+            binary, '-q', '-t', 'raw',
+            '-f', self.sample_format,
+            '-r', str(self.rate),
+            '-c', str(self.channels),
+        ]
+        if self.device:
+            command += ['-D', self.device]
+        return command + (extra_args or [])
+
+    def record(self, duration, timeout=None):
+        """
+        Record sound into memory
+
+        Args:
+            duration (float): recording duration in seconds
+            timeout (float): max time to wait for recording (default duration + 2 seconds)
+
+        Returns:
+            memoryview: recorded PCM data (may be shorter than expected if capture stopped early)
+
+        Raises:
+            OSError: if capture process can't be launched
+        """
+        frames = int(self.rate * duration)
+        buffer = bytearray(frames * self.frame_size)
+        view = memoryview(buffer)
+
+        process = subprocess.Popen(
+            self.get_command(self.ARECORD, ['-s', str(frames)]),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        watchdog = threading.Timer(timeout or duration + 2.0, process.kill)
+        watchdog.start()
+        received = 0
+        try:
+            while received < len(buffer):
+                count = process.stdout.readinto(view[received:])
+                if not count:
+                    break
+                received += count
+        finally:
+            watchdog.cancel()
+            process.stdout.close()
+            if process.poll() is None:
+                process.terminate()
+            process.wait()
+
+        self.logger.debug('Recorded %d/%d bytes' % (received, len(buffer)))
+        return view[:received]
+
+    def play(self, data, timeout=None):
+        """
+        Play PCM data from memory
+
+        Args:
+            data (bytes-like): PCM data with configured format
+            timeout (float): max playback duration (default data duration + 2 seconds)
+
+        Returns:
+            bool: True if sound played successfully
+
+        Raises:
+            OSError: if playback process can't be launched
+        """
+        duration = len(data) / float(self.rate * self.frame_size)
+        process = subprocess.Popen(
+            self.get_command(self.APLAY),
+            stdin=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        watchdog = threading.Timer(timeout or duration + 2.0, process.kill)
+        watchdog.start()
+        try:
+            process.stdin.write(data)
+            process.stdin.close()
+            return_code = process.wait()
+        except (BrokenPipeError, ValueError):
+            return_code = process.wait()
+        finally:
+            watchdog.cancel()
+
+        return return_code == 0
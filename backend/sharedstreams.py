@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+from .asoundprofile import AsoundProfile
+from .capturestream import CaptureStream
+from .fileutils import read_file
+from .playbackservice import PlaybackService
+
+__all__ = ['SharedStreams']
+
+
+class SharedStreams():
+    """
+    Shared playback service and capture stream of selected device, created on first use.
+
+    A stream holds its alsa resource (audio.playback or audio.capture) while it is opened, unless
+    device is shared through dmix or dsnoop (asound.conf generated from a latency profile). A
+    resource used by a test job is not requested by streams.
+    """
+
+    PLAYBACK_RESOURCE = 'audio.playback'
+    CAPTURE_RESOURCE = 'audio.capture'
+    RESOURCE_TIMEOUT = 3.0
+
+    def __init__(self, cleep_filesystem, asound_conf, playback_format, capture_format, need_resource, release_resource,
+                 is_resource_busy, stats, resource_timeout=RESOURCE_TIMEOUT):
+        """
+        Constructor
+
+        Args:
+            cleep_filesystem (CleepFilesystem): filesystem instance
+            asound_conf (string): alsa configuration file path
+            playback_format (callable): function returning selected device playback format (dict)
+            capture_format (dict): capture stream format (rate, channels, sample_format)
+            need_resource (callable): function requesting resource (resource name), acquisition is
+                                      notified through resource_acquired
+            release_resource (callable): function releasing resource (resource name)
+            is_resource_busy (callable): function returning True if resource is used by a test job
+            stats (CommandStats): stats instance
+            resource_timeout (float): max time to wait for a resource in seconds
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.cleep_filesystem = cleep_filesystem
+        self.asound_conf = asound_conf
+        self.playback_format = playback_format
+        self.capture_format = capture_format
+        self.need_resource = need_resource
+        self.release_resource = release_resource
+        self.is_resource_busy = is_resource_busy
+        self.stats = stats
+        self.resource_timeout = resource_timeout
+        self.__playback_service = None
+        self.__capture_stream = None
+        self.__lock = threading.Lock()
+        self.__resources_lock = threading.Lock()
+        self.__resource_events = {}
+        self.__resources_held = set()
+
+    def get_playback_service(self):
+        """
+        Return shared playback service, created with selected device format
+
+        Returns:
+            PlaybackService: playback service
+        """
+        with self.__lock:
+            if self.__playback_service is None:
+                self.__playback_service = PlaybackService(
+                    open_callback=self._open_playback_stream,
+                    close_callback=self._close_playback_stream,
+                    **self.playback_format()
+                )
+            return self.__playback_service
+
+    def close_playback_service(self):
+        """
+        Close shared playback service (device changed, module stopped). It is created again on next sound
+        """
+        with self.__lock:
+            service, self.__playback_service = self.__playback_service, None
+        if service:
+            service.stop()
+
+    def get_capture_stream(self):
+        """
+        Return shared capture stream
+
+        Returns:
+            CaptureStream: capture stream
+        """
+        with self.__lock:
+            if self.__capture_stream is None:
+                self.__capture_stream = CaptureStream(
+                    open_callback=self._open_capture_stream,
+                    close_callback=self._close_capture_stream,
+                    **self.capture_format
+                )
+            return self.__capture_stream
+
+    def stop(self):
+        """
+        Stop streams that were created
+        """
+        with self.__lock:
+            capture_stream = self.__capture_stream
+        if capture_stream:
+            capture_stream.stop()
+        self.close_playback_service()
+
+    def is_playback_shared(self):
+        """
+        Check if default pcm lets several processes play at the same time, that is asound.conf
+        was generated from a latency profile (dmix chain)
+
+        Returns:
+            bool: True if playback device is shared
+        """
+        return AsoundProfile.is_generated(read_file(self.cleep_filesystem, self.asound_conf, self.logger))
+
+    def is_capture_shared(self):
+        """
+        Check if default pcm lets several processes record at the same time, that is asound.conf
+        was generated from a latency profile with capture chain (dsnoop)
+
+        Returns:
+            bool: True if capture device is shared
+        """
+        return AsoundProfile.is_capture_shared(read_file(self.cleep_filesystem, self.asound_conf, self.logger))
+
+    def is_resource_held(self, resource_name):
+        """
+        Return True if resource is held by a stream
+
+        Args:
+            resource_name (string): resource name
+
+        Returns:
+            bool: True if resource is held
+        """
+        with self.__resources_lock:
+            return resource_name in self.__resources_held
+
+    def resource_acquired(self, resource_name):
+        """
+        Resource was acquired: wake up stream waiting for it
+
+        Args:
+            resource_name (string): acquired resource name
+
+        Returns:
+            bool: False if no stream waits for resource
+        """
+        with self.__resources_lock:
+            event = self.__resource_events.get(resource_name)
+            if event:
+                event.set()
+
+        return event is not None
+
+    def _open_playback_stream(self):
+        """
+        Called by playback service before opening its stream. Playback resource is acquired
+        unless playback device is shared
+
+        Returns:
+            bool: True if stream can be opened
+        """
+        if self.is_playback_shared():
+            return True
+
+        return self.__acquire_resource(self.PLAYBACK_RESOURCE)
+
+    def _close_playback_stream(self):
+        """
+        Called by playback service once its stream is closed: release playback resource if held
+        """
+        self.__release_resource(self.PLAYBACK_RESOURCE)
+
+    def _open_capture_stream(self):
+        """
+        Called by capture stream before launching capture. Capture resource is acquired unless
+        capture device is shared
+
+        Returns:
+            bool: True if stream can be opened
+        """
+        if self.is_capture_shared():
+            return True
+
+        return self.__acquire_resource(self.CAPTURE_RESOURCE)
+
+    def _close_capture_stream(self):
+        """
+        Called by capture stream once capture is stopped: release capture resource if held
+        """
+        self.__release_resource(self.CAPTURE_RESOURCE)
+
+    def __acquire_resource(self, resource_name):
+        """
+        Acquire resource for a stream, waiting at most resource timeout
+
+        Args:
+            resource_name (string): resource name
+
+        Returns:
+            bool: True if resource is acquired
+        """
+        if self.is_resource_busy(resource_name):
+            self.logger.debug('Resource "%s" is used by a test job' % resource_name)
+            return False
+
+        event = threading.Event()
+        with self.__resources_lock:
+            self.__resource_events[resource_name] = event
+        with self.stats.measure('resources.need'):
+            self.need_resource(resource_name)
+        event.wait(self.resource_timeout)
+
+        with self.__resources_lock:
+            self.__resource_events.pop(resource_name, None)
+            # resource may be acquired right after timeout
+            acquired = event.is_set()
+            if acquired:
+                self.__resources_held.add(resource_name)
+        if not acquired:
+            self.logger.warning('Resource "%s" not acquired in time' % resource_name)
+
+        return acquired
+
+    def __release_resource(self, resource_name):
+        """
+        Release resource acquired for a stream, if held
+
+        Args:
+            resource_name (string): resource name
+        """
+        with self.__resources_lock:
+            held = resource_name in self.__resources_held
+            self.__resources_held.discard(resource_name)
+        if held:
+            with self.stats.measure('resources.release'):
+                self.release_resource(resource_name)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import hashlib
+import os
+import threading
+import wave
+
+__all__ = ['SoundAssets']
+
+
+class SoundAssets():
+    """
+    Sound assets converted to card native format. Each sound is converted once and stored in a cache
+    directory keyed by format, so alsa doesn't have to resample or convert it each time it is played.
+
+    Converted variant is rebuilt when source file is modified.
+    """
+
+    SAMPLE_WIDTHS = {
+        'U8': 1,
+        'S16_LE': 2,
+        'S32_LE': 4,
+    }
+
+    def __init__(self, cache_path, cleep_filesystem, sound_cache):
+        """
+        Constructor
+
+        Args:
+            cache_path (string): converted sounds directory
+            cleep_filesystem (CleepFilesystem): filesystem instance
+            sound_cache (SoundCache): sound cache instance used to decode and convert sounds
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.cache_path = cache_path
+        self.cleep_filesystem = cleep_filesystem
+        self.sound_cache = sound_cache
+        self.__lock = threading.Lock()
+
+    def get_format_path(self, rate, channels, sample_format):
+        """
+        Return directory of sounds converted to specified format
+
+        Args:
+            rate (int): sample rate
+            channels (int): channels count
+            sample_format (string): sample format (U8, S16_LE or S32_LE)
+
+        Returns:
+            string: directory path
+        """
+        return os.path.join(self.cache_path, '%d_%d_%s' % (rate, channels, sample_format))
+
+    def get_variant_path(self, path, rate, channels, sample_format):
+        """
+        Return path of sound variant in specified format. Variant name contains source path hash
+        to avoid collisions between sounds with same name
+
+        Args:
+            path (string): source sound file path
+            rate (int): sample rate
+            channels (int): channels count
+            sample_format (string): sample format
+
+        Returns:
+            string: variant path (file may not exist)
+        """
+        path = os.path.abspath(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self.get_format_path(rate, channels, sample_format), '%s_%s.wav' % (name, digest))
+
+    def get(self, path, rate, channels, sample_format):
+        """
+        Return sound variant in specified format, converting it if necessary
+
+        Args:
+            path (string): source sound file path (wav)
+            rate (int): sample rate
+            channels (int): channels count
+            sample_format (string): sample format (U8, S16_LE or S32_LE)
+
+        Returns:
+            string: variant path (source path if it is already in specified format)
+
+        Raises:
+            Exception: if sound can't be converted
+        """
+        variant_path = self.get_variant_path(path, rate, channels, sample_format)
+        with self.__lock:
+            if self.__is_up_to_date(path, variant_path):
+                return variant_path
+            if self.__is_same_format(path, rate, channels, sample_format):
+                return path
+            self.__convert(path, variant_path, rate, channels, sample_format)
+
+        return variant_path
+
+    def prepare(self, paths, rate, channels, sample_format):
+        """
+        Convert specified sounds to specified format. Sounds that can't be converted are skipped
+
+        Args:
+            paths (list): source sound file paths
+            rate (int): sample rate
+            channels (int): channels count
+            sample_format (string): sample format
+
+        Returns:
+            dict: variant path of each converted sound, indexed by source path
+        """
+        variants = {}
+        for path in paths:
+            try:
+                variants[path] = self.get(path, rate, channels, sample_format)
+            except Exception as error:
+                self.logger.warning('Unable to convert sound "%s": %s' % (path, str(error)))
+
+        return variants
+
+    def __is_up_to_date(self, path, variant_path):
+        """
+        Check if variant exists and is newer than its source
+
+        Args:
+            path (string): source sound file path
+            variant_path (string): variant path
+
+        Returns:
+            bool: True if variant can be used
+        """
+        try:
+            return os.path.getmtime(variant_path) >= os.path.getmtime(path)
+        except OSError:
+            return False
+
+    def __is_same_format(self, path, rate, channels, sample_format):
+        """
+        Check if source sound is already in specified format
+
+        Args:
+            path (string): source sound file path (wav)
+            rate (int): sample rate
+            channels (int): channels count
+            sample_format (string): sample format
+
+        Returns:
+            bool: True if sound doesn't need to be converted
+
+        Raises:
+            Exception: if sound can't be read
+        """
+        with wave.open(path, 'rb') as wav:
+            source_format = (wav.getframerate(), wav.getnchannels(), wav.getsampwidth())
+
+        return source_format == (rate, channels, self.SAMPLE_WIDTHS.get(sample_format))
+
+    def __convert(self, path, variant_path, rate, channels, sample_format):
+        """
+        Convert sound and write it to variant path. Variant is written to temporary file first
+        so an interrupted conversion never leaves a truncated variant
+
+        Args:
+            path (string): source sound file path
+            variant_path (string): variant path
+            rate (int): sample rate
+            channels (int): channels count
+            sample_format (string): sample format
+
+        Raises:
+            Exception: if sound can't be converted
+        """
+        data = self.sound_cache.decode(path, rate, channels, sample_format)
+
+        self.cleep_filesystem.mkdir(os.path.dirname(variant_path), True)
+        tmp_path = variant_path + '.tmp'
+        fd = self.cleep_filesystem.open(tmp_path, 'wb')
+        try:
+            with wave.open(fd, 'wb') as wav:
+                wav.setframerate(rate)
+                wav.setnchannels(channels)
+                wav.setsampwidth(self.SAMPLE_WIDTHS[sample_format])
+                wav.writeframes(data)
+        except Exception:
+            self.cleep_filesystem.close(fd)
+            self.cleep_filesystem.rm(tmp_path)
+            raise
+        self.cleep_filesystem.close(fd)
+        self.cleep_filesystem.rename(tmp_path, variant_path)
+        self.logger.debug('Sound "%s" converted to "%s"' % (path, variant_path))
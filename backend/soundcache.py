@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import threading
+import wave
+from collections import OrderedDict
+
+__all__ = ['SoundCache']
+
+
+class SoundCache():
+    """
+    Memory cache of decoded sounds. Sound files are decoded once and converted to requested
+    PCM format, so playing them again only consists of writing PCM data to playback device.
+
+    Least recently used sounds are evicted when cache size exceeds its limit.
+    """
+
+    SAMPLE_FORMATS = {
+        1: 'U8',
+        2: 'S16_LE',
+        4: 'S32_LE',
+    }
+    SAMPLE_WIDTHS = {value: key for key, value in SAMPLE_FORMATS.items()}
+    SAMPLE_DTYPES = {
+        1: 'u1',
+        2: '<i2',
+        4: '<i4',
+    }
+
+    def __init__(self, max_size=2097152):
+        """
+        Constructor
+
+        Args:
+            max_size (int): max cache size in bytes
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.max_size = max_size
+        self.__sounds = OrderedDict()
+        self.__size = 0
+        self.__lock = threading.Lock()
+
+    def get_size(self):
+        """
+        Return current cache size
+
+        Returns:
+            int: cache size in bytes
+        """
+        return self.__size
+
+    def clear(self):
+        """
+        Clear cache
+        """
+        with self.__lock:
+            self.__sounds.clear()
+            self.__size = 0
+
+    def get(self, path, rate, channels, sample_format):
+        """
+        Return PCM data of specified sound file converted to specified format
+
+        Args:
+            path (string): sound file path (wav)
+            rate (int): output sample rate
+            channels (int): output channels count (1 or 2)
+            sample_format (string): output sample format (U8, S16_LE or S32_LE)
+
+        Returns:
+            bytes: PCM data
+
+        Raises:
+            Exception: if file can't be decoded or converted
+        """
+        mtime = os.path.getmtime(path)
+        key = (path, rate, channels, sample_format)
+        with self.__lock:
+            entry = self.__sounds.get(key)
+            if entry and entry['mtime'] == mtime:
+                self.__sounds.move_to_end(key)
+                return entry['data']
+
+        data = self.decode(path, rate, channels, sample_format)
+
+        with self.__lock:
+            old_entry = self.__sounds.pop(key, None)
+            if old_entry:
+                self.__size -= len(old_entry['data'])
+            if len(data) <= self.max_size:
+                self.__sounds[key] = {'data': data, 'mtime': mtime}
+                self.__size += len(data)
+                self.__evict()
+
+        return data
+
+    def __evict(self):
+        """
+        Evict least recently used sounds until cache size is below limit. Must be called with lock acquired
+        """
+        while self.__size > self.max_size and self.__sounds:
+            key, entry = self.__sounds.popitem(last=False)
+            self.__size -= len(entry['data'])
+            self.logger.debug('Sound "%s" evicted from cache' % str(key))
+
+    def decode(self, path, rate, channels, sample_format):
+        """
+        Decode wav file and convert its content to specified format. Conversion requires numpy
+
+        Args:
+            path (string): sound file path (wav)
+            rate (int): output sample rate
+            channels (int): output channels count (1 or 2)
+            sample_format (string): output sample format (U8, S16_LE or S32_LE)
+
+        Returns:
+            bytes: PCM data
+
+        Raises:
+            Exception: if file can't be decoded or converted
+        """
+        with wave.open(path, 'rb') as wav:
+            in_rate = wav.getframerate()
+            in_channels = wav.getnchannels()
+            in_width = wav.getsampwidth()
+            data = wav.readframes(wav.getnframes())
+
+        out_width = self.SAMPLE_WIDTHS.get(sample_format)
+        if out_width is None or in_width not in self.SAMPLE_FORMATS:
+            raise Exception('Unsupported sample format')
+        if (in_rate, in_channels, in_width) == (rate, channels, out_width):
+            return data
+        if in_channels not in (1, 2) or channels not in (1, 2):
+            raise Exception('Only mono and stereo sounds can be converted')
+        try:
+            # deferred import: not needed during module startup
+            import numpy
+        except ImportError: # pragma: no cover
+            raise Exception('Sound conversion requires numpy library')
+
+        # samples are converted to signed 32 bits (wav 8 bits samples are unsigned)
+        samples = numpy.frombuffer(data, dtype=self.SAMPLE_DTYPES[in_width]).astype(numpy.int64)
+        if in_width == 1:
+            samples -= 128
+        samples <<= 32 - 8 * in_width
+        samples = samples[:len(samples) - len(samples) % in_channels].reshape(-1, in_channels)
+
+        if in_channels == 2 and channels == 1:
+            samples = samples.sum(axis=1, keepdims=True) // 2
+        if in_rate != rate and len(samples) > 0:
+            # linear interpolation of each channel
+            positions = numpy.arange(len(samples) * rate // in_rate) * (in_rate / rate)
+            frames = numpy.arange(len(samples))
+            samples = numpy.rint(numpy.stack(
+                [numpy.interp(positions, frames, samples[:, channel]) for channel in range(samples.shape[1])],
+                axis=1,
+            )).astype(numpy.int64)
+        if samples.shape[1] == 1 and channels == 2:
+            samples = numpy.repeat(samples, 2, axis=1)
+
+        samples >>= 32 - 8 * out_width
+        if out_width == 1:
+            samples += 128
+
+        return samples.astype(self.SAMPLE_DTYPES[out_width]).tobytes()
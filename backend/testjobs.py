@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+__all__ = ['TestJobs']
+
+
+class TestJobs():
+    """
+    Background test jobs. A job waits for resources needed by its test type and is run in its own
+    thread once all of them are acquired. Resources are released at end of job.
+
+    Last HISTORY jobs are kept so their status can still be requested once they are done.
+    """
+
+    STATUS_WAITING = 'waiting'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    HISTORY = 10
+
+    def __init__(self, resources, run_callback, update_callback, need_resource, release_resource, stats, history=HISTORY):
+        """
+        Constructor
+
+        Args:
+            resources (dict): resource names needed by each test type
+            run_callback (callable): function running test (job, options), it returns job result
+            update_callback (callable): function called with a copy of job each time it is updated
+            need_resource (callable): function requesting resource (resource name), acquisition is
+                                      notified through resource_acquired
+            release_resource (callable): function releasing resource (resource name)
+            stats (CommandStats): stats instance
+            history (int): number of jobs kept
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.resources = resources
+        self.run_callback = run_callback
+        self.update_callback = update_callback
+        self.need_resource = need_resource
+        self.release_resource = release_resource
+        self.stats = stats
+        self.history = history
+        self.__jobs = OrderedDict()
+        self.__pending = {}
+        self.__contexts = {}
+        self.__lock = threading.Lock()
+
+    def start(self, test_type, options=None):
+        """
+        Create test job and request associated resources (non blocking). Job is run as soon as all
+        resources are acquired
+
+        Args:
+            test_type (string): test type
+            options (dict): test options
+
+        Returns:
+            string: job id
+
+        Raises:
+            ValueError: if a test using same resources is already running
+        """
+        resource_names = self.resources[test_type]
+        with self.__lock:
+            busy = [self.__contexts[job_id]['job']['type'] for resource_name, job_id in self.__pending.items()
+                    if resource_name in resource_names]
+            if busy:
+                raise ValueError('A %s test is already running' % busy[0])
+
+            job = {
+                'jobid': str(uuid.uuid4()),
+                'type': test_type,
+                'status': self.STATUS_WAITING,
+                'progress': 0,
+                'error': None,
+                'result': None,
+            }
+            self.__jobs[job['jobid']] = job
+            while len(self.__jobs) > self.history:
+                self.__jobs.popitem(last=False)
+            self.__contexts[job['jobid']] = {
+                'job': job,
+                'options': options or {},
+                'acquired': set(),
+            }
+            for resource_name in resource_names:
+                self.__pending[resource_name] = job['jobid']
+
+        self.logger.debug('Test job created: %s' % job)
+        with self.stats.measure('resources.need'):
+            for resource_name in resource_names:
+                self.need_resource(resource_name)
+
+        return job['jobid']
+
+    def get(self, job_id):
+        """
+        Return test job
+
+        Args:
+            job_id (string): job id
+
+        Returns:
+            dict: copy of job or None if job does not exist
+        """
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def is_pending(self, resource_name):
+        """
+        Return True if a job waits for or uses specified resource
+
+        Args:
+            resource_name (string): resource name
+
+        Returns:
+            bool: True if resource is used by a job
+        """
+        with self.__lock:
+            return resource_name in self.__pending
+
+    def update(self, job, status, progress, error=None, result=None):
+        """
+        Update test job and notify it
+
+        Args:
+            job (dict): test job
+            status (string): job status (STATUS_XXX)
+            progress (int): job progress percentage
+            error (string): error message
+            result (dict): job result
+        """
+        with self.__lock:
+            job.update({
+                'status': status,
+                'progress': progress,
+                'error': error,
+                'result': result,
+            })
+            params = copy.deepcopy(job)
+
+        self.update_callback(params)
+
+    def resource_acquired(self, resource_name):
+        """
+        Resource was acquired: launch job waiting for it in background if it has all its resources
+
+        Args:
+            resource_name (string): acquired resource name
+
+        Returns:
+            bool: False if no job waits for resource
+        """
+        ready = False
+        with self.__lock:
+            job_id = self.__pending.get(resource_name)
+            context = self.__contexts.get(job_id)
+            if context:
+                context['acquired'].add(resource_name)
+                ready = context['acquired'] == set(self.resources[context['job']['type']])
+        if not context:
+            return False
+        if not ready:
+            self.logger.debug('Test job %s waits for other resources' % job_id)
+            return True
+
+        thread = threading.Thread(target=self._run, args=(job_id,), daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, job_id):
+        """
+        Run test job (executed in its own thread). Acquired resources are released at end of job
+
+        Args:
+            job_id (string): test job id
+        """
+        with self.__lock:
+            context = self.__contexts[job_id]
+        job = context['job']
+        resource_names = self.resources[job['type']]
+        try:
+            self.update(job, self.STATUS_RUNNING, 10)
+            with self.stats.measure('test_job.%s' % job['type']):
+                result = self.run_callback(job, context['options'])
+            self.update(job, self.STATUS_DONE, 100, result=result)
+        except Exception as error:
+            self.logger.error('Test job %s failed: %s' % (job_id, str(error)))
+            self.update(job, self.STATUS_FAILED, 100, str(error))
+        finally:
+            with self.__lock:
+                self.__contexts.pop(job_id, None)
+                for resource_name in resource_names:
+                    self.__pending.pop(resource_name, None)
+            with self.stats.measure('resources.release'):
+                for resource_name in resource_names:
+                    self.release_resource(resource_name)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+
+__all__ = ['VolumeRamp']
+
+
+class VolumeRamp():
+    """
+    Volume ramp engine: fades audio driver volumes from a value to another one during a given time.
+
+    Ramp steps are computed when ramp is started and applied by a single scheduler thread using
+    AudioDriver.set_volumes, so any audio driver supports it. Starting a new ramp cancels the one
+    in progress. Steps are applied with ramp lock held, so once cancel returns no step of cancelled
+    ramp can overwrite volumes set afterwards.
+    """
+
+    STEP_INTERVAL = 50
+
+    def __init__(self, end_callback=None):
+        """
+        Constructor
+
+        Args:
+            end_callback (callable): function called (without parameter) when a ramp ends
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.end_callback = end_callback
+        self.__condition = threading.Condition()
+        self.__ramp = None
+        self.__thread = None
+
+    @staticmethod
+    def compute_steps(start, end, duration, step_interval=STEP_INTERVAL):
+        """
+        Compute ramp steps values
+
+        Args:
+            start (int): start volume (None if volume must not be updated)
+            end (int): end volume (None if volume must not be updated)
+            duration (int): ramp duration in milliseconds
+            step_interval (int): interval between steps in milliseconds
+
+        Returns:
+            list: list of volume values, one per step (None values if volume must not be updated)
+        """
+        count = max(1, int(duration / step_interval))
+        if start is None or end is None:
+            return [None] * count
+        return [int(round(start + (end - start) * (index + 1) / float(count))) for index in range(count)]
+
+    def start(self, driver, playback=None, capture=None, duration=1000):
+        """
+        Start new ramp, cancelling current one
+
+        Args:
+            driver (AudioDriver): audio driver to update volumes
+            playback (tuple): (from, to) playback volumes or None to keep playback volume unchanged
+            capture (tuple): (from, to) capture volumes or None to keep capture volume unchanged
+            duration (int): ramp duration in milliseconds
+
+        Returns:
+            int: number of volume updates scheduled
+        """
+        playbacks = self.compute_steps(*(playback or (None, None)), duration=duration)
+        captures = self.compute_steps(*(capture or (None, None)), duration=duration)
+        step_interval = duration / 1000.0 / len(playbacks)
+
+        # drop steps that don't change anything
+        steps = []
+        last = (None, None)
+        for index, volumes in enumerate(zip(playbacks, captures)):
+            if volumes != last:
+                steps.append(((index + 1) * step_interval, volumes[0], volumes[1]))
+                last = volumes
+        if not steps:
+            self.cancel()
+            return 0
+
+        with self.__condition:
+            self.__ramp = {
+                'driver': driver,
+                'start': time.monotonic(),
+                'steps': steps,
+            }
+            if not self.__thread or not self.__thread.is_alive():
+                self.__thread = threading.Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+
+        self.logger.debug('Volume ramp started with %d steps' % len(steps))
+        return len(steps)
+
+    def cancel(self):
+        """
+        Cancel ramp in progress if any
+        """
+        with self.__condition:
+            if self.__ramp:
+                self.logger.debug('Volume ramp cancelled')
+                self.__ramp = None
+                self.__condition.notify()
+
+    def is_running(self):
+        """
+        Return True if a ramp is in progress
+
+        Returns:
+            bool: True if ramp is running
+        """
+        with self.__condition:
+            return self.__ramp is not None
+
+    def __run(self):
+        """
+        Scheduler thread: apply ramp steps on time
+        """
+        while True:
+            with self.__condition:
+                ramp = self.__ramp
+                if not ramp:
+                    # stop thread when idle, it will be restarted by next ramp
+                    self.__thread = None
+                    return
+                step_time, playback, capture = ramp['steps'][0]
+                delay = ramp['start'] + step_time - time.monotonic()
+                if delay > 0:
+                    self.__condition.wait(delay)
+                    continue
+                ramp['steps'].pop(0)
+                finished = not ramp['steps']
+                if finished:
+                    self.__ramp = None
+
+                try:
+                    ramp['driver'].set_volumes(playback, capture)
+                except Exception:
+                    self.logger.exception('Error applying volume ramp step')
+
+            if finished and self.end_callback:
+                self.end_callback()
@@ -7,14 +7,20 @@ angular
 .directive('audioConfigComponent', ['$rootScope', 'toastService', 'audioService', 'cleepService',
 function($rootScope, toast, audioService, cleepService) {
 
-    var audioController = function()
+    var audioController = ['$scope', function($scope)
     {
         var self = this;
+        var listeners = [];
         self.playbackDevices = [];
         self.captureDevices = [];
         self.volumePlayback = 0;
         self.volumeCapture = 0;
         self.currentDevice = null;
+        self.levelMeter = false;
+        self.levels = null;
+        self.latencyProfile = null;
+        self.latencyProfiles = [];
+        self.config = null;
 
         /**
          * Set volumes
@@ -40,41 +46,72 @@ function($rootScope, toast, audioService, cleepService) {
 
             audioService.selectDevice(self.currentDevice.label)
                 .then(function() {
+                    //new volumes and devices are pushed through audio.config.changed event
                     toast.success('Selected device is now the default audio card');
-                })
-                .finally(function() {
-                    //reload module config to get new volumes
+                }, function() {
+                    //restore current device
                     return cleepService.reloadModuleConfig('audio');
                 });
         };
 
         /**
-         * Play test sound
+         * Set latency profile
          */
-        self.testPlaying = function() {
-            audioService.testPlaying()
+        self.setLatencyProfile = function() {
+            audioService.setLatencyProfile(self.latencyProfile)
                 .then(function() {
-                    toast.success('You should have heard a sound');
+                    toast.success('Latency profile applied');
+                }, function() {
+                    //restore current profile
+                    return cleepService.reloadModuleConfig('audio');
                 });
         };
 
+        /**
+         * Play test sound
+         * Test runs in background, result is received through audio.test.done event
+         */
+        self.testPlaying = function() {
+            audioService.testPlaying();
+        };
+
         /**
          * Record voice and play it
+         * Test runs in background, progress is received through audio.test.xxx events
          */
         self.testRecording = function() {
             toast.loading('Recording 5 seconds...');
-            audioService.testRecording()
-                .then(function() {
-                    toast.success('You will hear your record');
-                });
+            audioService.testRecording();
+        };
+
+        /**
+         * Start or stop level meter
+         * Levels are received through audio.level.update events
+         */
+        self.toggleLevelMeter = function() {
+            if( self.levelMeter ) {
+                audioService.stopLevelMeter()
+                    .then(function() {
+                        self.levelMeter = false;
+                        self.levels = null;
+                    });
+            } else {
+                audioService.startLevelMeter()
+                    .then(function() {
+                        self.levelMeter = true;
+                    });
+            }
         };
 
         //set internal members according to received config
         self.setConfig = function(config) {
+            self.config = config;
             self.playbackDevices = config.devices.playback;
             self.captureDevices = config.devices.capture;
             self.volumePlayback = config.volumes.playback;
             self.volumeCapture = config.volumes.capture;
+            self.latencyProfile = config.latencyprofile;
+            self.latencyProfiles = config.latencyprofiles;
 
             //search for current device in playback devices list
             for( var i=0; i<self.playbackDevices.length; i++ ) {
@@ -85,6 +122,27 @@ function($rootScope, toast, audioService, cleepService) {
             }
         };
 
+        //set received config and keep cached module config up to date
+        self.updateConfig = function(config) {
+            if( cleepService.modules['audio'] ) {
+                cleepService.modules['audio'].config = config;
+            }
+            self.setConfig(config);
+        };
+
+        /**
+         * Reload config. Config is only returned by backend if it changed since known version
+         */
+        self.reloadConfig = function() {
+            audioService.getConfig(self.config ? self.config.version : null)
+                .then(function(resp) {
+                    if( resp.data.modified===false ) {
+                        return;
+                    }
+                    self.updateConfig(resp.data);
+                });
+        };
+
         /**
          * Init component
          */
@@ -95,6 +153,63 @@ function($rootScope, toast, audioService, cleepService) {
                 });
         };
 
+        /**
+         * Handle test job events
+         */
+        listeners.push($rootScope.$on('audio.test.progress', function(event, uuid, params) {
+            if( params.type==='recording' && params.progress>=60 ) {
+                toast.loading('You will hear your record');
+            }
+        }));
+        listeners.push($rootScope.$on('audio.test.done', function(event, uuid, params) {
+            if( params.status==='failed' ) {
+                toast.error(params.error);
+            } else if( params.type==='playing' ) {
+                toast.success('You should have heard a sound');
+            } else {
+                toast.success('Recording test done');
+            }
+        }));
+
+        /**
+         * Handle level meter events
+         */
+        listeners.push($rootScope.$on('audio.level.update', function(event, uuid, params) {
+            if( self.levelMeter ) {
+                self.levels = params;
+            }
+        }));
+
+        /**
+         * Handle config changes (only changed fields are pushed)
+         * Devices list is also updated this way when a sound card is plugged or unplugged
+         */
+        listeners.push($rootScope.$on('audio.config.changed', function(event, uuid, params) {
+            if( !self.config || params.version<=self.config.version ) {
+                return;
+            }
+
+            if( params.version!==self.config.version+1 ) {
+                //some changes were missed, reload whole config
+                self.reloadConfig();
+                return;
+            }
+
+            var config = angular.extend({}, self.config, params.changes);
+            config.version = params.version;
+            self.updateConfig(config);
+        }));
+
+        /**
+         * Unregister events listeners when component is destroyed
+         */
+        $scope.$on('$destroy', function() {
+            listeners.forEach(function(unregister) {
+                unregister();
+            });
+            listeners = [];
+        });
+
      	/**
       	 * Watch for config changes
       	 */
@@ -106,7 +221,7 @@ function($rootScope, toast, audioService, cleepService) {
             	self.setConfig(newConfig.config);
          	}
      	});
-    };
+    }];
 
     return {
         templateUrl: 'audio.config.html',
@@ -8,14 +8,42 @@ angular
 function($q, $rootScope, rpcService) {
     var self = this;
 
+    self.getConfig = function(version) {
+        return rpcService.sendCommand('get_module_config', 'audio', {'version':version});
+    };
+
     self.setVolumes = function(playback, capture) {
         return rpcService.sendCommand('set_volumes', 'audio', {'playback':playback, 'capture':capture});
     };
 
+    self.fadeVolumes = function(playback, capture, duration) {
+        return rpcService.sendCommand('fade_volumes', 'audio', {'playback':playback, 'capture':capture, 'duration':duration});
+    };
+
     self.selectDevice = function(label) {
         return rpcService.sendCommand('select_device', 'audio', {'driver_name':label}, 30.0);
     };
 
+    self.setLatencyProfile = function(profile) {
+        return rpcService.sendCommand('set_latency_profile', 'audio', {'profile':profile}, 30.0);
+    };
+
+    self.getCards = function() {
+        return rpcService.sendCommand('get_cards', 'audio');
+    };
+
+    self.setCardActive = function(card, active) {
+        return rpcService.sendCommand('set_card_active', 'audio', {'card':card, 'active':active});
+    };
+
+    self.getCardsVolumes = function(cards) {
+        return rpcService.sendCommand('get_cards_volumes', 'audio', {'cards':cards});
+    };
+
+    self.setCardsVolumes = function(volumes) {
+        return rpcService.sendCommand('set_cards_volumes', 'audio', {'volumes':volumes});
+    };
+
     self.testPlaying = function()
     {
         return rpcService.sendCommand('test_playing', 'audio');
@@ -23,7 +51,37 @@ function($q, $rootScope, rpcService) {
 
     self.testRecording = function()
     {
-        return rpcService.sendCommand('test_recording', 'audio', null, 10);
+        return rpcService.sendCommand('test_recording', 'audio');
+    };
+
+    self.benchmarkLatency = function(runs)
+    {
+        return rpcService.sendCommand('benchmark_latency', 'audio', {'runs':runs});
+    };
+
+    self.getTestJob = function(jobId)
+    {
+        return rpcService.sendCommand('get_test_job', 'audio', {'job_id':jobId});
+    };
+
+    self.getStats = function()
+    {
+        return rpcService.sendCommand('get_stats', 'audio');
+    };
+
+    self.resetStats = function()
+    {
+        return rpcService.sendCommand('reset_stats', 'audio');
+    };
+
+    self.startLevelMeter = function()
+    {
+        return rpcService.sendCommand('start_level_meter', 'audio');
+    };
+
+    self.stopLevelMeter = function()
+    {
+        return rpcService.sendCommand('stop_level_meter', 'audio');
     };
 
 }]);
@@ -0,0 +1,369 @@
+"""
+Audio commands benchmark
+
+Main Audio entry points are executed against a simulated ALSA toolchain: stub amixer, aplay,
+arecord and alsactl executables (real processes are spawned) and a fake /proc/asound tree.
+Each stub call lasts FAKE_ALSA_LATENCY seconds to simulate a slow device.
+
+Results are checked against stored baseline (bench_audio_baseline.json): an entry point fails if
+its p95 exceeds baseline p95 by more than tolerance or if it spawns more subprocesses. Baseline is
+recorded on first run (or when BENCH_UPDATE_BASELINE is set) and only used with same stub latency.
+Playback mixing of MAX_VOICES sounds must also take less than half a playback period.
+
+Usage:
+    python3 bench_audio.py [-v]
+
+Environment:
+    BENCH_ITERATIONS: number of iterations per entry point (default 20)
+    BENCH_LATENCY: stub executables latency in seconds (default 0.01)
+    BENCH_JSON: path of file to write results to (json format)
+    BENCH_TOLERANCE: allowed p95 increase ratio over baseline (default 0.3)
+    BENCH_TOLERANCE_MS: allowed p95 increase in milliseconds over baseline, added to ratio (default 2)
+    BENCH_UPDATE_BASELINE: record results as new baseline instead of checking them
+"""
+
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.audio import Audio
+from backend.asoundcards import AsoundCards
+from backend.bcm2835audiodriver import Bcm2835AudioDriver
+from backend.playbackservice import PlaybackService
+from cleep.libs.tests import session
+import json
+import os
+import re
+import shutil
+import stat
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from mock import MagicMock, patch
+
+FAKE_ALSA_TOOL = r'''#!/bin/sh
+# fake alsa tool: logs call, waits simulated latency and prints canned output
+name=$(basename "$0")
+echo "$name $*" >> "$FAKE_ALSA_LOG"
+sleep "${FAKE_ALSA_LATENCY:-0}"
+
+print_volume() {
+    volume=$(cat "$FAKE_ALSA_STATE" 2>/dev/null || echo 50)
+    echo "Simple mixer control 'PCM',0"
+    echo "  Capabilities: pvolume pvolume-joined pswitch pswitch-joined"
+    echo "  Playback channels: Mono"
+    echo "  Limits: Playback -10239 - 400"
+    echo "  Mono: Playback -2000 [$volume%] [-20.00dB] [on]"
+}
+
+amixer_command() {
+    case "$1" in
+    scontrols)
+        echo "Simple mixer control 'PCM',0"
+        ;;
+    controls)
+        echo "numid=3,iface=MIXER,name='PCM Playback Route'"
+        echo "numid=2,iface=MIXER,name='PCM Playback Switch'"
+        echo "numid=1,iface=MIXER,name='PCM Playback Volume'"
+        ;;
+    get|sget)
+        print_volume
+        ;;
+    set|sset)
+        volume=$(echo "$3" | tr -dc '0-9')
+        [ -n "$volume" ] && echo "$volume" > "$FAKE_ALSA_STATE"
+        print_volume
+        ;;
+    contents)
+        echo "numid=3,iface=MIXER,name='PCM Playback Route'"
+        echo "  ; type=INTEGER,access=rw------,values=1,min=0,max=2,step=0"
+        echo "  : values=1"
+        echo "numid=2,iface=MIXER,name='PCM Playback Switch'"
+        echo "  ; type=BOOLEAN,access=rw------,values=1"
+        echo "  : values=on"
+        echo "numid=1,iface=MIXER,name='PCM Playback Volume'"
+        echo "  ; type=INTEGER,access=rw---R--,values=1,min=-10239,max=400,step=0"
+        echo "  : values=-2000"
+        echo "  | dBscale-min=-102.39dB,step=0.01dB,mute=1"
+        ;;
+    cget|cset)
+        echo "numid=3,iface=MIXER,name='PCM Playback Route'"
+        echo "  ; type=INTEGER,access=rw------,values=1,min=0,max=2,step=0"
+        echo "  : values=1"
+        ;;
+    esac
+}
+
+case "$name" in
+amixer)
+    stdin_mode=0
+    while [ "${1#-}" != "$1" ]; do
+        case "$1" in
+        -c|-D) shift;;
+        -s|--stdin) stdin_mode=1;;
+        esac
+        shift
+    done
+    if [ "$stdin_mode" = "1" ]; then
+        while read -r line; do
+            eval "amixer_command $line"
+        done
+    else
+        amixer_command "$@"
+    fi
+    ;;
+aplay|arecord)
+    if [ "$1" = "-l" ] && [ "$name" = "aplay" ]; then
+        echo "**** List of PLAYBACK Hardware Devices ****"
+        echo "card 0: Headphones [bcm2835 Headphones], device 0: bcm2835 Headphones [bcm2835 Headphones]"
+        echo "  Subdevices: 8/8"
+        echo "  Subdevice #0: subdevice #0"
+    elif [ "$1" = "-l" ]; then
+        echo "**** List of CAPTURE Hardware Devices ****"
+    elif [ "$name" = "aplay" ]; then
+        cat > /dev/null
+    fi
+    ;;
+esac
+exit 0
+'''
+
+FAKE_ALSA_TOOLS = ('amixer', 'aplay', 'arecord', 'alsactl')
+
+FAKE_PROC_CARDS = ''' 0 [Headphones     ]: bcm2835_headpho - bcm2835 Headphones
+                      bcm2835 Headphones
+'''
+
+
+class FakeAlsaToolchain():
+    """
+    Stub alsa executables and /proc/asound tree. Alsa commands spawned by module are redirected
+    to stubs, real processes are spawned so fork/exec cost is measured
+    """
+
+    TOOL_PATTERN = re.compile(r'(?:(?<=\s)|^)(?:/usr/s?bin/)?(%s)(?=\s|$)' % '|'.join(FAKE_ALSA_TOOLS))
+
+    def __init__(self, latency):
+        self.root = tempfile.mkdtemp()
+        self.bin_path = os.path.join(self.root, 'bin')
+        self.proc_path = os.path.join(self.root, 'proc', 'asound')
+        self.log_path = os.path.join(self.root, 'calls.log')
+        self.latency = latency
+        self.popen = subprocess.Popen
+        self.spawns = 0
+
+        os.makedirs(self.bin_path)
+        tool_path = os.path.join(self.bin_path, 'fake_alsa_tool')
+        with open(tool_path, 'w') as tool_file:
+            tool_file.write(FAKE_ALSA_TOOL)
+        os.chmod(tool_path, os.stat(tool_path).st_mode | stat.S_IEXEC)
+        for tool in FAKE_ALSA_TOOLS:
+            os.symlink(tool_path, os.path.join(self.bin_path, tool))
+
+        os.makedirs(os.path.join(self.proc_path, 'card0', 'pcm0p'))
+        with open(os.path.join(self.proc_path, 'cards'), 'w') as cards_file:
+            cards_file.write(FAKE_PROC_CARDS)
+        open(self.log_path, 'w').close()
+
+        os.environ.update({
+            'FAKE_ALSA_LOG': self.log_path,
+            'FAKE_ALSA_STATE': os.path.join(self.root, 'volume'),
+            'FAKE_ALSA_LATENCY': str(latency),
+        })
+
+    def clean(self):
+        shutil.rmtree(self.root)
+
+    def redirect(self, command):
+        """
+        Replace alsa tools by stubs in command (string or list)
+        """
+        bin_path = self.bin_path
+        if isinstance(command, str):
+            return self.TOOL_PATTERN.sub(lambda matches: os.path.join(bin_path, matches.group(1)), command)
+        command = list(command)
+        matches = self.TOOL_PATTERN.match(command[0]) if command else None
+        if matches:
+            command[0] = os.path.join(bin_path, matches.group(1))
+        return command
+
+    def Popen(self, command, *args, **kwargs):
+        self.spawns += 1
+        return self.popen(self.redirect(command), *args, **kwargs)
+
+    def get_calls(self):
+        """
+        Return stub calls counter by tool
+        """
+        with open(self.log_path) as log_file:
+            return Counter(line.split(' ', 1)[0] for line in log_file.read().splitlines())
+
+
+class OtherSoundcardDriver(Bcm2835AudioDriver):
+    """
+    Embedded soundcard driver registered under another name, so select_device has a device to
+    switch to
+    """
+
+    def __init__(self, **kwargs):
+        Bcm2835AudioDriver.__init__(self, **kwargs)
+        self.name = 'Other soundcard'
+
+
+class BenchAudio(unittest.TestCase):
+
+    ITERATIONS = int(os.environ.get('BENCH_ITERATIONS', 20))
+    LATENCY = float(os.environ.get('BENCH_LATENCY', 0.01))
+    TOLERANCE = float(os.environ.get('BENCH_TOLERANCE', 0.3))
+    TOLERANCE_MS = float(os.environ.get('BENCH_TOLERANCE_MS', 2.0))
+    BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_audio_baseline.json')
+
+    def setUp(self):
+        self.session = session.TestSession(self)
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.toolchain = FakeAlsaToolchain(self.LATENCY)
+        self.results = {}
+
+        patches = [
+            patch('subprocess.Popen', self.toolchain.Popen),
+            patch('backend.audio.AsoundCards', lambda: AsoundCards(self.toolchain.proc_path)),
+            patch('backend.audio.Tools.raspberry_pi_infos', return_value={'audio': True}),
+            patch('backend.audio.HotplugWatcher'),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        cleep_filesystem = MagicMock()
+        cleep_filesystem.open.return_value.read.return_value = 'dtparam=audio=on'
+        self.module = self.session.setup(Audio, bootstrap={'cleep_filesystem': cleep_filesystem})
+        self.other_driver = OtherSoundcardDriver(
+            asound_cards=self.module.asound_cards,
+            board_infos=self.module._get_board_infos,
+            stats=self.module.stats,
+        )
+        self.module._register_driver(self.other_driver)
+        self.session.start_module(self.module)
+
+    def tearDown(self):
+        self.session.clean()
+        self.toolchain.clean()
+
+    def percentile(self, values, percent):
+        values = sorted(values)
+        index = max(0, int(round(percent / 100.0 * len(values) + 0.5)) - 1)
+        return values[min(index, len(values) - 1)]
+
+    def bench(self, name, func, before=None):
+        durations = []
+        spawns = 0
+        calls = Counter()
+        for _ in range(self.ITERATIONS):
+            if before:
+                before()
+            spawns_before = self.toolchain.spawns
+            calls_before = self.toolchain.get_calls()
+            start = time.perf_counter()
+            func()
+            durations.append((time.perf_counter() - start) * 1000.0)
+            spawns += self.toolchain.spawns - spawns_before
+            calls += self.toolchain.get_calls() - calls_before
+
+        self.results[name] = {
+            'iterations': self.ITERATIONS,
+            'p50': round(self.percentile(durations, 50), 2),
+            'p95': round(self.percentile(durations, 95), 2),
+            'p99': round(self.percentile(durations, 99), 2),
+            'max': round(max(durations), 2),
+            'subprocesses': round(spawns / float(self.ITERATIONS), 2),
+            'calls': {tool: round(count / float(self.ITERATIONS), 2) for tool, count in sorted(calls.items())},
+        }
+
+    def report(self):
+        lines = [
+            '',
+            'Audio benchmark (%d iterations, stub latency %.0fms)' % (self.ITERATIONS, self.LATENCY * 1000.0),
+            '%-28s %9s %9s %9s %9s %6s  %s' % ('entry point', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms', 'procs', 'calls'),
+        ]
+        for name, result in self.results.items():
+            lines.append('%-28s %9.2f %9.2f %9.2f %9.2f %6.2f  %s' % (
+                name, result['p50'], result['p95'], result['p99'], result['max'], result['subprocesses'],
+                ', '.join(['%s=%s' % (tool, count) for tool, count in result['calls'].items()]),
+            ))
+        sys.stderr.write('\n'.join(lines) + '\n')
+
+        if os.environ.get('BENCH_JSON'):
+            with open(os.environ['BENCH_JSON'], 'w') as json_file:
+                json.dump({
+                    'iterations': self.ITERATIONS,
+                    'latency': self.LATENCY,
+                    'results': self.results,
+                }, json_file, indent=2)
+
+    def check_baseline(self):
+        """
+        Check results against stored baseline, or record them as baseline
+        """
+        if os.environ.get('BENCH_UPDATE_BASELINE') or not os.path.exists(self.BASELINE):
+            with open(self.BASELINE, 'w') as json_file:
+                json.dump({
+                    'latency': self.LATENCY,
+                    'results': {
+                        name: {'p95': result['p95'], 'subprocesses': result['subprocesses']}
+                        for name, result in self.results.items()
+                    },
+                }, json_file, indent=2, sort_keys=True)
+            sys.stderr.write('Results recorded as baseline in %s\n' % self.BASELINE)
+            return
+
+        with open(self.BASELINE) as json_file:
+            baseline = json.load(json_file)
+        if baseline['latency'] != self.LATENCY:
+            self.skipTest('Baseline recorded with stub latency %ss' % baseline['latency'])
+
+        regressions = []
+        for name, reference in baseline['results'].items():
+            result = self.results.get(name)
+            if result is None:
+                regressions.append('%s: not measured' % name)
+                continue
+            max_p95 = reference['p95'] * (1.0 + self.TOLERANCE) + self.TOLERANCE_MS
+            if result['p95'] > max_p95:
+                regressions.append('%s: p95 %.2fms > %.2fms (baseline %.2fms)' % (name, result['p95'], max_p95, reference['p95']))
+            if result['subprocesses'] > reference['subprocesses']:
+                regressions.append('%s: %.2f subprocesses > baseline %.2f' % (
+                    name, result['subprocesses'], reference['subprocesses'],
+                ))
+        self.assertEqual(regressions, [], 'Performance regressions:\n%s' % '\n'.join(regressions))
+
+    def test_bench(self):
+        drivers = [self.module.bcm2835_driver.name, self.other_driver.name]
+
+        def invalidate():
+            self.module.asound_cards.invalidate()
+            self.module._invalidate_devices_inventory()
+
+        def switch_device():
+            # always switch to the device that is not selected
+            selected = self.module._get_config_field('driver')
+            self.module.select_device(drivers[1] if selected == drivers[0] else drivers[0])
+
+        self.bench('get_module_config (cold)', self.module.get_module_config, invalidate)
+        self.bench('get_module_config (cached)', self.module.get_module_config)
+        self.bench('set_volumes', lambda: self.module.set_volumes(40, 0))
+        self.bench('select_device', switch_device)
+
+        # mixing of a full period with selected device format, as done by playback writer
+        service = PlaybackService(**self.module._get_playback_format())
+        chunks = [os.urandom(service.period_size) for _ in range(service.max_voices)]
+        self.bench('PlaybackService.mix', lambda: service.mix(chunks, service.width))
+
+        self.report()
+        period = service.period_size * 1000.0 / (service.pcm.rate * service.pcm.frame_size)
+        self.assertLess(self.results['PlaybackService.mix']['p95'], period / 2.0, 'Mixing too slow for playback writer')
+        self.check_baseline()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,248 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.alsamixer import AlsaMixer, LibasoundMixer
+from mock import Mock, patch
+
+
+class TestAlsaMixer(unittest.TestCase):
+
+    VOLUME_PATTERN = ('Mono', r'\[(\d*)%\]')
+    SSET_OUTPUT = "Simple mixer control 'PCM',0\n  Playback channels: Mono\n  Mono: Playback -2000 [22%] [-20.00dB] [on]"
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.alsa = Mock()
+        self.alsa.get_volume.return_value = 11
+        self.alsa.set_volume.return_value = 22
+        self.alsa.get_simple_controls.return_value = ['PCM']
+
+    @patch('backend.alsamixer.AmixerSession')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend(self, mock_native, mock_session):
+        mock_session.return_value.execute.return_value = [self.SSET_OUTPUT]
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=AlsaMixer.BACKEND_AMIXER)
+
+        self.assertEqual(mixer.get_backend(), AlsaMixer.BACKEND_AMIXER)
+        self.assertEqual(mixer.get_volume('PCM'), 11)
+        self.assertEqual(mixer.set_volume('PCM', 50), 22)
+        self.assertEqual(mixer.get_controls(), ['PCM'])
+        self.alsa.get_volume.assert_called_with('PCM', self.VOLUME_PATTERN)
+        mock_session.return_value.sset.assert_called_with('PCM', '50%')
+        self.assertFalse(self.alsa.set_volume.called)
+        self.assertFalse(mock_native.called)
+
+    @patch('backend.alsamixer.AmixerSession')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend_set_capture_volume(self, mock_native, mock_session):
+        mock_session.return_value.execute.return_value = [self.SSET_OUTPUT]
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=AlsaMixer.BACKEND_AMIXER, device='hw:1')
+
+        mixer.set_volume('Mic', 50, capture=True)
+
+        mock_session.assert_called_with(device='hw:1')
+        mock_session.return_value.sset.assert_called_with('Mic', '50% capture')
+
+    @patch('backend.alsamixer.AmixerSession')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend_set_volume_failed(self, mock_native, mock_session):
+        mock_session.return_value.execute.side_effect = Exception('Amixer batch failed')
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=AlsaMixer.BACKEND_AMIXER)
+
+        self.assertIsNone(mixer.set_volume('PCM', 50))
+
+    @patch('backend.alsamixer.AmixerSession')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend_set_volume_none_keeps_volume(self, mock_native, mock_session):
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=AlsaMixer.BACKEND_AMIXER)
+
+        self.assertEqual(mixer.set_volume('PCM', None), 11)
+        self.assertFalse(mock_session.called)
+
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_auto_backend_set_volume_none_keeps_libasound(self, mock_native):
+        mock_native.return_value.get_volume.return_value = 33
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN)
+
+        self.assertEqual(mixer.set_volume('PCM', None), 33)
+        self.assertFalse(mock_native.return_value.set_volume.called)
+        self.assertEqual(mixer.get_backend(), AlsaMixer.BACKEND_LIBASOUND)
+
+    @patch('backend.alsamixer.AmixerSession')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend_set_capture_volume_none(self, mock_native, mock_session):
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=AlsaMixer.BACKEND_AMIXER, device='hw:1')
+
+        mixer.set_volume('Mic', None, capture=True)
+
+        self.assertFalse(mock_session.return_value.sset.called)
+        self.assertFalse(mock_session.return_value.execute.called)
+
+    @patch('backend.alsamixer.AmixerSession')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend_set_volumes_single_batch(self, mock_native, mock_session):
+        capture_output = "Simple mixer control 'Mic',0\n  Capture channels: Mono\n  Mono: Capture 20 [40%] [on]"
+        mock_session.return_value.execute.return_value = [self.SSET_OUTPUT, capture_output]
+        mixer = AlsaMixer(self.alsa, (None, r'\[(\d*)%\]'), backend=AlsaMixer.BACKEND_AMIXER, device='hw:1')
+
+        volumes = mixer.set_volumes([('PCM', 20, False), ('Mic', 40, True)])
+
+        self.assertEqual(volumes, [22, 40])
+        self.assertEqual(mock_session.call_count, 1)
+        self.assertEqual(mock_session.return_value.execute.call_count, 1)
+        mock_session.return_value.sset.assert_any_call('PCM', '20%')
+        mock_session.return_value.sset.assert_any_call('Mic', '40% capture')
+
+    @patch('backend.alsamixer.subprocess.check_output')
+    @patch('backend.alsamixer.AmixerSession')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend_set_volumes_keeps_none_volume(self, mock_native, mock_session, mock_check_output):
+        mock_check_output.return_value = b"Simple mixer control 'Mic',0\n  Mono: Capture 20 [35%] [on]"
+        mock_session.return_value.execute.return_value = [self.SSET_OUTPUT]
+        mixer = AlsaMixer(self.alsa, (None, r'\[(\d*)%\]'), backend=AlsaMixer.BACKEND_AMIXER, device='hw:1')
+
+        self.assertEqual(mixer.set_volumes([('PCM', 20, False), ('Mic', None, True)]), [22, 35])
+        mock_session.return_value.sset.assert_called_once_with('PCM', '20%')
+
+    @patch('backend.alsamixer.AmixerSession')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend_set_volumes_failed(self, mock_native, mock_session):
+        mock_session.return_value.execute.side_effect = Exception('Amixer batch failed')
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=AlsaMixer.BACKEND_AMIXER)
+
+        self.assertEqual(mixer.set_volumes([('PCM', 20, False), ('Mic', 40, True)]), [None, None])
+
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_libasound_backend_set_volumes(self, mock_native):
+        mock_native.return_value.set_volume.side_effect = lambda control, volume, capture: volume
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN)
+
+        self.assertEqual(mixer.set_volumes([('PCM', 20, False), ('Mic', 40, True)]), [20, 40])
+
+    @patch('backend.alsamixer.subprocess.check_output')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend_on_card_device(self, mock_native, mock_check_output):
+        mixer = AlsaMixer(self.alsa, (None, r'\[(\d*)%\]'), backend=AlsaMixer.BACKEND_AMIXER, device='hw:2')
+
+        mock_check_output.return_value = b"Simple mixer control 'Mic',0\n  Limits: Capture 0 - 16\n  Mono: Capture 8 [50%] [0.00dB] [on]\n"
+        self.assertEqual(mixer.get_volume('Mic', capture=True), 50)
+        self.assertEqual(mock_check_output.call_args[0][0], ['amixer', '-D', 'hw:2', 'sget', 'Mic'])
+
+        mock_check_output.return_value = b"Simple mixer control 'Mic',0\nSimple mixer control 'Auto Gain Control',0\n"
+        self.assertEqual(mixer.get_controls(), ['Mic', 'Auto Gain Control'])
+        self.assertEqual(mock_check_output.call_args[0][0], ['amixer', '-D', 'hw:2', 'scontrols'])
+        self.assertFalse(self.alsa.get_volume.called)
+        self.assertFalse(self.alsa.get_simple_controls.called)
+
+    @patch('backend.alsamixer.subprocess.check_output')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_amixer_backend_on_card_device_failed(self, mock_native, mock_check_output):
+        mock_check_output.side_effect = OSError('amixer not found')
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=AlsaMixer.BACKEND_AMIXER, device='hw:2')
+
+        self.assertIsNone(mixer.get_volume('PCM'))
+        self.assertEqual(mixer.get_controls(), [])
+
+    def test_parse_volume(self):
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=AlsaMixer.BACKEND_AMIXER)
+
+        self.assertEqual(mixer.parse_volume(self.SSET_OUTPUT), 22)
+        self.assertIsNone(mixer.parse_volume(None))
+        self.assertIsNone(mixer.parse_volume("Simple mixer control 'PCM',0\n  Playback channels: Mono"))
+
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_auto_backend_get_controls_uses_libasound(self, mock_native):
+        mock_native.return_value.get_controls.return_value = ['Headphone']
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN)
+
+        self.assertEqual(mixer.get_controls(), ['Headphone'])
+        self.assertFalse(self.alsa.get_simple_controls.called)
+
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_auto_backend_uses_libasound(self, mock_native):
+        mock_native.return_value.get_volume.return_value = 33
+        mock_native.return_value.set_volume.return_value = 44
+        mixer = AlsaMixer(self.alsa, ('Mono', 'pattern'))
+
+        self.assertEqual(mixer.get_backend(), AlsaMixer.BACKEND_LIBASOUND)
+        self.assertEqual(mixer.get_volume('PCM'), 33)
+        self.assertEqual(mixer.set_volume('PCM', 50), 44)
+        self.assertFalse(self.alsa.get_volume.called)
+        self.assertFalse(self.alsa.set_volume.called)
+
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_auto_backend_fallback_to_amixer_if_libasound_unavailable(self, mock_native):
+        mock_native.side_effect = OSError('libasound not found')
+        mixer = AlsaMixer(self.alsa, ('Mono', 'pattern'))
+
+        self.assertEqual(mixer.get_backend(), AlsaMixer.BACKEND_AMIXER)
+        self.assertEqual(mixer.get_volume('PCM'), 11)
+
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_auto_backend_fallback_to_amixer_if_libasound_fails(self, mock_native):
+        mock_native.return_value.get_volume.side_effect = OSError('Mixer control "PCM" not found')
+        mixer = AlsaMixer(self.alsa, ('Mono', 'pattern'))
+
+        self.assertEqual(mixer.get_volume('PCM'), 11)
+        self.assertEqual(mixer.get_backend(), AlsaMixer.BACKEND_AMIXER)
+        self.assertTrue(mock_native.return_value.close.called)
+
+    @patch('backend.alsamixer.AmixerSession')
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_libasound_backend_raises_libasound_errors(self, mock_native, mock_session):
+        mock_native.return_value.set_volume.side_effect = OSError('Unable to set volume')
+        mock_native.return_value.get_volume.side_effect = OSError('Unable to read volume')
+        mock_native.return_value.get_controls.side_effect = OSError('Unable to list controls')
+        mixer = AlsaMixer(self.alsa, self.VOLUME_PATTERN, backend=AlsaMixer.BACKEND_LIBASOUND)
+
+        with self.assertRaises(OSError) as cm:
+            mixer.set_volume('PCM', 10)
+        self.assertEqual(str(cm.exception), 'Unable to set volume')
+        with self.assertRaises(OSError):
+            mixer.get_volume('PCM')
+        with self.assertRaises(OSError):
+            mixer.get_controls()
+        self.assertEqual(mixer.get_backend(), AlsaMixer.BACKEND_LIBASOUND)
+        self.assertFalse(mock_session.called)
+        self.assertFalse(self.alsa.get_volume.called)
+
+    @patch('backend.alsamixer.LibasoundMixer')
+    def test_libasound_backend_unavailable(self, mock_native):
+        mock_native.side_effect = OSError('libasound not found')
+
+        with self.assertRaises(OSError) as cm:
+            AlsaMixer(self.alsa, ('Mono', 'pattern'), backend=AlsaMixer.BACKEND_LIBASOUND)
+        self.assertEqual(str(cm.exception), 'Libasound mixer backend is not available')
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError) as cm:
+            AlsaMixer(self.alsa, ('Mono', 'pattern'), backend='dummy')
+        self.assertEqual(str(cm.exception), 'Invalid mixer backend "dummy"')
+
+
+class TestLibasoundMixer(unittest.TestCase):
+
+    def test_raw_to_percent(self):
+        self.assertEqual(LibasoundMixer.raw_to_percent(-10239, -10239, 400), 0)
+        self.assertEqual(LibasoundMixer.raw_to_percent(400, -10239, 400), 100)
+        self.assertEqual(LibasoundMixer.raw_to_percent(-4919, -10239, 400), 50)
+        self.assertEqual(LibasoundMixer.raw_to_percent(0, 0, 0), 0)
+
+    def test_percent_to_raw(self):
+        self.assertEqual(LibasoundMixer.percent_to_raw(0, -10239, 400), -10239)
+        self.assertEqual(LibasoundMixer.percent_to_raw(100, -10239, 400), 400)
+        self.assertEqual(LibasoundMixer.percent_to_raw(150, 0, 255), 255)
+        self.assertEqual(LibasoundMixer.percent_to_raw(50, 0, 255), 128)
+
+    @patch('backend.alsamixer.ctypes.util.find_library')
+    def test_libasound_not_found(self, mock_find):
+        mock_find.return_value = None
+
+        with self.assertRaises(OSError) as cm:
+            LibasoundMixer()
+        self.assertEqual(str(cm.exception), 'libasound not found')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.amixersession import AmixerSession
+import subprocess
+from mock import patch
+
+AMIXER_OUTPUT = """Simple mixer control 'PCM',0
+  Capabilities: pvolume pvolume-joined pswitch pswitch-joined
+  Playback channels: Mono
+  Limits: Playback -10239 - 400
+  Mono: Playback -2000 [42%] [-20.00dB] [on]
+numid=3,iface=MIXER,name='PCM Playback Route'
+  ; type=INTEGER,access=rw------,values=1,min=0,max=2,step=0
+  : values=1
+"""
+
+
+class TestAmixerSession(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def test_get_command(self):
+        self.assertEqual(AmixerSession().get_command(), ['amixer', '--stdin'])
+        self.assertEqual(AmixerSession(device='hw:1').get_command(), ['amixer', '-D', 'hw:1', '--stdin'])
+
+    def test_queue(self):
+        session = AmixerSession()
+
+        self.assertEqual(session.sset('PCM', '50%'), 0)
+        self.assertEqual(session.cset(3, 1), 1)
+
+        self.assertEqual(len(session), 2)
+
+    def test_queue_none_value(self):
+        session = AmixerSession()
+
+        with self.assertRaises(ValueError):
+            session.sset('PCM', None)
+        with self.assertRaises(ValueError):
+            session.cset(3, None)
+        self.assertEqual(len(session), 0)
+
+    def test_parse_output(self):
+        blocks = AmixerSession().parse_output(AMIXER_OUTPUT)
+
+        self.assertEqual(sorted(blocks.keys()), [('name', 'PCM'), ('numid', '3')])
+        self.assertEqual(blocks[('name', 'PCM')][-1], '  Mono: Playback -2000 [42%] [-20.00dB] [on]')
+        self.assertEqual(blocks[('numid', '3')][-1], '  : values=1')
+
+    @patch('backend.amixersession.subprocess.Popen')
+    def test_execute(self, mock_popen):
+        mock_popen.return_value.communicate.return_value = (AMIXER_OUTPUT.encode('utf-8'), b'')
+        mock_popen.return_value.returncode = 0
+        session = AmixerSession()
+        session.cset(3, 1)
+        session.sset('PCM', '42%')
+        session.cset(4, 0)
+
+        outputs = session.execute()
+
+        self.assertEqual(mock_popen.call_count, 1)
+        mock_popen.return_value.communicate.assert_called_with(b"cset numid=3 1\nsset 'PCM' 42%\ncset numid=4 0\n", timeout=5.0)
+        self.assertTrue(outputs[0].startswith('numid=3'))
+        self.assertTrue(outputs[1].startswith("Simple mixer control 'PCM'"))
+        self.assertIsNone(outputs[2])
+        self.assertEqual(len(session), 0)
+
+    @patch('backend.amixersession.subprocess.Popen')
+    def test_execute_empty_batch(self, mock_popen):
+        self.assertEqual(AmixerSession().execute(), [])
+        self.assertFalse(mock_popen.called)
+
+    @patch('backend.amixersession.subprocess.Popen')
+    def test_execute_failed(self, mock_popen):
+        mock_popen.return_value.communicate.return_value = (b'', b'amixer: Mixer attach default error\n')
+        mock_popen.return_value.returncode = 1
+        session = AmixerSession()
+        session.cset(3, 1)
+
+        with self.assertRaises(Exception) as cm:
+            session.execute()
+        self.assertEqual(str(cm.exception), 'Amixer batch failed: amixer: Mixer attach default error')
+
+    @patch('backend.amixersession.subprocess.Popen')
+    def test_execute_timeout(self, mock_popen):
+        mock_popen.return_value.communicate.side_effect = [subprocess.TimeoutExpired('amixer', 5.0), (b'', b'')]
+        session = AmixerSession()
+        session.cset(3, 1)
+
+        with self.assertRaises(Exception) as cm:
+            session.execute()
+        self.assertEqual(str(cm.exception), 'Amixer batch timed out')
+        self.assertTrue(mock_popen.return_value.kill.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.asoundcards import AsoundCards
+import os
+import shutil
+import tempfile
+
+CARDS = """ 0 [Headphones     ]: bcm2835_headpho - bcm2835 Headphones
+                      bcm2835 Headphones
+ 1 [vc4hdmi        ]: vc4-hdmi - vc4-hdmi
+                      vc4-hdmi
+ 2 [Device         ]: USB-Audio - USB PnP Sound Device
+                      C-Media Electronics Inc. USB PnP Sound Device at usb-3f980000.usb-1.2, full speed
+"""
+
+
+class TestAsoundCards(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.proc_path = tempfile.mkdtemp()
+        self.write_proc(CARDS, {0: ['pcm0p'], 1: ['pcm0p'], 2: ['pcm0p', 'pcm0c', 'id']})
+        self.cards = AsoundCards(self.proc_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.proc_path)
+
+    def write_proc(self, cards, pcms):
+        with open(os.path.join(self.proc_path, 'cards'), 'w') as fd:
+            fd.write(cards)
+        for cardid, entries in pcms.items():
+            for entry in entries:
+                os.makedirs(os.path.join(self.proc_path, 'card%d' % cardid, entry), exist_ok=True)
+
+    def test_get_cards(self):
+        cards = self.cards.get_cards()
+
+        self.assertEqual(len(cards), 3)
+        self.assertEqual(cards[0], {
+            'cardid': 0,
+            'id': 'Headphones',
+            'driver': 'bcm2835_headpho',
+            'name': 'bcm2835 Headphones',
+            'longname': 'bcm2835 Headphones',
+            'playback': [0],
+            'capture': [],
+        })
+        self.assertEqual(cards[2]['name'], 'USB PnP Sound Device')
+        self.assertEqual(cards[2]['playback'], [0])
+        self.assertEqual(cards[2]['capture'], [0])
+
+    def test_get_card(self):
+        self.assertEqual(self.cards.get_card(1)['id'], 'vc4hdmi')
+        self.assertIsNone(self.cards.get_card(5))
+
+    def test_get_card_by_id(self):
+        self.assertEqual(self.cards.get_card_by_id('Device')['cardid'], 2)
+        self.assertIsNone(self.cards.get_card_by_id('dummy'))
+
+    def test_get_card_by_name(self):
+        self.assertEqual(self.cards.get_card_by_name('vc4-hdmi')['cardid'], 1)
+        self.assertIsNone(self.cards.get_card_by_name('dummy'))
+
+    def test_get_cards_by_capability(self):
+        self.assertEqual([card['cardid'] for card in self.cards.get_cards_by_capability(AsoundCards.CAPABILITY_PLAYBACK)], [0, 1, 2])
+        self.assertEqual([card['cardid'] for card in self.cards.get_cards_by_capability(AsoundCards.CAPABILITY_CAPTURE)], [2])
+        self.assertEqual(self.cards.get_cards_by_capability('dummy'), [])
+
+    def test_find(self):
+        self.assertEqual(self.cards.find('BCM2835')['cardid'], 0)
+        self.assertEqual(self.cards.find('usb', AsoundCards.CAPABILITY_CAPTURE)['cardid'], 2)
+        self.assertIsNone(self.cards.find('bcm2835', AsoundCards.CAPABILITY_CAPTURE))
+
+    def test_cache_and_invalidate(self):
+        self.assertEqual(len(self.cards.get_cards()), 3)
+        self.write_proc(CARDS.split('\n 1 ')[0] + '\n', {})
+
+        self.assertEqual(len(self.cards.get_cards()), 3)
+        self.cards.invalidate()
+        self.assertEqual(len(self.cards.get_cards()), 1)
+
+    def test_no_proc_asound(self):
+        cards = AsoundCards(os.path.join(self.proc_path, 'dummy'))
+
+        self.assertEqual(cards.get_cards(), [])
+        self.assertIsNone(cards.find('bcm2835'))
+
+    def test_get_hw_params(self):
+        os.makedirs(os.path.join(self.proc_path, 'card2', 'pcm0p', 'sub0'))
+        with open(os.path.join(self.proc_path, 'card2', 'pcm0p', 'sub0', 'hw_params'), 'w') as fd:
+            fd.write('access: RW_INTERLEAVED\nformat: S16_LE\nsubformat: STD\nchannels: 2\nrate: 48000 (48000/1)\nperiod_size: 1024\nbuffer_size: 4096\n')
+
+        self.assertEqual(self.cards.get_hw_params(2), {
+            'rate': 48000,
+            'channels': 2,
+            'sample_format': 'S16_LE',
+        })
+
+    def test_get_hw_params_closed_device(self):
+        os.makedirs(os.path.join(self.proc_path, 'card2', 'pcm0c', 'sub0'))
+        with open(os.path.join(self.proc_path, 'card2', 'pcm0c', 'sub0', 'hw_params'), 'w') as fd:
+            fd.write('closed\n')
+
+        self.assertIsNone(self.cards.get_hw_params(2, capability=AsoundCards.CAPABILITY_CAPTURE))
+        self.assertIsNone(self.cards.get_hw_params(5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.asoundprofile import AsoundProfile
+
+
+class TestAsoundProfile(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def test_invalid_profile(self):
+        with self.assertRaises(ValueError) as cm:
+            AsoundProfile('dummy')
+        self.assertEqual(str(cm.exception), 'Unknown latency profile "dummy"')
+
+    def test_get_infos(self):
+        self.assertEqual(AsoundProfile(AsoundProfile.LOW_LATENCY, 48000).get_infos(), {
+            'name': 'low-latency',
+            'period_size': 256,
+            'buffer_size': 1024,
+            'latency': 21.3,
+        })
+
+    def test_get_profiles(self):
+        profiles = AsoundProfile.get_profiles()
+
+        self.assertEqual([profile['name'] for profile in profiles], ['low-latency', 'balanced', 'power-save'])
+        self.assertEqual([profile['latency'] for profile in profiles], [23.2, 92.9, 371.5])
+
+    def test_generate_playback(self):
+        content = AsoundProfile(AsoundProfile.BALANCED).generate(1, 0)
+
+        self.assertTrue(content.startswith('# generated by cleep audio module, profile "balanced"'))
+        self.assertIn('    playback.pcm "cleep_playback"', content)
+        self.assertNotIn('capture.pcm', content)
+        self.assertNotIn('dsnoop', content)
+        self.assertIn('ctl.!default {\n    type hw\n    card 1\n}', content)
+        self.assertIn('pcm.cleep_playback {\n    type plug\n    slave.pcm "cleep_dmix"\n}', content)
+        self.assertIn('    type dmix\n', content)
+        self.assertIn('        pcm "hw:1,0"\n        rate 44100\n        period_size 1024\n        buffer_size 4096\n', content)
+
+    def test_generate_capture(self):
+        content = AsoundProfile(AsoundProfile.POWER_SAVE, 48000).generate(2, 1, capture=True)
+
+        self.assertIn('    capture.pcm "cleep_capture"', content)
+        self.assertIn('pcm.cleep_capture {\n    type plug\n    slave.pcm "cleep_dsnoop"\n}', content)
+        self.assertIn('    type dsnoop\n    ipc_key 2049\n', content)
+        self.assertEqual(content.count('pcm "hw:2,1"'), 2)
+        self.assertIn('        rate 48000\n        period_size 4096\n        buffer_size 16384\n', content)
+
+    def test_generate_is_stable(self):
+        self.assertEqual(
+            AsoundProfile(AsoundProfile.LOW_LATENCY).generate(0, 0),
+            AsoundProfile(AsoundProfile.LOW_LATENCY).generate(0, 0),
+        )
+
+    def test_is_generated(self):
+        self.assertTrue(AsoundProfile.is_generated(AsoundProfile(AsoundProfile.LOW_LATENCY).generate(0, 0)))
+        self.assertFalse(AsoundProfile.is_generated('pcm.!default {\n    type hw\n    card 0\n}\n'))
+        self.assertFalse(AsoundProfile.is_generated(None))
+
+    def test_is_capture_shared(self):
+        self.assertTrue(AsoundProfile.is_capture_shared(AsoundProfile(AsoundProfile.LOW_LATENCY).generate(0, 0, capture=True)))
+        self.assertFalse(AsoundProfile.is_capture_shared(AsoundProfile(AsoundProfile.LOW_LATENCY).generate(0, 0)))
+        self.assertFalse(AsoundProfile.is_capture_shared(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,10 +4,15 @@ import sys
 sys.path.append('../')
 from backend.audio import Audio
 from backend.bcm2835audiodriver import Bcm2835AudioDriver
-from cleep.exception import InvalidParameter, MissingParameter, CommandError, Unauthorized
+from backend.alsamixer import AlsaMixer
+from backend.commandstats import CommandStats
+from backend.instrumentedproxy import InstrumentedProxy
+from backend.asoundprofile import AsoundProfile
+from cleep.libs.drivers.driver import Driver
+from cleep.exception import InvalidParameter, MissingParameter, CommandError
 from cleep.libs.tests import session, lib
-import os
 import time
+import threading
 from mock import Mock, MagicMock, patch
 
 class TestAudio(unittest.TestCase):
@@ -44,6 +49,73 @@ class TestAudio(unittest.TestCase):
 
         self.assertFalse(drivers_mock.get_drivers.called)
 
+    @patch('backend.audio.Tools')
+    def test_init_board_infos_computed_once(self, mock_tools):
+        mock_tools.raspberry_pi_infos.return_value = {'audio': True}
+        drivers_mock = Mock()
+        drivers_mock.get_driver.side_effect = [None, None]
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+
+        self.assertEqual(self.module._get_board_infos(), {'audio': True})
+        self.assertEqual(self.module.bcm2835_driver._get_board_infos(), {'audio': True})
+        self.assertEqual(mock_tools.raspberry_pi_infos.call_count, 1)
+
+    @patch('backend.audio.Alsa')
+    def test_init_alsa_created_on_first_use(self, mock_alsa):
+        self.init_session()
+
+        self.assertFalse(mock_alsa.called)
+        self.assertIs(self.module._get_alsa(), self.module._get_alsa())
+        self.assertEqual(mock_alsa.call_count, 1)
+
+    @patch('backend.audio.VolumeRamp')
+    @patch('backend.audio.SoundAssets')
+    @patch('backend.audio.CardRegistry')
+    @patch('backend.audio.LevelMeter')
+    @patch('backend.sharedstreams.CaptureStream')
+    def test_init_helpers_created_on_first_use(self, mock_stream, mock_meter, mock_registry, mock_assets, mock_ramp):
+        self.init_session()
+
+        for mock_helper in (mock_stream, mock_meter, mock_registry, mock_assets, mock_ramp):
+            self.assertFalse(mock_helper.called)
+        self.assertIs(self.module._get_level_meter(), self.module._get_level_meter())
+        self.assertEqual(mock_meter.call_args[1]['stream'], mock_stream.return_value)
+        self.assertEqual(mock_stream.call_count, 1)
+
+    @patch('backend.audio.CardRegistry')
+    def test_card_registry_created_with_active_cards(self, mock_registry):
+        self.init_session()
+        self.module._get_config_field = Mock(return_value=['Device'])
+
+        self.module._get_card_registry()
+
+        mock_registry.return_value.set_active_cards.assert_called_with(['Device'])
+
+    @patch('backend.audio.VolumeRamp')
+    @patch('backend.audio.LevelMeter')
+    @patch('backend.sharedstreams.CaptureStream')
+    def test_on_stop_unused_helpers_not_created(self, mock_stream, mock_meter, mock_ramp):
+        self.init_session()
+
+        self.module._on_stop()
+
+        self.assertFalse(mock_stream.called)
+        self.assertFalse(mock_meter.called)
+        self.assertFalse(mock_ramp.called)
+
+    @patch('backend.audio.LevelMeter')
+    @patch('backend.sharedstreams.CaptureStream')
+    def test_on_stop_stops_used_helpers(self, mock_stream, mock_meter):
+        self.init_session()
+        self.module._get_level_meter()
+
+        self.module._on_stop()
+
+        self.assertTrue(mock_meter.return_value.stop.called)
+        self.assertTrue(mock_stream.return_value.stop.called)
+
     def test_init_configured_driver_not_available(self):
         default_driver = Mock()
         default_driver.is_installed.return_value = False
@@ -98,6 +170,363 @@ class TestAudio(unittest.TestCase):
         # self.assertTrue(isinstance(conf['volumes']['playback'], int))
         # self.assertIsNone(conf['volumes']['capture'])
 
+    def _get_drivers_mock(self):
+        driver = Mock()
+        driver.card_name = 'dummycard'
+        driver.get_device_infos.return_value = {'playback': True, 'capture': False}
+        driver.is_enabled.return_value = True
+        driver.is_installed.return_value = True
+        driver.get_volumes.return_value = {'playback': 50, 'capture': None}
+        drivers_mock = Mock()
+        drivers_mock.get_drivers.return_value = {'dummydriver': driver}
+        drivers_mock.get_driver.return_value = driver
+        return drivers_mock, driver
+
+    def test_get_module_config_cached(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        driver.get_device_infos.reset_mock()
+
+        conf1 = self.module.get_module_config()
+        conf2 = self.module.get_module_config()
+
+        self.assertEqual(conf1, conf2)
+        self.assertEqual(driver.get_device_infos.call_count, 1)
+        self.assertEqual(conf1['volumes'], {'playback': 50, 'capture': None})
+
+    def test_get_module_config_cache_expired(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.DEVICES_CACHE_TTL = 0.0
+        driver.get_device_infos.reset_mock()
+
+        self.module.get_module_config()
+        self.module.get_module_config()
+
+        self.assertEqual(driver.get_device_infos.call_count, 2)
+
+    def test_get_module_config_volumes_updated_by_set_volumes(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module.config_changed_event = Mock()
+        driver.get_device_infos.reset_mock()
+
+        conf = self.module.get_module_config()
+        driver.get_volumes.return_value = {'playback': 12, 'capture': 34}
+        self.module.set_volumes(12, 34)
+        result = self.module.get_module_config(conf['version'])
+
+        self.assertEqual(driver.get_device_infos.call_count, 1)
+        self.assertEqual(result['version'], conf['version'] + 1)
+        self.assertEqual(result['volumes'], {'playback': 12, 'capture': 34})
+        self.module.config_changed_event.send.assert_called_once_with(params={
+            'version': conf['version'] + 1,
+            'changes': {'volumes': {'playback': 12, 'capture': 34}},
+        })
+
+    def test_publish_volumes_unchanged(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.config_changed_event = Mock()
+        conf = self.module.get_module_config()
+
+        self.module._publish_volumes({'playback': 50, 'capture': None})
+
+        self.assertEqual(self.module.get_module_config(conf['version']), {'version': conf['version'], 'modified': False})
+        self.assertFalse(self.module.config_changed_event.send.called)
+
+    def test_volume_ramp_end_publishes_volumes(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module._publish_volumes = Mock()
+        self.module._invalidate_devices_inventory = Mock()
+
+        self.module._on_volume_ramp_end()
+
+        self.module._publish_volumes.assert_called_once_with({'playback': 50, 'capture': None})
+        self.assertFalse(self.module._invalidate_devices_inventory.called)
+
+    def test_get_module_config_cache_invalidated_by_driver_install(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        driver.get_device_infos.reset_mock()
+
+        self.module.get_module_config()
+        self.module.on_event({
+            'event': 'system.driver.install',
+            'params': {'drivertype': Driver.DRIVER_AUDIO, 'drivername': 'dummydriver', 'installing': False},
+        })
+        self.module.get_module_config()
+
+        self.assertEqual(driver.get_device_infos.call_count, 2)
+
+    def test_get_module_config_cache_not_invalidated_by_other_event(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        driver.get_device_infos.reset_mock()
+
+        self.module.get_module_config()
+        self.module.on_event({
+            'event': 'system.driver.install',
+            'params': {'drivertype': 'electronic', 'drivername': 'dummydriver', 'installing': False},
+        })
+        self.module.get_module_config()
+
+        self.assertEqual(driver.get_device_infos.call_count, 1)
+
+    def test_get_module_config_not_modified(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        conf = self.module.get_module_config()
+        driver.get_device_infos.reset_mock()
+        driver.get_volumes.reset_mock()
+
+        result = self.module.get_module_config(conf['version'])
+
+        self.assertEqual(result, {'version': conf['version'], 'modified': False})
+        self.assertFalse(driver.get_device_infos.called)
+        self.assertFalse(driver.get_volumes.called)
+
+    def test_get_module_config_not_modified_inventory_untouched(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        conf = self.module.get_module_config()
+        self.module._get_devices_inventory = Mock()
+
+        result = self.module.get_module_config(conf['version'])
+
+        self.assertEqual(result, {'version': conf['version'], 'modified': False})
+        self.assertFalse(self.module._get_devices_inventory.called)
+
+    def test_get_module_config_expired_inventory_probed(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.config_changed_event = Mock()
+        conf = self.module.get_module_config()
+        self.module.DEVICES_CACHE_TTL = 0.0
+        # volume changed by another process
+        driver.get_volumes.return_value = {'playback': 30, 'capture': None}
+
+        result = self.module.get_module_config(conf['version'])
+
+        self.assertEqual(result['version'], conf['version'] + 1)
+        self.assertEqual(result['volumes'], {'playback': 30, 'capture': None})
+        self.assertTrue(self.module.config_changed_event.send.called)
+
+    def test_get_module_config_modified(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.config_changed_event = Mock()
+        self.module.CONFIG_PUBLISH_DELAY = 60.0
+        conf = self.module.get_module_config()
+        driver.get_volumes.return_value = {'playback': 80, 'capture': None}
+        self.module._invalidate_devices_inventory()
+
+        result = self.module.get_module_config(conf['version'])
+
+        self.assertEqual(result['version'], conf['version'] + 1)
+        self.assertEqual(result['volumes'], {'playback': 80, 'capture': None})
+        self.module.config_changed_event.send.assert_called_once_with(params={
+            'version': conf['version'] + 1,
+            'changes': {'volumes': {'playback': 80, 'capture': None}},
+        })
+
+    def test_get_module_config_same_version_after_probe(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.config_changed_event = Mock()
+        self.module.DEVICES_CACHE_TTL = 0.0
+        conf = self.module.get_module_config()
+
+        self.assertEqual(self.module.get_module_config(conf['version']), {'version': conf['version'], 'modified': False})
+        self.assertFalse(self.module.config_changed_event.send.called)
+
+    def test_config_changes_pushed_after_invalidation(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.config_changed_event = Mock()
+        self.module.CONFIG_PUBLISH_DELAY = 0.05
+        conf = self.module.get_module_config()
+        driver.get_volumes.return_value = {'playback': 10, 'capture': None}
+        driver.get_device_infos.reset_mock()
+
+        self.module._invalidate_devices_inventory()
+        self.module._invalidate_devices_inventory()
+        time.sleep(0.3)
+
+        self.assertEqual(driver.get_device_infos.call_count, 1)
+        self.module.config_changed_event.send.assert_called_once_with(params={
+            'version': conf['version'] + 1,
+            'changes': {'volumes': {'playback': 10, 'capture': None}},
+        })
+
+    def test_get_module_config_invalid_parameters(self):
+        self.init_session()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_module_config('1')
+        self.assertEqual(str(cm.exception), 'Parameter "version" must be of type "int"')
+
+    def test_get_module_config_probe_drivers_concurrently(self):
+        drivers = {}
+        for index in range(4):
+            driver = Mock()
+            driver.card_name = 'card%d' % index
+            driver.get_device_infos.side_effect = lambda: time.sleep(0.3) or {'playback': True, 'capture': True}
+            driver.is_enabled.return_value = False
+            driver.is_installed.return_value = True
+            drivers['driver%d' % index] = driver
+        drivers_mock = Mock()
+        drivers_mock.get_drivers.return_value = drivers
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+
+        start = time.time()
+        conf = self.module._probe_devices()
+
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual([device['label'] for device in conf['devices']['playback']], ['driver0', 'driver1', 'driver2', 'driver3'])
+        self.assertEqual(len(conf['devices']['capture']), 4)
+
+    def test_get_module_config_hung_driver_unavailable(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        hung_driver = Mock()
+        hung_driver.card_name = 'hungcard'
+        hung_driver.get_device_infos.side_effect = lambda: time.sleep(1.0)
+        drivers_mock.get_drivers.return_value = {'dummydriver': driver, 'hungdriver': hung_driver}
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.PROBE_TIMEOUT = 0.2
+
+        start = time.time()
+        conf = self.module._probe_devices()
+
+        self.assertLess(time.time() - start, 0.8)
+        self.assertEqual(len(conf['devices']['playback']), 2)
+        self.assertFalse(conf['devices']['playback'][0]['unavailable'])
+        self.assertEqual(conf['devices']['playback'][1], {
+            'name': 'hungcard',
+            'label': 'hungdriver',
+            'device': None,
+            'enabled': False,
+            'installed': False,
+            'unavailable': True,
+        })
+        self.assertEqual(conf['volumes'], {'playback': 50, 'capture': None})
+
+    def test_get_module_config_hung_driver_not_probed_again(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        hung_driver = Mock()
+        hung_driver.card_name = 'hungcard'
+        hung_driver.get_device_infos.side_effect = lambda: time.sleep(1.0)
+        drivers_mock.get_drivers.return_value = {'dummydriver': driver, 'hungdriver': hung_driver}
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.PROBE_TIMEOUT = 0.1
+        hung_driver.get_device_infos.reset_mock()
+
+        self.module._probe_devices()
+        conf = self.module._probe_devices()
+
+        self.assertEqual(hung_driver.get_device_infos.call_count, 1)
+        self.assertTrue(conf['devices']['playback'][1]['unavailable'])
+        self.assertFalse(conf['devices']['playback'][0]['unavailable'])
+
+    def test_get_module_config_failing_driver_unavailable(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        driver.get_device_infos.side_effect = Exception('Test exception')
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+
+        conf = self.module._probe_devices()
+
+        self.assertTrue(conf['devices']['playback'][0]['unavailable'])
+        self.assertEqual(conf['devices']['capture'], [])
+
+    def test_on_card_hotplug_added(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.asound_cards = Mock()
+        self.module.asound_cards.get_card.return_value = {'cardid': 2, 'id': 'Device', 'name': 'USB PnP Sound Device'}
+        self.module.device_added_event = Mock()
+        self.module.get_module_config()
+        driver.get_device_infos.reset_mock()
+
+        self.module._on_card_hotplug('added', 2)
+        self.module.get_module_config()
+
+        self.assertTrue(self.module.asound_cards.invalidate.called)
+        self.assertEqual(driver.get_device_infos.call_count, 1)
+        self.module.device_added_event.send.assert_called_with(params={'cardid': 2, 'id': 'Device', 'name': 'USB PnP Sound Device'})
+
+    def test_on_card_hotplug_invalidates_drivers_controls(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.asound_cards = Mock()
+        self.module.asound_cards.get_card.return_value = None
+        self.module.device_added_event = Mock()
+
+        self.module._on_card_hotplug('added', 2)
+
+        self.assertTrue(driver.invalidate_controls.called)
+
+    def test_on_card_hotplug_removed(self):
+        self.init_session()
+        self.module.asound_cards = Mock()
+        self.module.asound_cards.get_card.return_value = {'cardid': 2, 'id': 'Device', 'name': 'USB PnP Sound Device'}
+        self.module.device_added_event = Mock()
+        self.module.device_removed_event = Mock()
+        self.module._on_card_hotplug('added', 2)
+        self.module.asound_cards.get_card.return_value = None
+
+        self.module._on_card_hotplug('removed', 2)
+
+        self.module.device_removed_event.send.assert_called_with(params={'cardid': 2, 'id': 'Device', 'name': 'USB PnP Sound Device'})
+
+    def test_on_card_hotplug_removed_unknown_card(self):
+        self.init_session()
+        self.module.device_removed_event = Mock()
+
+        self.module._on_card_hotplug('removed', 5)
+
+        self.module.device_removed_event.send.assert_called_with(params={'cardid': 5, 'id': None, 'name': None})
+
     @patch('backend.audio.Tools')
     def test_select_device(self, mock_tools):
         mock_tools.raspberry_pi_infos.return_value = {'audio': True}
@@ -119,11 +548,41 @@ class TestAudio(unittest.TestCase):
         self.module._get_config_field = Mock(return_value='selecteddriver')
         self.module._set_config_field = Mock()
 
-        self.module.select_device('dummydriver')
+        result = self.module.select_device('dummydriver')
+        self.assertEqual(result['driver'], 'dummydriver')
+        self.assertTrue(isinstance(result['duration'], float))
         self.assertTrue(old_driver.disable.called)
         self.assertTrue(new_driver.enable.called)
+        self.assertTrue(new_driver.invalidate_controls.called)
         self.module._set_config_field.assert_called_with('driver', 'dummydriver')
 
+    @patch('backend.audio.Tools')
+    def test_select_device_suspends_capture(self, mock_tools):
+        mock_tools.raspberry_pi_infos.return_value = {'audio': True}
+        old_driver = Mock(name='olddriver')
+        old_driver.disable.return_value = True
+        new_driver = Mock(name='newdriver')
+        new_driver.configure_mock(name='dummydriver')
+        new_driver.is_installed.return_value = True
+        new_driver.is_card_enabled.return_value = True
+        calls = []
+        new_driver.enable.side_effect = lambda: calls.append('enable') or True
+        drivers_mock = Mock()
+        drivers_mock.get_driver.side_effect = [old_driver, old_driver, new_driver]
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='selecteddriver')
+        self.module._set_config_field = Mock()
+        self.module._get_capture_stream = Mock(return_value=Mock())
+        self.module._get_capture_stream().suspend.side_effect = lambda: calls.append('capture_stream.suspend')
+        self.module._get_capture_stream().resume.side_effect = lambda: calls.append('capture_stream.resume')
+
+        self.module.select_device('dummydriver')
+
+        self.assertEqual(calls, ['capture_stream.suspend', 'enable', 'capture_stream.resume'])
+        self.assertFalse(self.module._get_capture_stream().stop.called)
+
     @patch('backend.audio.Tools')
     def test_select_device_fallback_old_driver_if_error(self, mock_tools):
         mock_tools.raspberry_pi_infos.return_value = {'audio': True}
@@ -148,6 +607,8 @@ class TestAudio(unittest.TestCase):
         with self.assertRaises(CommandError) as cm:
             self.module.select_device('dummydriver')
         self.assertEqual(str(cm.exception), 'Unable to enable selected device')
+        self.assertTrue(old_driver.enable.called)
+        self.assertFalse(self.module._set_config_field.called)
 
     def test_select_device_invalid_parameters(self):
         self.init_session()
@@ -180,48 +641,832 @@ class TestAudio(unittest.TestCase):
         self.module._get_config_field = Mock(return_value='selecteddriver')
         self.module._set_config_field = Mock()
 
-        with self.assertRaises(InvalidParameter) as cm:
-            self.module.select_device('dummydriver')
-        self.assertEqual(str(cm.exception), 'Specified driver does not exist')
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.select_device('dummydriver')
+        self.assertEqual(str(cm.exception), 'Specified driver does not exist')
+
+    @patch('backend.audio.Tools')
+    def test_select_device_new_driver_not_installed(self, mock_tools):
+        mock_tools.raspberry_pi_infos.return_value = {'audio': True}
+        old_driver = Mock(name='olddriver')
+        old_driver.is_installed.return_value = True
+        old_driver.disable.return_value = True
+        new_driver = Mock(name='newdriver')
+        # add mock class variable
+        attrs = {'name': 'dummydriver'}
+        new_driver.configure_mock(**attrs)
+        new_driver.is_installed.return_value = False
+        new_driver.enable.return_value = True
+        new_driver.is_card_enabled.return_value = True
+        drivers_mock = Mock()
+        drivers_mock.get_driver.side_effect = [old_driver, old_driver, new_driver]
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='drivername')
+        self.module._set_config_field = Mock()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.select_device('dummydriver')
+        self.assertEqual(str(cm.exception), 'Can\'t selected device because its driver seems not to be installed')
+
+    def test_set_volumes(self):
+        driver = Mock()
+        driver.is_installed.return_value = True
+        drivers_mock = Mock()
+        drivers_mock.get_driver.return_value = driver
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+
+        self.module.set_volumes(12, 34)
+
+        driver.set_volumes.assert_called_with(12, 34)
+
+    def test_set_volumes_coalesced(self):
+        driver = Mock()
+        driver.get_volumes.return_value = {'playback': 30, 'capture': 40}
+        drivers_mock = Mock()
+        drivers_mock.get_driver.return_value = driver
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        results = []
+        def set_volumes(playback, capture):
+            results.append(self.module.set_volumes(playback, capture))
+
+        threads = []
+        for volumes in [(10, 10), (20, 20), (30, 40)]:
+            thread = threading.Thread(target=set_volumes, args=volumes)
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+
+        driver.set_volumes.assert_called_once_with(30, 40)
+        self.assertEqual(results, [{'playback': 30, 'capture': 40}] * 3)
+
+    def test_set_volumes_cancels_volume_ramp(self):
+        driver = Mock()
+        drivers_mock = Mock()
+        drivers_mock.get_driver.return_value = driver
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module._get_volume_ramp = Mock(return_value=Mock())
+
+        self.module.set_volumes(12, 34)
+
+        self.assertTrue(self.module._get_volume_ramp().cancel.called)
+
+    def test_fade_volumes(self):
+        driver = Mock()
+        driver.get_volumes.return_value = {'playback': 20, 'capture': None}
+        drivers_mock = Mock()
+        drivers_mock.get_driver.return_value = driver
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module._get_volume_ramp = Mock(return_value=Mock())
+
+        self.module.fade_volumes(playback=80, duration=500)
+
+        self.module._get_volume_ramp().start.assert_called_with(driver, playback=(20, 80), capture=None, duration=500)
+
+    def test_fade_volumes_with_start_values(self):
+        driver = Mock()
+        drivers_mock = Mock()
+        drivers_mock.get_driver.return_value = driver
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module._get_volume_ramp = Mock(return_value=Mock())
+
+        self.module.fade_volumes(playback=0, capture=50, duration=500, playback_from=100, capture_from=10)
+
+        self.assertFalse(driver.get_volumes.called)
+        self.module._get_volume_ramp().start.assert_called_with(driver, playback=(100, 0), capture=(10, 50), duration=500)
+
+    def test_fade_volumes_no_driver(self):
+        drivers_mock = Mock()
+        drivers_mock.get_driver.return_value = None
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value=None)
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.fade_volumes(playback=80)
+        self.assertEqual(str(cm.exception), 'No audio device selected')
+
+    def test_get_stats(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.reset_stats()
+
+        self.module.get_module_config()
+        self.module.get_module_config()
+        with self.assertRaises(InvalidParameter):
+            self.module.get_test_job('unknown')
+        stats = self.module.get_stats()
+
+        self.assertEqual(stats['get_module_config']['count'], 2)
+        self.assertEqual(stats['get_module_config']['failures'], 0)
+        self.assertEqual(stats['get_test_job']['failures'], 1)
+        self.assertEqual(sorted(stats['get_module_config'].keys()), ['count', 'failures', 'max', 'p50', 'p95', 'p99', 'total'])
+
+    @patch('backend.audio.Alsa')
+    def test_get_stats_alsa_calls(self, mock_alsa):
+        self.init_session()
+        self.module.reset_stats()
+
+        self.module._get_alsa().play_sound('/tmp/sound.wav')
+
+        self.assertEqual(self.module.get_stats()['alsa.play_sound']['count'], 1)
+        mock_alsa.return_value.play_sound.assert_called_with('/tmp/sound.wav')
+
+    def test_reset_stats(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module.get_module_config()
+
+        self.module.reset_stats()
+
+        self.assertEqual(self.module.get_stats(), {})
+
+    @patch('backend.audio.LatencyBench')
+    def test_benchmark_latency(self, mock_bench):
+        mock_bench.return_value.run.return_value = {'runs': 3, 'failed': 0}
+        self.init_session()
+        self.module.asound_cards = Mock()
+        self.module.asound_cards.get_card_by_id.return_value = None
+        self.module._need_resource = Mock()
+        self.module._release_resource = Mock()
+
+        job_id = self.module.benchmark_latency(runs=3)
+        self.assertEqual(self.module.get_test_job(job_id)['status'], 'waiting')
+        self.module._resource_acquired('audio.playback')
+        self.assertEqual(self.module.get_test_job(job_id)['status'], 'waiting')
+        self.module._resource_acquired('audio.capture')
+
+        job = self.wait_test_job(job_id)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result'], {'runs': 3, 'failed': 0})
+        mock_bench.assert_called_with(reference_devices=None)
+        mock_bench.return_value.run.assert_called_with(3)
+        self.assertEqual([call[0][0] for call in self.module._need_resource.call_args_list], ['audio.playback', 'audio.capture'])
+        self.assertEqual([call[0][0] for call in self.module._release_resource.call_args_list], ['audio.playback', 'audio.capture'])
+
+    @patch('backend.audio.LatencyBench')
+    def test_benchmark_latency_calibrated_on_loopback(self, mock_bench):
+        mock_bench.return_value.run.return_value = {'runs': 1, 'failed': 0}
+        self.init_session()
+        self.module.asound_cards = Mock()
+        self.module.asound_cards.get_card_by_id.return_value = {'cardid': 3, 'id': 'Loopback'}
+        self.module._need_resource = Mock()
+        self.module._release_resource = Mock()
+
+        job_id = self.module.benchmark_latency(runs=1)
+        self.module._resource_acquired('audio.playback')
+        self.module._resource_acquired('audio.capture')
+
+        self.wait_test_job(job_id)
+        self.module.asound_cards.get_card_by_id.assert_called_with('Loopback')
+        mock_bench.assert_called_with(reference_devices=('hw:3,0', 'hw:3,1'))
+
+    @patch('backend.audio.LatencyBench')
+    def test_benchmark_latency_numpy_not_installed(self, mock_bench):
+        mock_bench.return_value.run.side_effect = ImportError('No module named numpy')
+        self.init_session()
+        self.module._need_resource = Mock()
+        self.module._release_resource = Mock()
+
+        job_id = self.module.benchmark_latency()
+        self.module._resource_acquired('audio.playback')
+        self.module._resource_acquired('audio.capture')
+
+        job = self.wait_test_job(job_id)
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'Latency benchmark requires numpy library')
+        self.assertEqual(self.module._release_resource.call_count, 2)
+
+    def test_benchmark_latency_test_running(self):
+        self.init_session()
+        self.module._need_resource = Mock()
+
+        self.module.test_recording()
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.benchmark_latency()
+        self.assertEqual(str(cm.exception), 'A recording test is already running')
+
+    def test_benchmark_latency_invalid_parameters(self):
+        self.init_session()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.benchmark_latency(runs=0)
+        self.assertEqual(str(cm.exception), 'Parameter "runs" must be 1<=runs<=20')
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.benchmark_latency(runs=21)
+        self.assertEqual(str(cm.exception), 'Parameter "runs" must be 1<=runs<=20')
+
+    def test_set_latency_profile(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(side_effect=lambda field: {'driver': 'dummydriver', 'latency_profile': None}[field])
+        self.module._set_config_field = Mock()
+        self.module._get_playback_format = Mock(return_value={'rate': 48000})
+        driver.enable.return_value = True
+
+        result = self.module.set_latency_profile('low-latency')
+
+        driver.set_latency_profile.assert_called_with('low-latency')
+        self.assertTrue(driver.enable.called)
+        self.module._set_config_field.assert_called_with('latency_profile', 'low-latency')
+        self.assertEqual(result, {'name': 'low-latency', 'period_size': 256, 'buffer_size': 1024, 'latency': 21.3})
+
+    def test_set_latency_profile_default(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(side_effect=lambda field: {'driver': 'dummydriver', 'latency_profile': 'balanced'}[field])
+        self.module._set_config_field = Mock()
+        driver.enable.return_value = True
+
+        self.assertIsNone(self.module.set_latency_profile(None))
+
+        driver.set_latency_profile.assert_called_with(None)
+        self.module._set_config_field.assert_called_with('latency_profile', None)
+
+    def test_set_latency_profile_failed(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(side_effect=lambda field: {'driver': 'dummydriver', 'latency_profile': 'balanced'}[field])
+        self.module._set_config_field = Mock()
+        driver.enable.side_effect = [False, True]
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.set_latency_profile('low-latency')
+        self.assertEqual(str(cm.exception), 'Unable to apply latency profile')
+
+        driver.set_latency_profile.assert_called_with('balanced')
+        self.assertEqual(driver.enable.call_count, 2)
+        self.assertFalse(self.module._set_config_field.called)
+
+    def test_set_latency_profile_restore_failed(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(side_effect=lambda field: {'driver': 'dummydriver', 'latency_profile': 'balanced'}[field])
+        self.module._set_config_field = Mock()
+        self.module._invalidate_devices_inventory = Mock()
+        driver.enable.side_effect = [False, False]
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.set_latency_profile('low-latency')
+        self.assertEqual(str(cm.exception), 'Unable to apply latency profile')
+
+        self.assertTrue(self.module._invalidate_devices_inventory.called)
+        self.assertFalse(self.module._set_config_field.called)
+
+    def test_set_latency_profile_resumes_capture(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(side_effect=lambda field: {'driver': 'dummydriver', 'latency_profile': None}[field])
+        self.module._set_config_field = Mock()
+        self.module._get_capture_stream = Mock(return_value=Mock())
+        self.module._get_level_meter = Mock(return_value=Mock())
+        calls = []
+        self.module._get_capture_stream().suspend.side_effect = lambda: calls.append('capture_stream.suspend')
+        self.module._get_capture_stream().resume.side_effect = lambda: calls.append('capture_stream.resume')
+        driver.enable.side_effect = lambda: calls.append('enable') or True
+
+        self.module.set_latency_profile('balanced')
+
+        # consumers (level meter...) are kept
+        self.assertEqual(calls, ['capture_stream.suspend', 'enable', 'capture_stream.resume'])
+        self.assertFalse(self.module._get_capture_stream().stop.called)
+        self.assertFalse(self.module._get_level_meter().stop.called)
+
+    def test_set_latency_profile_failed_resumes_capture(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(side_effect=lambda field: {'driver': 'dummydriver', 'latency_profile': None}[field])
+        self.module._get_capture_stream = Mock(return_value=Mock())
+        driver.enable.side_effect = [False, True]
+
+        with self.assertRaises(CommandError):
+            self.module.set_latency_profile('balanced')
+
+        self.assertTrue(self.module._get_capture_stream().suspend.called)
+        self.assertTrue(self.module._get_capture_stream().resume.called)
+
+    def test_set_latency_profile_capture_not_resumed(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(side_effect=lambda field: {'driver': 'dummydriver', 'latency_profile': None}[field])
+        self.module._set_config_field = Mock()
+        self.module._get_capture_stream = Mock(return_value=Mock())
+        self.module._get_capture_stream().resume.side_effect = OSError('Capture device is busy')
+
+        self.assertIsNotNone(self.module.set_latency_profile('balanced'))
+
+        self.assertTrue(driver.enable.called)
+
+    def test_set_latency_profile_unsupported_driver(self):
+        drivers_mock, driver = self._get_drivers_mock()
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value=None)
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.set_latency_profile('low-latency')
+        self.assertEqual(str(cm.exception), 'Selected device does not support latency profiles')
+
+    def test_set_latency_profile_invalid_parameters(self):
+        self.init_session()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_latency_profile('dummy')
+        self.assertEqual(str(cm.exception), 'Parameter "profile" must be one of [\'balanced\', \'low-latency\', \'power-save\']')
+
+    def test_get_module_config_latency_profiles(self):
+        self.init_session()
+
+        config = self.module.get_module_config()
+
+        self.assertIsNone(config['latencyprofile'])
+        self.assertEqual([profile['name'] for profile in config['latencyprofiles']], ['low-latency', 'balanced', 'power-save'])
+
+    def test_get_cards(self):
+        self.init_session()
+        self.module._get_card_registry = Mock(return_value=Mock())
+        self.module._get_card_registry().get_cards.return_value = [{'cardid': 0, 'id': 'Headphones'}]
+
+        self.assertEqual(self.module.get_cards(), [{'cardid': 0, 'id': 'Headphones'}])
+
+    def test_set_card_active(self):
+        self.init_session()
+        self.module._get_card_registry = Mock(return_value=Mock())
+        self.module._get_card_registry().get_card.return_value = {'cardid': 2, 'id': 'Device'}
+        self.module._get_config_field = Mock(return_value=['Headphones'])
+        self.module._set_config_field = Mock()
+
+        self.assertEqual(self.module.set_card_active('USB PnP Sound Device', True), ['Device', 'Headphones'])
+
+        self.module._set_config_field.assert_called_with('active_cards', ['Device', 'Headphones'])
+        self.module._get_card_registry().set_active_cards.assert_called_with(['Device', 'Headphones'])
+
+    def test_set_card_active_deactivate(self):
+        self.init_session()
+        self.module._get_card_registry = Mock(return_value=Mock())
+        self.module._get_card_registry().get_card.return_value = {'cardid': 2, 'id': 'Device'}
+        self.module._get_config_field = Mock(return_value=['Device', 'Headphones'])
+        self.module._set_config_field = Mock()
+
+        self.assertEqual(self.module.set_card_active('Device', False), ['Headphones'])
+
+    def test_set_card_active_invalid_parameters(self):
+        self.init_session()
+        self.module._get_card_registry = Mock(return_value=Mock())
+        self.module._get_card_registry().get_card.return_value = None
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_card_active('dummy', True)
+        self.assertEqual(str(cm.exception), 'Card "dummy" does not exist')
+
+        self.module._get_card_registry().get_card.return_value = {'cardid': 2, 'id': 'Device'}
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_card_active('Device', 1)
+        self.assertEqual(str(cm.exception), 'Parameter "active" must be of type "bool"')
+
+    def test_get_cards_volumes(self):
+        self.init_session()
+        self.module._get_card_registry = Mock(return_value=Mock())
+        self.module._get_card_registry().get_volumes.return_value = {'Headphones': {'playback': 50, 'capture': None}}
+
+        self.assertEqual(self.module.get_cards_volumes(), {'Headphones': {'playback': 50, 'capture': None}})
+        self.module._get_card_registry().get_volumes.assert_called_with(None)
+
+    def test_get_cards_volumes_unknown_card(self):
+        self.init_session()
+        self.module._get_card_registry = Mock(return_value=Mock())
+        self.module._get_card_registry().get_volumes.side_effect = ValueError('Card "dummy" does not exist')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_cards_volumes(['dummy'])
+        self.assertEqual(str(cm.exception), 'Card "dummy" does not exist')
+
+    def test_set_cards_volumes(self):
+        self.init_session()
+        self.module._get_card_registry = Mock(return_value=Mock())
+        self.module._get_card_registry().set_volumes.return_value = {'Headphones': {'playback': 10, 'capture': None}}
+        self.module._get_card_registry().get_card.return_value = {'id': 'Headphones'}
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module._invalidate_devices_inventory = Mock()
+        self.module._publish_volumes = Mock()
+
+        result = self.module.set_cards_volumes({'Headphones': {'playback': 10}})
+
+        self.assertEqual(result, {'Headphones': {'playback': 10, 'capture': None}})
+        self.module._get_card_registry().set_volumes.assert_called_with({'Headphones': {'playback': 10}})
+        self.module._publish_volumes.assert_called_once_with({'playback': 10, 'capture': None})
+        self.assertFalse(self.module._invalidate_devices_inventory.called)
+
+    def test_set_cards_volumes_selected_card_not_updated(self):
+        self.init_session()
+        self.module._get_card_registry = Mock(return_value=Mock())
+        self.module._get_card_registry().set_volumes.return_value = {'Device': {'playback': None, 'capture': 40}}
+        self.module._get_card_registry().get_card.return_value = {'id': 'Headphones'}
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module._publish_volumes = Mock()
+
+        self.module.set_cards_volumes({'Device': {'capture': 40}})
+
+        self.assertFalse(self.module._publish_volumes.called)
+
+    def test_set_cards_volumes_invalid_parameters(self):
+        self.init_session()
+        self.module._get_card_registry = Mock(return_value=Mock())
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_cards_volumes({})
+        self.assertEqual(str(cm.exception), 'Parameter "volumes" must not be empty')
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_cards_volumes({'Headphones': {'playback': 101}})
+        self.assertEqual(str(cm.exception), 'Parameter "playback" of card "Headphones" must be 0<=playback<=100')
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_cards_volumes({'Headphones': 10})
+        self.assertEqual(str(cm.exception), 'Parameter "playback" of card "Headphones" must be 0<=playback<=100')
+        self.assertFalse(self.module._get_card_registry().set_volumes.called)
+
+    @patch('backend.audio.CardRegistry')
+    def test_on_card_hotplug_invalidates_card_registry(self, mock_registry):
+        self.init_session()
+        self.module.asound_cards = Mock()
+        self.module.asound_cards.get_card.return_value = None
+        self.module._get_card_registry()
+        self.module.device_added_event = Mock()
+
+        self.module._on_card_hotplug('added', 2)
+
+        self.assertTrue(mock_registry.return_value.invalidate.called)
+
+    @patch('backend.audio.CardRegistry')
+    def test_on_card_hotplug_card_registry_not_created(self, mock_registry):
+        self.init_session()
+        self.module.asound_cards = Mock()
+        self.module.asound_cards.get_card.return_value = None
+        self.module.device_added_event = Mock()
+
+        self.module._on_card_hotplug('added', 2)
+
+        self.assertFalse(mock_registry.called)
+
+    @patch('backend.audio.os.path.exists')
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_play_sound(self, mock_service, mock_exists):
+        mock_exists.return_value = True
+        mock_service.return_value.get_format.return_value = {'rate': 44100, 'channels': 2, 'sample_format': 'S16_LE'}
+        mock_service.return_value.play.return_value = 3
+        self.init_session()
+        self.module.sound_cache = Mock()
+        self.module.sound_cache.get.return_value = b'data'
+
+        self.assertEqual(self.module.play_sound('/dummy/sound.wav'), 3)
+
+        self.module.sound_cache.get.assert_called_with('/dummy/sound.wav', rate=44100, channels=2, sample_format='S16_LE')
+        mock_service.return_value.play.assert_called_with(b'data', 0)
+        self.assertFalse(mock_service.return_value.queue.called)
+
+    @patch('backend.audio.os.path.exists')
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_play_sound_uses_converted_variant(self, mock_service, mock_exists):
+        mock_exists.return_value = True
+        mock_service.return_value.get_format.return_value = {'rate': 48000, 'channels': 2, 'sample_format': 'S16_LE'}
+        self.init_session()
+        self.module.MODULE_SOUNDS = ['/dummy/sound.wav']
+        self.module.sound_cache = Mock()
+        self.module._get_sound_assets = Mock(return_value=Mock())
+        self.module._get_sound_assets().get.return_value = '/var/cache/cleep/audio/48000_2_S16_LE/sound_12345678.wav'
+
+        self.module.play_sound('/dummy/sound.wav')
+
+        self.module._get_sound_assets().get.assert_called_with('/dummy/sound.wav', rate=48000, channels=2, sample_format='S16_LE')
+        self.module.sound_cache.get.assert_called_with('/var/cache/cleep/audio/48000_2_S16_LE/sound_12345678.wav', rate=48000, channels=2, sample_format='S16_LE')
+
+    @patch('backend.audio.os.path.exists')
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_play_sound_conversion_failed(self, mock_service, mock_exists):
+        mock_exists.return_value = True
+        mock_service.return_value.get_format.return_value = {'rate': 48000, 'channels': 2, 'sample_format': 'S16_LE'}
+        self.init_session()
+        self.module.MODULE_SOUNDS = ['/dummy/sound.wav']
+        self.module.sound_cache = Mock()
+        self.module._get_sound_assets = Mock(return_value=Mock())
+        self.module._get_sound_assets().get.side_effect = Exception('Read-only filesystem')
+
+        self.module.play_sound('/dummy/sound.wav')
+
+        self.module.sound_cache.get.assert_called_with('/dummy/sound.wav', rate=48000, channels=2, sample_format='S16_LE')
+
+    @patch('backend.audio.os.path.exists')
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_play_sound_not_persisted(self, mock_service, mock_exists):
+        mock_exists.return_value = True
+        mock_service.return_value.get_format.return_value = {'rate': 48000, 'channels': 2, 'sample_format': 'S16_LE'}
+        self.init_session()
+        self.module.sound_cache = Mock()
+        self.module._get_sound_assets = Mock(return_value=Mock())
+
+        self.module.play_sound('/dummy/sound.wav')
+
+        self.assertFalse(self.module._get_sound_assets().get.called)
+        self.module.sound_cache.get.assert_called_with('/dummy/sound.wav', rate=48000, channels=2, sample_format='S16_LE')
+
+    def test_prepare_sound_assets(self):
+        self.init_session()
+        self.module._get_playback_format = Mock(return_value={'rate': 48000, 'channels': 2, 'sample_format': 'S16_LE'})
+
+        with patch('backend.audio.threading.Thread') as mock_thread:
+            self.module._prepare_sound_assets()
+
+        mock_thread.assert_called_with(
+            target=self.module._get_sound_assets().prepare,
+            args=(Audio.MODULE_SOUNDS,),
+            kwargs={'rate': 48000, 'channels': 2, 'sample_format': 'S16_LE'},
+            daemon=True,
+        )
+        self.assertTrue(mock_thread.return_value.start.called)
+
+    def test_get_playback_format_from_hw_params(self):
+        driver = Mock(spec=['get_cardid_deviceid'])
+        driver.get_cardid_deviceid.return_value = (2, 0)
+        drivers_mock = Mock()
+        drivers_mock.get_driver.return_value = driver
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module.asound_cards = Mock()
+        self.module.asound_cards.get_hw_params.return_value = {'rate': 48000, 'channels': 2, 'sample_format': 'S32_LE'}
+
+        self.assertEqual(self.module._get_playback_format(), {'rate': 48000, 'channels': 2, 'sample_format': 'S32_LE'})
+        self.module.asound_cards.get_hw_params.assert_called_with(2, 0)
+
+    def test_get_playback_format_default(self):
+        driver = Mock(spec=['get_cardid_deviceid'])
+        driver.get_cardid_deviceid.return_value = (None, None)
+        drivers_mock = Mock()
+        drivers_mock.get_driver.return_value = driver
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module.asound_cards = Mock()
+
+        self.assertEqual(self.module._get_playback_format(), Audio.DEFAULT_PLAYBACK_FORMAT)
+        self.assertFalse(self.module.asound_cards.get_hw_params.called)
+
+    @patch('backend.audio.os.path.exists')
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_queue_sound(self, mock_service, mock_exists):
+        mock_exists.return_value = True
+        mock_service.return_value.get_format.return_value = {'rate': 44100, 'channels': 2, 'sample_format': 'S16_LE'}
+        mock_service.return_value.queue.return_value = 4
+        self.init_session()
+        self.module.sound_cache = Mock()
+        self.module.sound_cache.get.return_value = b'data'
+
+        self.assertEqual(self.module.queue_sound('/dummy/sound.wav', priority=5), 4)
+        self.module.queue_sound('/dummy/sound.wav')
+
+        mock_service.return_value.queue.assert_called_with(b'data', 0)
+        self.assertEqual(mock_service.call_count, 1)
+        self.assertFalse(mock_service.return_value.play.called)
+
+    @patch('backend.audio.os.path.exists')
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_play_sound_decode_failed(self, mock_service, mock_exists):
+        mock_exists.return_value = True
+        mock_service.return_value.get_format.return_value = {'rate': 44100, 'channels': 2, 'sample_format': 'S16_LE'}
+        self.init_session()
+        self.module.sound_cache = Mock()
+        self.module.sound_cache.get.side_effect = Exception('Unsupported sample format')
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.play_sound('/dummy/sound.wav')
+        self.assertEqual(str(cm.exception), 'Unable to decode sound: Unsupported sample format')
+
+    @patch('backend.audio.os.path.exists')
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_play_sound_stream_failed(self, mock_service, mock_exists):
+        mock_exists.return_value = True
+        mock_service.return_value.get_format.return_value = {'rate': 44100, 'channels': 2, 'sample_format': 'S16_LE'}
+        mock_service.return_value.play.side_effect = OSError('aplay not found')
+        self.init_session()
+        self.module.sound_cache = Mock()
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.play_sound('/dummy/sound.wav')
+        self.assertEqual(str(cm.exception), 'Unable to play sound: aplay not found')
+
+    def test_play_sound_invalid_parameters(self):
+        self.init_session()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.play_sound('/dummy/sound.wav')
+        self.assertEqual(str(cm.exception), 'Sound file "/dummy/sound.wav" does not exist')
+
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.queue_sound(None)
+        self.assertEqual(str(cm.exception), 'Parameter "filepath" is missing')
+
+        with patch('backend.audio.os.path.exists', return_value=True):
+            with self.assertRaises(InvalidParameter) as cm:
+                self.module.queue_sound('/dummy/sound.wav', priority=11)
+            self.assertEqual(str(cm.exception), 'Parameter "priority" must be -10<=priority<=10')
+
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_playback_service_closed_on_stop(self, mock_service):
+        self.init_session()
+        self.module._get_playback_service()
+
+        self.module._on_stop()
+
+        self.assertTrue(mock_service.return_value.stop.called)
+
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_playback_service_closed_on_device_change(self, mock_service):
+        self.init_session()
+        service = self.module._get_playback_service()
+
+        self.module._close_playback_service()
+
+        self.assertTrue(service.stop.called)
+        self.module._get_playback_service()
+        self.assertEqual(mock_service.call_count, 2)
+
+    def test_shared_streams_created_with_module_resources(self):
+        self.init_session()
+
+        shared_streams = self.module._get_shared_streams()
+
+        self.assertIs(shared_streams, self.module._get_shared_streams())
+        self.assertEqual(shared_streams.asound_conf, '/etc/asound.conf')
+        self.assertEqual(shared_streams.capture_format, Audio.CAPTURE_STREAM_FORMAT)
+        self.assertEqual(shared_streams.is_resource_busy, self.module._get_test_jobs().is_pending)
+
+    def test_resource_acquired_by_shared_stream(self):
+        self.init_session()
+        self.module._get_shared_streams = Mock(return_value=Mock())
+        self.module._get_shared_streams().resource_acquired.return_value = True
+        self.module._release_resource = Mock()
+
+        self.module._resource_acquired('audio.playback')
+
+        self.module._get_shared_streams().resource_acquired.assert_called_with('audio.playback')
+        self.assertFalse(self.module._release_resource.called)
+
+    def test_open_playback_stream_test_job_running(self):
+        self.init_session()
+        self.module._need_resource = Mock()
+        self.module.test_playing()
+        self.module._need_resource.reset_mock()
+
+        self.assertFalse(self.module._get_shared_streams()._open_playback_stream())
+        self.assertFalse(self.module._need_resource.called)
+
+    def test_test_job_keeps_resource_held_by_shared_stream(self):
+        self.init_session()
+        self.module._release_resource = Mock()
+        self.module._get_shared_streams().is_resource_held = Mock(side_effect=lambda name: name == 'audio.capture')
+
+        self.module._release_test_resource('audio.capture')
+        self.module._release_test_resource('audio.playback')
+
+        self.module._release_resource.assert_called_once_with('audio.playback')
+
+    def test_open_capture_consumer(self):
+        self.init_session()
+        self.module._get_capture_stream = Mock(return_value=Mock())
+
+        consumer = self.module.open_capture_consumer()
+
+        self.assertEqual(consumer, self.module._get_capture_stream().open_consumer.return_value)
+
+    def test_open_capture_consumer_failed(self):
+        self.init_session()
+        self.module._get_capture_stream = Mock(return_value=Mock())
+        self.module._get_capture_stream().open_consumer.side_effect = OSError('arecord not found')
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.open_capture_consumer()
+        self.assertEqual(str(cm.exception), 'Unable to open capture stream: arecord not found')
+
+    def test_get_capture_status(self):
+        self.init_session()
+
+        status = self.module.get_capture_status()
+
+        self.assertEqual(status['running'], False)
+        self.assertEqual(status['consumers'], 0)
+        self.assertEqual(status['format'], {'rate': 16000, 'channels': 1, 'sample_format': 'S16_LE'})
+
+    def test_level_meter_uses_capture_stream(self):
+        self.init_session()
+
+        self.assertIs(self.module._get_level_meter().stream, self.module._get_capture_stream())
+
+    def test_start_level_meter(self):
+        self.init_session()
+        self.module._get_level_meter = Mock(return_value=Mock())
+        self.module._get_level_meter().is_running.return_value = False
+
+        self.assertTrue(self.module.start_level_meter())
+
+        self.assertTrue(self.module._get_level_meter().start.called)
+
+    def test_start_level_meter_already_running(self):
+        self.init_session()
+        self.module._get_level_meter = Mock(return_value=Mock())
+        self.module._get_level_meter().is_running.return_value = True
+
+        self.assertTrue(self.module.start_level_meter())
+
+        self.assertFalse(self.module._get_level_meter().start.called)
+
+    def test_start_level_meter_numpy_not_installed(self):
+        self.init_session()
+        self.module._get_level_meter = Mock(return_value=Mock())
+        self.module._get_level_meter().is_running.return_value = False
+        self.module._get_level_meter().start.side_effect = ImportError('No module named numpy')
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.start_level_meter()
+        self.assertEqual(str(cm.exception), 'Level meter requires numpy library')
+
+    def test_start_level_meter_failed(self):
+        self.init_session()
+        self.module._get_level_meter = Mock(return_value=Mock())
+        self.module._get_level_meter().is_running.return_value = False
+        self.module._get_level_meter().start.side_effect = OSError('arecord not found')
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.start_level_meter()
+        self.assertEqual(str(cm.exception), 'Unable to start level meter: arecord not found')
+
+    def test_stop_level_meter(self):
+        self.init_session()
+        self.module._get_level_meter = Mock(return_value=Mock())
+
+        self.module.stop_level_meter()
 
-    @patch('backend.audio.Tools')
-    def test_select_device_new_driver_not_installed(self, mock_tools):
-        mock_tools.raspberry_pi_infos.return_value = {'audio': True}
-        old_driver = Mock(name='olddriver')
-        old_driver.is_installed.return_value = True
-        old_driver.disable.return_value = True
-        new_driver = Mock(name='newdriver')
-        # add mock class variable
-        attrs = {'name': 'dummydriver'}
-        new_driver.configure_mock(**attrs)
-        new_driver.is_installed.return_value = False
-        new_driver.enable.return_value = True
-        new_driver.is_card_enabled.return_value = True
-        drivers_mock = Mock()
-        drivers_mock.get_driver.side_effect = [old_driver, old_driver, new_driver]
-        self.init_session(bootstrap={
-            'drivers': drivers_mock,
-        })
-        self.module._get_config_field = Mock(return_value='drivername')
-        self.module._set_config_field = Mock()
+        self.assertTrue(self.module._get_level_meter().stop.called)
 
-        with self.assertRaises(InvalidParameter) as cm:
-            self.module.select_device('dummydriver')
-        self.assertEqual(str(cm.exception), 'Can\'t selected device because its driver seems not to be installed')
+    def test_on_level_update(self):
+        self.init_session()
+        self.module.level_update_event = Mock()
 
-    def test_set_volumes(self):
-        driver = Mock()
-        driver.is_installed.return_value = True
-        drivers_mock = Mock()
-        drivers_mock.get_driver.return_value = driver
-        self.init_session(bootstrap={
-            'drivers': drivers_mock,
-        })
-        self.module._get_config_field = Mock(return_value='dummydriver')
+        self.module._on_level_update({'rms': -20.5, 'peak': -3.0})
 
-        self.module.set_volumes(12, 34)
+        self.module.level_update_event.send.assert_called_with(params={'rms': -20.5, 'peak': -3.0})
 
-        driver.set_volumes.assert_called_with(12, 34)
+    def test_fade_volumes_invalid_parameters(self):
+        self.init_session()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.fade_volumes(playback=101)
+        self.assertEqual(str(cm.exception), 'Parameter "playback" must be 0<=playback<=100')
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.fade_volumes(playback=50, capture_from=-1)
+        self.assertEqual(str(cm.exception), 'Parameter "capture_from" must be 0<=capture_from<=100')
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.fade_volumes(playback=50, duration=-1)
+        self.assertEqual(str(cm.exception), 'Parameter "duration" must be 0<=duration<=60000')
 
     @patch('backend.audio.Tools')
     def test_set_volumes_invalid_parameters(self, mock_tools):
@@ -279,44 +1524,176 @@ class TestAudio(unittest.TestCase):
 
         self.assertEqual(volumes, { 'playback': None, 'capture': None })
 
+    def wait_test_job(self, job_id, timeout=2.0):
+        end = time.time() + timeout
+        while time.time() < end:
+            job = self.module.get_test_job(job_id)
+            if job['status'] in ('done', 'failed'):
+                return job
+            time.sleep(0.05)
+        return self.module.get_test_job(job_id)
+
+    @patch('backend.audio.SoundCache')
     @patch('backend.audio.Alsa')
-    def test_test_playing(self, mock_alsa):
+    def test_test_playing(self, mock_alsa, mock_soundcache):
+        mock_soundcache.return_value.get.side_effect = Exception('File not found')
         self.init_session()
-        self.module.test_playing()
+        job_id = self.module.test_playing()
 
-        time.sleep(1.0)
+        job = self.wait_test_job(job_id)
         self.assertTrue(mock_alsa.return_value.play_sound.called)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['progress'], 100)
+        self.assertIsNone(job['error'])
 
+    @patch('backend.audio.SoundCache')
     @patch('backend.audio.Alsa')
-    def test_test_playing_failed(self, mock_alsa):
+    def test_test_playing_failed(self, mock_alsa, mock_soundcache):
+        mock_soundcache.return_value.get.side_effect = Exception('File not found')
         mock_alsa.return_value.play_sound.return_value = False
         self.init_session()
-        self.module.test_playing()
+        job_id = self.module.test_playing()
 
-        time.sleep(1.0)
+        job = self.wait_test_job(job_id)
         self.assertTrue(mock_alsa.return_value.play_sound.called)
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'Unable to play test sound: internal error')
+
+    @patch('backend.audio.RawPcm')
+    @patch('backend.audio.SoundCache')
+    @patch('backend.audio.Alsa')
+    def test_test_playing_from_sound_cache(self, mock_alsa, mock_soundcache, mock_rawpcm):
+        mock_soundcache.return_value.get.return_value = b'\x00' * 100
+        mock_rawpcm.return_value.play.return_value = True
+        driver = Mock()
+        driver.get_playback_format.return_value = {'rate': 48000, 'channels': 2, 'sample_format': 'S16_LE'}
+        drivers_mock = Mock()
+        drivers_mock.get_driver.return_value = driver
+        self.init_session(bootstrap={
+            'drivers': drivers_mock,
+        })
+        self.module._get_config_field = Mock(return_value='dummydriver')
+        job_id = self.module.test_playing()
+
+        job = self.wait_test_job(job_id)
+        mock_soundcache.return_value.get.assert_called_with(Audio.TEST_SOUND, rate=48000, channels=2, sample_format='S16_LE')
+        mock_rawpcm.return_value.play.assert_called_with(b'\x00' * 100)
+        self.assertFalse(mock_alsa.return_value.play_sound.called)
+        self.assertEqual(job['status'], 'done')
 
     @patch('backend.audio.Alsa')
-    def test_test_recording(self, mock_alsa):
+    def test_test_playing_returns_immediately(self, mock_alsa):
+        mock_alsa.return_value.play_sound.side_effect = lambda *args, **kwargs: time.sleep(1.0)
         self.init_session()
-        self.module.test_recording()
 
+        start = time.time()
+        job_id = self.module.test_playing()
+        self.assertLess(time.time() - start, 0.5)
+        self.assertIn(self.module.get_test_job(job_id)['status'], ('waiting', 'running'))
+        with self.assertRaises(CommandError) as cm:
+            self.module.test_playing()
+        self.assertEqual(str(cm.exception), 'A playing test is already running')
+
+        job = self.wait_test_job(job_id)
+        self.assertEqual(job['status'], 'done')
+
+    @patch('backend.audio.RawPcm')
+    @patch('backend.audio.Alsa')
+    def test_test_recording(self, mock_alsa, mock_rawpcm):
+        mock_rawpcm.return_value.record.return_value = memoryview(b'\x01\x02' * 100)
+        mock_rawpcm.return_value.play.return_value = True
+        self.init_session()
+        job_id = self.module.test_recording()
+
+        job = self.wait_test_job(job_id)
+        mock_rawpcm.return_value.record.assert_called_with(5.0)
+        mock_rawpcm.return_value.play.assert_called_with(mock_rawpcm.return_value.record.return_value)
+        self.assertFalse(mock_alsa.return_value.record_sound.called)
+        self.assertEqual(job['status'], 'done')
+
+    @patch('backend.audio.RawPcm')
+    @patch('backend.audio.Alsa')
+    def test_test_recording_from_capture_stream(self, mock_alsa, mock_rawpcm):
+        mock_rawpcm.return_value.play.return_value = True
+        self.init_session()
+        self.module.TEST_RECORDING_DURATION = 0.01
+        self.module._get_capture_stream = Mock(return_value=Mock(frame_size=2))
+        self.module._get_capture_stream().is_running.return_value = True
+        self.module._get_capture_stream().get_format.return_value = {'rate': 16000, 'channels': 1, 'sample_format': 'S16_LE'}
+        consumer = self.module._get_capture_stream().open_consumer.return_value.__enter__.return_value
+        consumer.read.side_effect = [memoryview(b'\x01\x02' * 100), memoryview(b'\x03\x04' * 60)]
+        job_id = self.module.test_recording()
+
+        job = self.wait_test_job(job_id)
+        self.assertEqual(job['status'], 'done')
+        self.assertFalse(mock_rawpcm.return_value.record.called)
+        mock_rawpcm.assert_called_with(rate=16000, channels=1, sample_format='S16_LE')
+        played = mock_rawpcm.return_value.play.call_args[0][0]
+        self.assertEqual(bytes(played), b'\x01\x02' * 100 + b'\x03\x04' * 60)
+
+    @patch('backend.audio.RawPcm')
+    @patch('backend.audio.Alsa')
+    def test_test_recording_failed(self, mock_alsa, mock_rawpcm):
+        mock_rawpcm.return_value.record.return_value = memoryview(b'\x01\x02' * 100)
+        mock_rawpcm.return_value.play.return_value = False
+        self.init_session()
+        job_id = self.module.test_recording()
+
+        job = self.wait_test_job(job_id)
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'Unable to play recorded sound: internal error')
+
+    @patch('backend.audio.os.remove')
+    @patch('backend.audio.RawPcm')
+    @patch('backend.audio.Alsa')
+    def test_test_recording_file_fallback(self, mock_alsa, mock_rawpcm, mock_remove):
+        mock_rawpcm.return_value.record.side_effect = OSError('arecord not found')
+        mock_alsa.return_value.record_sound.return_value = '/tmp/sound.wav'
+        self.init_session()
+        job_id = self.module.test_recording()
+
+        job = self.wait_test_job(job_id)
         self.assertTrue(mock_alsa.return_value.record_sound.called)
+        mock_alsa.return_value.play_sound.assert_called_with('/tmp/sound.wav', timeout=6.0)
+        mock_remove.assert_called_with('/tmp/sound.wav')
+        self.assertEqual(job['status'], 'done')
 
+    @patch('backend.audio.os.remove')
+    @patch('backend.audio.RawPcm')
     @patch('backend.audio.Alsa')
-    def test_test_recording_failed(self, mock_alsa):
+    def test_test_recording_file_fallback_failed(self, mock_alsa, mock_rawpcm, mock_remove):
+        mock_rawpcm.return_value.record.return_value = memoryview(b'')
         mock_alsa.return_value.play_sound.return_value = False
         self.init_session()
-        self.module.test_recording()
+        job_id = self.module.test_recording()
 
+        job = self.wait_test_job(job_id)
         self.assertTrue(mock_alsa.return_value.record_sound.called)
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'Unable to play recorded sound: internal error')
+        self.assertTrue(mock_remove.called)
+
+    def test_get_test_job_invalid_parameters(self):
+        self.init_session()
+
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.get_test_job(None)
+        self.assertEqual(str(cm.exception), 'Parameter "job_id" is missing')
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_test_job('dummy')
+        self.assertEqual(str(cm.exception), 'Test job "dummy" does not exist')
 
     def test_resource_acquired(self):
         self.init_session()
         self.module._resource_acquired('dummy.resource')
 
+    def test_resource_acquired_without_job(self):
+        self.init_session()
+        self.module._release_resource = Mock()
 
+        self.module._resource_acquired('audio.playback')
 
+        self.module._release_resource.assert_called_with('audio.playback')
 
 
 class TestBcm2835AudioDriver(unittest.TestCase):
@@ -333,6 +1710,48 @@ class TestBcm2835AudioDriver(unittest.TestCase):
         self.driver.cleep_filesystem = Mock()
         self.driver._on_registered()
 
+    @patch('backend.bcm2835audiodriver.ConfigTxt')
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    def test_helpers_created_on_first_use(self, mock_asound, mock_configtxt):
+        self.init_session()
+
+        self.assertFalse(mock_asound.called)
+        self.assertFalse(mock_configtxt.called)
+        self.driver.is_installed()
+        self.driver.is_installed()
+        self.assertEqual(mock_configtxt.call_count, 1)
+        self.assertFalse(mock_asound.called)
+
+    @patch('backend.bcm2835audiodriver.ConfigTxt')
+    def test_helpers_instrumented(self, mock_configtxt):
+        stats = CommandStats()
+        self.driver = Bcm2835AudioDriver(stats=stats)
+        self.driver.cleep_filesystem = Mock()
+        self.driver._on_registered()
+
+        self.driver.is_installed()
+
+        self.assertEqual(stats.get_stats()['configtxt.is_audio_enabled']['count'], 1)
+        self.assertTrue(isinstance(self.driver.alsa, InstrumentedProxy))
+
+    @patch('backend.bcm2835audiodriver.ConfigTxt')
+    def test_helpers_not_instrumented_without_stats(self, mock_configtxt):
+        self.init_session()
+
+        self.assertIs(self.driver.configtxt, mock_configtxt.return_value)
+        self.assertFalse(isinstance(self.driver.alsa, InstrumentedProxy))
+
+    def test_board_infos_shared(self):
+        board_infos = Mock(return_value={'audio': False})
+        self.driver = Bcm2835AudioDriver(board_infos=board_infos)
+        self.driver.cleep_filesystem = Mock()
+        self.driver._on_registered()
+
+        with self.assertRaises(Exception) as cm:
+            self.driver._install()
+        self.assertEqual(str(cm.exception), 'Raspberry pi has no onboard audio device')
+        self.assertTrue(board_infos.called)
+
     @patch('backend.bcm2835audiodriver.Tools')
     @patch('backend.bcm2835audiodriver.ConfigTxt')
     @patch('backend.bcm2835audiodriver.EtcAsoundConf')
@@ -393,8 +1812,10 @@ class TestBcm2835AudioDriver(unittest.TestCase):
             self.driver._uninstall()
         self.assertEqual(str(cm.exception), 'Raspberry pi has no onboard audio device')
 
+    @patch('backend.bcm2835audiodriver.AmixerSession')
     @patch('backend.bcm2835audiodriver.EtcAsoundConf')
-    def test_enable(self, mock_asound):
+    def test_enable(self, mock_asound, mock_session):
+        mock_session.return_value.execute.return_value = ['numid=1,iface=MIXER']
         self.init_session()
         mock_alsa = MagicMock()
         self.driver.alsa = mock_alsa
@@ -405,41 +1826,47 @@ class TestBcm2835AudioDriver(unittest.TestCase):
 
         self.assertTrue(mock_asound.return_value.delete.called)
         self.assertTrue(mock_asound.return_value.save_default_file.called)
-        self.assertTrue(mock_alsa.amixer_control.called)
+        mock_session.return_value.cset.assert_called_with(1, Bcm2835AudioDriver.AMIXER_JACK)
+        self.assertEqual(mock_session.return_value.execute.call_count, 1)
         self.assertTrue(mock_alsa.save.called)
 
     @patch('backend.bcm2835audiodriver.EtcAsoundConf')
-    @patch('backend.bcm2835audiodriver.Alsa')
-    def test_enable_no_card_infos(self, mock_alsa, mock_asound):
+    @patch('backend.bcm2835audiodriver.AmixerSession')
+    def test_enable_no_card_infos(self, mock_session, mock_asound):
         self.init_session()
+        mock_alsa = MagicMock()
+        self.driver.alsa = mock_alsa
         self.driver.get_cardid_deviceid = Mock(return_value=(None, None))
     
         self.assertFalse(self.driver.enable())
 
         self.assertTrue(mock_asound.return_value.delete.called)
         self.assertFalse(mock_asound.return_value.save_default_file.called)
-        self.assertFalse(mock_alsa.return_value.amixer_control.called)
-        self.assertFalse(mock_alsa.return_value.save.called)
+        self.assertFalse(mock_session.return_value.execute.called)
+        self.assertFalse(mock_alsa.save.called)
 
     @patch('backend.bcm2835audiodriver.EtcAsoundConf')
-    @patch('backend.bcm2835audiodriver.Alsa')
-    def test_enable_alsa_save_default_file_failed(self, mock_alsa, mock_asound):
+    @patch('backend.bcm2835audiodriver.AmixerSession')
+    def test_enable_alsa_save_default_file_failed(self, mock_session, mock_asound):
         mock_asound.return_value.save_default_file.return_value = False
         self.init_session()
+        mock_alsa = MagicMock()
+        self.driver.alsa = mock_alsa
         self.driver.get_cardid_deviceid = Mock(return_value=(0, 0))
     
         self.assertFalse(self.driver.enable())
 
         self.assertTrue(mock_asound.return_value.delete.called)
         self.assertTrue(mock_asound.return_value.save_default_file.called)
-        self.assertFalse(mock_alsa.return_value.amixer_control.called)
-        self.assertFalse(mock_alsa.return_value.save.called)
+        self.assertFalse(mock_session.return_value.execute.called)
+        self.assertFalse(mock_alsa.save.called)
 
+    @patch('backend.bcm2835audiodriver.AmixerSession')
     @patch('backend.bcm2835audiodriver.EtcAsoundConf')
-    def test_enable_alsa_amixer_control_failed(self, mock_asound):
+    def test_enable_alsa_amixer_control_failed(self, mock_asound, mock_session):
+        mock_session.return_value.execute.side_effect = Exception('Amixer batch failed')
         self.init_session()
         mock_alsa = MagicMock()
-        mock_alsa.amixer_control.return_value = False
         self.driver.alsa = mock_alsa
         self.driver.get_cardid_deviceid = Mock(return_value=(0, 0))
         self.driver.get_control_numid = Mock(return_value=1)
@@ -448,43 +1875,331 @@ class TestBcm2835AudioDriver(unittest.TestCase):
 
         self.assertTrue(mock_asound.return_value.delete.called)
         self.assertTrue(mock_asound.return_value.save_default_file.called)
-        self.assertTrue(mock_alsa.amixer_control.called)
+        self.assertTrue(mock_session.return_value.execute.called)
         self.assertFalse(mock_alsa.save.called)
 
+    @patch('backend.bcm2835audiodriver.AmixerSession')
     @patch('backend.bcm2835audiodriver.EtcAsoundConf')
-    def test_disable(self, mock_asound):
+    def test_enable_alsa_amixer_control_not_updated(self, mock_asound, mock_session):
+        mock_session.return_value.execute.return_value = [None]
         self.init_session()
-        mock_alsa = Mock()
+        mock_alsa = MagicMock()
+        self.driver.alsa = mock_alsa
+        self.driver.get_cardid_deviceid = Mock(return_value=(0, 0))
+        self.driver.get_control_numid = Mock(return_value=1)
+    
+        self.assertFalse(self.driver.enable())
+
+        self.assertFalse(mock_alsa.save.called)
+
+    @patch('backend.bcm2835audiodriver.AmixerSession')
+    @patch('backend.bcm2835audiodriver.os.path.exists')
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    def test_enable_already_configured(self, mock_asound, mock_exists, mock_session):
+        mock_exists.return_value = True
+        self.init_session()
+        mock_alsa = MagicMock()
+        self.driver.alsa = mock_alsa
+        self.driver.volume_control = 'PCM'
+        self.driver.get_cardid_deviceid = Mock(return_value=(0, 0))
+        self.driver.get_control_numid = Mock(return_value=3)
+        self.driver._is_asound_conf_configured = Mock(return_value=True)
+        self.driver._get_saved_control_value = Mock(return_value=Bcm2835AudioDriver.AMIXER_JACK)
+
+        self.assertTrue(self.driver.enable())
+
+        self.assertFalse(mock_asound.return_value.delete.called)
+        self.assertFalse(mock_asound.return_value.save_default_file.called)
+        self.assertFalse(mock_session.return_value.execute.called)
+        self.assertFalse(mock_alsa.save.called)
+        self.assertFalse(mock_alsa.get_simple_controls.called)
+
+    @patch('backend.bcm2835audiodriver.AmixerSession')
+    @patch('backend.bcm2835audiodriver.os.path.exists')
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    def test_enable_only_route_differs(self, mock_asound, mock_exists, mock_session):
+        mock_exists.return_value = True
+        mock_session.return_value.execute.return_value = ['numid=3,iface=MIXER']
+        self.init_session()
+        mock_alsa = MagicMock()
         self.driver.alsa = mock_alsa
+        self.driver.volume_control = 'PCM'
+        self.driver.get_cardid_deviceid = Mock(return_value=(0, 0))
+        self.driver.get_control_numid = Mock(return_value=3)
+        self.driver._is_asound_conf_configured = Mock(return_value=True)
+        self.driver._get_saved_control_value = Mock(return_value=Bcm2835AudioDriver.AMIXER_AUTO)
+
+        self.assertTrue(self.driver.enable())
+
+        self.assertFalse(mock_asound.return_value.delete.called)
+        self.assertFalse(mock_asound.return_value.save_default_file.called)
+        mock_session.return_value.cset.assert_called_with(3, Bcm2835AudioDriver.AMIXER_JACK)
+        self.assertTrue(mock_alsa.save.called)
+
+    @patch('backend.bcm2835audiodriver.os.path.exists')
+    def test_read_file(self, mock_exists):
+        mock_exists.return_value = True
+        self.init_session()
+        self.driver.cleep_filesystem.open.return_value.read.return_value = 'content'
+
+        self.assertEqual(self.driver._read_file('/etc/asound.conf'), 'content')
+        self.assertTrue(self.driver.cleep_filesystem.close.called)
+
+        mock_exists.return_value = False
+        self.assertIsNone(self.driver._read_file('/etc/asound.conf'))
+
+    def test_is_asound_conf_configured(self):
+        self.init_session()
+        self.driver._read_file = Mock(return_value='pcm.!default {\n    type hw\n    card 1\n    device 0\n}\nctl.!default {\n    type hw\n    card 1\n}\n')
+
+        self.assertTrue(self.driver._is_asound_conf_configured(1, 0))
+        self.assertFalse(self.driver._is_asound_conf_configured(0, 0))
+        self.assertFalse(self.driver._is_asound_conf_configured(1, 1))
+
+        self.driver._read_file = Mock(return_value=None)
+        self.assertFalse(self.driver._is_asound_conf_configured(1, 0))
+
+    def test_is_asound_conf_configured_with_profile(self):
+        self.init_session()
+        content = AsoundProfile(AsoundProfile.LOW_LATENCY).generate(1, 0)
+        self.driver._read_file = Mock(return_value=content)
+
+        self.assertTrue(self.driver._is_asound_conf_configured(1, 0, content))
+        self.assertFalse(self.driver._is_asound_conf_configured(1, 0, AsoundProfile(AsoundProfile.BALANCED).generate(1, 0)))
+        # profile file is not a default configuration
+        self.assertFalse(self.driver._is_asound_conf_configured(1, 0))
+
+    @patch('backend.bcm2835audiodriver.AmixerSession')
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    def test_enable_with_latency_profile(self, mock_asound, mock_session):
+        mock_session.return_value.execute.return_value = ['numid=1,iface=MIXER']
+        self.init_session()
+        self.driver.alsa = MagicMock()
+        self.driver.get_cardid_deviceid = Mock(return_value=(0, 0))
+        self.driver.get_control_numid = Mock(return_value=1)
+        self.driver._read_file = Mock(return_value=None)
+        self.driver.set_latency_profile(AsoundProfile.LOW_LATENCY)
+
+        self.assertTrue(self.driver.enable())
+
+        self.assertFalse(mock_asound.return_value.save_default_file.called)
+        self.driver.cleep_filesystem.open.assert_called_with('/etc/asound.conf', 'w')
+        content = self.driver.cleep_filesystem.open.return_value.write.call_args[0][0]
+        self.assertEqual(content, AsoundProfile(AsoundProfile.LOW_LATENCY).generate(0, 0, capture=False))
+
+    @patch('backend.bcm2835audiodriver.AmixerSession')
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    def test_enable_with_latency_profile_write_failed(self, mock_asound, mock_session):
+        self.init_session()
+        self.driver.alsa = MagicMock()
+        self.driver.get_cardid_deviceid = Mock(return_value=(0, 0))
+        self.driver._read_file = Mock(return_value=None)
+        self.driver.cleep_filesystem.open.side_effect = Exception('Test exception')
+        self.driver.set_latency_profile(AsoundProfile.BALANCED)
+
+        self.assertFalse(self.driver.enable())
+
+        self.assertFalse(self.driver.alsa.save.called)
+
+    def test_set_latency_profile_invalid(self):
+        self.init_session()
+
+        with self.assertRaises(ValueError) as cm:
+            self.driver.set_latency_profile('dummy')
+        self.assertEqual(str(cm.exception), 'Unknown latency profile "dummy"')
+
+    ASOUND_STATE = """state.vc4hdmi {
+\tcontrol.1 {
+\t\tiface MIXER
+\t\tname 'PCM Playback Route'
+\t\tvalue 2
+\t}
+}
+state.Headphones {
+\tcontrol.1 {
+\t\tiface MIXER
+\t\tname 'PCM Playback Volume'
+\t\tvalue -2000
+\t\tcomment {
+\t\t\tdbvalue.0 -2000
+\t\t}
+\t}
+\tcontrol.3 {
+\t\tiface MIXER
+\t\tname 'PCM Playback Route'
+\t\tvalue 1
+\t}
+}
+state.Device {
+\tcontrol.1 {
+\t\tiface MIXER
+\t\tname 'Mic Capture Switch'
+\t\tvalue 1
+\t}
+}"""
+
+    def test_get_saved_control_value(self):
+        self.init_session()
+        self.driver._read_file = Mock(return_value=self.ASOUND_STATE)
+        self.driver.get_cardid_deviceid = Mock(return_value=(1, 0))
+        self.driver.asound_cards = Mock()
+        self.driver.asound_cards.get_card.return_value = {'cardid': 1, 'id': 'Headphones'}
+
+        self.assertEqual(self.driver._get_saved_control_value('Route'), 1)
+        self.assertEqual(self.driver._get_saved_control_value('Volume'), -2000)
+        self.assertIsNone(self.driver._get_saved_control_value('Switch'))
+        self.driver.asound_cards.get_card.assert_called_with(1)
+
+    def test_get_saved_control_value_card_without_state(self):
+        self.init_session()
+        self.driver._read_file = Mock(return_value=self.ASOUND_STATE)
+        self.driver.get_cardid_deviceid = Mock(return_value=(3, 0))
+        self.driver.asound_cards = Mock()
+        self.driver.asound_cards.get_card.return_value = {'cardid': 3, 'id': 'Headphones1'}
+
+        self.assertIsNone(self.driver._get_saved_control_value('Route'))
+
+    def test_get_saved_control_value_card_not_found(self):
+        self.init_session()
+        self.driver._read_file = Mock(return_value=self.ASOUND_STATE)
+        self.driver.get_cardid_deviceid = Mock(return_value=(None, None))
+
+        self.assertIsNone(self.driver._get_saved_control_value('Route'))
+
+    @patch('backend.bcm2835audiodriver.AmixerSession')
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    def test_disable(self, mock_asound, mock_session):
+        mock_session.return_value.execute.return_value = ['numid=3,iface=MIXER']
+        self.init_session()
+        self.driver.get_control_numid = Mock(return_value=3)
     
         self.assertTrue(self.driver.disable())
 
         self.assertTrue(mock_asound.return_value.delete.called)
-        self.assertTrue(mock_alsa.amixer_control.called)
+        mock_session.return_value.cset.assert_called_with(3, Bcm2835AudioDriver.AMIXER_AUTO)
 
+    @patch('backend.bcm2835audiodriver.AmixerSession')
     @patch('backend.bcm2835audiodriver.EtcAsoundConf')
-    def test_disable_alsa_amixer_control_failed(self, mock_asound):
+    def test_disable_no_route_control(self, mock_asound, mock_session):
         self.init_session()
-        mock_alsa = Mock()
-        mock_alsa.amixer_control.return_value = False
-        self.driver.alsa = mock_alsa
+        self.driver.get_control_numid = Mock(return_value=None)
+
+        self.assertTrue(self.driver.disable())
+
+        self.assertFalse(mock_session.return_value.execute.called)
+        self.assertTrue(mock_asound.return_value.delete.called)
+
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    def test_disable_invalidates_controls(self, mock_asound):
+        self.init_session()
+        self.driver.get_control_numid = Mock(return_value=None)
+        self.driver.control_index = Mock()
+
+        self.driver.disable()
+
+        self.assertTrue(self.driver.control_index.invalidate.called)
+
+    @patch('backend.bcm2835audiodriver.ControlIndex')
+    def test_get_control_numid(self, mock_index):
+        mock_index.return_value.card = 1
+        mock_index.return_value.get_numid.return_value = 3
+        self.init_session()
+        self.driver.get_cardid_deviceid = Mock(return_value=(1, 0))
+
+        self.assertEqual(self.driver.get_control_numid('Route'), 3)
+        self.assertEqual(self.driver.get_control_numid('Route'), 3)
+
+        mock_index.assert_called_once_with(1)
+        mock_index.return_value.get_numid.assert_called_with('Route')
+
+    @patch('backend.bcm2835audiodriver.ControlIndex')
+    def test_control_index_recreated_when_card_changes(self, mock_index):
+        first_index = Mock(card=0)
+        second_index = Mock(card=1)
+        mock_index.side_effect = [first_index, second_index]
+        self.init_session()
+
+        self.assertIs(self.driver._get_control_index(0), first_index)
+        self.assertIs(self.driver._get_control_index(), first_index)
+        self.assertIs(self.driver._get_control_index(1), second_index)
+
+    @patch('backend.bcm2835audiodriver.ControlIndex')
+    def test_get_control_numid_card_not_found(self, mock_index):
+        self.init_session()
+        self.driver.get_cardid_deviceid = Mock(return_value=(None, None))
+
+        self.assertIsNone(self.driver._get_control_index())
+        self.assertIsNone(self.driver.get_control_numid('Route'))
+
+        self.assertFalse(mock_index.called)
+
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    def test_enable_card_not_found_drops_controls_index(self, mock_asound):
+        self.init_session()
+        self.driver.get_cardid_deviceid = Mock(return_value=(None, None))
+        self.driver.control_index = Mock(card=0)
+
+        self.assertFalse(self.driver.enable())
+
+        self.assertIsNone(self.driver.control_index)
+
+    def test_invalidate_controls(self):
+        self.init_session()
+        self.driver.invalidate_controls()
+        self.driver.control_index = Mock()
+
+        self.driver.invalidate_controls()
+
+        self.assertTrue(self.driver.control_index.invalidate.called)
+
+    @patch('backend.bcm2835audiodriver.AmixerSession')
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    def test_disable_alsa_amixer_control_failed(self, mock_asound, mock_session):
+        mock_session.return_value.execute.side_effect = Exception('Amixer batch failed')
+        self.init_session()
+        self.driver.get_control_numid = Mock(return_value=3)
     
         self.assertFalse(self.driver.disable())
 
-        self.assertTrue(mock_alsa.amixer_control.called)
+        self.assertTrue(mock_session.return_value.execute.called)
         self.assertFalse(mock_asound.return_value.delete.called)
 
+    @patch('backend.bcm2835audiodriver.AmixerSession')
     @patch('backend.bcm2835audiodriver.EtcAsoundConf')
-    def test_disable_asound_delete_failed(self, mock_asound):
+    def test_disable_asound_delete_failed(self, mock_asound, mock_session):
         mock_asound.return_value.delete.return_value = False
+        mock_session.return_value.execute.return_value = ['numid=3,iface=MIXER']
         self.init_session()
-        mock_alsa = Mock()
-        self.driver.alsa = mock_alsa
+        self.driver.get_control_numid = Mock(return_value=3)
     
         self.assertFalse(self.driver.disable())
 
         self.assertTrue(mock_asound.return_value.delete.called)
-        self.assertTrue(mock_alsa.amixer_control.called)
+        self.assertTrue(mock_session.return_value.execute.called)
+
+    def test_get_cardid_deviceid(self):
+        self.init_session()
+        self.driver.asound_cards = Mock()
+        self.driver.asound_cards.find.return_value = {'cardid': 1, 'name': 'bcm2835 Headphones', 'playback': [0]}
+
+        self.assertEqual(self.driver.get_cardid_deviceid(), (1, 0))
+        self.driver.asound_cards.find.assert_called_with('bcm2835', 'playback')
+
+    def test_get_cardid_deviceid_card_not_found(self):
+        self.init_session()
+        self.driver.asound_cards = Mock()
+        self.driver.asound_cards.find.return_value = None
+
+        self.assertEqual(self.driver.get_cardid_deviceid(), (None, None))
+
+    def test_is_card_enabled(self):
+        self.init_session()
+        self.driver.asound_cards = Mock()
+        self.driver.asound_cards.find.return_value = {'cardid': 1}
+        self.driver.asound_cards.get_card_by_name.return_value = None
+
+        self.assertTrue(self.driver.is_card_enabled())
+        self.assertFalse(self.driver.is_card_enabled('bcm2835 HDMI 1'))
 
     @patch('backend.bcm2835audiodriver.EtcAsoundConf')
     def test_is_enabled(self, mock_asound):
@@ -504,6 +2219,7 @@ class TestBcm2835AudioDriver(unittest.TestCase):
 
     def test_get_volumes(self):
         self.init_session()
+        self.driver.mixer_backend = AlsaMixer.BACKEND_AMIXER
         mock_alsa = Mock()
         mock_alsa.get_volume.return_value = 66
         self.driver.alsa = mock_alsa
@@ -511,14 +2227,75 @@ class TestBcm2835AudioDriver(unittest.TestCase):
         vols =  self.driver.get_volumes()
         self.assertEqual(vols, { 'playback': 66, 'capture': None })
 
-    def test_set_volumes(self):
+    @patch('backend.alsamixer.AmixerSession')
+    def test_set_volumes(self, mock_session):
+        mock_session.return_value.execute.return_value = ["Simple mixer control 'PCM',0\n  Mono: Playback -2000 [99%] [-20.00dB] [on]"]
         self.init_session()
-        mock_alsa = Mock()
-        mock_alsa.set_volume.return_value = 99
-        self.driver.alsa = mock_alsa
+        self.driver.mixer_backend = AlsaMixer.BACKEND_AMIXER
+        self.driver.volume_control = 'PCM'
+        self.driver.alsa = Mock()
 
         vols = self.driver.set_volumes(playback=12, capture=34)
         self.assertEqual(vols, { 'playback': 99, 'capture': None })
+        mock_session.return_value.sset.assert_called_with('PCM', '12%')
+
+    @patch('backend.alsamixer.AmixerSession')
+    def test_set_volumes_playback_none(self, mock_session):
+        self.init_session()
+        self.driver.mixer_backend = AlsaMixer.BACKEND_AMIXER
+        self.driver.volume_control = 'PCM'
+        self.driver.alsa = Mock()
+        self.driver.alsa.get_volume.return_value = 66
+
+        vols = self.driver.set_volumes(None, 50)
+
+        self.assertEqual(vols, { 'playback': 66, 'capture': None })
+        self.assertFalse(mock_session.return_value.sset.called)
+
+    @patch('backend.bcm2835audiodriver.AlsaMixer')
+    def test_volumes_use_configured_mixer_backend(self, mock_mixer):
+        mock_mixer.return_value.get_volume.return_value = 42
+        self.init_session()
+        self.driver.mixer_backend = 'libasound'
+
+        vols = self.driver.get_volumes()
+        self.driver.get_volumes()
+
+        self.assertEqual(vols, { 'playback': 42, 'capture': None })
+        self.assertEqual(mock_mixer.call_count, 1)
+        self.assertEqual(mock_mixer.call_args[1]['backend'], 'libasound')
+
+    @patch('backend.bcm2835audiodriver.AlsaMixer')
+    def test_mixer_opened_on_embedded_card(self, mock_mixer):
+        self.init_session()
+        self.driver.get_cardid_deviceid = Mock(return_value=(1, 0))
+
+        self.driver.get_volumes()
+
+        self.assertEqual(mock_mixer.call_args[1]['device'], 'hw:1')
+
+    @patch('backend.bcm2835audiodriver.AlsaMixer')
+    def test_invalidate_controls_closes_mixer(self, mock_mixer):
+        self.init_session()
+        self.driver.get_cardid_deviceid = Mock(return_value=(1, 0))
+        self.driver.get_volumes()
+
+        self.driver.invalidate_controls()
+
+        self.assertTrue(mock_mixer.return_value.close.called)
+        self.assertIsNone(self.driver.mixer)
+
+    @patch('backend.bcm2835audiodriver.EtcAsoundConf')
+    @patch('backend.bcm2835audiodriver.AlsaMixer')
+    def test_disable_closes_mixer(self, mock_mixer, mock_asound):
+        self.init_session()
+        self.driver.alsa = Mock()
+        self.driver.get_volumes()
+
+        self.driver.disable()
+
+        self.assertTrue(mock_mixer.return_value.close.called)
+        self.assertIsNone(self.driver.mixer)
 
 
 
@@ -0,0 +1,57 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.captureconsumer import CaptureConsumer
+from mock import Mock
+
+
+class TestCaptureConsumer(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.stream = Mock()
+
+    def test_read(self):
+        self.stream.read.return_value = (memoryview(b'\x01\x02'), 12, 0)
+        consumer = CaptureConsumer(self.stream, 10)
+
+        self.assertEqual(bytes(consumer.read(4, timeout=1.0)), b'\x01\x02')
+
+        self.stream.read.assert_called_with(consumer, 4, 1.0)
+        self.assertEqual(consumer.position, 12)
+        self.assertEqual(consumer.lost, 0)
+
+    def test_read_lost_bytes(self):
+        self.stream.read.return_value = (memoryview(b'\x01\x02'), 42, 30)
+        consumer = CaptureConsumer(self.stream, 10)
+
+        consumer.read()
+        consumer.read()
+
+        self.assertEqual(consumer.lost, 60)
+
+    def test_chunks(self):
+        self.stream.read.side_effect = [
+            (memoryview(b'\x01\x02'), 2, 0),
+            (memoryview(b'\x03\x04'), 4, 0),
+            (memoryview(b''), 4, 0),
+        ]
+        consumer = CaptureConsumer(self.stream, 0)
+
+        self.assertEqual([bytes(chunk) for chunk in consumer.chunks(2)], [b'\x01\x02', b'\x03\x04'])
+        self.stream.read.assert_called_with(consumer, 2, None)
+
+    def test_close(self):
+        with CaptureConsumer(self.stream, 0) as consumer:
+            pass
+
+        consumer.close()
+
+        self.assertTrue(consumer.closed)
+        self.stream.close_consumer.assert_called_once_with(consumer)
+        self.assertEqual(list(consumer.chunks()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,338 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.capturestream import CaptureStream
+import io
+import threading
+import time
+from mock import Mock, patch
+
+
+class BlockingStdout():
+    """
+    Capture process stdout returning fed data, blocking until data is fed or stdout is closed
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def feed(self, data):
+        with self.condition:
+            self.chunks.append(data)
+            self.condition.notify_all()
+
+    def readinto(self, view):
+        with self.condition:
+            while not self.chunks and not self.closed:
+                self.condition.wait()
+            if not self.chunks:
+                return 0
+            data = self.chunks.pop(0)
+            view[:len(data)] = data
+            return len(data)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class TestCaptureStream(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.stream = None
+
+    def tearDown(self):
+        if self.stream:
+            self.stream.stop()
+
+    def init_stream(self, mock_popen, stdout, **kwargs):
+        # 2 bytes frames, 4 bytes reads, 20 bytes ring buffer
+        params = {'rate': 200, 'channels': 1, 'buffer_duration': 0.05, 'read_duration': 0.01}
+        params.update(kwargs)
+        mock_popen.return_value.stdout = stdout
+        mock_popen.return_value.poll.return_value = None
+        mock_popen.return_value.terminate.side_effect = stdout.close
+        self.stream = CaptureStream(**params)
+        return self.stream
+
+    def wait_stopped(self, timeout=2.0):
+        end = time.time() + timeout
+        while self.stream.is_running() and time.time() < end:
+            time.sleep(0.01)
+
+    def wait_captured(self, size, timeout=2.0):
+        end = time.time() + timeout
+        while self.stream.get_status()['captured'] < size and time.time() < end:
+            time.sleep(0.01)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_sizes(self, mock_popen):
+        stream = self.init_stream(mock_popen, BlockingStdout())
+
+        self.assertEqual(stream.frame_size, 2)
+        self.assertEqual(stream.read_size, 4)
+        self.assertEqual(stream.size, 20)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_open_consumer_starts_capture_once(self, mock_popen):
+        stream = self.init_stream(mock_popen, BlockingStdout())
+
+        consumer1 = stream.open_consumer()
+        consumer2 = stream.open_consumer()
+
+        self.assertEqual(mock_popen.call_count, 1)
+        self.assertIn('arecord', mock_popen.call_args[0][0])
+        self.assertTrue(stream.is_running())
+        self.assertEqual(stream.get_status()['consumers'], 2)
+        consumer1.close()
+        self.assertTrue(stream.is_running())
+        consumer2.close()
+        self.assertFalse(stream.is_running())
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_consumers_read_same_data(self, mock_popen):
+        stdout = BlockingStdout()
+        stream = self.init_stream(mock_popen, stdout)
+        consumer1 = stream.open_consumer()
+        consumer2 = stream.open_consumer()
+
+        stdout.feed(b'\x01\x02\x03\x04')
+        data1 = consumer1.read(timeout=1.0)
+        data2 = consumer2.read(timeout=1.0)
+
+        self.assertTrue(isinstance(data1, memoryview))
+        self.assertEqual(bytes(data1), b'\x01\x02\x03\x04')
+        self.assertEqual(bytes(data2), b'\x01\x02\x03\x04')
+        # no copy: both consumers see ring buffer
+        self.assertIs(data1.obj, data2.obj)
+        self.assertEqual(consumer1.position, 4)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_read_timeout(self, mock_popen):
+        stream = self.init_stream(mock_popen, BlockingStdout())
+        consumer = stream.open_consumer()
+
+        start = time.monotonic()
+        data = consumer.read(timeout=0.05)
+
+        self.assertEqual(len(data), 0)
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_read_max_size_frame_aligned(self, mock_popen):
+        stdout = BlockingStdout()
+        stream = self.init_stream(mock_popen, stdout)
+        consumer = stream.open_consumer()
+        stdout.feed(b'\x01\x02\x03\x04')
+        stdout.feed(b'\x05')
+        time.sleep(0.05)
+
+        self.assertEqual(bytes(consumer.read(3, timeout=1.0)), b'\x01\x02')
+        self.assertEqual(bytes(consumer.read(timeout=1.0)), b'\x03\x04')
+        # incomplete frame is not returned
+        self.assertEqual(len(consumer.read(timeout=0.01)), 0)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_wrap_around(self, mock_popen):
+        stdout = BlockingStdout()
+        stream = self.init_stream(mock_popen, stdout)
+        consumer = stream.open_consumer()
+        for index in range(6):
+            stdout.feed(bytes([index] * 4))
+            if index < 4:
+                self.assertEqual(bytes(consumer.read(timeout=1.0)), bytes([index] * 4))
+
+        time.sleep(0.05)
+        self.assertEqual(bytes(consumer.read(timeout=1.0)), bytes([4] * 4))
+        # ring end reached, next slice starts at ring beginning
+        self.assertEqual(bytes(consumer.read(timeout=1.0)), bytes([5] * 4))
+        self.assertEqual(consumer.lost, 0)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_consumer_too_late(self, mock_popen):
+        stream = self.init_stream(mock_popen, io.BytesIO(bytes(range(40))))
+        consumer = stream.open_consumer()
+        self.wait_stopped()
+
+        data = consumer.read(timeout=0.01)
+
+        self.assertEqual(consumer.lost, 20)
+        self.assertEqual(bytes(data), bytes(range(20, 40)))
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_consumer_too_late_writer_window_lost(self, mock_popen):
+        stdout = BlockingStdout()
+        stream = self.init_stream(mock_popen, stdout)
+        consumer = stream.open_consumer()
+        for index in range(5):
+            stdout.feed(bytes([index] * 4))
+        self.wait_captured(20)
+
+        data = consumer.read(timeout=1.0)
+
+        # oldest read is being overwritten by running capture
+        self.assertEqual(consumer.lost, 4)
+        self.assertEqual(bytes(data), bytes([1] * 4 + [2] * 4 + [3] * 4 + [4] * 4))
+        self.assertIsInstance(data.obj, bytes)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_slice_near_writer_copied(self, mock_popen):
+        stdout = BlockingStdout()
+        stream = self.init_stream(mock_popen, stdout)
+        consumer = stream.open_consumer()
+        for index in range(4):
+            stdout.feed(bytes([index] * 4))
+        self.wait_captured(16)
+
+        data1 = consumer.read(4, timeout=1.0)
+        data2 = consumer.read(4, timeout=1.0)
+
+        self.assertEqual(consumer.lost, 0)
+        # first slice is overwritten by next capture read
+        self.assertEqual(bytes(data1), bytes([0] * 4))
+        self.assertIsInstance(data1.obj, bytes)
+        self.assertEqual(bytes(data2), bytes([1] * 4))
+        self.assertIsInstance(data2.obj, bytearray)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_data_readable_after_capture_end(self, mock_popen):
+        stream = self.init_stream(mock_popen, io.BytesIO(bytes(range(8))))
+        consumer = stream.open_consumer()
+        self.wait_stopped()
+
+        self.assertEqual(bytes(consumer.read()), bytes(range(8)))
+        self.assertEqual(len(consumer.read()), 0)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_close_wakes_reader(self, mock_popen):
+        stream = self.init_stream(mock_popen, BlockingStdout())
+        consumer = stream.open_consumer()
+        chunks = []
+        thread = threading.Thread(target=lambda: chunks.extend(consumer.chunks()))
+        thread.start()
+        time.sleep(0.05)
+
+        consumer.close()
+        thread.join(1.0)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(chunks, [])
+        self.assertFalse(stream.is_running())
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_open_close_callbacks(self, mock_popen):
+        open_callback = Mock(return_value=True)
+        close_callback = Mock()
+        stream = self.init_stream(mock_popen, BlockingStdout(), open_callback=open_callback, close_callback=close_callback)
+
+        consumer1 = stream.open_consumer()
+        consumer2 = stream.open_consumer()
+        self.assertEqual(open_callback.call_count, 1)
+        consumer1.close()
+        self.assertFalse(close_callback.called)
+        consumer2.close()
+
+        self.assertEqual(close_callback.call_count, 1)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_open_callback_refused(self, mock_popen):
+        close_callback = Mock()
+        stream = self.init_stream(
+            mock_popen, BlockingStdout(), open_callback=Mock(return_value=False), close_callback=close_callback
+        )
+
+        with self.assertRaises(OSError):
+            stream.open_consumer()
+
+        self.assertFalse(mock_popen.called)
+        self.assertFalse(close_callback.called)
+        self.assertFalse(stream.is_running())
+        self.assertEqual(stream.get_status()['consumers'], 0)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_close_callback_called_if_launch_failed(self, mock_popen):
+        close_callback = Mock()
+        stream = self.init_stream(
+            mock_popen, BlockingStdout(), open_callback=Mock(return_value=True), close_callback=close_callback
+        )
+        mock_popen.side_effect = OSError('arecord not found')
+
+        with self.assertRaises(OSError):
+            stream.open_consumer()
+
+        self.assertEqual(close_callback.call_count, 1)
+        self.assertFalse(stream.is_running())
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_suspend_resume_keeps_consumers(self, mock_popen):
+        stdout1 = BlockingStdout()
+        stream = self.init_stream(mock_popen, stdout1)
+        consumer = stream.open_consumer()
+        stdout1.feed(b'\x01\x02')
+        self.assertEqual(bytes(consumer.read(timeout=1.0)), b'\x01\x02')
+        chunks = []
+        thread = threading.Thread(target=lambda: chunks.extend(bytes(chunk) for chunk in consumer.chunks()))
+        thread.start()
+
+        stream.suspend()
+        self.assertFalse(stream.is_running())
+        time.sleep(0.05)
+        # consumer waits for resumed capture
+        self.assertTrue(thread.is_alive())
+        stdout2 = BlockingStdout()
+        mock_popen.return_value.stdout = stdout2
+        mock_popen.return_value.terminate.side_effect = stdout2.close
+        stream.resume()
+        stdout2.feed(b'\x03\x04')
+        time.sleep(0.05)
+        consumer.close()
+        thread.join(1.0)
+
+        self.assertEqual(mock_popen.call_count, 2)
+        self.assertEqual(chunks, [b'\x03\x04'])
+        self.assertFalse(thread.is_alive())
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_resume_failed_ends_consumers(self, mock_popen):
+        stream = self.init_stream(mock_popen, BlockingStdout())
+        consumer = stream.open_consumer()
+        stream.suspend()
+        mock_popen.side_effect = OSError('arecord not found')
+
+        with self.assertRaises(OSError):
+            stream.resume()
+
+        self.assertEqual(len(consumer.read(timeout=1.0)), 0)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_suspend_not_running(self, mock_popen):
+        stream = self.init_stream(mock_popen, BlockingStdout())
+
+        stream.suspend()
+        stream.resume()
+
+        self.assertFalse(mock_popen.called)
+
+    @patch('backend.capturestream.subprocess.Popen')
+    def test_get_status(self, mock_popen):
+        stream = self.init_stream(mock_popen, io.BytesIO(bytes(8)))
+        consumer = stream.open_consumer()
+        self.wait_stopped()
+
+        self.assertEqual(stream.get_status(), {
+            'running': False,
+            'consumers': 1,
+            'captured': 8,
+            'buffer_size': 20,
+        })
+        self.assertEqual(stream.get_format(), {'rate': 200, 'channels': 1, 'sample_format': 'S16_LE'})
+        consumer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.cardmixer import CardMixer
+from mock import patch
+
+
+class TestCardMixer(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    @patch('backend.cardmixer.AlsaMixer')
+    def test_mixer_opened_on_card(self, mock_mixer):
+        CardMixer(2)
+
+        self.assertEqual(mock_mixer.call_args[1]['device'], 'hw:2')
+
+    @patch('backend.cardmixer.AlsaMixer')
+    def test_get_controls(self, mock_mixer):
+        mock_mixer.return_value.get_controls.return_value = ['Auto Gain Control', 'Mic', 'Speaker']
+        mixer = CardMixer(1)
+
+        self.assertEqual(mixer.get_controls(), {'playback': 'Speaker', 'capture': 'Mic'})
+        mixer.get_controls()
+        self.assertEqual(mock_mixer.return_value.get_controls.call_count, 1)
+
+    @patch('backend.cardmixer.AlsaMixer')
+    def test_get_volumes(self, mock_mixer):
+        mock_mixer.return_value.get_controls.return_value = ['Mic']
+        mock_mixer.return_value.get_volume.return_value = 60
+        mixer = CardMixer(1)
+
+        self.assertEqual(mixer.get_volumes(), {'playback': None, 'capture': 60})
+        mock_mixer.return_value.get_volume.assert_called_with('Mic', capture=True)
+
+    @patch('backend.cardmixer.AlsaMixer')
+    def test_set_volumes(self, mock_mixer):
+        mock_mixer.return_value.get_controls.return_value = ['Digital', 'Capture']
+        mock_mixer.return_value.set_volumes.return_value = [30, 45]
+        mixer = CardMixer(1)
+
+        self.assertEqual(mixer.set_volumes(30, None), {'playback': 30, 'capture': 45})
+        mock_mixer.return_value.set_volumes.assert_called_once_with([('Digital', 30, False), ('Capture', None, True)])
+
+    @patch('backend.cardmixer.AlsaMixer')
+    def test_set_volumes_capture_only_card(self, mock_mixer):
+        mock_mixer.return_value.get_controls.return_value = ['Mic']
+        mock_mixer.return_value.set_volumes.return_value = [40]
+        mixer = CardMixer(1)
+
+        self.assertEqual(mixer.set_volumes(30, 40), {'playback': None, 'capture': 40})
+        mock_mixer.return_value.set_volumes.assert_called_once_with([('Mic', 40, True)])
+
+
+if __name__ == "__main__":
+    unittest.main()
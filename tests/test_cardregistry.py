@@ -0,0 +1,184 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.cardregistry import CardRegistry
+from mock import Mock, patch
+import time
+
+CARDS = [
+    {'cardid': 0, 'id': 'Headphones', 'name': 'bcm2835 Headphones', 'driver': 'bcm2835_headpho', 'playback': [0], 'capture': []},
+    {'cardid': 1, 'id': 'Device', 'name': 'USB PnP Sound Device', 'driver': 'USB-Audio', 'playback': [], 'capture': [0]},
+    {'cardid': 2, 'id': 'sndrpihifiberry', 'name': 'snd_rpi_hifiberry_dac', 'driver': 'snd_rpi_hifiberry', 'playback': [0], 'capture': []},
+]
+
+
+class TestCardRegistry(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.asound_cards = Mock()
+        self.asound_cards.get_cards.return_value = CARDS
+        self.asound_cards.get_card_by_name.side_effect = lambda name: {card['name']: card for card in CARDS}.get(name)
+        self.onboard = Mock()
+        self.onboard.get_cardid_deviceid.return_value = (0, 0)
+        self.onboard.get_volumes.return_value = {'playback': 50, 'capture': None}
+        self.dac = Mock(spec=['get_card_name', 'get_volumes', 'set_volumes'])
+        self.dac.get_card_name.return_value = 'snd_rpi_hifiberry_dac'
+        self.dac.get_volumes.return_value = {'playback': 80, 'capture': None}
+        self.drivers = {'onboard': self.onboard, 'dac': self.dac}
+        self.registry = CardRegistry(self.asound_cards, lambda: self.drivers)
+
+    def test_get_cards(self):
+        self.registry.set_active_cards(['Headphones'])
+
+        cards = self.registry.get_cards()
+
+        self.assertEqual([card['cardid'] for card in cards], [0, 1, 2])
+        self.assertEqual(cards[0], {
+            'cardid': 0,
+            'id': 'Headphones',
+            'name': 'bcm2835 Headphones',
+            'driver': 'onboard',
+            'playback': True,
+            'capture': False,
+            'active': True,
+        })
+        self.assertIsNone(cards[1]['driver'])
+        self.assertEqual(cards[2]['driver'], 'dac')
+
+    def test_get_card(self):
+        self.assertEqual(self.registry.get_card(1)['id'], 'Device')
+        self.assertEqual(self.registry.get_card('Device')['cardid'], 1)
+        self.assertEqual(self.registry.get_card('USB PnP Sound Device')['cardid'], 1)
+        self.assertEqual(self.registry.get_card('dac')['cardid'], 2)
+        self.assertIsNone(self.registry.get_card('dummy'))
+        self.assertIsNone(self.registry.get_card(5))
+
+    def test_registry_built_once(self):
+        self.registry.get_cards()
+        self.registry.get_card('Device')
+        self.assertEqual(self.asound_cards.get_cards.call_count, 1)
+
+        self.registry.invalidate()
+        self.registry.get_cards()
+        self.assertEqual(self.asound_cards.get_cards.call_count, 2)
+
+    def test_get_capabilities(self):
+        self.assertEqual(self.registry.get_capabilities('Device'), {'playback': False, 'capture': True})
+        with self.assertRaises(ValueError) as cm:
+            self.registry.get_capabilities('dummy')
+        self.assertEqual(str(cm.exception), 'Card "dummy" does not exist')
+
+    def test_set_active(self):
+        self.assertEqual(self.registry.set_active('dac', True), ['sndrpihifiberry'])
+        self.assertEqual(self.registry.set_active(0, True), ['Headphones', 'sndrpihifiberry'])
+        self.assertEqual(self.registry.set_active('dac', False), ['Headphones'])
+        self.assertEqual([card['id'] for card in self.registry.get_active_cards()], ['Headphones'])
+        with self.assertRaises(ValueError):
+            self.registry.set_active('dummy', True)
+
+    def test_get_volumes_of_active_cards(self):
+        self.registry.set_active_cards(['Headphones', 'sndrpihifiberry', 'unplugged'])
+
+        self.assertEqual(self.registry.get_volumes(), {
+            'Headphones': {'playback': 50, 'capture': None},
+            'sndrpihifiberry': {'playback': 80, 'capture': None},
+        })
+
+    @patch('backend.cardregistry.CardMixer')
+    def test_get_volumes_card_without_driver(self, mock_mixer):
+        mock_mixer.return_value.get_volumes.return_value = {'playback': None, 'capture': 70}
+
+        self.assertEqual(self.registry.get_volumes(['Device']), {'Device': {'playback': None, 'capture': 70}})
+        self.registry.get_volumes(['Device'])
+
+        mock_mixer.assert_called_once_with(1)
+
+    @patch('backend.cardregistry.CardMixer')
+    def test_set_volumes_card_without_driver(self, mock_mixer):
+        mock_mixer.return_value.set_volumes.return_value = {'playback': None, 'capture': 40}
+
+        self.assertEqual(self.registry.set_volumes({'Device': {'capture': 40}}), {'Device': {'playback': None, 'capture': 40}})
+        mock_mixer.return_value.set_volumes.assert_called_with(None, 40)
+
+    @patch('backend.cardregistry.CardMixer')
+    def test_invalidate_releases_mixers(self, mock_mixer):
+        self.registry.get_volumes(['Device'])
+        self.registry.invalidate()
+        self.registry.get_volumes(['Device'])
+
+        self.assertEqual(mock_mixer.call_count, 2)
+
+    def test_get_volumes_failed_card(self):
+        self.dac.get_volumes.side_effect = Exception('Mixer error')
+
+        self.assertEqual(self.registry.get_volumes([0, 2]), {
+            'Headphones': {'playback': 50, 'capture': None},
+            'sndrpihifiberry': None,
+        })
+
+    def test_set_volumes(self):
+        self.onboard.set_volumes.return_value = {'playback': 10, 'capture': None}
+        self.dac.set_volumes.return_value = {'playback': 20, 'capture': None}
+
+        result = self.registry.set_volumes({
+            'onboard': {'playback': 10},
+            2: {'playback': 20, 'capture': 30},
+        })
+
+        self.assertEqual(result, {
+            'Headphones': {'playback': 10, 'capture': None},
+            'sndrpihifiberry': {'playback': 20, 'capture': None},
+        })
+        self.onboard.set_volumes.assert_called_with(10, None)
+        self.dac.set_volumes.assert_called_with(20, 30)
+
+    def test_operations_run_concurrently(self):
+        cards = [{'cardid': index, 'id': 'card%d' % index, 'name': 'card %d' % index, 'playback': [0], 'capture': []} for index in range(4)]
+        self.asound_cards.get_cards.return_value = cards
+        self.drivers = {}
+        for index in range(4):
+            driver = Mock()
+            driver.get_cardid_deviceid.return_value = (index, 0)
+            driver.get_volumes.side_effect = lambda: time.sleep(0.2) or {'playback': 50, 'capture': None}
+            self.drivers['driver%d' % index] = driver
+
+        start = time.time()
+        volumes = self.registry.get_volumes([0, 1, 2, 3])
+
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(len(volumes), 4)
+
+    def test_hung_card_reported_as_failed(self):
+        self.registry = CardRegistry(self.asound_cards, lambda: self.drivers, timeout=0.1)
+        self.dac.get_volumes.side_effect = lambda: time.sleep(0.5)
+
+        start = time.time()
+        volumes = self.registry.get_volumes([0, 2])
+
+        self.assertLess(time.time() - start, 0.4)
+        self.assertIsNone(volumes['sndrpihifiberry'])
+
+    def test_hung_card_not_queried_again(self):
+        self.registry = CardRegistry(self.asound_cards, lambda: self.drivers, timeout=0.1)
+        self.dac.get_volumes.side_effect = lambda: time.sleep(0.5)
+
+        self.registry.get_volumes([2])
+        volumes = self.registry.get_volumes([0, 2])
+
+        self.assertEqual(self.dac.get_volumes.call_count, 1)
+        self.assertIsNone(volumes['sndrpihifiberry'])
+        self.assertEqual(volumes['Headphones'], {'playback': 50, 'capture': None})
+
+    def test_shared_runner(self):
+        runner = Mock()
+        runner.run.return_value = {('card', 'Headphones'): ({'playback': 50, 'capture': None}, None)}
+        self.registry = CardRegistry(self.asound_cards, lambda: self.drivers, runner=runner)
+
+        self.assertEqual(self.registry.get_volumes([0]), {'Headphones': {'playback': 50, 'capture': None}})
+        self.assertEqual(list(runner.run.call_args[0][0].keys()), [('card', 'Headphones')])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.coalescer import Coalescer
+import threading
+import time
+from mock import Mock
+
+
+class TestCoalescer(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def submit_all(self, coalescer, calls, delay=0.01):
+        results = [None] * len(calls)
+        def submit(index, args):
+            try:
+                results[index] = coalescer.submit(*args)
+            except Exception as error:
+                results[index] = error
+        threads = []
+        for index, args in enumerate(calls):
+            thread = threading.Thread(target=submit, args=(index, args))
+            thread.start()
+            threads.append(thread)
+            time.sleep(delay)
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_single_call(self):
+        func = Mock(return_value='result')
+        coalescer = Coalescer(func, window=0.01)
+
+        self.assertEqual(coalescer.submit(1, 2), 'result')
+        func.assert_called_once_with(1, 2)
+
+    def test_burst_coalesced(self):
+        func = Mock(side_effect=lambda value: value * 10)
+        coalescer = Coalescer(func, window=0.2)
+
+        results = self.submit_all(coalescer, [(1,), (2,), (3,)])
+
+        func.assert_called_once_with(3)
+        self.assertEqual(results, [30, 30, 30])
+
+    def test_merge(self):
+        func = Mock(side_effect=lambda a, b: (a, b))
+        merge = lambda pending, new: tuple(n if n is not None else p for p, n in zip(pending, new))
+        coalescer = Coalescer(func, window=0.2, merge=merge)
+
+        results = self.submit_all(coalescer, [(1, None), (None, 2)])
+
+        func.assert_called_once_with(1, 2)
+        self.assertEqual(results, [(1, 2), (1, 2)])
+
+    def test_calls_after_window_not_coalesced(self):
+        func = Mock(side_effect=lambda value: value)
+        coalescer = Coalescer(func, window=0.01)
+
+        results = self.submit_all(coalescer, [(1,), (2,)], delay=0.1)
+
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(results, [1, 2])
+
+    def test_exception_raised_to_all_callers(self):
+        func = Mock(side_effect=Exception('Test exception'))
+        coalescer = Coalescer(func, window=0.2)
+
+        results = self.submit_all(coalescer, [(1,), (2,)])
+
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual([str(result) for result in results], ['Test exception', 'Test exception'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.commandstats import CommandStats, instrumented
+import inspect
+from mock import Mock, patch
+
+
+class Dummy():
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @instrumented
+    def command(self, value, option=None):
+        if value is None:
+            raise Exception('Test exception')
+        return value
+
+
+class TestCommandStats(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.stats = CommandStats()
+
+    def test_record(self):
+        self.stats.record('op', 0.004)
+        self.stats.record('op', 0.015, failed=True)
+
+        stats = self.stats.get_stats()
+
+        self.assertEqual(stats['op']['count'], 2)
+        self.assertEqual(stats['op']['failures'], 1)
+        self.assertAlmostEqual(stats['op']['total'], 19.0)
+        self.assertAlmostEqual(stats['op']['max'], 15.0)
+
+    def test_percentiles(self):
+        for _ in range(90):
+            self.stats.record('op', 0.0008)
+        for _ in range(9):
+            self.stats.record('op', 0.03)
+        self.stats.record('op', 0.3)
+
+        stats = self.stats.get_stats()
+
+        self.assertEqual(stats['op']['p50'], 1.0)
+        self.assertEqual(stats['op']['p95'], 50.0)
+        self.assertEqual(stats['op']['p99'], 50.0)
+        self.assertAlmostEqual(stats['op']['max'], 300.0)
+
+    def test_percentiles_bounded_by_max(self):
+        self.stats.record('op', 0.0012)
+
+        self.assertAlmostEqual(self.stats.get_stats()['op']['p99'], 1.2)
+
+    def test_percentiles_last_bucket(self):
+        self.stats.record('op', 12.0)
+
+        self.assertAlmostEqual(self.stats.get_stats()['op']['p50'], 12000.0)
+
+    @patch('backend.commandstats.time.perf_counter')
+    def test_measure(self, mock_perf_counter):
+        mock_perf_counter.side_effect = [1.0, 1.5]
+
+        with self.stats.measure('op'):
+            pass
+
+        self.assertEqual(self.stats.get_stats()['op']['total'], 500.0)
+        self.assertEqual(self.stats.get_stats()['op']['failures'], 0)
+
+    def test_measure_failure(self):
+        with self.assertRaises(ValueError):
+            with self.stats.measure('op'):
+                raise ValueError('Test exception')
+
+        self.assertEqual(self.stats.get_stats()['op']['failures'], 1)
+
+    def test_wrap(self):
+        func = Mock(return_value=3, __name__='func')
+        wrapped = self.stats.wrap(func, 'prefix.func')
+
+        self.assertEqual(wrapped(1, key=2), 3)
+
+        func.assert_called_with(1, key=2)
+        self.assertEqual(self.stats.get_stats()['prefix.func']['count'], 1)
+
+    def test_instrumented(self):
+        dummy = Dummy(self.stats)
+
+        self.assertEqual(dummy.command(12), 12)
+        with self.assertRaises(Exception):
+            dummy.command(None)
+
+        self.assertEqual(self.stats.get_stats()['command']['count'], 2)
+        self.assertEqual(self.stats.get_stats()['command']['failures'], 1)
+
+    def test_instrumented_keeps_signature(self):
+        dummy = Dummy(self.stats)
+
+        self.assertEqual(list(inspect.signature(dummy.command).parameters), ['value', 'option'])
+        self.assertEqual(inspect.getfullargspec(Dummy.command).args, ['self', 'value', 'option'])
+        self.assertEqual(Dummy.command.__name__, 'command')
+
+    def test_reset(self):
+        self.stats.record('op', 0.001)
+
+        self.stats.reset()
+
+        self.assertEqual(self.stats.get_stats(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
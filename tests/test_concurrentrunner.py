@@ -0,0 +1,80 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.concurrentrunner import ConcurrentRunner
+from collections import OrderedDict
+import threading
+import time
+
+
+class TestConcurrentRunner(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.runner = ConcurrentRunner(workers=4, timeout=1.0)
+        self.events = []
+
+    def tearDown(self):
+        for event in self.events:
+            event.set()
+        self.runner.shutdown()
+
+    def hang(self):
+        event = threading.Event()
+        self.events.append(event)
+        return lambda: event.wait(5.0)
+
+    def raise_error(self):
+        raise Exception('Test exception')
+
+    def test_run(self):
+        results = self.runner.run(OrderedDict([
+            ('a', (lambda value: value * 2, (2,))),
+            ('b', (self.raise_error, ())),
+        ]))
+
+        self.assertEqual(list(results.keys()), ['a', 'b'])
+        self.assertEqual(results['a'], (4, None))
+        self.assertEqual(str(results['b'][1]), 'Test exception')
+
+    def test_run_concurrently(self):
+        calls = OrderedDict((index, (time.sleep, (0.2,))) for index in range(4))
+
+        start = time.time()
+        results = self.runner.run(calls)
+
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual([error for _, error in results.values()], [None] * 4)
+
+    def test_timeout(self):
+        start = time.time()
+        results = self.runner.run(OrderedDict([('hung', (self.hang(), ()))]), timeout=0.1)
+
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(str(results['hung'][1]), 'timeout')
+
+    def test_hung_call_not_submitted_again(self):
+        hung = self.hang()
+        calls = []
+        def call():
+            calls.append(True)
+            hung()
+        self.runner.run(OrderedDict([('hung', (call, ()))]), timeout=0.05)
+
+        results = self.runner.run(OrderedDict([('hung', (call, ())), ('other', (lambda: 'ok', ()))]), timeout=0.05)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(str(results['hung'][1]), 'previous call still running')
+        self.assertEqual(results['other'], ('ok', None))
+
+    def test_executor_shared_by_runs(self):
+        threads = set()
+        for _ in range(5):
+            self.runner.run(OrderedDict([('a', (lambda: threads.add(threading.current_thread().ident), ()))]))
+
+        self.assertEqual(len(threads), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
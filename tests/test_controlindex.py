@@ -0,0 +1,121 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.controlindex import ControlIndex
+from mock import Mock, patch
+
+CONTENTS = """numid=3,iface=MIXER,name='PCM Playback Route'
+  ; type=INTEGER,access=rw------,values=1,min=0,max=2,step=0
+  : values=1
+numid=2,iface=MIXER,name='PCM Playback Switch'
+  ; type=BOOLEAN,access=rw------,values=1
+  : values=on
+numid=1,iface=MIXER,name='PCM Playback Volume'
+  ; type=INTEGER,access=rw---R--,values=1,min=-10239,max=400,step=0
+  : values=-2000
+  | dBscale-min=-102.39dB,step=0.01dB,mute=1
+numid=4,iface=MIXER,name='Headphone Playback Volume'
+  ; type=INTEGER,access=rw---R--,values=2,min=0,max=100,step=0
+  : values=50,60
+  | dBminmax-min=-50.00dB,max=0.00dB
+"""
+
+
+class TestControlIndex(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def test_get_command(self):
+        self.assertEqual(ControlIndex().get_command(), ['amixer', 'contents'])
+        self.assertEqual(ControlIndex(1).get_command(), ['amixer', '-c', '1', 'contents'])
+
+    def test_parse_contents(self):
+        controls = ControlIndex().parse_contents(CONTENTS)
+
+        self.assertEqual(list(controls.keys()), [
+            'PCM Playback Route',
+            'PCM Playback Switch',
+            'PCM Playback Volume',
+            'Headphone Playback Volume',
+        ])
+        self.assertEqual(controls['PCM Playback Route'], {
+            'numid': 3,
+            'iface': 'MIXER',
+            'name': 'PCM Playback Route',
+            'type': 'INTEGER',
+            'min': 0,
+            'max': 2,
+            'step': 0,
+            'values': [1],
+            'db_min': None,
+            'db_max': None,
+        })
+        self.assertEqual(controls['PCM Playback Switch']['type'], 'BOOLEAN')
+        self.assertIsNone(controls['PCM Playback Switch']['min'])
+        self.assertEqual(controls['PCM Playback Switch']['values'], ['on'])
+        self.assertEqual(controls['PCM Playback Volume']['db_min'], -102.39)
+        self.assertEqual(controls['PCM Playback Volume']['db_max'], 4.0)
+        self.assertEqual(controls['Headphone Playback Volume']['values'], [50, 60])
+        self.assertEqual(controls['Headphone Playback Volume']['db_min'], -50.0)
+        self.assertEqual(controls['Headphone Playback Volume']['db_max'], 0.0)
+
+    def test_parse_contents_empty(self):
+        self.assertEqual(len(ControlIndex().parse_contents('')), 0)
+
+    @patch('backend.controlindex.subprocess.run')
+    def test_index_built_once(self, mock_run):
+        mock_run.return_value.stdout = CONTENTS.encode('utf-8')
+        index = ControlIndex(0)
+
+        self.assertFalse(index.is_built())
+        self.assertEqual(index.get_numid('Route'), 3)
+        self.assertEqual(index.get_numid('Route'), 3)
+        self.assertEqual(index.get_numid('PCM Playback Volume'), 1)
+        self.assertEqual(index.get('PCM Playback Switch')['numid'], 2)
+        self.assertEqual(len(index.get_controls()), 4)
+
+        self.assertTrue(index.is_built())
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(mock_run.call_args[0][0], ['amixer', '-c', '0', 'contents'])
+
+    @patch('backend.controlindex.subprocess.run')
+    def test_find_unknown_control(self, mock_run):
+        mock_run.return_value.stdout = CONTENTS.encode('utf-8')
+        index = ControlIndex()
+
+        self.assertIsNone(index.find('Capture'))
+        self.assertIsNone(index.get_numid('Capture'))
+        self.assertIsNone(index.get('Capture'))
+        self.assertEqual(mock_run.call_count, 1)
+
+    @patch('backend.controlindex.subprocess.run')
+    def test_invalidate(self, mock_run):
+        mock_run.return_value.stdout = CONTENTS.encode('utf-8')
+        index = ControlIndex()
+        index.get_numid('Route')
+
+        index.invalidate()
+
+        self.assertFalse(index.is_built())
+        self.assertEqual(index.get_numid('Route'), 3)
+        self.assertEqual(mock_run.call_count, 2)
+
+    @patch('backend.controlindex.subprocess.run')
+    def test_build_failed(self, mock_run):
+        mock_run.side_effect = Exception('amixer not found')
+        index = ControlIndex()
+
+        self.assertIsNone(index.get_numid('Route'))
+        self.assertEqual(index.get_controls(), [])
+        self.assertFalse(index.is_built())
+
+        # index build is retried on next lookup
+        mock_run.side_effect = None
+        mock_run.return_value = Mock(stdout=CONTENTS.encode('utf-8'))
+        self.assertEqual(index.get_numid('Route'), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
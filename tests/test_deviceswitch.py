@@ -0,0 +1,173 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.deviceswitch import DeviceSwitch
+from mock import Mock, patch
+
+
+class TestDeviceSwitch(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.old_driver = Mock()
+        self.old_driver.name = 'olddriver'
+        self.old_driver.is_installed.return_value = True
+        self.old_driver.disable.return_value = True
+        self.new_driver = Mock()
+        self.new_driver.name = 'newdriver'
+        self.new_driver.enable.return_value = True
+        self.new_driver.is_card_enabled.return_value = True
+        self.fs = Mock()
+        self.fs.open.return_value.read.return_value = 'old config'
+
+    def init_switch(self, volumes=None):
+        return DeviceSwitch(self.old_driver, self.new_driver, self.fs, volumes=volumes, asound_conf='/dummy/asound.conf')
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_execute(self, mock_exists):
+        mock_exists.return_value = True
+        commit = Mock(return_value=True)
+        switch = self.init_switch()
+
+        duration = switch.execute(commit)
+
+        self.assertTrue(isinstance(duration, float))
+        self.assertEqual(switch.duration, duration)
+        self.assertFalse(switch.rolled_back)
+        self.assertTrue(self.old_driver.disable.called)
+        self.assertTrue(self.new_driver.enable.called)
+        self.assertTrue(commit.called)
+        self.assertFalse(self.old_driver.enable.called)
+        self.assertFalse(self.new_driver.disable.called)
+        self.assertEqual(self.old_driver.is_installed.call_count, 1)
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_execute_without_old_driver(self, mock_exists):
+        mock_exists.return_value = False
+        switch = DeviceSwitch(None, self.new_driver, self.fs)
+
+        switch.execute()
+
+        self.assertTrue(self.new_driver.enable.called)
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_execute_old_driver_not_installed(self, mock_exists):
+        mock_exists.return_value = False
+        self.old_driver.is_installed.return_value = False
+        switch = self.init_switch()
+
+        switch.execute()
+
+        self.assertFalse(self.old_driver.disable.called)
+        self.assertTrue(self.new_driver.enable.called)
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_snapshot(self, mock_exists):
+        mock_exists.return_value = True
+        switch = self.init_switch(volumes={'playback': 12, 'capture': None})
+
+        self.assertEqual(switch.snapshot(), {
+            'old_installed': True,
+            'asound_conf': 'old config',
+            'volumes': {'playback': 12, 'capture': None},
+        })
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_disable_failed(self, mock_exists):
+        mock_exists.return_value = True
+        self.old_driver.disable.return_value = False
+        switch = self.init_switch()
+
+        with self.assertRaises(Exception) as cm:
+            switch.execute()
+        self.assertEqual(str(cm.exception), 'Unable to disable current device')
+
+        self.assertTrue(switch.rolled_back)
+        self.assertFalse(self.new_driver.enable.called)
+        self.assertFalse(self.old_driver.enable.called)
+        # asound.conf unchanged, not rewritten
+        self.fs.open.assert_called_with('/dummy/asound.conf', 'r')
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_enable_failed_rollback(self, mock_exists):
+        mock_exists.return_value = True
+        self.new_driver.enable.return_value = False
+        commit = Mock()
+        switch = self.init_switch(volumes={'playback': 12, 'capture': None})
+
+        with self.assertRaises(Exception) as cm:
+            switch.execute(commit)
+        self.assertEqual(str(cm.exception), 'Unable to enable selected device')
+
+        self.assertTrue(self.old_driver.enable.called)
+        self.assertFalse(self.new_driver.disable.called)
+        self.assertFalse(commit.called)
+        self.old_driver.set_volumes.assert_called_with(playback=12, capture=None)
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_card_not_enabled_rollback(self, mock_exists):
+        mock_exists.return_value = False
+        self.new_driver.is_card_enabled.return_value = False
+        switch = self.init_switch()
+
+        with self.assertRaises(Exception) as cm:
+            switch.execute()
+        self.assertEqual(str(cm.exception), 'Unable to enable selected device')
+
+        self.assertTrue(self.new_driver.disable.called)
+        self.assertTrue(self.old_driver.enable.called)
+        self.assertFalse(self.old_driver.set_volumes.called)
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_commit_failed_rollback(self, mock_exists):
+        mock_exists.return_value = False
+        switch = self.init_switch()
+
+        with self.assertRaises(Exception) as cm:
+            switch.execute(Mock(return_value=False))
+        self.assertEqual(str(cm.exception), 'Unable to save selected device')
+
+        self.assertTrue(self.new_driver.disable.called)
+        self.assertTrue(self.old_driver.enable.called)
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_rollback_restores_asound_conf(self, mock_exists):
+        mock_exists.return_value = True
+        self.new_driver.is_card_enabled.return_value = False
+        self.fs.open.return_value.read.side_effect = ['old config', 'new config']
+        switch = self.init_switch()
+
+        with self.assertRaises(Exception):
+            switch.execute()
+
+        self.fs.open.assert_called_with('/dummy/asound.conf', 'w')
+        self.fs.open.return_value.write.assert_called_with('old config')
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_rollback_deletes_created_asound_conf(self, mock_exists):
+        mock_exists.side_effect = [False, True]
+        self.fs.open.return_value.read.return_value = 'new config'
+        self.new_driver.is_card_enabled.return_value = False
+        switch = self.init_switch()
+
+        with self.assertRaises(Exception):
+            switch.execute()
+
+        self.fs.rm.assert_called_with('/dummy/asound.conf')
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_rollback_continues_if_undo_failed(self, mock_exists):
+        mock_exists.return_value = False
+        self.new_driver.is_card_enabled.return_value = False
+        self.new_driver.disable.side_effect = Exception('Test exception')
+        switch = self.init_switch()
+
+        with self.assertRaises(Exception):
+            switch.execute()
+
+        self.assertTrue(self.old_driver.enable.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.fileutils import read_file
+from mock import Mock, patch
+
+
+class TestFileUtils(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.fs = Mock()
+        self.logger = Mock()
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_read_file(self, mock_exists):
+        mock_exists.return_value = True
+        self.fs.open.return_value.read.return_value = 'content'
+
+        self.assertEqual(read_file(self.fs, '/etc/asound.conf', self.logger), 'content')
+        self.fs.open.assert_called_with('/etc/asound.conf', 'r')
+        self.assertTrue(self.fs.close.called)
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_read_file_not_exists(self, mock_exists):
+        mock_exists.return_value = False
+
+        self.assertIsNone(read_file(self.fs, '/etc/asound.conf', self.logger))
+        self.assertFalse(self.fs.open.called)
+
+    @patch('backend.fileutils.os.path.exists')
+    def test_read_file_failed(self, mock_exists):
+        mock_exists.return_value = True
+        self.fs.open.side_effect = OSError('Permission denied')
+
+        self.assertIsNone(read_file(self.fs, '/etc/asound.conf', self.logger))
+        self.assertTrue(self.logger.exception.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
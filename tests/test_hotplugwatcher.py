@@ -0,0 +1,84 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.hotplugwatcher import HotplugWatcher
+import os
+import shutil
+import struct
+import tempfile
+import time
+from mock import Mock, call
+
+
+class TestHotplugWatcher(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.path = tempfile.mkdtemp()
+        self.watcher = None
+
+    def tearDown(self):
+        if self.watcher:
+            self.watcher.stop()
+        shutil.rmtree(self.path)
+
+    def build_event(self, mask, name):
+        name = name.encode('utf-8') + b'\0' * (16 - len(name))
+        return struct.pack('iIII', 1, mask, 0, len(name)) + name
+
+    def wait_calls(self, callback, count, timeout=2.0):
+        end = time.time() + timeout
+        while callback.call_count < count and time.time() < end:
+            time.sleep(0.01)
+
+    def test_parse_events(self):
+        watcher = HotplugWatcher(Mock())
+        data = self.build_event(HotplugWatcher.IN_CREATE, 'controlC1')
+        data += self.build_event(HotplugWatcher.IN_CREATE, 'pcmC1D0p')
+        data += self.build_event(HotplugWatcher.IN_DELETE, 'controlC2')
+
+        self.assertEqual(watcher.parse_events(data), [('added', 1), ('removed', 2)])
+
+    def test_watch(self):
+        callback = Mock()
+        self.watcher = HotplugWatcher(callback, self.path)
+
+        self.assertTrue(self.watcher.start())
+        self.assertTrue(self.watcher.is_running())
+        open(os.path.join(self.path, 'pcmC1D0p'), 'w').close()
+        open(os.path.join(self.path, 'controlC1'), 'w').close()
+        os.remove(os.path.join(self.path, 'controlC1'))
+        self.wait_calls(callback, 2)
+
+        self.assertEqual(callback.call_args_list, [call('added', 1), call('removed', 1)])
+
+    def test_callback_exception_does_not_stop_watcher(self):
+        callback = Mock(side_effect=[Exception('Test exception'), None])
+        self.watcher = HotplugWatcher(callback, self.path)
+        self.watcher.start()
+
+        open(os.path.join(self.path, 'controlC1'), 'w').close()
+        open(os.path.join(self.path, 'controlC2'), 'w').close()
+        self.wait_calls(callback, 2)
+
+        self.assertEqual(callback.call_count, 2)
+        self.assertTrue(self.watcher.is_running())
+
+    def test_stop(self):
+        self.watcher = HotplugWatcher(Mock(), self.path)
+        self.watcher.start()
+
+        self.watcher.stop()
+
+        self.assertFalse(self.watcher.is_running())
+
+    def test_start_invalid_path(self):
+        self.watcher = HotplugWatcher(Mock(), os.path.join(self.path, 'dummy'))
+
+        self.assertFalse(self.watcher.start())
+        self.assertFalse(self.watcher.is_running())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.instrumentedproxy import InstrumentedProxy
+from backend.commandstats import CommandStats
+from mock import Mock
+
+
+class Helper():
+
+    def __init__(self):
+        self.value = 12
+
+    def get(self, key):
+        return key
+
+    def _private(self):
+        return 'private'
+
+
+class TestInstrumentedProxy(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.stats = CommandStats()
+        self.proxy = InstrumentedProxy(Helper(), self.stats, 'helper')
+
+    def test_method_measured(self):
+        self.assertEqual(self.proxy.get('key'), 'key')
+        self.assertEqual(self.proxy.get('key'), 'key')
+
+        self.assertEqual(self.stats.get_stats()['helper.get']['count'], 2)
+
+    def test_wrapper_cached(self):
+        self.assertIs(self.proxy.get, self.proxy.get)
+
+    def test_attribute_not_measured(self):
+        self.assertEqual(self.proxy.value, 12)
+        self.assertEqual(self.proxy._private(), 'private')
+
+        self.assertEqual(self.stats.get_stats(), {})
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(AttributeError):
+            self.proxy.dummy
+
+    def test_failure_measured(self):
+        target = Mock()
+        target.run.side_effect = Exception('Test exception')
+        proxy = InstrumentedProxy(target, self.stats, 'mock')
+
+        with self.assertRaises(Exception):
+            proxy.run()
+
+        self.assertEqual(self.stats.get_stats()['mock.run']['failures'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
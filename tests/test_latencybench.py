@@ -0,0 +1,240 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.latencybench import LatencyBench
+import os
+import tempfile
+import wave
+import numpy
+from mock import Mock, patch
+
+
+class TestLatencyBench(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.bench = LatencyBench(rate=16000)
+        self.wav_path = None
+
+    def tearDown(self):
+        if self.wav_path and os.path.exists(self.wav_path):
+            os.remove(self.wav_path)
+
+    def simulate_loopback(self, delay, length, noise=0.0, gain=0.3):
+        """
+        Build captured signal: attenuated chirp at specified delay plus white noise
+        """
+        chirp = self.bench.generate_chirp()
+        random = numpy.random.RandomState(1234)
+        captured = random.normal(0.0, noise * 32767.0, length) if noise else numpy.zeros(length)
+        captured[delay:delay + len(chirp)] += chirp * gain
+        return numpy.clip(captured, -32768, 32767).astype('<i2')
+
+    def write_wav(self, samples, rate, channels=1):
+        fd, self.wav_path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        with wave.open(self.wav_path, 'wb') as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(numpy.repeat(samples, channels).astype('<i2').tobytes())
+        return self.wav_path
+
+    def test_generate_chirp(self):
+        chirp = self.bench.generate_chirp()
+
+        self.assertEqual(len(chirp), 1600)
+        self.assertEqual(chirp.dtype, numpy.dtype('<i2'))
+        self.assertLessEqual(numpy.max(numpy.abs(chirp)), 32767 * LatencyBench.CHIRP_AMPLITUDE)
+        self.assertEqual(chirp[0], 0)
+
+    def test_estimate_delay(self):
+        captured = self.simulate_loopback(1234, 8000)
+
+        delay, confidence = self.bench.estimate_delay(self.bench.generate_chirp(), captured)
+
+        self.assertEqual(delay, 1234)
+        self.assertGreater(confidence, 0.99)
+
+    def test_estimate_delay_with_noise(self):
+        captured = self.simulate_loopback(4321, 12000, noise=0.05)
+
+        delay, confidence = self.bench.estimate_delay(self.bench.generate_chirp(), captured)
+
+        self.assertEqual(delay, 4321)
+        self.assertGreater(confidence, LatencyBench.MIN_CONFIDENCE)
+
+    def test_estimate_delay_inverted_signal(self):
+        captured = self.simulate_loopback(500, 4000, gain=-0.5)
+
+        delay, _ = self.bench.estimate_delay(self.bench.generate_chirp(), captured)
+
+        self.assertEqual(delay, 500)
+
+    def test_estimate_delay_no_chirp(self):
+        random = numpy.random.RandomState(1234)
+        captured = (random.normal(0.0, 0.1, 8000) * 32767.0).astype('<i2')
+
+        _, confidence = self.bench.estimate_delay(self.bench.generate_chirp(), captured)
+
+        self.assertLess(confidence, LatencyBench.MIN_CONFIDENCE)
+
+    def test_estimate_delay_captured_too_short(self):
+        self.assertEqual(self.bench.estimate_delay(self.bench.generate_chirp(), numpy.zeros(100)), (0, 0.0))
+
+    def test_estimate_delay_from_wav(self):
+        path = self.write_wav(self.simulate_loopback(2000, 8000, noise=0.01), 16000, channels=2)
+
+        samples, rate = self.bench.load_wav(path)
+        delay, _ = self.bench.estimate_delay(self.bench.generate_chirp(), samples)
+
+        self.assertEqual(rate, 16000)
+        self.assertEqual(len(samples), 8000)
+        self.assertEqual(delay, 2000)
+
+    def test_load_wav_invalid_sample_width(self):
+        fd, self.wav_path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        with wave.open(self.wav_path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(1)
+            wav.setframerate(8000)
+            wav.writeframes(b'\x80' * 100)
+
+        with self.assertRaises(ValueError) as cm:
+            self.bench.load_wav(self.wav_path)
+        self.assertEqual(str(cm.exception), 'Only 16 bits wav files are supported')
+
+    @patch('backend.latencybench.time.sleep')
+    def test_measure(self, mock_sleep):
+        captured = self.simulate_loopback(int(16000 * (LatencyBench.PREROLL + 0.05)), 13000)
+        self.bench.capture_pcm = Mock()
+        self.bench.capture_pcm.record.return_value = memoryview(captured.tobytes())
+        self.bench.playback_pcm = Mock()
+        self.bench.playback_pcm.play.return_value = True
+
+        latency, confidence = self.bench.measure()
+
+        # sleep is mocked: playback starts right after capture
+        self.assertAlmostEqual(latency, LatencyBench.PREROLL + 0.05, places=2)
+        self.assertGreater(confidence, 0.99)
+        self.assertEqual(self.bench.playback_pcm.play.call_args[0][0], self.bench.generate_chirp().tobytes())
+
+    @patch('backend.latencybench.time.sleep')
+    def test_measure_on_specified_pcms(self, mock_sleep):
+        captured = self.simulate_loopback(int(16000 * LatencyBench.PREROLL), 13000)
+        self.bench.capture_pcm = Mock()
+        self.bench.playback_pcm = Mock()
+        playback_pcm = Mock()
+        playback_pcm.play.return_value = True
+        capture_pcm = Mock()
+        capture_pcm.record.return_value = memoryview(captured.tobytes())
+
+        latency, _ = self.bench.measure(playback_pcm, capture_pcm)
+
+        self.assertAlmostEqual(latency, LatencyBench.PREROLL, places=2)
+        self.assertFalse(self.bench.playback_pcm.play.called)
+        self.assertFalse(self.bench.capture_pcm.record.called)
+
+    @patch('backend.latencybench.time.sleep')
+    def test_measure_chirp_not_detected(self, mock_sleep):
+        self.bench.capture_pcm = Mock()
+        self.bench.capture_pcm.record.return_value = memoryview(numpy.zeros(13000, dtype='<i2').tobytes())
+        self.bench.playback_pcm = Mock()
+        self.bench.playback_pcm.play.return_value = True
+
+        latency, confidence = self.bench.measure()
+
+        self.assertIsNone(latency)
+        self.assertEqual(confidence, 0.0)
+
+    @patch('backend.latencybench.time.sleep')
+    def test_measure_capture_failed(self, mock_sleep):
+        self.bench.capture_pcm = Mock()
+        self.bench.capture_pcm.record.side_effect = OSError('Test exception')
+        self.bench.playback_pcm = Mock()
+        self.bench.playback_pcm.play.return_value = True
+
+        with self.assertRaises(OSError):
+            self.bench.measure()
+
+    @patch('backend.latencybench.time.sleep')
+    def test_measure_playback_failed(self, mock_sleep):
+        self.bench.capture_pcm = Mock()
+        self.bench.capture_pcm.record.return_value = memoryview(b'')
+        self.bench.playback_pcm = Mock()
+        self.bench.playback_pcm.play.return_value = False
+
+        with self.assertRaises(Exception) as cm:
+            self.bench.measure()
+        self.assertEqual(str(cm.exception), 'Unable to play reference signal')
+
+    def test_run(self):
+        self.bench.measure = Mock(side_effect=[(0.010, 0.9), Exception('Test exception'), (None, 0.1), (0.014, 0.7)])
+
+        stats = self.bench.run(4)
+
+        self.assertEqual(stats, {
+            'runs': 4,
+            'failed': 2,
+            'latencies': [10.0, 14.0],
+            'min': 10.0,
+            'max': 14.0,
+            'mean': 12.0,
+            'median': 12.0,
+            'jitter': 2.0,
+            'confidence': 0.8,
+            'calibrated': False,
+            'bias': None,
+        })
+
+    def test_run_calibrated(self):
+        self.bench = LatencyBench(rate=16000, reference_devices=('hw:3,0', 'hw:3,1'))
+        reference_pcms = self.bench.reference_pcms
+        measures = {
+            'reference': [(0.030, 0.9), Exception('Test exception'), (0.040, 0.9)],
+            'card': [(0.050, 0.9), (0.060, 0.7)],
+        }
+        self.bench.measure = Mock(side_effect=lambda *pcms: self.next_measure(measures['reference' if pcms else 'card']))
+
+        stats = self.bench.run(2)
+
+        self.assertEqual(self.bench.measure.call_args_list[0][0], reference_pcms)
+        self.assertTrue(stats['calibrated'])
+        self.assertEqual(stats['bias'], 35.0)
+        self.assertEqual(stats['latencies'], [15.0, 25.0])
+
+    def test_run_calibration_failed(self):
+        self.bench = LatencyBench(rate=16000, reference_devices=('hw:3,0', 'hw:3,1'))
+        self.bench.measure = Mock(side_effect=lambda *pcms: (None, 0.0) if pcms else (0.050, 0.9))
+
+        stats = self.bench.run(1)
+
+        self.assertFalse(stats['calibrated'])
+        self.assertIsNone(stats['bias'])
+        self.assertEqual(stats['latencies'], [50.0])
+
+    def next_measure(self, measures):
+        measure = measures.pop(0)
+        if isinstance(measure, Exception):
+            raise measure
+        return measure
+
+    def test_reference_devices(self):
+        bench = LatencyBench(rate=16000, reference_devices=('hw:3,0', 'hw:3,1'))
+
+        self.assertEqual([pcm.device for pcm in bench.reference_pcms], ['hw:3,0', 'hw:3,1'])
+        self.assertIsNone(self.bench.reference_pcms)
+
+    def test_compute_stats_no_measure(self):
+        stats = LatencyBench.compute_stats([], [], 3)
+
+        self.assertEqual(stats['failed'], 3)
+        self.assertIsNone(stats['mean'])
+        self.assertIsNone(stats['jitter'])
+        self.assertIsNone(stats['confidence'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.levelmeter import LevelMeter
+import io
+import itertools
+import struct
+import time
+from mock import Mock, patch
+
+
+class TestLevelMeter(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.meter = None
+
+    def tearDown(self):
+        if self.meter:
+            self.meter.stop()
+
+    def build_samples(self, values):
+        return struct.pack('<%dh' % len(values), *values)
+
+    def wait_calls(self, callback, count, timeout=2.0):
+        end = time.time() + timeout
+        while callback.call_count < count and time.time() < end:
+            time.sleep(0.01)
+
+    def test_compute_levels(self):
+        meter = LevelMeter(Mock())
+
+        power, peak = meter.compute_levels(self.build_samples([16384, -16384, 16384, -32768]))
+
+        self.assertAlmostEqual(power, (0.25 * 3 + 1.0) / 4)
+        self.assertAlmostEqual(peak, 1.0)
+
+    def test_compute_levels_empty_block(self):
+        meter = LevelMeter(Mock())
+
+        self.assertEqual(meter.compute_levels(b''), (0.0, 0.0))
+
+    def test_to_dbfs(self):
+        meter = LevelMeter(Mock())
+
+        self.assertEqual(meter.to_dbfs(1.0), 0.0)
+        self.assertEqual(meter.to_dbfs(0.5), -6.0)
+        self.assertEqual(meter.to_dbfs(0.0), LevelMeter.MIN_LEVEL)
+        self.assertEqual(meter.to_dbfs(1e-9), LevelMeter.MIN_LEVEL)
+
+    def test_block_size(self):
+        meter = LevelMeter(Mock(), rate=16000, channels=2, block_duration=0.025)
+
+        self.assertEqual(meter.block_size, 400 * 4)
+
+    @patch('backend.levelmeter.time.monotonic')
+    @patch('backend.levelmeter.subprocess.Popen')
+    def test_start(self, mock_popen, mock_monotonic):
+        mock_monotonic.side_effect = itertools.count()
+        callback = Mock()
+        mock_popen.return_value.stdout = io.BytesIO(self.build_samples([16384] * 8000))
+        mock_popen.return_value.poll.return_value = 0
+        self.meter = LevelMeter(callback, rate=16000, publish_rate=10.0)
+
+        self.meter.start()
+        self.wait_calls(callback, 1)
+
+        self.assertIn('arecord', mock_popen.call_args[0][0])
+        callback.assert_called_with({'rms': -6.0, 'peak': -6.0})
+
+    @patch('backend.levelmeter.subprocess.Popen')
+    def test_start_levels_are_throttled(self, mock_popen):
+        callback = Mock()
+        mock_popen.return_value.stdout = io.BytesIO(self.build_samples([1000] * 16000))
+        mock_popen.return_value.poll.return_value = 0
+        self.meter = LevelMeter(callback, rate=16000, publish_rate=0.1)
+
+        self.meter.start()
+        self.meter.stop()
+
+        self.assertFalse(callback.called)
+
+    @patch('backend.levelmeter.subprocess.Popen')
+    def test_start_already_running(self, mock_popen):
+        mock_popen.return_value.stdout = Mock()
+        mock_popen.return_value.stdout.readinto.side_effect = lambda view: time.sleep(0.05) or 0
+        self.meter = LevelMeter(Mock())
+        self.meter.start()
+
+        self.meter.start()
+
+        self.assertEqual(mock_popen.call_count, 1)
+
+    @patch('backend.levelmeter.subprocess.Popen')
+    def test_stop(self, mock_popen):
+        mock_popen.return_value.stdout = io.BytesIO(b'')
+        mock_popen.return_value.poll.return_value = 0
+        self.meter = LevelMeter(Mock())
+        self.meter.start()
+
+        self.meter.stop()
+
+        self.assertFalse(self.meter.is_running())
+        self.assertTrue(mock_popen.return_value.terminate.called)
+
+    @patch('backend.levelmeter.time.monotonic')
+    @patch('backend.levelmeter.subprocess.Popen')
+    def test_start_with_capture_stream(self, mock_popen, mock_monotonic):
+        mock_monotonic.side_effect = itertools.count()
+        callback = Mock()
+        stream = Mock()
+        stream.pcm.rate = 8000
+        stream.pcm.channels = 1
+        stream.pcm.device = None
+        consumer = stream.open_consumer.return_value
+        consumer.chunks.return_value = (memoryview(self.build_samples([16384] * 200)) for _ in range(3))
+        self.meter = LevelMeter(callback, publish_rate=10.0, stream=stream)
+
+        self.meter.start()
+        self.wait_calls(callback, 1)
+        self.meter.stop()
+
+        self.assertFalse(mock_popen.called)
+        consumer.chunks.assert_called_with(200 * 2)
+        callback.assert_called_with({'rms': -6.0, 'peak': -6.0})
+        self.assertTrue(consumer.close.called)
+
+    @patch('backend.levelmeter.time.monotonic')
+    @patch('backend.levelmeter.subprocess.Popen')
+    def test_callback_exception(self, mock_popen, mock_monotonic):
+        mock_monotonic.side_effect = itertools.count()
+        callback = Mock(side_effect=Exception('Test exception'))
+        mock_popen.return_value.stdout = io.BytesIO(self.build_samples([1000] * 16000))
+        mock_popen.return_value.poll.return_value = 0
+        self.meter = LevelMeter(callback, rate=16000, publish_rate=10.0)
+
+        self.meter.start()
+        self.wait_calls(callback, 2)
+
+        self.assertGreaterEqual(callback.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,247 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.playbackservice import PlaybackService
+from backend.rawpcm import RawPcm
+import struct
+import time
+from mock import Mock, patch
+
+
+def pcm(*samples):
+    return struct.pack('<%dh' % len(samples), *samples)
+
+
+class TestPlaybackService(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def init_service(self, **kwargs):
+        # 2 mono S16 frames per period, stream closed as soon as idle
+        params = {'rate': 400, 'channels': 1, 'period': 0.005, 'idle_timeout': 0.0}
+        params.update(kwargs)
+        return PlaybackService(**params)
+
+    @patch('backend.playbackservice.threading.Thread')
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_play_opens_stream_once(self, mock_popen, mock_thread):
+        service = self.init_service()
+
+        self.assertFalse(service.is_running())
+        self.assertEqual(service.play(pcm(1, 2)), 1)
+        self.assertEqual(service.play(pcm(3, 4)), 2)
+
+        self.assertTrue(service.is_running())
+        self.assertEqual(mock_popen.call_count, 1)
+        command = mock_popen.call_args[0][0]
+        self.assertEqual(command[0], 'aplay')
+        self.assertIn('--buffer-time=20000', command)
+        self.assertEqual(service.get_status(), {'running': True, 'playing': 2, 'queued': 0})
+
+    @patch('backend.playbackservice.threading.Thread')
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_play_mixes_sounds(self, mock_popen, mock_thread):
+        service = self.init_service()
+        service.play(pcm(100, 200, 300, 400))
+        service.play(pcm(1, 2))
+
+        self.assertEqual(service._next_chunk(), pcm(101, 202))
+        self.assertEqual(service._next_chunk(), pcm(300, 400))
+        self.assertEqual(service.get_status()['playing'], 0)
+
+    @patch('backend.playbackservice.threading.Thread')
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_play_pads_last_period(self, mock_popen, mock_thread):
+        service = self.init_service()
+        service.play(pcm(5))
+
+        self.assertEqual(service._next_chunk(), pcm(5, 0))
+        self.assertIsNone(service._next_chunk())
+
+    @patch('backend.playbackservice.threading.Thread')
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_queue_plays_sounds_sequentially_by_priority(self, mock_popen, mock_thread):
+        service = self.init_service()
+        service.queue(pcm(1, 1))
+        service.queue(pcm(2, 2), PlaybackService.PRIORITY_HIGH)
+        service.queue(pcm(3, 3))
+
+        self.assertEqual(service.get_status()['queued'], 3)
+        self.assertEqual(service._next_chunk(), pcm(2, 2))
+        self.assertEqual(service._next_chunk(), pcm(1, 1))
+        self.assertEqual(service._next_chunk(), pcm(3, 3))
+        self.assertEqual(service.get_status()['queued'], 0)
+
+    @patch('backend.playbackservice.threading.Thread')
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_queued_sound_mixed_with_played_sound(self, mock_popen, mock_thread):
+        service = self.init_service()
+        service.queue(pcm(10, 10, 10, 10))
+        service._next_chunk()
+        service.play(pcm(5, 5))
+
+        self.assertEqual(service._next_chunk(), pcm(15, 15))
+
+    def test_mix_saturates(self):
+        self.assertEqual(PlaybackService.mix([pcm(32000, -32000), pcm(1000, -1000)], 2), pcm(32767, -32768))
+        self.assertEqual(PlaybackService.mix([pcm(1, 2)], 2), pcm(1, 2))
+
+    def test_mix_several_chunks(self):
+        self.assertEqual(PlaybackService.mix([pcm(20000, 1), pcm(20000, 2), pcm(-30000, 3)], 2), pcm(10000, 6))
+
+    def test_mix_s32_saturates(self):
+        chunks = [struct.pack('<2i', 2**31 - 10, -5), struct.pack('<2i', 100, 5)]
+
+        self.assertEqual(PlaybackService.mix(chunks, 4), struct.pack('<2i', 2**31 - 1, 0))
+
+    @patch('backend.playbackservice.PlaybackService._numpy', False)
+    def test_mix_without_numpy(self):
+        self.assertIsNone(PlaybackService.get_numpy())
+        self.assertEqual(PlaybackService.mix([pcm(32000, -32000), pcm(1000, -1000)], 2), pcm(32767, -32768))
+        self.assertEqual(PlaybackService.mix([pcm(20000, 1), pcm(20000, 2), pcm(-30000, 3)], 2), pcm(10000, 6))
+
+        chunks = [struct.pack('<2i', 2**31 - 10, -5), struct.pack('<2i', 100, 5)]
+        self.assertEqual(PlaybackService.mix(chunks, 4), struct.pack('<2i', 2**31 - 1, 0))
+
+    def test_mix_memoryview_chunks(self):
+        data = memoryview(pcm(1, 2, 3, 4)).cast('B')
+
+        self.assertEqual(PlaybackService.mix([data[0:4], data[4:8]], 2), pcm(4, 6))
+
+    @patch('backend.playbackservice.threading.Thread')
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_max_voices(self, mock_popen, mock_thread):
+        service = self.init_service(max_voices=2)
+        service.play(pcm(1, 1), PlaybackService.PRIORITY_HIGH)
+        service.play(pcm(2, 2), PlaybackService.PRIORITY_LOW)
+        service.play(pcm(4, 4))
+
+        # low priority sound dropped
+        self.assertEqual(service.get_status()['playing'], 2)
+        self.assertEqual(service._next_chunk(), pcm(5, 5))
+
+    @patch('backend.playbackservice.threading.Thread')
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_stream_closed_when_nothing_to_play(self, mock_popen, mock_thread):
+        service = self.init_service()
+        service.play(pcm(1, 1))
+        service._next_chunk()
+
+        self.assertIsNone(service._next_chunk())
+        self.assertFalse(service.is_running())
+
+        # stream is opened again on next sound, once previous writer is done
+        service.play(pcm(1, 1))
+        self.assertEqual(mock_popen.call_count, 2)
+        self.assertTrue(mock_thread.return_value.join.called)
+
+    @patch('backend.playbackservice.threading.Thread')
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_stream_kept_opened_while_idle(self, mock_popen, mock_thread):
+        service = self.init_service(idle_timeout=0.1)
+        service.play(pcm(1, 1))
+        service._next_chunk()
+
+        # silence is written during idle timeout
+        self.assertEqual(service._next_chunk(), pcm(0, 0))
+        self.assertTrue(service.is_running())
+        service.play(pcm(2, 2))
+        self.assertEqual(service._next_chunk(), pcm(2, 2))
+        self.assertEqual(mock_popen.call_count, 1)
+
+        service._next_chunk()
+        time.sleep(0.15)
+        self.assertIsNone(service._next_chunk())
+        self.assertFalse(service.is_running())
+
+    @patch('backend.playbackservice.threading.Thread')
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_open_callback_called_without_lock(self, mock_popen, mock_thread):
+        statuses = []
+        service = self.init_service(open_callback=lambda: statuses.append(service.get_status()) or True)
+
+        service.play(pcm(1, 1))
+
+        self.assertEqual(statuses, [{'running': False, 'playing': 1, 'queued': 0}])
+        self.assertTrue(service.is_running())
+
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_stream_written(self, mock_popen):
+        service = self.init_service(rate=8000)
+        service.play(pcm(*range(80)))
+        time.sleep(0.2)
+
+        self.assertFalse(service.is_running())
+        written = b''.join(call[0][0] for call in mock_popen.return_value.stdin.write.call_args_list)
+        self.assertEqual(written, pcm(*range(80)))
+        self.assertTrue(mock_popen.return_value.stdin.close.called)
+        self.assertFalse(mock_popen.return_value.terminate.called)
+
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_callbacks(self, mock_popen):
+        open_callback = Mock(return_value=True)
+        close_callback = Mock()
+        service = self.init_service(rate=8000, open_callback=open_callback, close_callback=close_callback)
+
+        service.play(pcm(1, 1))
+        time.sleep(0.1)
+
+        self.assertEqual(open_callback.call_count, 1)
+        self.assertEqual(close_callback.call_count, 1)
+
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_device_busy(self, mock_popen):
+        close_callback = Mock()
+        service = self.init_service(open_callback=Mock(return_value=False), close_callback=close_callback)
+
+        with self.assertRaises(OSError) as cm:
+            service.play(pcm(1, 1))
+        self.assertEqual(str(cm.exception), 'Playback device is busy')
+
+        self.assertFalse(mock_popen.called)
+        self.assertFalse(close_callback.called)
+        self.assertEqual(service.get_status(), {'running': False, 'playing': 0, 'queued': 0})
+
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_aplay_failed(self, mock_popen):
+        mock_popen.side_effect = OSError('aplay not found')
+        close_callback = Mock()
+        service = self.init_service(open_callback=Mock(return_value=True), close_callback=close_callback)
+
+        with self.assertRaises(OSError):
+            service.play(pcm(1, 1))
+
+        self.assertEqual(close_callback.call_count, 1)
+        self.assertFalse(service.is_running())
+
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_stream_broken(self, mock_popen):
+        mock_popen.return_value.stdin.write.side_effect = BrokenPipeError()
+        service = self.init_service()
+        service.play(pcm(1, 1))
+        time.sleep(0.05)
+
+        self.assertFalse(service.is_running())
+
+    @patch('backend.playbackservice.subprocess.Popen')
+    def test_stop(self, mock_popen):
+        service = self.init_service()
+        service.play(pcm(1, 1))
+        service.queue(pcm(1, 1))
+
+        service.stop()
+
+        self.assertFalse(service.is_running())
+        self.assertEqual(service.get_status(), {'running': False, 'playing': 0, 'queued': 0})
+        self.assertTrue(mock_popen.return_value.wait.called)
+
+    def test_u8_format_mixed_as_s16(self):
+        service = self.init_service(sample_format=RawPcm.FORMAT_U8)
+
+        self.assertEqual(service.get_format()['sample_format'], RawPcm.FORMAT_S16LE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.rawpcm import RawPcm
+import io
+from mock import Mock, patch
+
+
+class TestRawPcm(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError) as cm:
+            RawPcm(sample_format='dummy')
+        self.assertEqual(str(cm.exception), 'Unsupported sample format "dummy"')
+
+    def test_frame_size(self):
+        self.assertEqual(RawPcm(channels=1, sample_format=RawPcm.FORMAT_S16LE).frame_size, 2)
+        self.assertEqual(RawPcm(channels=2, sample_format=RawPcm.FORMAT_S32LE).frame_size, 8)
+
+    def test_get_command(self):
+        pcm = RawPcm(rate=16000, channels=2, device='hw:1,0')
+
+        self.assertEqual(pcm.get_command(RawPcm.APLAY), [
+            'aplay', '-q', '-t', 'raw', '-f', 'S16_LE', '-r', '16000', '-c', '2', '-D', 'hw:1,0',
+        ])
+        self.assertEqual(pcm.get_command(RawPcm.ARECORD, ['-s', '10'])[-2:], ['-s', '10'])
+
+    @patch('backend.rawpcm.subprocess.Popen')
+    def test_record(self, mock_popen):
+        mock_popen.return_value.stdout = io.BytesIO(b'\x01\x02' * 1000)
+        mock_popen.return_value.poll.return_value = 0
+        pcm = RawPcm(rate=1000)
+
+        data = pcm.record(0.5)
+
+        self.assertEqual(bytes(data), b'\x01\x02' * 500)
+        self.assertIn('500', mock_popen.call_args[0][0])
+
+    @patch('backend.rawpcm.subprocess.Popen')
+    def test_record_stopped_early(self, mock_popen):
+        mock_popen.return_value.stdout = io.BytesIO(b'\x01\x02' * 10)
+        mock_popen.return_value.poll.return_value = 0
+        pcm = RawPcm(rate=1000)
+
+        data = pcm.record(0.5)
+
+        self.assertEqual(len(data), 20)
+
+    @patch('backend.rawpcm.subprocess.Popen')
+    def test_play(self, mock_popen):
+        stdin = Mock()
+        mock_popen.return_value.stdin = stdin
+        mock_popen.return_value.wait.return_value = 0
+        pcm = RawPcm(rate=1000)
+
+        self.assertTrue(pcm.play(b'\x00' * 200))
+        stdin.write.assert_called_with(b'\x00' * 200)
+        self.assertTrue(stdin.close.called)
+
+    @patch('backend.rawpcm.subprocess.Popen')
+    def test_play_failed(self, mock_popen):
+        mock_popen.return_value.stdin.write.side_effect = BrokenPipeError()
+        mock_popen.return_value.wait.return_value = 1
+        pcm = RawPcm(rate=1000)
+
+        self.assertFalse(pcm.play(b'\x00' * 200))
+
+
+if __name__ == "__main__":
+    unittest.main()
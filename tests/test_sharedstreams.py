@@ -0,0 +1,163 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.sharedstreams import SharedStreams
+from backend.asoundprofile import AsoundProfile
+from mock import Mock, MagicMock, patch
+
+
+class TestSharedStreams(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.fs = Mock()
+        self.need_resource = Mock()
+        self.release_resource = Mock()
+        self.is_resource_busy = Mock(return_value=False)
+        self.streams = SharedStreams(
+            self.fs,
+            '/etc/asound.conf',
+            Mock(return_value={'rate': 48000, 'channels': 2, 'sample_format': 'S16_LE'}),
+            {'rate': 16000, 'channels': 1, 'sample_format': 'S16_LE'},
+            self.need_resource,
+            self.release_resource,
+            self.is_resource_busy,
+            MagicMock(),
+            resource_timeout=0.01,
+        )
+
+    def acquire_on_need(self):
+        self.need_resource.side_effect = self.streams.resource_acquired
+
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_playback_service_created_once(self, mock_service):
+        self.assertIs(self.streams.get_playback_service(), self.streams.get_playback_service())
+
+        self.assertEqual(mock_service.call_count, 1)
+        self.assertEqual(mock_service.call_args[1]['rate'], 48000)
+        self.assertEqual(mock_service.call_args[1]['open_callback'], self.streams._open_playback_stream)
+        self.assertEqual(mock_service.call_args[1]['close_callback'], self.streams._close_playback_stream)
+
+    @patch('backend.sharedstreams.PlaybackService')
+    def test_close_playback_service(self, mock_service):
+        self.streams.get_playback_service()
+
+        self.streams.close_playback_service()
+
+        self.assertTrue(mock_service.return_value.stop.called)
+        self.streams.get_playback_service()
+        self.assertEqual(mock_service.call_count, 2)
+
+    @patch('backend.sharedstreams.CaptureStream')
+    def test_capture_stream_created_with_resource_callbacks(self, mock_stream):
+        self.assertIs(self.streams.get_capture_stream(), self.streams.get_capture_stream())
+
+        self.assertEqual(mock_stream.call_count, 1)
+        self.assertEqual(mock_stream.call_args[1]['rate'], 16000)
+        self.assertEqual(mock_stream.call_args[1]['open_callback'], self.streams._open_capture_stream)
+        self.assertEqual(mock_stream.call_args[1]['close_callback'], self.streams._close_capture_stream)
+
+    @patch('backend.sharedstreams.PlaybackService')
+    @patch('backend.sharedstreams.CaptureStream')
+    def test_stop(self, mock_stream, mock_service):
+        self.streams.get_capture_stream()
+        self.streams.get_playback_service()
+
+        self.streams.stop()
+
+        self.assertTrue(mock_stream.return_value.stop.called)
+        self.assertTrue(mock_service.return_value.stop.called)
+
+    @patch('backend.sharedstreams.PlaybackService')
+    @patch('backend.sharedstreams.CaptureStream')
+    def test_stop_unused_streams_not_created(self, mock_stream, mock_service):
+        self.streams.stop()
+
+        self.assertFalse(mock_stream.called)
+        self.assertFalse(mock_service.called)
+
+    @patch('backend.fileutils.os.path.exists', return_value=True)
+    def test_is_playback_shared(self, mock_exists):
+        self.fs.open.return_value.read.return_value = AsoundProfile('balanced').generate(0, 0)
+        self.assertTrue(self.streams.is_playback_shared())
+        self.fs.open.assert_called_with('/etc/asound.conf', 'r')
+
+        self.fs.open.return_value.read.return_value = 'pcm.!default {}'
+        self.assertFalse(self.streams.is_playback_shared())
+
+        self.fs.open.side_effect = OSError('Permission denied')
+        self.assertFalse(self.streams.is_playback_shared())
+
+    @patch('backend.fileutils.os.path.exists', return_value=True)
+    def test_is_capture_shared(self, mock_exists):
+        self.fs.open.return_value.read.return_value = AsoundProfile('balanced').generate(0, 0, capture=True)
+        self.assertTrue(self.streams.is_capture_shared())
+
+        self.fs.open.return_value.read.return_value = AsoundProfile('balanced').generate(0, 0)
+        self.assertFalse(self.streams.is_capture_shared())
+
+    def test_open_playback_stream_device_shared(self):
+        self.streams.is_playback_shared = Mock(return_value=True)
+
+        self.assertTrue(self.streams._open_playback_stream())
+
+        self.assertFalse(self.need_resource.called)
+
+    def test_open_playback_stream_acquires_resource(self):
+        self.streams.is_playback_shared = Mock(return_value=False)
+        self.acquire_on_need()
+
+        self.assertTrue(self.streams._open_playback_stream())
+        self.need_resource.assert_called_with('audio.playback')
+        self.assertTrue(self.streams.is_resource_held('audio.playback'))
+        self.assertFalse(self.release_resource.called)
+
+        self.streams._close_playback_stream()
+        self.release_resource.assert_called_once_with('audio.playback')
+        self.streams._close_playback_stream()
+        self.assertEqual(self.release_resource.call_count, 1)
+        self.assertFalse(self.streams.is_resource_held('audio.playback'))
+
+    def test_open_playback_stream_resource_not_acquired(self):
+        self.streams.is_playback_shared = Mock(return_value=False)
+
+        self.assertFalse(self.streams._open_playback_stream())
+
+        # late acquisition is not for a stream anymore
+        self.assertFalse(self.streams.resource_acquired('audio.playback'))
+        self.streams._close_playback_stream()
+        self.assertFalse(self.release_resource.called)
+
+    def test_open_playback_stream_resource_busy(self):
+        self.streams.is_playback_shared = Mock(return_value=False)
+        self.is_resource_busy.return_value = True
+
+        self.assertFalse(self.streams._open_playback_stream())
+
+        self.is_resource_busy.assert_called_with('audio.playback')
+        self.assertFalse(self.need_resource.called)
+
+    def test_open_capture_stream_acquires_resource(self):
+        self.streams.is_capture_shared = Mock(return_value=False)
+        self.acquire_on_need()
+
+        self.assertTrue(self.streams._open_capture_stream())
+        self.need_resource.assert_called_with('audio.capture')
+
+        self.streams._close_capture_stream()
+        self.release_resource.assert_called_once_with('audio.capture')
+
+    def test_open_capture_stream_device_shared(self):
+        self.streams.is_capture_shared = Mock(return_value=True)
+
+        self.assertTrue(self.streams._open_capture_stream())
+
+        self.assertFalse(self.need_resource.called)
+
+    def test_resource_acquired_without_stream(self):
+        self.assertFalse(self.streams.resource_acquired('audio.capture'))
+
+
+if __name__ == "__main__":
+    unittest.main()
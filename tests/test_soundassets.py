@@ -0,0 +1,115 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.soundassets import SoundAssets
+from backend.soundcache import SoundCache
+from mock import Mock
+import os
+import struct
+import tempfile
+import shutil
+import wave
+
+
+class TestSoundAssets(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.path = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.path, 'cache')
+        self.fs = Mock()
+        self.fs.open.side_effect = open
+        self.fs.close.side_effect = lambda fd: fd.close()
+        self.fs.mkdir.side_effect = lambda path, recursive: os.makedirs(path, exist_ok=True)
+        self.fs.rename.side_effect = os.rename
+        self.fs.rm.side_effect = os.remove
+        self.sound_cache = SoundCache()
+        self.assets = SoundAssets(self.cache_path, self.fs, self.sound_cache)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write_wav(self, name, rate=8000, channels=1, frames=800):
+        path = os.path.join(self.path, name)
+        with wave.open(path, 'wb') as wav:
+            wav.setframerate(rate)
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.writeframes(struct.pack('<%dh' % (frames * channels), *([1000] * frames * channels)))
+        return path
+
+    def test_get_converts_sound(self):
+        path = self.write_wav('sound.wav')
+
+        variant_path = self.assets.get(path, 16000, 2, 'S16_LE')
+
+        self.assertTrue(variant_path.startswith(os.path.join(self.cache_path, '16000_2_S16_LE', 'sound_')))
+        with wave.open(variant_path, 'rb') as wav:
+            self.assertEqual((wav.getframerate(), wav.getnchannels(), wav.getsampwidth()), (16000, 2, 2))
+            self.assertAlmostEqual(wav.getnframes(), 1600, delta=4)
+        self.assertFalse(os.path.exists(variant_path + '.tmp'))
+
+    def test_get_converts_once(self):
+        path = self.write_wav('sound.wav')
+        self.sound_cache.decode = Mock(wraps=self.sound_cache.decode)
+
+        variant_path = self.assets.get(path, 16000, 1, 'S16_LE')
+        self.assertEqual(self.assets.get(path, 16000, 1, 'S16_LE'), variant_path)
+
+        self.assertEqual(self.sound_cache.decode.call_count, 1)
+
+    def test_get_variants_keyed_by_format(self):
+        path = self.write_wav('sound.wav')
+
+        variant1 = self.assets.get(path, 16000, 1, 'S16_LE')
+        variant2 = self.assets.get(path, 48000, 2, 'S32_LE')
+
+        self.assertNotEqual(os.path.dirname(variant1), os.path.dirname(variant2))
+        self.assertEqual(os.path.basename(variant1), os.path.basename(variant2))
+
+    def test_get_same_format(self):
+        path = self.write_wav('sound.wav')
+
+        self.assertEqual(self.assets.get(path, 8000, 1, 'S16_LE'), path)
+        self.assertFalse(self.fs.open.called)
+
+    def test_get_source_modified(self):
+        path = self.write_wav('sound.wav')
+        variant_path = self.assets.get(path, 16000, 1, 'S16_LE')
+        os.utime(variant_path, (0, 0))
+        self.sound_cache.decode = Mock(wraps=self.sound_cache.decode)
+
+        self.assets.get(path, 16000, 1, 'S16_LE')
+
+        self.assertEqual(self.sound_cache.decode.call_count, 1)
+
+    def test_get_conversion_failed(self):
+        path = self.write_wav('sound.wav')
+        self.sound_cache.decode = Mock(side_effect=Exception('Unsupported sample format'))
+
+        with self.assertRaises(Exception) as cm:
+            self.assets.get(path, 16000, 1, 'S16_LE')
+        self.assertEqual(str(cm.exception), 'Unsupported sample format')
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_get_write_failed(self):
+        path = self.write_wav('sound.wav')
+        self.sound_cache.decode = Mock(return_value=None)
+
+        with self.assertRaises(Exception):
+            self.assets.get(path, 16000, 1, 'S16_LE')
+        self.assertEqual(os.listdir(self.assets.get_format_path(16000, 1, 'S16_LE')), [])
+
+    def test_prepare(self):
+        path = self.write_wav('sound.wav')
+        missing = os.path.join(self.path, 'missing.wav')
+
+        variants = self.assets.prepare([path, missing], 16000, 1, 'S16_LE')
+
+        self.assertEqual(list(variants.keys()), [path])
+        self.assertTrue(os.path.exists(variants[path]))
+
+
+if __name__ == "__main__":
+    unittest.main()
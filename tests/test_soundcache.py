@@ -0,0 +1,136 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.soundcache import SoundCache
+import os
+import struct
+import tempfile
+import shutil
+import wave
+
+
+class TestSoundCache(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write_wav(self, name, rate=8000, channels=1, width=2, frames=800):
+        path = os.path.join(self.path, name)
+        with wave.open(path, 'wb') as wav:
+            wav.setframerate(rate)
+            wav.setnchannels(channels)
+            wav.setsampwidth(width)
+            wav.writeframes(struct.pack('<%dh' % (frames * channels), *([1000] * frames * channels)) if width == 2 else b'\x80' * frames * channels)
+        return path
+
+    def test_get_same_format(self):
+        path = self.write_wav('sound.wav')
+        cache = SoundCache()
+
+        data = cache.get(path, 8000, 1, 'S16_LE')
+
+        self.assertEqual(len(data), 1600)
+        self.assertEqual(cache.get_size(), 1600)
+
+    def test_get_converted(self):
+        path = self.write_wav('sound.wav', rate=8000, channels=1)
+        cache = SoundCache()
+
+        data = cache.get(path, 16000, 2, 'S16_LE')
+
+        # twice frames, twice channels
+        self.assertAlmostEqual(len(data), 800 * 2 * 2 * 2, delta=8)
+        self.assertEqual(struct.unpack('<2h', data[40:44]), (1000, 1000))
+
+    def test_get_converted_from_u8_stereo(self):
+        path = self.write_wav('sound.wav', rate=8000, channels=2, width=1)
+        cache = SoundCache()
+
+        data = cache.get(path, 8000, 1, 'S16_LE')
+
+        self.assertEqual(len(data), 1600)
+        self.assertEqual(struct.unpack('<h', data[0:2]), (0,))
+
+    def test_get_converted_to_s32_mono(self):
+        path = self.write_wav('sound.wav', rate=8000, channels=2)
+        cache = SoundCache()
+
+        data = cache.get(path, 4000, 1, 'S32_LE')
+
+        self.assertEqual(len(data), 400 * 4)
+        self.assertEqual(struct.unpack('<2i', data[0:8]), (1000 << 16, 1000 << 16))
+
+    def test_decode_interpolates_samples(self):
+        path = os.path.join(self.path, 'sound.wav')
+        with wave.open(path, 'wb') as wav:
+            wav.setframerate(8000)
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.writeframes(struct.pack('<3h', 0, 1000, -1000))
+
+        data = SoundCache().decode(path, 16000, 1, 'S16_LE')
+
+        self.assertEqual(struct.unpack('<6h', data), (0, 500, 1000, 0, -1000, -1000))
+
+    def test_get_cached(self):
+        path = self.write_wav('sound.wav')
+        cache = SoundCache()
+        data1 = cache.get(path, 8000, 1, 'S16_LE')
+        os.remove(path)
+        self.write_wav('sound.wav')
+        os.utime(path, (0, 0))
+
+        self.assertIsNot(cache.get(path, 8000, 1, 'S16_LE'), data1)
+        data2 = cache.get(path, 8000, 1, 'S16_LE')
+        self.assertIs(cache.get(path, 8000, 1, 'S16_LE'), data2)
+
+    def test_lru_eviction(self):
+        path1 = self.write_wav('sound1.wav')
+        path2 = self.write_wav('sound2.wav')
+        path3 = self.write_wav('sound3.wav')
+        cache = SoundCache(max_size=3500)
+        data1 = cache.get(path1, 8000, 1, 'S16_LE')
+        cache.get(path2, 8000, 1, 'S16_LE')
+        cache.get(path1, 8000, 1, 'S16_LE')
+
+        cache.get(path3, 8000, 1, 'S16_LE')
+
+        self.assertEqual(cache.get_size(), 3200)
+        self.assertIs(cache.get(path1, 8000, 1, 'S16_LE'), data1)
+
+    def test_sound_bigger_than_cache_not_cached(self):
+        path = self.write_wav('sound.wav')
+        cache = SoundCache(max_size=100)
+
+        cache.get(path, 8000, 1, 'S16_LE')
+
+        self.assertEqual(cache.get_size(), 0)
+
+    def test_clear(self):
+        path = self.write_wav('sound.wav')
+        cache = SoundCache()
+        cache.get(path, 8000, 1, 'S16_LE')
+
+        cache.clear()
+
+        self.assertEqual(cache.get_size(), 0)
+
+    def test_unsupported_format(self):
+        path = self.write_wav('sound.wav')
+        cache = SoundCache()
+
+        with self.assertRaises(Exception) as cm:
+            cache.get(path, 8000, 1, 'FLOAT_LE')
+        self.assertEqual(str(cm.exception), 'Unsupported sample format')
+        with self.assertRaises(Exception) as cm:
+            cache.get(path, 8000, 6, 'S16_LE')
+        self.assertEqual(str(cm.exception), 'Only mono and stereo sounds can be converted')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.testjobs import TestJobs
+import threading
+import time
+from mock import Mock, MagicMock
+
+
+class TestTestJobs(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.run_callback = Mock(return_value={'runs': 1})
+        self.update_callback = Mock()
+        self.need_resource = Mock()
+        self.release_resource = Mock()
+        self.jobs = TestJobs(
+            {'playing': ('audio.playback',), 'latency': ('audio.playback', 'audio.capture')},
+            self.run_callback,
+            self.update_callback,
+            self.need_resource,
+            self.release_resource,
+            MagicMock(),
+            history=2,
+        )
+
+    def wait_job(self, job_id, timeout=2.0):
+        end = time.time() + timeout
+        while time.time() < end:
+            job = self.jobs.get(job_id)
+            if job['status'] in (TestJobs.STATUS_DONE, TestJobs.STATUS_FAILED):
+                return job
+            time.sleep(0.01)
+        return self.jobs.get(job_id)
+
+    def test_start(self):
+        job_id = self.jobs.start('latency', {'runs': 1})
+
+        job = self.jobs.get(job_id)
+        self.assertEqual(job['status'], TestJobs.STATUS_WAITING)
+        self.assertEqual(job['type'], 'latency')
+        self.assertEqual([call[0][0] for call in self.need_resource.call_args_list], ['audio.playback', 'audio.capture'])
+        self.assertTrue(self.jobs.is_pending('audio.capture'))
+
+    def test_start_resources_used(self):
+        self.jobs.start('latency')
+
+        with self.assertRaises(ValueError) as cm:
+            self.jobs.start('playing')
+        self.assertEqual(str(cm.exception), 'A latency test is already running')
+
+    def test_get_returns_copy(self):
+        job_id = self.jobs.start('playing')
+
+        self.jobs.get(job_id)['status'] = 'dummy'
+
+        self.assertEqual(self.jobs.get(job_id)['status'], TestJobs.STATUS_WAITING)
+        self.assertIsNone(self.jobs.get('dummy'))
+
+    def test_run_when_all_resources_acquired(self):
+        job_id = self.jobs.start('latency', {'runs': 1})
+
+        self.assertTrue(self.jobs.resource_acquired('audio.playback'))
+        self.assertEqual(self.jobs.get(job_id)['status'], TestJobs.STATUS_WAITING)
+        self.assertTrue(self.jobs.resource_acquired('audio.capture'))
+        job = self.wait_job(job_id)
+
+        self.assertEqual(job['status'], TestJobs.STATUS_DONE)
+        self.assertEqual(job['result'], {'runs': 1})
+        self.assertEqual(self.run_callback.call_args[0][1], {'runs': 1})
+        self.assertEqual([call[0][0] for call in self.release_resource.call_args_list], ['audio.playback', 'audio.capture'])
+        self.assertFalse(self.jobs.is_pending('audio.playback'))
+        statuses = [call[0][0]['status'] for call in self.update_callback.call_args_list]
+        self.assertEqual(statuses, [TestJobs.STATUS_RUNNING, TestJobs.STATUS_DONE])
+
+    def test_run_failed(self):
+        self.run_callback.side_effect = Exception('Unable to play test sound')
+        job_id = self.jobs.start('playing')
+
+        self.jobs.resource_acquired('audio.playback')
+        job = self.wait_job(job_id)
+
+        self.assertEqual(job['status'], TestJobs.STATUS_FAILED)
+        self.assertEqual(job['error'], 'Unable to play test sound')
+        self.release_resource.assert_called_once_with('audio.playback')
+
+    def test_update(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def run(job, options):
+            self.jobs.update(job, TestJobs.STATUS_RUNNING, 50)
+            started.set()
+            finish.wait(1.0)
+
+        self.run_callback.side_effect = run
+        job_id = self.jobs.start('playing')
+        self.jobs.resource_acquired('audio.playback')
+        started.wait(1.0)
+
+        self.assertEqual(self.jobs.get(job_id)['progress'], 50)
+        finish.set()
+        self.assertEqual(self.wait_job(job_id)['progress'], 100)
+
+    def test_resource_acquired_without_job(self):
+        self.assertFalse(self.jobs.resource_acquired('audio.capture'))
+
+    def test_history(self):
+        job_ids = []
+        for _ in range(3):
+            job_ids.append(self.jobs.start('playing'))
+            self.jobs.resource_acquired('audio.playback')
+            self.wait_job(job_ids[-1])
+
+        self.assertIsNone(self.jobs.get(job_ids[0]))
+        self.assertIsNotNone(self.jobs.get(job_ids[2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
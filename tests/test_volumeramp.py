@@ -0,0 +1,133 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.volumeramp import VolumeRamp
+import threading
+import time
+from mock import Mock, call
+
+
+class TestVolumeRamp(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def wait_ramp(self, ramp, timeout=2.0):
+        end = time.time() + timeout
+        while ramp.is_running() and time.time() < end:
+            time.sleep(0.01)
+
+    def test_compute_steps(self):
+        self.assertEqual(VolumeRamp.compute_steps(0, 100, 200, 50), [25, 50, 75, 100])
+        self.assertEqual(VolumeRamp.compute_steps(100, 0, 100, 50), [50, 0])
+        self.assertEqual(VolumeRamp.compute_steps(10, 20, 0, 50), [20])
+        self.assertEqual(VolumeRamp.compute_steps(None, 20, 100, 50), [None, None])
+
+    def test_ramp(self):
+        driver = Mock()
+        end_callback = Mock()
+        ramp = VolumeRamp(end_callback)
+
+        count = ramp.start(driver, playback=(0, 100), capture=(50, 50), duration=200)
+        self.wait_ramp(ramp)
+
+        self.assertEqual(count, 4)
+        self.assertEqual(driver.set_volumes.call_args_list, [call(25, 50), call(50, 50), call(75, 50), call(100, 50)])
+        self.assertTrue(end_callback.called)
+
+    def test_ramp_does_not_block(self):
+        driver = Mock()
+        ramp = VolumeRamp()
+
+        start = time.time()
+        ramp.start(driver, playback=(0, 100), duration=500)
+
+        self.assertLess(time.time() - start, 0.1)
+        self.assertTrue(ramp.is_running())
+        self.wait_ramp(ramp)
+
+    def test_ramp_skips_identical_steps(self):
+        driver = Mock()
+        ramp = VolumeRamp()
+
+        count = ramp.start(driver, playback=(10, 11), duration=500)
+        self.wait_ramp(ramp)
+
+        self.assertEqual(count, 2)
+        self.assertEqual(driver.set_volumes.call_args_list, [call(10, None), call(11, None)])
+
+    def test_new_ramp_cancels_current_one(self):
+        driver1 = Mock()
+        driver2 = Mock()
+        ramp = VolumeRamp()
+
+        ramp.start(driver1, playback=(0, 100), duration=1000)
+        time.sleep(0.12)
+        ramp.start(driver2, playback=(100, 0), duration=100)
+        self.wait_ramp(ramp)
+
+        self.assertLess(driver1.set_volumes.call_count, 5)
+        self.assertEqual(driver2.set_volumes.call_args_list[-1], call(0, None))
+        calls = driver1.set_volumes.call_count
+        time.sleep(0.2)
+        self.assertEqual(driver1.set_volumes.call_count, calls)
+
+    def test_cancel(self):
+        driver = Mock()
+        end_callback = Mock()
+        ramp = VolumeRamp(end_callback)
+
+        ramp.start(driver, playback=(0, 100), duration=1000)
+        ramp.cancel()
+        time.sleep(0.2)
+
+        self.assertFalse(ramp.is_running())
+        self.assertFalse(driver.set_volumes.called)
+        self.assertFalse(end_callback.called)
+
+    def test_cancel_waits_for_step_in_progress(self):
+        applying = threading.Event()
+        release = threading.Event()
+        applied = []
+        def set_volumes(playback, capture):
+            applying.set()
+            release.wait(1.0)
+            applied.append(playback)
+        driver = Mock()
+        driver.set_volumes.side_effect = set_volumes
+        ramp = VolumeRamp()
+
+        ramp.start(driver, playback=(0, 100), duration=1000)
+        self.assertTrue(applying.wait(1.0))
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        ramp.cancel()
+
+        # step in progress is completed before cancel returns, no step is applied after
+        calls = driver.set_volumes.call_count
+        self.assertEqual(len(applied), calls)
+        time.sleep(0.15)
+        self.assertEqual(driver.set_volumes.call_count, calls)
+        timer.join()
+
+    def test_nothing_to_ramp(self):
+        driver = Mock()
+        ramp = VolumeRamp()
+
+        self.assertEqual(ramp.start(driver, duration=1000), 0)
+        self.assertFalse(ramp.is_running())
+
+    def test_driver_error_does_not_stop_ramp(self):
+        driver = Mock()
+        driver.set_volumes.side_effect = [Exception('Test exception'), None]
+        ramp = VolumeRamp()
+
+        ramp.start(driver, playback=(0, 100), duration=100)
+        self.wait_ramp(ramp)
+
+        self.assertEqual(driver.set_volumes.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()